@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import APIKey
+from .models import APIKey, CalendarFeed
 
 
 @admin.register(APIKey)
@@ -36,3 +36,15 @@ class APIKeyAdmin(admin.ModelAdmin):
             readonly.append('key')
         return readonly
 
+
+
+@admin.register(CalendarFeed)
+class CalendarFeedAdmin(admin.ModelAdmin):
+    list_display = ['user', 'token_preview', 'created_at']
+    search_fields = ['user__username']
+    readonly_fields = ['token', 'created_at']
+    
+    def token_preview(self, obj):
+        """Show masked version of the feed token"""
+        return f"{obj.token[:8]}..." if obj.token else '-'
+    token_preview.short_description = 'Token Preview'
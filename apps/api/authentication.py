@@ -1,11 +1,27 @@
 """
-API Key Authentication for Meal Planner Apps
+Authentication classes for the API
+
+- APIKeyAuthentication: API keys for meal planner apps
+- CachedTokenAuthentication: DRF tokens with cached token -> user lookups
+- CachedJWTAuthentication: JWTs with cached user lookups (and an optional
+  stateless mode for read-only requests)
 """
 
+import hashlib
+
 from rest_framework import authentication, exceptions
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import router
 from django.utils import timezone
 from .models import APIKey
 
+User = get_user_model()
+
 
 class APIKeyAuthentication(authentication.BaseAuthentication):
     """
@@ -55,3 +71,140 @@ class APIKeyAuthentication(authentication.BaseAuthentication):
         except Exception as e:
             raise exceptions.AuthenticationFailed(f'Authentication failed: {str(e)}')
 
+
+
+# ========== CACHED TOKEN / JWT AUTHENTICATION ==========
+
+# What the cache keeps of a user: enough to authenticate and authorize,
+# never the password hash or personal data
+CACHED_USER_FIELDS = ('id', 'is_active', 'is_staff')
+
+
+def _auth_cache_timeout():
+    """How long resolved users stay cached (seconds)"""
+    return getattr(settings, 'AUTH_CACHE_TIMEOUT', 300)
+
+
+def cached_user_fields(user):
+    """The CACHED_USER_FIELDS of a user, as stored in the cache"""
+    return {name: getattr(user, name) for name in CACHED_USER_FIELDS}
+
+
+def user_from_cache(fields):
+    """
+    User built from cached_user_fields()
+    
+    The other fields are deferred: reading one (e.g. username) loads it
+    from the database like a field left out with .only().
+    """
+    names = [field.attname for field in User._meta.concrete_fields if field.attname in fields]
+    return User.from_db(router.db_for_read(User), names, [fields[name] for name in names])
+
+
+def token_cache_key(key):
+    """Cache key for a DRF token (the raw token never ends up in the cache)"""
+    digest = hashlib.sha256(key.encode()).hexdigest()
+    return f'auth:token-user:{digest}'
+
+
+def user_cache_key(user_id):
+    """Cache key for a user resolved from a JWT"""
+    return f'auth:user-fields:{user_id}'
+
+
+def invalidate_token_cache(key):
+    """Forget a cached token (called when the token is deleted)"""
+    cache.delete(token_cache_key(key))
+
+
+def invalidate_user_cache(user):
+    """Forget everything cached for a user (called when the user changes)"""
+    from rest_framework.authtoken.models import Token
+    
+    keys = [user_cache_key(user.pk)]
+    keys.extend(
+        token_cache_key(key)
+        for key in Token.objects.filter(user=user).values_list('key', flat=True)
+    )
+    cache.delete_many(keys)
+
+
+class CachedTokenAuthentication(authentication.TokenAuthentication):
+    """
+    TokenAuthentication that caches the token -> user lookup.
+    
+    The stock class joins authtoken_token to the user table on every
+    request. Here the token's user (only CACHED_USER_FIELDS) is cached for
+    AUTH_CACHE_TIMEOUT seconds. Entries are dropped when the token is
+    deleted (e.g. revoke_token) or the user is saved (e.g. deactivated).
+    """
+    
+    def authenticate_credentials(self, key):
+        cache_key = token_cache_key(key)
+        fields = cache.get(cache_key)
+        
+        if fields is None:
+            user, token = super().authenticate_credentials(key)
+            cache.set(cache_key, cached_user_fields(user), _auth_cache_timeout())
+            return (user, token)
+        
+        if not fields['is_active']:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+        user = user_from_cache(fields)
+        token = self.get_model()(key=key, user=user)
+        token._state.adding = False
+        return (user, token)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that caches the user looked up from the token (only
+    CACHED_USER_FIELDS).
+    
+    Stateless mode (settings.JWT_STATELESS_READS = True):
+    For safe (read-only) requests the user is built straight from the token
+    claims without touching the database or the cache. The object is an
+    unsaved User with only the id (and username, if present in the claims)
+    filled in - enough for ownership filters like author=request.user, but
+    it is never staff or superuser. Write requests always load the real user.
+    """
+    
+    def authenticate(self, request):
+        self._stateless = (
+            getattr(settings, 'JWT_STATELESS_READS', False)
+            and request.method in SAFE_METHODS
+        )
+        return super().authenticate(request)
+    
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[jwt_settings.USER_ID_CLAIM]
+        except KeyError:
+            # Let the parent raise its usual InvalidToken error
+            return super().get_user(validated_token)
+        
+        if getattr(self, '_stateless', False):
+            return self.get_stateless_user(user_id, validated_token)
+        
+        cache_key = user_cache_key(user_id)
+        fields = cache.get(cache_key)
+        if fields is None:
+            user = super().get_user(validated_token)
+            cache.set(cache_key, cached_user_fields(user), _auth_cache_timeout())
+            return user
+        if not fields['is_active']:
+            raise exceptions.AuthenticationFailed('User is inactive')
+        return user_from_cache(fields)
+    
+    def get_stateless_user(self, user_id, validated_token):
+        """Build a lightweight user object from the token claims"""
+        user = User(**{
+            jwt_settings.USER_ID_FIELD: user_id,
+            'username': validated_token.get('username', ''),
+            'is_active': True,
+        })
+        # Behave like a saved row (so ORM filters accept it)
+        user._state.adding = False
+        user._state.db = 'default'
+        user.is_stateless = True
+        return user
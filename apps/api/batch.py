@@ -0,0 +1,246 @@
+"""
+Batch endpoint: several API requests in one HTTP round trip
+
+A page like the recipe detail page needs the recipe, its comments and
+ratings and the current user. As separate requests, each one pays for
+authentication, the RLS session variables, rate limiting and the rest of the
+middleware. POST /api/batch/ runs them all in one request instead:
+
+    POST /api/batch/
+    {
+        "requests": [
+            {"id": "recipe", "method": "GET", "path": "/api/recipes/5/"},
+            {"id": "comments", "path": "/api/comments/?recipe=5"},
+            {"id": "me", "path": "/api/users/me/"}
+        ]
+    }
+
+    {
+        "responses": [
+            {"id": "recipe", "status": 200, "headers": {...}, "body": {...}, "duration_ms": 4.1},
+            ...
+        ],
+        "duration_ms": 9.7
+    }
+
+How sub-requests run:
+- Each path is resolved with the URL resolver and its view is called
+  directly. Middleware isn't run again (CORS, sessions, RLS and rate
+  limiting were done once for the batch).
+- Sub-requests use the batch request's user and auth (no second
+  authentication). Authorization/Cookie headers can't be overridden; other
+  headers (e.g. If-None-Match, Accept) can be set per sub-request.
+- Everything runs on one database connection in one transaction. Each
+  sub-request gets its own savepoint, so a failed one (status >= 400 or an
+  exception) doesn't affect the others - reads too: on PostgreSQL a failed
+  query aborts the transaction until its savepoint is rolled back. With
+  "atomic": true, the whole batch is rolled back if any sub-request fails.
+
+Limits: at most BATCH_MAX_REQUESTS sub-requests (default 20). Only /api/
+paths, and no nested batches. Each sub-request counts against the client's
+rate limit.
+"""
+
+import io
+import json
+import logging
+import time
+
+from django.conf import settings
+from django.core.exceptions import BadRequest, PermissionDenied, SuspiciousOperation
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import transaction
+from django.http import Http404
+from django.urls import Resolver404, resolve
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from .parsers import FastJSONParser
+
+logger = logging.getLogger(__name__)
+
+BATCH_PATH = '/api/batch/'
+ALLOWED_METHODS = ('GET', 'HEAD', 'OPTIONS', 'POST', 'PUT', 'PATCH', 'DELETE')
+
+# Request META that describes the batch request itself, not a sub-request
+_BATCH_ONLY_META = {
+    'CONTENT_TYPE', 'CONTENT_LENGTH', 'QUERY_STRING', 'PATH_INFO', 'SCRIPT_NAME',
+    'REQUEST_METHOD', 'wsgi.input', 'HTTP_IF_NONE_MATCH', 'HTTP_IF_MODIFIED_SINCE',
+    'HTTP_IF_MATCH', 'HTTP_IF_UNMODIFIED_SINCE', 'HTTP_IDEMPOTENCY_KEY',
+}
+# Headers a sub-request may not set
+_PROTECTED_META = {'HTTP_AUTHORIZATION', 'HTTP_COOKIE', 'HTTP_X_API_KEY', 'HTTP_HOST', 'REMOTE_ADDR', 'HTTP_X_FORWARDED_FOR'}
+
+# Response headers that describe the transport, not the sub-response
+_SKIPPED_RESPONSE_HEADERS = {'content-length', 'vary', 'allow'}
+
+# Exceptions plain Django views raise for client errors, as Django's own
+# handler answers them (anything else is a 500)
+_CLIENT_ERRORS = (
+    (Http404, 404, 'Not found.'),
+    (PermissionDenied, 403, 'You do not have permission to perform this action.'),
+    ((BadRequest, SuspiciousOperation), 400, 'Bad request.'),
+)
+
+
+def max_batch_requests():
+    return getattr(settings, 'BATCH_MAX_REQUESTS', 20)
+
+
+class SubRequestRollback(Exception):
+    """Raised inside a savepoint to undo a failed sub-request"""
+
+
+def parse_batch(data):
+    """Validated list of sub-request specs from the batch body (400 on errors)"""
+    if not isinstance(data, dict) or not isinstance(data.get('requests'), list):
+        raise ValidationError({'requests': 'Expected a list of requests.'})
+    items = data['requests']
+    if not items:
+        raise ValidationError({'requests': 'At least one request is required.'})
+    if len(items) > max_batch_requests():
+        raise ValidationError({'requests': f'At most {max_batch_requests()} requests per batch.'})
+
+    specs = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or not isinstance(item.get('path'), str):
+            raise ValidationError({'requests': f'Request {index}: "path" is required.'})
+        method = str(item.get('method', 'GET')).upper()
+        path = item['path']
+        if method not in ALLOWED_METHODS:
+            raise ValidationError({'requests': f'Request {index}: method {method} is not allowed.'})
+        if not path.startswith('/api/') or path.split('?', 1)[0] == BATCH_PATH:
+            raise ValidationError({'requests': f'Request {index}: only /api/ paths (except the batch endpoint).'})
+        headers = item.get('headers') or {}
+        if not isinstance(headers, dict):
+            raise ValidationError({'requests': f'Request {index}: "headers" must be an object.'})
+        specs.append({
+            'id': item.get('id', index),
+            'method': method,
+            'path': path,
+            'headers': headers,
+            'body': item.get('body'),
+        })
+    return specs
+
+
+def _sub_request(request, spec):
+    """WSGIRequest for a sub-request, sharing the batch request's authentication"""
+    path, _, query = spec['path'].partition('?')
+    body = b'' if spec['body'] is None else json.dumps(spec['body']).encode()
+
+    environ = {key: value for key, value in request.META.items() if key not in _BATCH_ONLY_META}
+    for name, value in spec['headers'].items():
+        key = 'HTTP_' + name.upper().replace('-', '_')
+        if key not in _PROTECTED_META:
+            environ[key] = str(value)
+    environ.update({
+        'REQUEST_METHOD': spec['method'],
+        'PATH_INFO': path,
+        'SCRIPT_NAME': '',
+        'QUERY_STRING': query,
+        'CONTENT_TYPE': FastJSONParser.media_type,
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': io.BytesIO(body),
+    })
+    sub_request = WSGIRequest(environ)
+
+    # What the middleware set on the batch request
+    http_request = request._request
+    for attribute in ('session', 'user', '_messages'):
+        if hasattr(http_request, attribute):
+            setattr(sub_request, attribute, getattr(http_request, attribute))
+    # DRF uses these instead of authenticating again (and skips CSRF:
+    # the batch request itself already passed the CSRF check)
+    sub_request._force_auth_user = request.user
+    sub_request._force_auth_token = request.auth
+    sub_request.csrf_processing_done = True
+    return sub_request
+
+
+def _response_body(response):
+    """JSON-compatible body of a sub-response"""
+    if isinstance(response, Response):
+        return response.data
+    if response.streaming:
+        return None
+    if not getattr(response, 'is_rendered', True):
+        response.render()
+    content = response.content
+    if response.get('Content-Type', '').startswith('application/json'):
+        try:
+            return json.loads(content)
+        except ValueError:
+            pass
+    return content.decode(response.charset or 'utf-8', errors='replace')
+
+
+def _call_view(sub_request):
+    try:
+        match = resolve(sub_request.path_info)
+    except Resolver404:
+        return Response({'detail': 'Not found.'}, status=404)
+    return match.func(sub_request, *match.args, **match.kwargs)
+
+
+def _run_one(sub_request):
+    """
+    Call the view in a savepoint; failed sub-requests are rolled back to it
+    (exceptions propagate after the rollback)
+    """
+    response = None
+    try:
+        with transaction.atomic():
+            response = _call_view(sub_request)
+            if response.status_code >= 400:
+                raise SubRequestRollback
+    except SubRequestRollback:
+        pass
+    return response
+
+
+def _error_response(exc, spec):
+    """Sub-response for an exception a view raised"""
+    for exception_types, status, detail in _CLIENT_ERRORS:
+        if isinstance(exc, exception_types):
+            return Response({'detail': detail}, status=status)
+    logger.exception('Batch sub-request %s %s failed', spec['method'], spec['path'])
+    return Response({'detail': 'Internal server error.'}, status=500)
+
+
+def run_batch(request, specs, atomic=False):
+    """
+    Run sub-requests in order within one transaction
+
+    Returns (list of sub-response dicts, total milliseconds).
+    """
+    started = time.perf_counter()
+    results = []
+    with transaction.atomic():
+        for spec in specs:
+            sub_started = time.perf_counter()
+            sub_request = _sub_request(request, spec)
+            try:
+                response = _run_one(sub_request)
+            except Exception as exc:
+                response = _error_response(exc, spec)
+            results.append({
+                'id': spec['id'],
+                'status': response.status_code,
+                'headers': {
+                    name: value for name, value in response.items()
+                    if name.lower() not in _SKIPPED_RESPONSE_HEADERS
+                },
+                'body': _response_body(response),
+                'duration_ms': round((time.perf_counter() - sub_started) * 1000, 2),
+            })
+        if atomic and any(result['status'] >= 400 for result in results):
+            transaction.set_rollback(True)
+    return results, round((time.perf_counter() - started) * 1000, 2)
+
+
+def server_timing(results, total_ms):
+    """Server-Timing header value (shows up in the browser's network panel)"""
+    parts = [f'batch;dur={total_ms}']
+    parts += [f'sub{index};dur={result["duration_ms"]}' for index, result in enumerate(results)]
+    return ', '.join(parts)
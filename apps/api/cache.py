@@ -0,0 +1,261 @@
+"""
+Application cache helpers
+
+A small API on top of Django's cache for memoizing expensive computations
+(querysets, serializations, aggregates) from views and serializers.
+
+Features:
+- Versioned namespaces: every key lives in a namespace with a version
+  number. bump_namespace() invalidates the whole namespace in O(1) instead
+  of scanning keys.
+- Single-flight: when a value is missing, only one caller computes it.
+  Threads in the same process wait on a lock; other processes wait on a
+  short-lived lock key in the shared cache.
+- Stale-while-revalidate: after `timeout` a value is stale but is kept for
+  another `stale_timeout` seconds. One caller refreshes it while everyone
+  else keeps getting the stale value.
+- Counters: hits, stale hits, misses and compute time per namespace
+  (see get_stats()).
+
+Usage:
+    from apps.api.cache import memoize, cached, bump_namespace
+
+    data = memoize('catalog', ['top', category_id], lambda: expensive(...))
+
+    @cached('stats', timeout=60)
+    def category_counts(category_id):
+        ...
+
+    bump_namespace('catalog')  # after the data changes
+"""
+
+import functools
+import hashlib
+import threading
+import time
+from collections import defaultdict
+
+from django.core.cache import cache
+
+DEFAULT_TIMEOUT = 300  # Seconds a value is fresh
+DEFAULT_STALE_TIMEOUT = 60  # Extra seconds a stale value may be served
+LOCK_TIMEOUT = 10  # Max seconds to wait for another worker's computation
+LOCK_POLL_INTERVAL = 0.05
+
+
+def _now():
+    return time.time()
+
+
+# ========== NAMESPACES ==========
+
+def _version_key(namespace):
+    return f'ns:{namespace}:version'
+
+
+def get_namespace_version(namespace):
+    """Current version of a namespace"""
+    key = _version_key(namespace)
+    version = cache.get(key)
+    if version is None:
+        # Seed from the clock so an evicted version never reuses old keys
+        cache.add(key, int(_now()), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_namespace(namespace):
+    """Invalidate every key in a namespace"""
+    key = _version_key(namespace)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Version was never set (or was evicted) - start a fresh one
+        version = int(_now())
+        cache.set(key, version, None)
+        return version
+
+
+def make_key(namespace, parts):
+    """Build a versioned cache key from a namespace and key parts"""
+    raw = '|'.join(str(part) for part in parts)
+    digest = hashlib.sha1(raw.encode()).hexdigest()
+    return f'ns:{namespace}:{get_namespace_version(namespace)}:{digest}'
+
+
+# ========== STATISTICS ==========
+
+class _NamespaceStats:
+    __slots__ = ('hits', 'stale_hits', 'misses', 'computes', 'compute_seconds')
+
+    def __init__(self):
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.computes = 0
+        self.compute_seconds = 0.0
+
+    def as_dict(self):
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            'hits': self.hits,
+            'stale_hits': self.stale_hits,
+            'misses': self.misses,
+            'hit_rate': round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+            'computes': self.computes,
+            'avg_compute_ms': (
+                round(self.compute_seconds * 1000 / self.computes, 3) if self.computes else 0.0
+            ),
+        }
+
+
+_stats = defaultdict(_NamespaceStats)
+
+
+def get_stats():
+    """Per-namespace counters, plus backend tier counters when available"""
+    result = {namespace: stats.as_dict() for namespace, stats in _stats.items()}
+    backend_stats = getattr(cache, 'stats', None)
+    if backend_stats is not None:
+        result['_backend'] = backend_stats.as_dict()
+    return result
+
+
+def reset_stats():
+    _stats.clear()
+    backend_stats = getattr(cache, 'stats', None)
+    if backend_stats is not None:
+        backend_stats.reset()
+
+
+# ========== SINGLE-FLIGHT ==========
+
+_flight_locks = {}
+_flight_locks_guard = threading.Lock()
+
+
+def _flight_lock(key):
+    with _flight_locks_guard:
+        lock = _flight_locks.get(key)
+        if lock is None:
+            lock = _flight_locks[key] = threading.Lock()
+        return lock
+
+
+def _release_flight_lock(key, lock):
+    with _flight_locks_guard:
+        if _flight_locks.get(key) is lock and not lock.locked():
+            del _flight_locks[key]
+
+
+def single_flight(key, compute, lock_timeout=LOCK_TIMEOUT, ready=None):
+    """
+    Run compute() for `key` at most once at a time, across threads and processes.
+
+    `ready` is an optional callable returning the finished result (or None)
+    - it is checked after waiting, so callers that queued behind another
+    computation reuse its result instead of computing again.
+    """
+    lock = _flight_lock(key)
+    try:
+        with lock:
+            if ready is not None:
+                result = ready()
+                if result is not None:
+                    return result
+
+            lock_key = f'{key}:lock'
+            if not cache.add(lock_key, 1, lock_timeout):
+                # Another process is computing - wait for its result
+                deadline = time.monotonic() + lock_timeout
+                while time.monotonic() < deadline:
+                    time.sleep(LOCK_POLL_INTERVAL)
+                    if ready is not None:
+                        result = ready()
+                        if result is not None:
+                            return result
+                    if not cache.has_key(lock_key):
+                        break
+                # Gave up waiting (or the lock is gone) - compute ourselves
+                return compute()
+
+            try:
+                return compute()
+            finally:
+                cache.delete(lock_key)
+    finally:
+        _release_flight_lock(key, lock)
+
+
+# ========== MEMOIZATION ==========
+
+def memoize(namespace, parts, compute, timeout=DEFAULT_TIMEOUT, stale_timeout=DEFAULT_STALE_TIMEOUT):
+    """
+    Return a cached value for (namespace, parts), computing it if needed.
+
+    compute() is called with no arguments. Its result may be any picklable
+    value, including None.
+    """
+    stats = _stats[namespace]
+    key = make_key(namespace, parts)
+
+    def lookup():
+        # Entries are (value, fresh_until) tuples
+        return cache.get(key)
+
+    def refresh():
+        started = time.perf_counter()
+        value = compute()
+        stats.computes += 1
+        stats.compute_seconds += time.perf_counter() - started
+        cache.set(key, (value, _now() + timeout), timeout + stale_timeout)
+        return (value, None)
+
+    entry = lookup()
+    if entry is not None:
+        value, fresh_until = entry
+        if fresh_until > _now():
+            stats.hits += 1
+            return value
+
+        # Stale: one caller refreshes, everyone else keeps the stale value
+        lock_key = f'{key}:lock'
+        if cache.add(lock_key, 1, LOCK_TIMEOUT):
+            try:
+                return refresh()[0]
+            finally:
+                cache.delete(lock_key)
+        stats.stale_hits += 1
+        return value
+
+    stats.misses += 1
+
+    def ready():
+        entry = lookup()
+        if entry is not None and entry[1] > _now():
+            return entry
+        return None
+
+    return single_flight(key, refresh, ready=ready)[0]
+
+
+def cached(namespace, timeout=DEFAULT_TIMEOUT, stale_timeout=DEFAULT_STALE_TIMEOUT, key=None):
+    """
+    Decorator form of memoize().
+
+    The cache key is built from the function's arguments, or from
+    key(*args, **kwargs) when given.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if key is not None:
+                parts = [func.__qualname__, key(*args, **kwargs)]
+            else:
+                parts = [func.__qualname__, *args, *sorted(kwargs.items())]
+            return memoize(
+                namespace, parts, lambda: func(*args, **kwargs),
+                timeout=timeout, stale_timeout=stale_timeout,
+            )
+        return wrapper
+    return decorator
@@ -0,0 +1,177 @@
+"""
+Custom Django cache backends
+
+TwoTierCache puts a small in-process LRU in front of a shared cache
+(Redis/Memcached in production, a file-based cache locally):
+
+- Reads check the in-process LRU first, then the shared cache
+- Writes go to the shared cache and refresh the local copy
+- Counters (incr/decr) and add() always go to the shared cache, so things
+  like rate limits are shared by every worker process
+
+Local copies live at most LOCAL_TIMEOUT seconds, which bounds how stale a
+worker can be after another process changes or deletes a key.
+
+Configuration (settings.CACHES):
+    'default': {
+        'BACKEND': 'apps.api.cache_backends.TwoTierCache',
+        'OPTIONS': {
+            'SHARED_ALIAS': 'shared',    # Alias of the shared cache
+            'LOCAL_MAX_ENTRIES': 1000,   # Size of the in-process LRU
+            'LOCAL_TIMEOUT': 5,          # Max seconds a local copy is used
+        },
+    }
+"""
+
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import BaseCache, DEFAULT_TIMEOUT
+
+_MISSING = object()
+
+
+class CacheStats:
+    """Hit/miss/latency counters for a TwoTierCache (approximate under threads)"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.local_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.shared_reads = 0
+        self.shared_read_seconds = 0.0
+
+    def as_dict(self):
+        lookups = self.local_hits + self.shared_hits + self.misses
+        hits = self.local_hits + self.shared_hits
+        return {
+            'local_hits': self.local_hits,
+            'shared_hits': self.shared_hits,
+            'misses': self.misses,
+            'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+            'shared_avg_ms': (
+                round(self.shared_read_seconds * 1000 / self.shared_reads, 3)
+                if self.shared_reads else 0.0
+            ),
+        }
+
+
+class TwoTierCache(BaseCache):
+    """In-process LRU in front of a shared Django cache"""
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = options.get('SHARED_ALIAS', location or 'shared')
+        self._local_max_entries = int(options.get('LOCAL_MAX_ENTRIES', 1000))
+        self._local_timeout = float(options.get('LOCAL_TIMEOUT', 5))
+        self._local = OrderedDict()  # key -> (expires_at, pickled value)
+        self._lock = threading.Lock()
+        self.stats = CacheStats()
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    # ----- in-process tier -----
+
+    def _local_get(self, key):
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return _MISSING
+            expires_at, pickled = entry
+            if expires_at <= time.monotonic():
+                del self._local[key]
+                return _MISSING
+            self._local.move_to_end(key)
+        return pickle.loads(pickled)
+
+    def _local_set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        timeout = self.get_backend_timeout(timeout)
+        local_timeout = self._local_timeout
+        if timeout is not None:
+            local_timeout = min(local_timeout, timeout - time.time())
+        if local_timeout <= 0:
+            self._local_delete(key)
+            return
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._local[key] = (time.monotonic() + local_timeout, pickled)
+            self._local.move_to_end(key)
+            while len(self._local) > self._local_max_entries:
+                self._local.popitem(last=False)
+
+    def _local_delete(self, key):
+        with self._lock:
+            self._local.pop(key, None)
+
+    # ----- Django cache API -----
+
+    def get(self, key, default=None, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        value = self._local_get(local_key)
+        if value is not _MISSING:
+            self.stats.local_hits += 1
+            return value
+
+        started = time.perf_counter()
+        value = self.shared.get(key, _MISSING, version=version)
+        self.stats.shared_reads += 1
+        self.stats.shared_read_seconds += time.perf_counter() - started
+
+        if value is _MISSING:
+            self.stats.misses += 1
+            return default
+        self.stats.shared_hits += 1
+        self._local_set(local_key, value)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout=timeout, version=version)
+        self._local_set(self.make_and_validate_key(key, version=version), value, timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout=timeout, version=version)
+        if added:
+            self._local_set(self.make_and_validate_key(key, version=version), value, timeout)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout=timeout, version=version)
+
+    def delete(self, key, version=None):
+        self._local_delete(self.make_and_validate_key(key, version=version))
+        return self.shared.delete(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        self._local_delete(self.make_and_validate_key(key, version=version))
+        return self.shared.incr(key, delta, version=version)
+
+    def decr(self, key, delta=1, version=None):
+        return self.incr(key, -delta, version=version)
+
+    def has_key(self, key, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        if self._local_get(local_key) is not _MISSING:
+            return True
+        return self.shared.has_key(key, version=version)
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+        self.shared.clear()
+
+    def clear_local(self):
+        """Drop only the in-process tier (e.g. between benchmark runs)"""
+        with self._lock:
+            self._local.clear()
+
+    def close(self, **kwargs):
+        self.shared.close(**kwargs)
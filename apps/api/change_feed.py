@@ -0,0 +1,123 @@
+"""
+Recipe change feed for incremental partner sync
+
+Partners (usually authenticated with an API key) keep a copy of the public
+catalog. Instead of exporting every recipe again to find what changed, they
+follow the RecipeChange log:
+
+    GET /api/recipes/changes/              -> {"next_cursor": "1042", ...}
+    (export the catalog once, e.g. /api/recipes/export/)
+    GET /api/recipes/changes/?since=1042   -> changes after that cursor
+
+Each response has:
+- changes: one delta per recipe, in commit order. "created"/"updated"
+  deltas carry the recipe (same shape as the JSON export); "unpublished"
+  and "deleted" deltas are tombstones (recipe is null) - drop the recipe.
+  Drafts that were never published don't appear at all.
+- next_cursor: pass it as ?since= next time (store it after applying the
+  changes; repeating a page is harmless)
+- has_more: true if more changes are waiting right now
+
+Fetch the starting cursor *before* the initial export, so changes made
+while exporting are replayed rather than missed.
+
+Changes are written after the transaction making them commits, one
+writer at a time (see RecipeChange.record()), so ids become visible in
+order: a change can't appear below a cursor that was already handed out.
+"""
+
+from django.db.models import Max
+from rest_framework.exceptions import ValidationError
+
+from apps.recipes.models import Recipe, RecipeChange
+
+CHANGE_FEED_PAGE_SIZE = 500  # Default changes per response
+CHANGE_FEED_MAX_PAGE_SIZE = 1000
+
+# Actions whose delta carries the current recipe
+UPSERT_ACTIONS = (RecipeChange.CREATED, RecipeChange.UPDATED)
+
+
+def format_cursor(change_id):
+    return str(change_id)
+
+
+def parse_cursor(value):
+    """Change id from a ?since= cursor (400 for anything else)"""
+    try:
+        change_id = int(value)
+    except (TypeError, ValueError):
+        change_id = -1
+    if change_id < 0:
+        raise ValidationError({'since': 'Invalid cursor.'})
+    return change_id
+
+
+def parse_limit(value):
+    if value is None:
+        return CHANGE_FEED_PAGE_SIZE
+    try:
+        return max(1, min(int(value), CHANGE_FEED_MAX_PAGE_SIZE))
+    except ValueError:
+        raise ValidationError({'limit': 'Must be a number.'})
+
+
+def latest_cursor():
+    """Cursor of the newest change (where a fresh sync starts)"""
+    latest = RecipeChange.objects.aggregate(latest=Max('id'))
+    return latest['latest'] or 0
+
+
+def read_changes(since, limit=CHANGE_FEED_PAGE_SIZE):
+    """
+    Changes after a cursor, compacted to the last one per recipe
+
+    Returns (changes, next_cursor, has_more).
+    """
+    changes = list(
+        RecipeChange.objects.filter(id__gt=since).order_by('id')[:limit + 1]
+    )
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    next_cursor = changes[-1].id if changes else since
+
+    # Only the latest state matters: keep each recipe's last change, in
+    # the position of that last change
+    latest = {}
+    for change in changes:
+        latest.pop(change.recipe_id, None)
+        latest[change.recipe_id] = change
+    return list(latest.values()), next_cursor, has_more
+
+
+def build_deltas(changes, render_recipes):
+    """
+    Deltas for compacted changes
+
+    render_recipes(queryset, ids) returns the representations of the
+    published recipes among ids. A recipe that was updated but is no longer
+    visible is reported with the tombstone it will get further on.
+    """
+    upsert_ids = [change.recipe_id for change in changes if change.action in UPSERT_ACTIONS]
+    recipes = {}
+    if upsert_ids:
+        recipes = {
+            data['id']: data
+            for data in render_recipes(Recipe.objects.filter(is_published=True), upsert_ids)
+        }
+    hidden = set(upsert_ids) - set(recipes)
+    existing = set(Recipe.objects.filter(pk__in=hidden).values_list('pk', flat=True)) if hidden else set()
+
+    deltas = []
+    for change in changes:
+        action = change.action
+        if action in UPSERT_ACTIONS and change.recipe_id in hidden:
+            action = RecipeChange.UNPUBLISHED if change.recipe_id in existing else RecipeChange.DELETED
+        deltas.append({
+            'cursor': format_cursor(change.id),
+            'recipe_id': change.recipe_id,
+            'action': action,
+            'changed_at': change.created_at,
+            'recipe': recipes.get(change.recipe_id) if action in UPSERT_ACTIONS else None,
+        })
+    return deltas
@@ -0,0 +1,183 @@
+"""
+Conditional GET support (ETag / Last-Modified / Cache-Control)
+
+Clients that already have a response send its validators back
+(If-None-Match / If-Modified-Since). When nothing changed we answer
+304 Not Modified with no body - and without serializing anything.
+
+Validators are computed cheaply:
+- Recipe detail: the recipe's updated_at plus a "stats changed" timestamp
+  that is touched whenever a rating, comment, favorite, ingredient or image
+  of the recipe changes (see apps/recipes/models.py)
+- Lists: max(updated_at) and count over the filtered queryset, plus the
+  catalog "changed" timestamp (ratings/favorites change list fields too)
+- Meal plan exports: max(updated_at) and count of the user's meal plans,
+  the newest recipe update, and a per-user "meal plans changed" timestamp
+  (catches deletions)
+
+Public (anonymous) responses get
+    Cache-Control: public, max-age=..., stale-while-revalidate=...
+Responses for logged-in users are personalized, so they get
+    Cache-Control: private, no-cache
+which still lets the browser revalidate with the ETag.
+
+View counters are not part of the validators, so a 304 may hide a view
+count that is a little out of date (like the catalog response cache).
+"""
+
+import functools
+import hashlib
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+from .response_cache import CATALOG_NAMESPACE, catalog_memoize, normalize_query, response_cache_enabled
+
+SAFE_METHODS = ('GET', 'HEAD')
+
+
+# ========== CHANGE TIMESTAMPS ==========
+
+def _changed_at_key(resource):
+    return f'changed_at:{resource}'
+
+
+def recipe_resource(recipe_id):
+    return f'recipe:{recipe_id}'
+
+
+def meal_plans_resource(user_id):
+    return f'meal_plans:{user_id}'
+
+
+def touch_resource(resource):
+    """Record that a resource (e.g. 'recipe:12' or 'catalog') changed just now"""
+    cache.set(_changed_at_key(resource), time.time(), None)
+
+
+def resource_changed_at(resource):
+    """
+    When a resource last changed (seconds since the epoch)
+
+    A missing entry (never touched, or evicted) counts as "changed now", so
+    losing it can only cause an extra full response, never a wrong 304.
+    """
+    key = _changed_at_key(resource)
+    changed_at = cache.get(key)
+    if changed_at is None:
+        cache.add(key, time.time(), None)
+        changed_at = cache.get(key)
+    return changed_at
+
+
+# ========== HEADERS ==========
+
+def make_etag(parts):
+    """Weak ETag from validator parts (the body is equivalent, not byte-identical)"""
+    raw = '|'.join(str(part) for part in parts)
+    return f'W/"{hashlib.sha1(raw.encode()).hexdigest()}"'
+
+
+def last_modified_timestamp(*values):
+    """Latest of several datetimes / epoch seconds, in whole seconds (None if all are None)"""
+    stamps = [
+        value.timestamp() if isinstance(value, datetime) else value
+        for value in values if value is not None
+    ]
+    return int(max(stamps)) if stamps else None
+
+
+def set_cache_headers(response, etag, last_modified=None, public=False):
+    """Add ETag, Last-Modified and Cache-Control headers to a response"""
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    if public:
+        patch_cache_control(
+            response,
+            public=True,
+            max_age=getattr(settings, 'HTTP_CACHE_MAX_AGE', 60),
+            stale_while_revalidate=getattr(settings, 'HTTP_CACHE_STALE_WHILE_REVALIDATE', 300),
+        )
+        # Shared caches must not hand an anonymous copy to a logged-in user
+        patch_vary_headers(response, ('Authorization', 'Cookie'))
+    else:
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+# ========== CONDITIONAL RESPONSES ==========
+
+def conditional_get(request, etag_parts, last_modified, build_response, public=False):
+    """
+    Answer a GET with 304 Not Modified when the client's copy is current
+
+    Otherwise build_response() is called and its response is returned with
+    validators and Cache-Control headers. Error responses are left alone.
+    """
+    if request.method not in SAFE_METHODS:
+        return build_response()
+
+    # JSON and the browsable API are different representations
+    etag = make_etag([*etag_parts, getattr(request, 'accepted_media_type', '')])
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = build_response()
+        if response.status_code != 200:
+            return response
+    return set_cache_headers(response, etag, last_modified, public)
+
+
+def list_validators(view, request):
+    """
+    (count, max(updated_at)) over the view's filtered queryset
+
+    For anonymous visitors the result is cached with the catalog pages, so a
+    revalidation costs no queries at all.
+    """
+    def compute():
+        queryset = view.filter_queryset(view.get_queryset()).order_by()
+        totals = queryset.aggregate(count=Count('pk'), last_updated=Max('updated_at'))
+        return (totals['count'], totals['last_updated'])
+
+    if request.user.is_authenticated or not response_cache_enabled():
+        return compute()
+    return catalog_memoize(
+        ['validators', type(view).__name__, view.action, request.path,
+         normalize_query(request.query_params)],
+        compute,
+    )
+
+
+def conditional_list(view_method):
+    """
+    Decorator for DRF list-style actions: ETag/Last-Modified from the filtered set
+
+    Put it above @cache_anonymous_response so a 304 skips the cache lookup too.
+    """
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        if request.method not in SAFE_METHODS:
+            return view_method(self, request, *args, **kwargs)
+
+        user = request.user
+        count, last_updated = list_validators(self, request)
+        catalog_changed = resource_changed_at(CATALOG_NAMESPACE)
+        etag_parts = [
+            'list', type(self).__name__, self.action, request.path,
+            normalize_query(request.query_params),
+            user.pk if user.is_authenticated else 'anon',
+            count, last_updated.isoformat() if last_updated else '', catalog_changed,
+        ]
+        return conditional_get(
+            request, etag_parts,
+            last_modified_timestamp(last_updated, catalog_changed),
+            lambda: view_method(self, request, *args, **kwargs),
+            public=not user.is_authenticated,
+        )
+    return wrapper
@@ -0,0 +1,112 @@
+"""
+Fast JSON encoding/decoding for the API
+
+Uses the fastest available backend:
+1. orjson (pip install orjson)
+2. msgspec (pip install msgspec)
+3. the standard library json module (always available)
+
+Output matches DRF's JSONRenderer with the default settings: compact
+separators, UTF-8, datetimes in ISO 8601 with 'Z' for UTC, Decimal as a
+number and U+2028/U+2029 escaped. Values the fast encoder doesn't know
+(Decimal, timedelta, lazy translation strings, querysets, ...) go through
+DRF's JSONEncoder.default(), and anything it rejects outright (e.g.
+integers wider than 64 bits) is retried with the standard library.
+
+Usage:
+    from apps.api import fastjson
+
+    body = fastjson.dumps(data)            # bytes
+    pretty = fastjson.dumps(data, indent=2)
+    data = fastjson.loads(body)
+"""
+
+import json
+
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:  # pragma: no cover - optional dependency
+    msgspec = None
+
+_drf_encoder = JSONEncoder()
+
+# Converts Decimal, datetime, lazy strings, ... to JSON-compatible values
+# (also used by the MessagePack renderer)
+default = _drf_encoder.default
+
+# Errors raised for malformed input by every backend
+DECODE_ERRORS = (ValueError,)
+
+if orjson is not None:
+    BACKEND = 'orjson'
+    _OPTIONS = orjson.OPT_UTC_Z
+
+    def _fast_dumps(data, indent):
+        # orjson only supports 2-space indentation
+        options = _OPTIONS | orjson.OPT_INDENT_2 if indent else _OPTIONS
+        return orjson.dumps(data, default=default, option=options)
+
+    _fast_loads = orjson.loads
+
+elif msgspec is not None:  # pragma: no cover - depends on installed packages
+    BACKEND = 'msgspec'
+    try:
+        _encoder = msgspec.json.Encoder(enc_hook=default, decimal_format='number')
+    except TypeError:
+        # Older msgspec: Decimal is not native, so enc_hook handles it
+        _encoder = msgspec.json.Encoder(enc_hook=default)
+
+    def _fast_dumps(data, indent):
+        encoded = _encoder.encode(data)
+        return msgspec.json.format(encoded, indent=indent) if indent else encoded
+
+    _fast_loads = msgspec.json.decode
+    DECODE_ERRORS = (ValueError, msgspec.DecodeError)
+
+else:  # pragma: no cover - depends on installed packages
+    BACKEND = 'json'
+    _fast_dumps = None
+    _fast_loads = None
+
+
+def _escape_js(encoded):
+    """Escape U+2028/U+2029 so the output is also valid JavaScript (like DRF)"""
+    return encoded.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+def _stdlib_dumps(data, indent=None):
+    """Pure-Python encoder with DRF's default JSON settings"""
+    separators = (',', ': ') if indent else (',', ':')
+    encoded = json.dumps(
+        data, cls=JSONEncoder, indent=indent or None,
+        ensure_ascii=False, allow_nan=False, separators=separators,
+    )
+    return _escape_js(encoded.encode())
+
+
+def dumps(data, indent=None):
+    """Encode data as JSON bytes"""
+    if _fast_dumps is not None:
+        try:
+            return _escape_js(_fast_dumps(data, indent))
+        except (TypeError, ValueError):
+            pass
+    return _stdlib_dumps(data, indent)
+
+
+def loads(data):
+    """Decode JSON from bytes or str"""
+    if _fast_loads is not None:
+        return _fast_loads(data)
+    return json.loads(data, parse_constant=_reject_constant)
+
+
+def _reject_constant(name):
+    raise ValueError(f'Out of range float value: {name}')
@@ -0,0 +1,155 @@
+"""
+Meal plans as iCalendar (RFC 5545)
+
+Two ways to get them:
+- GET /api/meal-plans/export/ical/ - a one-off download (logged in)
+- GET /api/calendar/<token>.ics - a subscription feed for calendar apps
+  (webcal://), authenticated by the token in the URL (CalendarFeed)
+
+Calendar apps poll their subscriptions every few minutes, so the feed is
+built to make unchanged polls cheap:
+
+1. One query finds the token's user and aggregates their meal plans in the
+   feed window (count, newest updated_at, newest recipe update) - an index
+   lookup on the token and on (user, date). No session, no JWT decoding.
+2. Those values (plus the per-user "meal plans changed" timestamp, which
+   catches deletions) are the ETag and Last-Modified: an unchanged poll
+   gets 304 Not Modified without loading a single meal plan.
+3. Otherwise the calendar is streamed: plans are read FEED_CHUNK_SIZE rows
+   at a time and written out as they come, never built as one string.
+
+The feed covers plans from MEAL_PLAN_FEED_PAST_DAYS (default 90) days ago
+onwards.
+"""
+
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db.models import Count, Max, Q
+
+from .models import CalendarFeed
+
+FEED_CHUNK_SIZE = 500  # Meal plans per database round trip
+LINES_PER_WRITE = 200  # iCal lines per streamed chunk
+MAX_LINE_OCTETS = 75
+
+CALENDAR_HEADER = [
+    'BEGIN:VCALENDAR',
+    'VERSION:2.0',
+    'PRODID:-//Recipe Sharing Platform//Meal Plans//EN',
+    'CALSCALE:GREGORIAN',
+    'METHOD:PUBLISH',
+]
+
+
+# ========== FORMATTING ==========
+
+def escape_text(value):
+    """Escape a TEXT value (backslashes, commas, semicolons, newlines)"""
+    return (
+        str(value).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n').replace('\r', '\\n')
+    )
+
+
+def fold(line):
+    """Split a content line into lines of at most 75 octets (continuations start with a space)"""
+    if len(line.encode('utf-8')) <= MAX_LINE_OCTETS:
+        return line
+    parts, current, size = [], [], 0
+    for char in line:
+        octets = len(char.encode('utf-8'))
+        if size + octets > MAX_LINE_OCTETS:
+            parts.append(''.join(current))
+            current, size = [' '], 1
+        current.append(char)
+        size += octets
+    parts.append(''.join(current))
+    return '\r\n'.join(parts)
+
+
+def event_lines(meal_plan):
+    """VEVENT lines of one meal plan (an all-day event on its date)"""
+    stamp = meal_plan.updated_at.strftime('%Y%m%dT%H%M%SZ')
+    return [
+        'BEGIN:VEVENT',
+        f'UID:mealplan-{meal_plan.id}@recipesharing.com',
+        f'DTSTAMP:{stamp}',
+        f'LAST-MODIFIED:{stamp}',
+        f'DTSTART;VALUE=DATE:{meal_plan.date:%Y%m%d}',
+        f'DTEND;VALUE=DATE:{meal_plan.date + timedelta(days=1):%Y%m%d}',
+        fold(f'SUMMARY:{escape_text(meal_plan.recipe.title)} - {meal_plan.get_meal_type_display()}'),
+        fold(f'DESCRIPTION:{escape_text(meal_plan.recipe.description[:200])}'),
+        'LOCATION:Kitchen',
+        'STATUS:CONFIRMED',
+        'SEQUENCE:0',
+        'END:VEVENT',
+    ]
+
+
+def calendar_lines(meal_plans, name=None):
+    """Every line of a calendar of meal plans, lazily"""
+    yield from CALENDAR_HEADER
+    if name:
+        yield fold(f'X-WR-CALNAME:{escape_text(name)}')
+    for meal_plan in meal_plans:
+        yield from event_lines(meal_plan)
+    yield 'END:VCALENDAR'
+
+
+def render_calendar(meal_plans, name=None):
+    """The whole calendar as one string"""
+    return '\r\n'.join(calendar_lines(meal_plans, name)) + '\r\n'
+
+
+def stream_calendar(meal_plans, name=None):
+    """The calendar in chunks of LINES_PER_WRITE lines (for StreamingHttpResponse)"""
+    buffer = []
+    for line in calendar_lines(meal_plans, name):
+        buffer.append(line)
+        if len(buffer) >= LINES_PER_WRITE:
+            yield ('\r\n'.join(buffer) + '\r\n').encode('utf-8')
+            buffer = []
+    if buffer:
+        yield ('\r\n'.join(buffer) + '\r\n').encode('utf-8')
+
+
+# ========== SUBSCRIPTION FEED ==========
+
+def feed_start():
+    """First date shown in the feeds"""
+    return date.today() - timedelta(days=getattr(settings, 'MEAL_PLAN_FEED_PAST_DAYS', 90))
+
+
+def feed_state(token):
+    """
+    The feed's user and validators, in one query (None for an unknown token)
+
+    {"user_id", "user__username", "count", "last_updated", "recipes_updated"}
+    over the user's meal plans in the feed window.
+    """
+    in_window = Q(user__meal_plans__date__gte=feed_start())
+    rows = (
+        CalendarFeed.objects
+        .filter(token=token, user__is_active=True)
+        .values('user_id', 'user__username')
+        .annotate(
+            count=Count('user__meal_plans', filter=in_window),
+            last_updated=Max('user__meal_plans__updated_at', filter=in_window),
+            recipes_updated=Max('user__meal_plans__recipe__updated_at', filter=in_window),
+        )
+    )
+    return next(iter(rows), None)  # Tokens are unique
+
+
+def feed_meal_plans(user_id):
+    """The feed's meal plans, read in chunks"""
+    from apps.recipes.models import MealPlan
+    return (
+        MealPlan.objects
+        .filter(user_id=user_id, date__gte=feed_start())
+        .select_related('recipe')
+        .only('id', 'date', 'meal_type', 'updated_at', 'recipe__title', 'recipe__description')
+        .order_by('date', 'meal_type')
+        .iterator(chunk_size=FEED_CHUNK_SIZE)
+    )
@@ -0,0 +1,234 @@
+"""
+Safe retries: Idempotency-Key for writes, single-flight for expensive GETs
+
+Mobile clients on flaky networks retry requests whose response got lost.
+
+Idempotency-Key (POST/PUT/PATCH):
+    A client sends a unique key (e.g. a UUID) with a write:
+        POST /api/recipes/
+        Idempotency-Key: 5f0c...
+    The first request runs normally and its response is stored for
+    IDEMPOTENCY_KEY_TTL seconds (default 24 hours). A retry with the same
+    key gets the stored response (with `Idempotent-Replayed: true`) instead
+    of creating a second recipe or toggling a favorite back off.
+    - Keys are scoped per user and endpoint; anonymous requests ignore them.
+    - Reusing a key for a different request body returns 422.
+    - A retry while the first request is still running returns 409.
+    - Server errors (5xx) are not stored, so the client can retry them.
+
+Single-flight (GET):
+    Identical concurrent requests to an expensive endpoint (exports, PDF
+    grocery lists) are coalesced: one request computes the response and the
+    others wait for it (threads in-process, other workers through a lock in
+    the shared cache - see cache.single_flight()). The result is kept for
+    SINGLE_FLIGHT_RESULT_TIMEOUT seconds (default 5) in a versioned
+    namespace, so a change to the catalog is never hidden.
+
+Usage:
+    class MealPlanViewSet(IdempotencyMixin, viewsets.ModelViewSet): ...
+
+    @idempotent
+    def create(self, request, *args, **kwargs): ...
+
+    @action(detail=False, methods=['get'])
+    @coalesce_get()
+    def export(self, request): ...
+"""
+
+import functools
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.http.request import RawPostDataException
+from rest_framework.response import Response
+
+from .cache import make_key, single_flight
+from .response_cache import CATALOG_NAMESPACE, normalize_query
+
+IDEMPOTENCY_KEY_HEADER = 'HTTP_IDEMPOTENCY_KEY'
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+IDEMPOTENCY_LOCK_TIMEOUT = 60  # Max seconds a request holds its key
+
+# Response headers that belong to the original transport, not the result
+_SKIPPED_HEADERS = {'content-length'}
+
+
+def _idempotency_ttl():
+    return getattr(settings, 'IDEMPOTENCY_KEY_TTL', 24 * 3600)
+
+
+def _single_flight_timeout():
+    return getattr(settings, 'SINGLE_FLIGHT_RESULT_TIMEOUT', 5)
+
+
+# ========== RESPONSE SNAPSHOTS ==========
+
+def snapshot_response(response):
+    """
+    Picklable copy of a response, or None if it can't be stored
+
+    DRF responses keep their data (so the replay is rendered for whatever
+    the retry accepts); other responses keep their content.
+    """
+    if getattr(response, 'streaming', False):
+        return None
+    headers = {
+        name: value for name, value in response.items() if name.lower() not in _SKIPPED_HEADERS
+    }
+    if isinstance(response, Response):
+        return ('data', response.status_code, response.data, headers)
+    if not getattr(response, 'is_rendered', True):
+        response.render()
+    return ('content', response.status_code, response.content, headers)
+
+
+def restore_response(snapshot):
+    """New response object from snapshot_response()"""
+    kind, status_code, payload, headers = snapshot
+    if kind == 'data':
+        response = Response(payload, status=status_code)
+    else:
+        response = HttpResponse(payload, status=status_code)
+    for name, value in headers.items():
+        response[name] = value
+    return response
+
+
+# ========== IDEMPOTENCY KEYS ==========
+
+def _request_fingerprint(request):
+    """Hash of what makes two requests "the same request" """
+    http_request = request._request
+    content_type = http_request.META.get('CONTENT_TYPE', '')
+    digest = hashlib.sha256()
+    digest.update(f'{request.method} {http_request.get_full_path()} {content_type}\n'.encode())
+    if content_type.startswith('multipart/'):
+        # File uploads can be too big to hold in memory twice
+        digest.update(http_request.META.get('CONTENT_LENGTH', '').encode())
+    else:
+        try:
+            digest.update(http_request.body)
+        except RawPostDataException:
+            # Already parsed by DRF
+            digest.update(repr(sorted(request.data.items())).encode())
+    return digest.hexdigest()
+
+
+def idempotency_cache_key(scope):
+    """Cache key of the stored response for [view, action, user pk, key]"""
+    return 'idempotency:' + hashlib.sha256('|'.join(map(str, scope)).encode()).hexdigest()
+
+
+def idempotent(view_method):
+    """
+    Decorator for DRF viewset write actions honoring the Idempotency-Key header
+
+    Must be the outermost wrapper of the action (the body is fingerprinted
+    before DRF parses it).
+    """
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.META.get(IDEMPOTENCY_KEY_HEADER, '').strip()
+        if not key or not request.user.is_authenticated:
+            return view_method(self, request, *args, **kwargs)
+        if len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+            return Response({'detail': 'Idempotency-Key is too long.'}, status=400)
+
+        cache_key = idempotency_cache_key([type(self).__name__, self.action, request.user.pk, key])
+        fingerprint = _request_fingerprint(request)
+
+        stored = cache.get(cache_key)
+        if stored is None:
+            lock_key = f'{cache_key}:lock'
+            if not cache.add(lock_key, 1, IDEMPOTENCY_LOCK_TIMEOUT):
+                return Response(
+                    {'detail': 'A request with this Idempotency-Key is still being processed.'},
+                    status=409,
+                )
+            try:
+                # The first request may have stored its response and released
+                # the lock between our get() and add()
+                stored = cache.get(cache_key)
+                if stored is None:
+                    response = view_method(self, request, *args, **kwargs)
+                    snapshot = snapshot_response(response) if response.status_code < 500 else None
+                    if snapshot is not None:
+                        cache.set(cache_key, (fingerprint, snapshot), _idempotency_ttl())
+                    return response
+            finally:
+                cache.delete(lock_key)
+
+        stored_fingerprint, snapshot = stored
+        if stored_fingerprint != fingerprint:
+            return Response(
+                {'detail': 'This Idempotency-Key was already used for a different request.'},
+                status=422,
+            )
+        response = restore_response(snapshot)
+        response['Idempotent-Replayed'] = 'true'
+        return response
+    return wrapper
+
+
+class IdempotencyMixin:
+    """Idempotency-Key support for a ModelViewSet's create and update"""
+
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
+    @idempotent
+    def update(self, request, *args, **kwargs):
+        return super().update(request, *args, **kwargs)
+
+
+# ========== SINGLE-FLIGHT GETS ==========
+
+def coalesce_get(namespace=CATALOG_NAMESPACE, extra_parts=None):
+    """
+    Decorator for expensive GET actions: identical concurrent requests run once
+
+    Requests are identical when they have the same view, user, query
+    parameters and Accept/conditional headers. extra_parts(view, request)
+    may add more (e.g. a version of per-user data). The shared result lives
+    in `namespace`, so bumping it (on catalog changes) invalidates it.
+    """
+    def decorator(view_method):
+        @functools.wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            if request.method != 'GET':
+                return view_method(self, request, *args, **kwargs)
+
+            meta = request.META
+            parts = [
+                'single-flight', type(self).__name__, self.action, request.user.pk,
+                request.path, normalize_query(request.query_params), args, sorted(kwargs.items()),
+                meta.get('HTTP_ACCEPT', ''), meta.get('HTTP_IF_NONE_MATCH', ''),
+                meta.get('HTTP_IF_MODIFIED_SINCE', ''),
+            ]
+            if extra_parts is not None:
+                parts += list(extra_parts(self, request))
+            key = make_key(namespace, parts)
+            computed = []
+
+            def compute():
+                response = view_method(self, request, *args, **kwargs)
+                computed.append(response)
+                snapshot = snapshot_response(response) if response.status_code < 500 else None
+                if snapshot is not None:
+                    cache.set(key, snapshot, _single_flight_timeout())
+                return snapshot
+
+            snapshot = single_flight(key, compute, ready=lambda: cache.get(key))
+            if computed:
+                return computed[0]
+            if snapshot is None:
+                # The other request's result couldn't be shared
+                return view_method(self, request, *args, **kwargs)
+            response = restore_response(snapshot)
+            response['X-Single-Flight'] = 'shared'
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,39 @@
+"""
+Django Management Command: build_recommendations
+
+Recomputes the recipe neighbors behind /api/recipes/recommended/ from
+favorites and ratings (see apps/api/recommendations.py). Run it
+periodically (e.g. nightly from cron). Needs NumPy and SciPy.
+
+Usage:
+    python manage.py build_recommendations
+    python manage.py build_recommendations --workers 4
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.api.recommendations import build_available, build_neighbors
+
+
+class Command(BaseCommand):
+    help = 'Compute item-item recipe neighbors for recommendations'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Worker processes (default: one per CPU core)',
+        )
+
+    def handle(self, *args, **options):
+        if not build_available():
+            raise CommandError('build_recommendations needs numpy and scipy (pip install numpy scipy)')
+
+        started = time.perf_counter()
+        recipes, neighbors = build_neighbors(workers=options['workers'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Stored {neighbors} neighbors for {recipes} recipes in {time.perf_counter() - started:.1f}s'
+        ))
@@ -0,0 +1,26 @@
+"""
+Django Management Command: build_similarity_index
+
+Indexes recipes for /api/recipes/{id}/similar/ (see apps/api/similarity.py).
+Recipes are re-indexed automatically when they change; run this once for
+existing recipes (it skips recipes whose index entry is up to date).
+
+Usage:
+    python manage.py build_similarity_index
+"""
+
+from django.core.management.base import BaseCommand
+
+from apps.api.similarity import INDEX_BATCH_SIZE, index_recipes
+from apps.recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Build the MinHash/LSH index used for similar recipes'
+
+    def handle(self, *args, **options):
+        recipe_ids = list(Recipe.objects.order_by('pk').values_list('pk', flat=True))
+        indexed = 0
+        for start in range(0, len(recipe_ids), INDEX_BATCH_SIZE):
+            indexed += index_recipes(recipe_ids[start:start + INDEX_BATCH_SIZE])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} of {len(recipe_ids)} recipes'))
@@ -0,0 +1,45 @@
+"""
+Django Management Command: renormalize_trending
+
+Keeps the stored trending scores small (see apps/api/trending.py).
+Run it daily from cron; it only rewrites scores every few weeks.
+
+Usage:
+    python manage.py renormalize_trending            # Rescale if it's due
+    python manage.py renormalize_trending --force    # Rescale now
+    python manage.py renormalize_trending --rebuild  # Recompute from the analytics buckets
+"""
+
+from django.core.management.base import BaseCommand
+
+from apps.api import analytics, trending
+
+
+class Command(BaseCommand):
+    help = 'Move the trending score landmark forward and rescale the scores'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Rescale even if the landmark is still recent',
+        )
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Recompute all scores from the daily analytics buckets',
+        )
+
+    def handle(self, *args, **options):
+        analytics.flush()
+
+        if options['rebuild']:
+            scored = trending.rebuild()
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt trending scores of {scored} recipes'))
+            return
+
+        rescaled = trending.renormalize(force=options['force'])
+        if rescaled is None:
+            self.stdout.write('Landmark is recent, nothing to do')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Rescaled trending scores of {rescaled} recipes'))
@@ -0,0 +1,422 @@
+"""
+Bulk meal plan operations: batch create, move, copy a range, templates
+
+The calendar used to create plans one POST at a time (20+ requests to copy
+a week). These operations take the whole list at once:
+
+    POST /api/meal-plans/bulk/                    create many plans
+    POST /api/meal-plans/move/                    move plans to other slots
+    POST /api/meal-plans/copy/                    copy a date range to another start date
+    POST /api/meal-plan-templates/{id}/apply/     apply a saved template
+
+Every operation works the same way:
+
+1. Validate every item in one pass, with one query for all the recipes
+   (published or the user's own) and one for the slots already taken. Any
+   invalid item fails the whole request with 400 and per-item errors:
+   {"items": {"3": {"date": ["..."]}}}.
+2. Resolve conflicts (an item for a (date, meal type) slot the user
+   already filled - MealPlan is unique per user, date and meal type) with
+   on_conflict:
+   - "error" (default): nothing is written, 409 lists the conflicts
+   - "skip": keep the existing plans, write the others
+   - "replace": overwrite the existing plans
+3. Write with one bulk_create (an upsert for "replace") in a transaction.
+
+The response reports what happened to each item, in request order:
+{"index": 0, "date": ..., "meal_type": ..., "status": "created" (or "moved")
+| "replaced" | "skipped", "id": ...}.
+"""
+
+from datetime import datetime, timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+
+from apps.recipes.models import MealPlan, Recipe
+
+from .conditional import meal_plans_resource, touch_resource
+from .meal_planner import MAX_DAYS, MEAL_TYPES
+
+MAX_ITEMS = 200  # Items per request
+CONFLICT_MODES = ('error', 'skip', 'replace')
+
+
+class PlanConflict(Exception):
+    """Raised with on_conflict="error" when items target slots already taken"""
+
+    def __init__(self, conflicts):
+        super().__init__(f'{len(conflicts)} meal plan slot(s) already taken')
+        self.conflicts = conflicts
+
+
+# ========== VALIDATION ==========
+
+def parse_date(value, name='date'):
+    """A YYYY-MM-DD date (ValidationError otherwise)"""
+    try:
+        return datetime.strptime(str(value), '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        raise ValidationError({name: 'Use the YYYY-MM-DD format.'})
+
+
+def parse_conflict_mode(data):
+    mode = str(data.get('on_conflict') or 'error').lower()
+    if mode not in CONFLICT_MODES:
+        raise ValidationError({'on_conflict': f'Choose from: {", ".join(CONFLICT_MODES)}.'})
+    return mode
+
+
+def parse_days(data, default=7):
+    try:
+        days = int(data.get('days', default))
+    except (TypeError, ValueError):
+        raise ValidationError({'days': 'Must be a number.'})
+    if not 1 <= days <= MAX_DAYS:
+        raise ValidationError({'days': f'Must be between 1 and {MAX_DAYS}.'})
+    return days
+
+
+def _item_list(data, name='items'):
+    items = data.get(name)
+    if not isinstance(items, list) or not items:
+        raise ValidationError({name: 'Send a non-empty list.'})
+    if len(items) > MAX_ITEMS:
+        raise ValidationError({name: f'At most {MAX_ITEMS} items per request.'})
+    return items
+
+
+def visible_recipe_ids(user, recipe_ids):
+    """The ids among recipe_ids the user may plan (published or their own), in one query"""
+    return set(
+        Recipe.objects.filter(Q(is_published=True) | Q(author=user), pk__in=set(recipe_ids))
+        .values_list('pk', flat=True)
+    )
+
+
+def validate_plan_items(user, items, *, day_field=False, name='items'):
+    """
+    Validate plan items in one pass
+
+    Items are {"date" (or "day", an offset, with day_field), "meal_type",
+    "recipe_id", "notes"}. Returns them cleaned ({date or day, meal_type,
+    recipe_id, notes}) or raises ValidationError with the errors of every
+    invalid item, by index.
+    """
+    cleaned, errors, seen = [], {}, {}
+    for index, item in enumerate(items):
+        item_errors = {}
+        if not isinstance(item, dict):
+            errors[str(index)] = {'non_field_errors': ['Must be an object.']}
+            cleaned.append(None)
+            continue
+        if day_field:
+            try:
+                when = int(item.get('day'))
+                if not 0 <= when < MAX_DAYS:
+                    raise ValueError
+            except (TypeError, ValueError):
+                item_errors['day'] = [f'Must be a day offset between 0 and {MAX_DAYS - 1}.']
+                when = None
+        else:
+            try:
+                when = parse_date(item.get('date'))
+            except ValidationError as error:
+                item_errors['date'] = error.detail['date']
+                when = None
+        meal_type = item.get('meal_type') or 'dinner'
+        if not isinstance(meal_type, str) or meal_type not in MEAL_TYPES:
+            item_errors['meal_type'] = [f'Choose from: {", ".join(MEAL_TYPES)}.']
+            meal_type = None
+        try:
+            recipe_id = int(item.get('recipe_id'))
+        except (TypeError, ValueError):
+            item_errors['recipe_id'] = ['A recipe id is required.']
+            recipe_id = None
+        notes = item.get('notes') or ''
+        if not isinstance(notes, str) or len(notes) > 500:
+            item_errors['notes'] = ['Must be text of at most 500 characters.']
+        slot = (when, meal_type)
+        if when is not None and meal_type is not None:
+            if slot in seen:
+                item_errors['non_field_errors'] = [f'Same slot as item {seen[slot]}.']
+            seen.setdefault(slot, index)
+        if item_errors:
+            errors[str(index)] = item_errors
+        cleaned.append({
+            'day' if day_field else 'date': when,
+            'meal_type': meal_type,
+            'recipe_id': recipe_id,
+            'notes': notes,
+        })
+
+    visible = visible_recipe_ids(user, [item['recipe_id'] for item in cleaned if item and item['recipe_id']])
+    for index, item in enumerate(cleaned):
+        if item and item['recipe_id'] is not None and item['recipe_id'] not in visible:
+            errors.setdefault(str(index), {})['recipe_id'] = ['Recipe not found.']
+    if errors:
+        raise ValidationError({name: errors})
+    return cleaned
+
+
+def parse_bulk_items(data, user):
+    """Plan items of a /bulk/ request (400 on errors)"""
+    return validate_plan_items(user, _item_list(data))
+
+
+# ========== WRITING ==========
+
+def _taken_slots(user, dates):
+    """{(date, meal type): meal plan id} for the user's plans on the given dates"""
+    return {
+        (day, meal_type): plan_id
+        for day, meal_type, plan_id in MealPlan.objects.filter(user=user, date__in=set(dates))
+        .values_list('date', 'meal_type', 'pk')
+    }
+
+
+def _load_plans(user, slots):
+    """{(date, meal type): MealPlan} for the given slots, with recipe and user loaded"""
+    plans = MealPlan.objects.filter(
+        user=user, date__in={day for day, _ in slots}
+    ).select_related('recipe', 'user')
+    return {(plan.date, plan.meal_type): plan for plan in plans}
+
+
+def _results(items, statuses, plans):
+    return [
+        {
+            'index': index,
+            'date': item['date'],
+            'meal_type': item['meal_type'],
+            'status': status,
+            'id': plans[item['date'], item['meal_type']].pk,
+        }
+        for index, (item, status) in enumerate(zip(items, statuses))
+    ]
+
+
+def _summary(results, plans, counts=('created', 'replaced', 'skipped')):
+    statuses = [result['status'] for result in results]
+    return {
+        'results': results,
+        **{status: statuses.count(status) for status in counts},
+        'plans': sorted(plans, key=lambda plan: (plan.date, MEAL_TYPES.index(plan.meal_type))),
+    }
+
+
+def write_plans(user, items, on_conflict='error'):
+    """
+    Create meal plans for validated items (one bulk_create)
+
+    Returns {"results", "created", "replaced", "skipped", "plans"}. Raises
+    PlanConflict with on_conflict="error" when slots are taken (nothing is
+    written), and IntegrityError if another request takes a slot meanwhile.
+    """
+    taken = _taken_slots(user, [item['date'] for item in items])
+    conflicts = [
+        {'index': index, 'date': item['date'], 'meal_type': item['meal_type'], 'existing_id': taken[slot]}
+        for index, item in enumerate(items)
+        for slot in [(item['date'], item['meal_type'])]
+        if slot in taken
+    ]
+    if conflicts and on_conflict == 'error':
+        raise PlanConflict(conflicts)
+
+    statuses, new_plans = [], []
+    for item in items:
+        if (item['date'], item['meal_type']) not in taken:
+            statuses.append('created')
+        elif on_conflict == 'replace':
+            statuses.append('replaced')
+        else:
+            statuses.append('skipped')
+            continue
+        new_plans.append(MealPlan(
+            user=user, recipe_id=item['recipe_id'], date=item['date'],
+            meal_type=item['meal_type'], notes=item['notes'],
+        ))
+
+    if new_plans:
+        with transaction.atomic():
+            if on_conflict == 'replace':
+                MealPlan.objects.bulk_create(
+                    new_plans,
+                    update_conflicts=True,
+                    unique_fields=['user', 'date', 'meal_type'],
+                    update_fields=['recipe', 'notes', 'updated_at'],
+                )
+            else:
+                MealPlan.objects.bulk_create(new_plans)
+        touch_resource(meal_plans_resource(user.pk))  # bulk_create sends no signals
+
+    # Reload: bulk_create doesn't set primary keys on every database
+    plans = _load_plans(user, [(item['date'], item['meal_type']) for item in items])
+    slots = {(item['date'], item['meal_type']) for item in items}
+    return _summary(
+        _results(items, statuses, plans),
+        [plan for slot, plan in plans.items() if slot in slots],
+    )
+
+
+def copy_items(user, data):
+    """
+    Plan items copying the user's plans of one date range to another
+
+    Body: source_start, days (default 7), target_start, meal_types (optional).
+    """
+    source = parse_date(data.get('source_start'), 'source_start')
+    target = parse_date(data.get('target_start'), 'target_start')
+    days = parse_days(data)
+    meal_types = data.get('meal_types') or MEAL_TYPES
+    if isinstance(meal_types, str):
+        meal_types = [meal_type.strip() for meal_type in meal_types.split(',')]
+    unknown = sorted(set(meal_types) - set(MEAL_TYPES))
+    if unknown:
+        raise ValidationError({'meal_types': f'Unknown meal types: {", ".join(unknown)}.'})
+
+    shift = target - source
+    plans = MealPlan.objects.filter(
+        user=user, date__range=(source, source + timedelta(days=days - 1)), meal_type__in=meal_types,
+    ).order_by('date', 'meal_type')
+    return [
+        {'date': day + shift, 'meal_type': meal_type, 'recipe_id': recipe_id, 'notes': notes}
+        for day, meal_type, recipe_id, notes in plans.values_list('date', 'meal_type', 'recipe_id', 'notes')
+    ]
+
+
+def template_items(template, start):
+    """Plan items applying a template from a start date"""
+    return [
+        {
+            'date': start + timedelta(days=item.day),
+            'meal_type': item.meal_type,
+            'recipe_id': item.recipe_id,
+            'notes': item.notes,
+        }
+        for item in template.items.all()
+    ]
+
+
+# ========== MOVING ==========
+
+def parse_moves(data, user):
+    """
+    Validated moves: [{"plan": MealPlan, "date", "meal_type"}]
+
+    Each move is {"id", "date" and/or "meal_type"} (what's left out stays
+    as is). One query loads every plan.
+    """
+    moves = _item_list(data, 'moves')
+    ids = []
+    for move in moves:
+        try:
+            ids.append(int(move.get('id')) if isinstance(move, dict) else None)
+        except (TypeError, ValueError):
+            ids.append(None)
+    plans = MealPlan.objects.filter(user=user).in_bulk([plan_id for plan_id in ids if plan_id is not None])
+
+    cleaned, errors, targets, moved = [], {}, {}, set()
+    for index, (move, plan_id) in enumerate(zip(moves, ids)):
+        move_errors = {}
+        plan = plans.get(plan_id)
+        if plan is None:
+            errors[str(index)] = {'id': ['Meal plan not found.']}
+            continue
+        day = plan.date
+        if move.get('date'):
+            try:
+                day = parse_date(move['date'])
+            except ValidationError as error:
+                move_errors['date'] = error.detail['date']
+        meal_type = move.get('meal_type') or plan.meal_type
+        if not isinstance(meal_type, str) or meal_type not in MEAL_TYPES:
+            move_errors['meal_type'] = [f'Choose from: {", ".join(MEAL_TYPES)}.']
+            meal_type = None
+        if plan_id in moved:
+            move_errors['id'] = ['Moved twice.']
+        elif meal_type is not None and (day, meal_type) in targets:
+            move_errors['non_field_errors'] = [f'Same slot as move {targets[day, meal_type]}.']
+        moved.add(plan_id)
+        if meal_type is not None:
+            targets.setdefault((day, meal_type), index)
+        if move_errors:
+            errors[str(index)] = move_errors
+        cleaned.append({'plan': plan, 'date': day, 'meal_type': meal_type})
+    if errors:
+        raise ValidationError({'moves': errors})
+    return cleaned
+
+
+def move_plans(user, moves, on_conflict='error'):
+    """
+    Move plans to other (date, meal type) slots
+
+    Plans may swap slots with each other. A target slot taken by a plan
+    that isn't moving is a conflict: "replace" deletes that plan, "skip"
+    leaves the move out (and the plan then still holds its slot, which may
+    block another move). The moved plans keep their ids: they are deleted
+    and re-inserted in one transaction, as updating them one by one would
+    trip the unique constraint halfway through a swap.
+    """
+    moving = {move['plan'].pk for move in moves}
+    occupied = {
+        slot: plan_id
+        for slot, plan_id in _taken_slots(user, [move['date'] for move in moves]).items()
+        if plan_id not in moving
+    }
+    conflicts = [
+        {'index': index, 'date': move['date'], 'meal_type': move['meal_type'], 'existing_id': occupied[slot]}
+        for index, move in enumerate(moves)
+        for slot in [(move['date'], move['meal_type'])]
+        if slot in occupied
+    ]
+    if conflicts and on_conflict == 'error':
+        raise PlanConflict(conflicts)
+
+    skipped = set()
+    while on_conflict == 'skip':
+        blocked = {
+            index for index, move in enumerate(moves)
+            if index not in skipped and (move['date'], move['meal_type']) in occupied
+        }
+        if not blocked:
+            break
+        skipped |= blocked
+        for index in blocked:
+            plan = moves[index]['plan']
+            occupied[plan.date, plan.meal_type] = plan.pk
+
+    statuses, updated, replaced = [], [], []
+    for index, move in enumerate(moves):
+        slot = (move['date'], move['meal_type'])
+        if index in skipped:
+            statuses.append('skipped')
+            continue
+        if slot in occupied:
+            statuses.append('replaced')
+            replaced.append(occupied[slot])
+        else:
+            statuses.append('moved')
+        plan = move['plan']
+        plan.date, plan.meal_type = slot
+        updated.append(plan)
+
+    if updated:
+        with transaction.atomic():
+            MealPlan.objects.filter(pk__in=replaced + [plan.pk for plan in updated]).delete()
+            created_at = {plan.pk: plan.created_at for plan in updated}
+            MealPlan.objects.bulk_create(updated)
+            for plan in updated:  # bulk_create stamps created_at again
+                plan.created_at = created_at[plan.pk]
+            MealPlan.objects.bulk_update(updated, ['created_at'])
+        touch_resource(meal_plans_resource(user.pk))
+
+    items = [{'date': move['plan'].date, 'meal_type': move['plan'].meal_type} for move in moves]
+    plans = _load_plans(user, [(item['date'], item['meal_type']) for item in items])
+    return _summary(
+        _results(items, statuses, plans),
+        [plans[item['date'], item['meal_type']] for item in items],
+        counts=('moved', 'replaced', 'skipped'),
+    )
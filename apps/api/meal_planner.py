@@ -0,0 +1,373 @@
+"""
+Meal plan generator: fill a date range with recipes automatically
+
+POST /api/meal-plans/generate/ picks a recipe for every (date, meal type)
+slot that is still empty. Recipes must:
+- suit the user's diets (Recipe.dietary_tags, see apps/recipes/dietary.py)
+- fit the time budget (max_prep_time / max_cook_time / max_total_time)
+- not repeat: a recipe is used once per range, and recipes planned in the
+  VARIETY_DAYS before the range are skipped too
+
+Among those, it prefers popular recipes (by trending score) that share
+ingredients, so the grocery list stays short. The plan maximizes
+
+    sum of the recipes' quality  -  GROCERY_ITEM_COST x distinct ingredients
+
+where quality is 1.0 for the most popular candidate of a meal type down to
+0.0 for the least popular one. Solving:
+
+1. Candidates: one indexed query per meal type for the POOL_SIZE most
+   popular matching recipes (in the category named like the meal type, or
+   any category if there are too few), then one query for all their
+   ingredients. Each recipe's ingredients become a bit vector (one bit per
+   ingredient in the pool).
+2. Greedy: fill the slots in order, each with the candidate adding the
+   most quality for the fewest new grocery items (a popcount of
+   "ingredients & ~basket").
+3. Local search: until the time budget (MEAL_PLANNER_TIME_BUDGET_MS,
+   default 30) runs out, try replacing a random slot's recipe with a
+   random candidate and keep the change if the objective improves.
+
+Generating a week of three meals takes a few queries and well under 100 ms
+on a 50k-recipe catalog (see scripts/benchmark_meal_planner.py). The plans
+are written with one bulk_create.
+"""
+
+import random
+import time
+from datetime import date, datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from rest_framework.exceptions import ValidationError
+
+from apps.recipes.dietary import compatible_with, diet_mask
+from apps.recipes.models import MealPlan, Recipe, RecipeIngredient
+
+from .conditional import meal_plans_resource, touch_resource
+
+MEAL_TYPES = [choice for choice, _ in MealPlan.MEAL_TYPE_CHOICES]
+DEFAULT_MEAL_TYPES = ['breakfast', 'lunch', 'dinner']
+MAX_DAYS = 28
+POOL_SIZE = 200  # Candidates per meal type
+GROCERY_ITEM_COST = 0.1  # Quality given up to save one grocery item
+VARIETY_DAYS = 7  # Don't reuse recipes planned this many days before the range
+MAX_ITERATIONS = 20000
+
+# int.bit_count() needs Python 3.10
+_popcount = getattr(int, 'bit_count', lambda value: bin(value).count('1'))
+
+
+def _time_budget():
+    return getattr(settings, 'MEAL_PLANNER_TIME_BUDGET_MS', 30) / 1000
+
+
+# ========== PARAMETERS ==========
+
+def _as_list(value):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return [item.strip() for item in value.split(',') if item.strip()]
+    return [str(item).strip() for item in value]
+
+
+def _as_bool(value):
+    return str(value).lower() in ('1', 'true', 'yes', 'on')
+
+
+def _minutes(data, name):
+    value = data.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ValidationError({name: 'Must be a number of minutes.'})
+    if value < 0:
+        raise ValidationError({name: 'Must not be negative.'})
+    return value
+
+
+def parse_generate_params(data, user):
+    """Generator options from the request body (400 on errors)"""
+    try:
+        start = datetime.strptime(str(data['start_date']), '%Y-%m-%d').date() if data.get('start_date') else date.today()
+    except ValueError:
+        raise ValidationError({'start_date': 'Use the YYYY-MM-DD format.'})
+    try:
+        days = int(data.get('days', 7))
+    except (TypeError, ValueError):
+        raise ValidationError({'days': 'Must be a number.'})
+    if not 1 <= days <= MAX_DAYS:
+        raise ValidationError({'days': f'Must be between 1 and {MAX_DAYS}.'})
+
+    meal_types = _as_list(data.get('meal_types')) or DEFAULT_MEAL_TYPES
+    unknown = sorted(set(meal_types) - set(MEAL_TYPES))
+    if unknown:
+        raise ValidationError({'meal_types': f'Unknown meal types: {", ".join(unknown)}.'})
+
+    diets = _as_list(data.get('dietary')) or ['mine']
+    if 'mine' in diets:
+        diets.remove('mine')
+        profile = getattr(user, 'profile', None)
+        diets.append(getattr(profile, 'dietary_preferences', 'none'))
+    try:
+        mask = diet_mask(diets)
+    except ValueError as error:
+        raise ValidationError({'dietary': str(error)})
+
+    seed = data.get('seed')
+    try:
+        seed = int(seed) if seed not in (None, '') else None
+    except (TypeError, ValueError):
+        raise ValidationError({'seed': 'Must be a number.'})
+
+    return {
+        'start': start,
+        'days': days,
+        'meal_types': [meal_type for meal_type in MEAL_TYPES if meal_type in meal_types],
+        'diet_mask': mask,
+        'max_prep_time': _minutes(data, 'max_prep_time'),
+        'max_cook_time': _minutes(data, 'max_cook_time'),
+        'max_total_time': _minutes(data, 'max_total_time'),
+        'replace': _as_bool(data.get('replace', False)),
+        'dry_run': _as_bool(data.get('dry_run', False)),
+        'seed': seed,
+    }
+
+
+# ========== CANDIDATES ==========
+
+def _candidate_queryset(options, excluded):
+    queryset = Recipe.objects.filter(is_published=True).filter(compatible_with(options['diet_mask']))
+    if options['max_prep_time'] is not None:
+        queryset = queryset.filter(prep_time__lte=options['max_prep_time'])
+    if options['max_cook_time'] is not None:
+        queryset = queryset.filter(cook_time__lte=options['max_cook_time'])
+    if options['max_total_time'] is not None:
+        queryset = queryset.alias(total_minutes=F('prep_time') + F('cook_time')).filter(
+            total_minutes__lte=options['max_total_time']
+        )
+    if excluded:
+        queryset = queryset.exclude(pk__in=excluded)
+    return queryset.order_by('-trending_score', '-view_count', 'pk')
+
+
+def candidate_pools(options, excluded):
+    """{meal type: [recipe ids, most popular first]}"""
+    queryset = _candidate_queryset(options, excluded)
+    needed = options['days']
+    pools = {}
+    for meal_type in options['meal_types']:
+        ids = list(queryset.filter(category__slug=meal_type).values_list('pk', flat=True)[:POOL_SIZE])
+        if len(ids) < needed:  # Not enough recipes filed under this meal: take any
+            ids = list(queryset.values_list('pk', flat=True)[:POOL_SIZE])
+        pools[meal_type] = ids
+    return pools
+
+
+def ingredient_vectors(recipe_ids):
+    """
+    Ingredients of recipes as bit vectors (one bit per distinct ingredient)
+
+    Returns ({recipe id: bit vector}, {recipe id: bit positions}, number of bits).
+    """
+    positions = {}
+    members = {recipe_id: [] for recipe_id in recipe_ids}
+    for recipe_id, ingredient_id in RecipeIngredient.objects.filter(recipe_id__in=recipe_ids).values_list(
+        'recipe_id', 'ingredient_id'
+    ):
+        members[recipe_id].append(positions.setdefault(ingredient_id, len(positions)))
+    vectors = {recipe_id: sum(1 << bit for bit in set(bits)) for recipe_id, bits in members.items()}
+    return vectors, {recipe_id: tuple(set(bits)) for recipe_id, bits in members.items()}, len(positions)
+
+
+# ========== SOLVER ==========
+
+class PlanSolver:
+    """
+    Greedy + local search assignment of recipes to slots
+
+    slots: [(date, meal type)] to fill. pools: {meal type: [recipe ids,
+    best first]}. kept: recipe ids already planned in the range (their
+    ingredients are bought anyway).
+    """
+
+    def __init__(self, slots, pools, vectors, bits, ingredient_count, kept=(), seed=None):
+        self.slots = slots
+        self.pools = pools
+        self.vectors = vectors
+        self.bits = bits
+        self.quality = {
+            meal_type: {recipe_id: 1 - rank / len(ids) for rank, recipe_id in enumerate(ids)}
+            for meal_type, ids in pools.items()
+        }
+        self.counts = [0] * ingredient_count
+        for recipe_id in kept:
+            self._add(recipe_id)
+        self.basket = 0
+        for recipe_id in kept:
+            self.basket |= vectors.get(recipe_id, 0)
+        self.assignment = [None] * len(slots)
+        self.used = set()
+        self.rng = random.Random(seed)
+        self.iterations = self.improvements = 0
+
+    def _add(self, recipe_id):
+        """Count a recipe's ingredients. Returns how many are new"""
+        added = 0
+        for bit in self.bits.get(recipe_id, ()):
+            added += self.counts[bit] == 0
+            self.counts[bit] += 1
+        return added
+
+    def _remove(self, recipe_id):
+        """Uncount a recipe's ingredients. Returns how many are no longer needed"""
+        removed = 0
+        for bit in self.bits.get(recipe_id, ()):
+            self.counts[bit] -= 1
+            removed += self.counts[bit] == 0
+        return removed
+
+    def greedy(self):
+        for index, (_, meal_type) in enumerate(self.slots):
+            quality = self.quality[meal_type]
+            best, best_score = None, None
+            for recipe_id in self.pools[meal_type]:
+                if recipe_id in self.used:
+                    continue
+                new_items = _popcount(self.vectors[recipe_id] & ~self.basket)
+                score = quality[recipe_id] - GROCERY_ITEM_COST * new_items
+                if best_score is None or score > best_score:
+                    best, best_score = recipe_id, score
+            if best is not None:
+                self.assignment[index] = best
+                self.used.add(best)
+                self.basket |= self.vectors[best]
+                self._add(best)
+
+    def improve(self, deadline):
+        """Random replacements that increase the objective, until the deadline"""
+        filled = [index for index, recipe_id in enumerate(self.assignment) if recipe_id is not None]
+        if not filled:
+            return
+        while self.iterations < MAX_ITERATIONS and time.perf_counter() < deadline:
+            self.iterations += 1
+            index = self.rng.choice(filled)
+            meal_type = self.slots[index][1]
+            candidate = self.rng.choice(self.pools[meal_type])
+            if candidate in self.used:
+                continue
+            current = self.assignment[index]
+            removed = self._remove(current)
+            added = self._add(candidate)
+            gain = (
+                self.quality[meal_type][candidate] - self.quality[meal_type][current]
+                - GROCERY_ITEM_COST * (added - removed)
+            )
+            if gain > 1e-9:
+                self.assignment[index] = candidate
+                self.used.discard(current)
+                self.used.add(candidate)
+                self.improvements += 1
+            else:
+                self._remove(candidate)
+                self._add(current)
+
+    def solve(self, time_budget):
+        deadline = time.perf_counter() + time_budget
+        self.greedy()
+        self.improve(deadline)
+        return self.assignment
+
+    @property
+    def grocery_items(self):
+        return sum(1 for count in self.counts if count)
+
+
+# ========== GENERATING ==========
+
+def generate_meal_plans(user, options):
+    """
+    Fill the empty slots of the range
+
+    Returns a summary dict whose 'plans' are the range's MealPlans after
+    generating (not saved with dry_run). Raises IntegrityError if another
+    request filled a slot in the meantime.
+    """
+    started = time.perf_counter()
+    start, days, meal_types = options['start'], options['days'], options['meal_types']
+    end = start + timedelta(days=days - 1)
+
+    existing = list(MealPlan.objects.filter(
+        user=user, date__gte=start - timedelta(days=VARIETY_DAYS), date__lte=end
+    ).values_list('date', 'meal_type', 'recipe_id'))
+    in_range = [
+        (day, meal_type, recipe_id) for day, meal_type, recipe_id in existing
+        if day >= start and meal_type in meal_types
+    ]
+    replaced = in_range if options['replace'] else []
+    kept = [] if options['replace'] else [recipe_id for _, _, recipe_id in in_range]
+    taken = {(day, meal_type) for day, meal_type, _ in in_range} if not options['replace'] else set()
+    excluded = {recipe_id for day, _, recipe_id in existing if day < start} | set(kept)
+
+    slots = [
+        (start + timedelta(days=offset), meal_type)
+        for offset in range(days)
+        for meal_type in meal_types
+        if (start + timedelta(days=offset), meal_type) not in taken
+    ]
+    pools = candidate_pools(options, excluded)
+    candidates = {recipe_id for ids in pools.values() for recipe_id in ids}
+    vectors, bits, ingredient_count = ingredient_vectors(candidates | set(kept))
+
+    solver = PlanSolver(
+        slots, pools, vectors, bits, ingredient_count, kept=kept,
+        seed=options['seed'] if options['seed'] is not None else hash((user.pk, start.toordinal())),
+    )
+    assignment = solver.solve(_time_budget())
+    new_plans = [
+        MealPlan(user=user, recipe_id=recipe_id, date=day, meal_type=meal_type)
+        for (day, meal_type), recipe_id in zip(slots, assignment)
+        if recipe_id is not None
+    ]
+    solved_ms = (time.perf_counter() - started) * 1000
+
+    in_range_plans = MealPlan.objects.filter(
+        user=user, date__gte=start, date__lte=end, meal_type__in=meal_types
+    ).select_related('recipe', 'user').order_by('date', 'meal_type')
+    if options['dry_run']:
+        recipes = Recipe.objects.only('id', 'title').in_bulk([plan.recipe_id for plan in new_plans])
+        for plan in new_plans:
+            plan.recipe = recipes[plan.recipe_id]
+        plans = ([] if replaced else list(in_range_plans)) + new_plans
+        plans.sort(key=lambda plan: (plan.date, MEAL_TYPES.index(plan.meal_type)))
+    else:
+        with transaction.atomic():
+            if replaced:
+                in_range_plans.delete()
+            MealPlan.objects.bulk_create(new_plans)
+        touch_resource(meal_plans_resource(user.pk))  # bulk_create sends no signals
+        plans = list(in_range_plans)
+
+    return {
+        'start_date': start,
+        'end_date': end,
+        'meal_types': meal_types,
+        'plans': plans,
+        'created': len(new_plans),
+        'unfilled': [
+            {'date': day, 'meal_type': meal_type}
+            for (day, meal_type), recipe_id in zip(slots, assignment)
+            if recipe_id is None
+        ],
+        'grocery_items': solver.grocery_items,
+        'solver': {
+            'candidates': len(candidates),
+            'iterations': solver.iterations,
+            'improvements': solver.improvements,
+            'elapsed_ms': round(solved_ms, 1),
+        },
+    }
@@ -58,7 +58,9 @@ class RateLimitMiddleware(MiddlewareMixin):
     Rate limiting middleware for API endpoints
     
     Limits requests per IP address to prevent abuse.
-    Uses Django cache for storing rate limit data.
+    Uses the Django cache for storing rate limit data. Counters always live
+    in the shared cache tier (see cache_backends.TwoTierCache), so limits
+    apply across all worker processes.
     """
     
     def process_request(self, request):
@@ -71,35 +73,27 @@ class RateLimitMiddleware(MiddlewareMixin):
         if any(request.path.startswith(path) for path in skip_paths):
             return None
         
-        # Get client IP address
-        client_ip = self.get_client_ip(request)
-        
         # Rate limit configuration
         # Default: 100 requests per hour per IP
         rate_limit_requests = getattr(settings, 'RATE_LIMIT_REQUESTS', 100)
         rate_limit_window = getattr(settings, 'RATE_LIMIT_WINDOW', 3600)  # 1 hour in seconds
         
-        # Check rate limit
-        cache_key = f'rate_limit:{client_ip}'
-        current_count = cache.get(cache_key, 0)
+        current_count, reset_at = self.count_requests(request)
         
-        if current_count >= rate_limit_requests:
+        if current_count > rate_limit_requests:
             # Rate limit exceeded
             return JsonResponse(
                 {
                     'error': 'Rate limit exceeded',
                     'message': f'Too many requests. Limit: {rate_limit_requests} requests per {rate_limit_window // 60} minutes.',
-                    'retry_after': rate_limit_window,
+                    'retry_after': max(reset_at - int(time.time()), 1),
                 },
                 status=429  # Too Many Requests
             )
         
-        # Increment counter
-        cache.set(cache_key, current_count + 1, rate_limit_window)
-        
         # Add rate limit headers to response
-        request._rate_limit_remaining = rate_limit_requests - current_count - 1
-        request._rate_limit_reset = int(time.time()) + rate_limit_window
+        request._rate_limit_remaining = rate_limit_requests - current_count
+        request._rate_limit_reset = reset_at
         
         return None
     
@@ -112,7 +106,33 @@ class RateLimitMiddleware(MiddlewareMixin):
         
         return response
     
-    def get_client_ip(self, request):
+    @classmethod
+    def count_requests(cls, request, amount=1):
+        """
+        Add amount requests to the client's counter
+        
+        Returns (requests in the current window, window reset timestamp).
+        Also used by /api/batch/ to charge for its sub-requests.
+        """
+        client_ip = cls.get_client_ip(request)
+        rate_limit_window = getattr(settings, 'RATE_LIMIT_WINDOW', 3600)
+        
+        # Fixed-window counter in the shared cache, so every worker process
+        # counts against the same limit. add() starts the window and incr()
+        # is atomic on Redis/Memcached.
+        window = int(time.time() // rate_limit_window)
+        cache_key = f'rate_limit:{client_ip}:{window}'
+        cache.add(cache_key, 0, rate_limit_window)
+        try:
+            current_count = cache.incr(cache_key, amount)
+        except ValueError:
+            # Key expired between add() and incr()
+            cache.set(cache_key, amount, rate_limit_window)
+            current_count = amount
+        return current_count, (window + 1) * rate_limit_window
+    
+    @staticmethod
+    def get_client_ip(request):
         """
         Get client IP address from request
         
@@ -0,0 +1,110 @@
+"""
+Reusable ViewSet mixins for the API
+"""
+
+from rest_framework.response import Response
+
+from .projections import get_projection, projections_enabled
+from .sparse_fields import parse_sparse_fields, plan_queryset
+
+
+class CachedObjectMixin:
+    """
+    Fetch the detail object at most once per request.
+
+    Our viewsets check ownership in check_permissions() by calling
+    get_object(), and then the action (update, destroy, ...) calls
+    get_object() again. Without this mixin the object (and all of its
+    prefetches) is loaded from the database twice.
+    """
+
+    def get_object(self):
+        if getattr(self, '_cached_object', None) is None:
+            self._cached_object = super().get_object()
+        return self._cached_object
+
+
+class SparseFieldsMixin:
+    """
+    ?fields= / ?expand= support for a ViewSet (see apps/api/sparse_fields.py)
+
+    The selection is passed to the serializer through its context and is
+    used in filter_queryset() to plan joins, prefetches and loaded columns.
+    Custom actions should pass their queryset through filter_queryset().
+
+    sparse_required_columns lists columns the view itself reads from the
+    objects (e.g. for permission checks), so they are never deferred.
+    """
+    sparse_required_columns = ()
+
+    def get_sparse_fields(self):
+        if not hasattr(self, '_sparse_fields'):
+            request = getattr(self, 'request', None)
+            self._sparse_fields = (
+                parse_sparse_fields(request, self.get_serializer_class())
+                if request is not None else None
+            )
+        return self._sparse_fields
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        sparse = self.get_sparse_fields()
+        if sparse is not None:
+            context['sparse_fields'] = sparse
+        return context
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        sparse = self.get_sparse_fields()
+        if sparse is None:
+            return queryset
+        return plan_queryset(
+            queryset, self.get_serializer_class(), *sparse,
+            required_columns=self.sparse_required_columns,
+        )
+
+
+class ProjectionMixin:
+    """
+    Serve list pages from a compiled projection (see apps/api/projections.py)
+
+    list() and custom list actions (via list_response() and serialize_pks())
+    read the objects with one .values() query and build the same data the
+    serializer would, without running the serializer. Requests with ?fields=/?expand= and
+    serializers that can't be projected use the serializer as usual.
+    """
+
+    def get_projection(self):
+        if not projections_enabled():
+            return None
+        get_sparse_fields = getattr(self, 'get_sparse_fields', None)
+        if get_sparse_fields is not None and get_sparse_fields() is not None:
+            return None
+        return get_projection(self.get_serializer_class())
+
+    def list_response(self, queryset):
+        """Paginated response for an already filtered queryset"""
+        projection = self.get_projection()
+        if projection is None:
+            page = self.paginate_queryset(queryset)
+            if page is not None:
+                return self.get_paginated_response(self.get_serializer(page, many=True).data)
+            return Response(self.get_serializer(queryset, many=True).data)
+
+        rows = projection.values(queryset)
+        context = self.get_serializer_context()
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(projection.project(page, context))
+        return Response(projection.project(rows, context))
+
+    def list(self, request, *args, **kwargs):
+        return self.list_response(self.filter_queryset(self.get_queryset()))
+
+    def serialize_pks(self, queryset, pks):
+        """Representations of the objects with the given pks, in that order (missing ones skipped)"""
+        projection = self.get_projection()
+        if projection is not None:
+            return projection.project_pks(queryset, pks, self.get_serializer_context())
+        objects = {obj.pk: obj for obj in self.filter_queryset(queryset.filter(pk__in=pks))}
+        return self.get_serializer([objects[pk] for pk in pks if pk in objects], many=True).data
@@ -3,6 +3,7 @@ API Models for Recipe Sharing Platform
 
 Models:
 - APIKey: API keys for meal planner apps and external integrations
+- CalendarFeed: Secret token of a user's meal plan calendar subscription
 """
 
 from django.db import models
@@ -94,3 +95,67 @@ class APIKey(models.Model):
         if self.expires_at and self.expires_at < timezone.now():
             raise ValidationError("Expiration date cannot be in the past")
 
+
+class CalendarFeed(models.Model):
+    """
+    Calendar Feed Token
+    
+    Calendar apps subscribe to a user's meal plans with a URL that embeds
+    this token (webcal://.../api/calendar/<token>.ics) and poll it without
+    logging in. Rotating the token invalidates the old URL.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='calendar_feed',
+        help_text="User whose meal plans the feed shows"
+    )
+    token = models.CharField(
+        max_length=64,
+        unique=True,
+        help_text="Secret part of the subscription URL"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = "Calendar Feed"
+        verbose_name_plural = "Calendar Feeds"
+    
+    def __str__(self):
+        return f"Calendar feed of {self.user.username}"
+    
+    def save(self, *args, **kwargs):
+        if not self.token:
+            self.token = self.generate_token()
+        super().save(*args, **kwargs)
+    
+    @staticmethod
+    def generate_token():
+        """Generate a secure random feed token"""
+        return secrets.token_urlsafe(32)
+
+
+
+# Signals to keep cached authentication (see authentication.py) in sync
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    """Forget a revoked/deleted token right away"""
+    from .authentication import invalidate_token_cache
+    invalidate_token_cache(instance.key)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    """
+    Forget cached copies of a user whenever the user row changes
+    
+    Covers deactivation (is_active=False), password changes and deletion.
+    """
+    from .authentication import invalidate_user_cache
+    invalidate_user_cache(instance)
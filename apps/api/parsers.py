@@ -0,0 +1,55 @@
+"""
+API Parsers
+
+- FastJSONParser: drop-in replacement for DRF's JSONParser that decodes
+  with orjson/msgspec when installed (see apps/api/fastjson.py)
+- MessagePackParser: request bodies sent as `Content-Type: application/msgpack`
+  (needs the optional msgpack package, see parser_classes_with_msgpack())
+"""
+
+import codecs
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser
+from rest_framework.settings import api_settings
+
+from . import fastjson
+from .renderers import FastJSONRenderer, MessagePackRenderer, msgpack
+
+
+class FastJSONParser(JSONParser):
+    """JSONParser backed by the fastest available JSON decoder"""
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+
+        try:
+            body = stream.read()
+            if codecs.lookup(encoding).name != 'utf-8':
+                body = body.decode(encoding)
+            return fastjson.loads(body)
+        except fastjson.DECODE_ERRORS as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
+
+
+class MessagePackParser(BaseParser):
+    """Parses MessagePack request bodies"""
+    media_type = 'application/msgpack'
+    renderer_class = MessagePackRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False, strict_map_key=False)
+        except (ValueError, msgpack.UnpackException) as exc:
+            raise ParseError('MessagePack parse error - %s' % str(exc))
+
+
+def parser_classes_with_msgpack():
+    """The default parsers, plus MessagePack when msgpack is installed"""
+    parsers = list(api_settings.DEFAULT_PARSER_CLASSES)
+    if msgpack is not None:
+        parsers.append(MessagePackParser)
+    return parsers
@@ -0,0 +1,258 @@
+"""
+Compiled read projections for list endpoints
+
+Rendering a page of recipes through DRF builds a field tree per serializer,
+walks every field for every object, and (for the counts and the average
+rating) runs extra queries per recipe. For read-only list pages we can do
+the same work much more cheaply:
+
+1. "Compile" the serializer once: walk its fields and turn each one into a
+   step that reads a column from a .values() row (author__username,
+   category__name, ...), a SQL annotation (counts, average rating) or a
+   small Python function (the current user's favorites/rating).
+2. Fetch the page with one .values() query (plus one query per nested
+   many=True relation for the whole page) and build plain dicts from the
+   rows with those steps.
+
+The output is the same data, in the same key order, as the serializer, so
+the rendered JSON is byte-identical (see ProjectionParityTest).
+
+Fields that aren't model columns are described by the serializer in
+`projected_fields` (see RECIPE_PROJECTED_FIELDS in serializers.py). A
+serializer using anything the compiler doesn't understand (dotted sources,
+unknown method fields, many-to-many relations, ...) is simply not
+projectable - get_projection() returns None and views use the serializer.
+
+Usage:
+    projection = get_projection(RecipeListSerializer)
+    rows = projection.values(queryset)
+    data = projection.project(rows[:20], {'request': request})
+
+Set API_PROJECTIONS_ENABLED = False in settings to always use serializers.
+"""
+
+import functools
+import logging
+from collections import defaultdict
+from typing import Any, Callable, NamedTuple, Optional
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Avg, Count, FloatField, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+# Step kinds
+VALUE = 'value'  # Model column (None stays None, like the serializer)
+EXPRESSION = 'expression'  # SQL annotation from projected_fields
+NESTED = 'nested'  # Forward foreign key rendered with a nested serializer
+MANY = 'many'  # Reverse foreign key rendered with a nested serializer(many=True)
+RESOLVED = 'resolved'  # Python function of the row's primary key
+
+# DRF fields whose to_representation() returns database values unchanged
+_IDENTITY_FIELDS = (
+    serializers.CharField,
+    serializers.IntegerField,
+    serializers.BooleanField,
+    serializers.ReadOnlyField,
+    serializers.PrimaryKeyRelatedField,
+)
+
+
+class ProjectionNotSupported(Exception):
+    """The serializer uses a field the projection can't reproduce exactly"""
+
+
+class ProjectedField(NamedTuple):
+    """
+    How to project a serializer field that isn't a model column
+
+    Either an SQL expression (annotated on the queryset, then passed through
+    convert(value) if given) or resolve(pk, context), computed in Python for
+    each row. prepare(pks, context) is called once per page before resolve,
+    e.g. to batch-load data for all rows.
+    """
+    expression: Any = None
+    convert: Optional[Callable] = None
+    resolve: Optional[Callable] = None
+    prepare: Optional[Callable] = None
+
+
+def related_count(model, fk='recipe'):
+    """Number of `model` rows pointing at the outer row (0 if none)"""
+    counts = (
+        model.objects.filter(**{fk: OuterRef('pk')}).order_by()
+        .values(fk).annotate(count=Count('pk')).values('count')
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+def related_average(model, field, fk='recipe'):
+    """Average of `model.field` over rows pointing at the outer row (0.0 if none)"""
+    averages = (
+        model.objects.filter(**{fk: OuterRef('pk')}).order_by()
+        .values(fk).annotate(average=Avg(field)).values('average')
+    )
+    return Coalesce(Subquery(averages, output_field=FloatField()), Value(0.0))
+
+
+def projections_enabled():
+    return getattr(settings, 'API_PROJECTIONS_ENABLED', True)
+
+
+def _file_url(model_field):
+    """Converter matching DRF's FileField/ImageField (absolute URL with a request)"""
+    storage = model_field.storage
+
+    def convert(name, context):
+        if not name:
+            return None
+        url = storage.url(name)
+        request = context.get('request')
+        return request.build_absolute_uri(url) if request is not None else url
+    return convert
+
+
+def _representation(field):
+    return lambda value, context: field.to_representation(value)
+
+
+class Projection:
+    """Compiled projection of one serializer over its model"""
+
+    def __init__(self, serializer, model, top_level=True):
+        self.model = model
+        self.pk_key = model._meta.pk.attname
+        self._lookups = {self.pk_key: None}  # Ordered set of .values() lookups
+        self.annotations = {}
+        self._prepares = []
+        self._many = []  # (foreign key attname on the child, child Projection)
+        self.steps = self._compile(serializer, model, '', top_level)
+
+    @property
+    def lookups(self):
+        return list(self._lookups)
+
+    def _add_lookup(self, lookup):
+        self._lookups[lookup] = None
+        return lookup
+
+    def _compile(self, serializer, model, prefix, top_level):
+        declared = getattr(serializer, 'projected_fields', {})
+        steps = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if name in declared:
+                if not top_level or prefix:
+                    raise ProjectionNotSupported(f'{name}: projected_fields only work at the top level')
+                steps.append(self._compile_declared(name, declared[name]))
+                continue
+
+            source = field.source
+            if source == '*' or '.' in source:
+                raise ProjectionNotSupported(f'{name}: source {source!r}')
+            try:
+                model_field = model._meta.get_field(source)
+            except FieldDoesNotExist:
+                raise ProjectionNotSupported(f'{name}: {source!r} is not a model field')
+
+            if isinstance(field, serializers.ListSerializer):
+                if not (top_level and not prefix and model_field.one_to_many):
+                    raise ProjectionNotSupported(f'{name}: only top-level reverse foreign keys')
+                child = Projection(field.child, model_field.related_model, top_level=False)
+                fk = child._add_lookup(model_field.field.attname)
+                self._many.append((fk, child))
+                steps.append((MANY, name, len(self._many) - 1, None))
+            elif isinstance(field, serializers.BaseSerializer):
+                if not (model_field.many_to_one or model_field.one_to_one) or model_field.auto_created:
+                    raise ProjectionNotSupported(f'{name}: only forward foreign keys')
+                null_key = self._add_lookup(prefix + source)
+                child_steps = self._compile(
+                    field, model_field.related_model, f'{prefix}{source}__', top_level=False
+                )
+                steps.append((NESTED, name, null_key, child_steps))
+            elif model_field.is_relation and not isinstance(field, serializers.PrimaryKeyRelatedField):
+                raise ProjectionNotSupported(f'{name}: relation rendered as {type(field).__name__}')
+            elif model_field.is_relation and (model_field.many_to_many or model_field.one_to_many):
+                raise ProjectionNotSupported(f'{name}: many-valued relation')
+            elif isinstance(field, serializers.FileField):
+                steps.append((VALUE, name, self._add_lookup(prefix + source), _file_url(model_field)))
+            elif isinstance(field, serializers.SerializerMethodField):
+                raise ProjectionNotSupported(f'{name}: method field without projected_fields')
+            elif isinstance(field, _IDENTITY_FIELDS) and not isinstance(field, serializers.ChoiceField):
+                steps.append((VALUE, name, self._add_lookup(prefix + source), None))
+            else:
+                steps.append((VALUE, name, self._add_lookup(prefix + source), _representation(field)))
+        return steps
+
+    def _compile_declared(self, name, projected):
+        if projected.expression is not None:
+            alias = f'_projected_{name}'
+            self.annotations[alias] = projected.expression
+            return (EXPRESSION, name, self._add_lookup(alias), projected.convert)
+        if projected.prepare is not None:
+            self._prepares.append(projected.prepare)
+        return (RESOLVED, name, self.pk_key, projected.resolve)
+
+    def values(self, queryset):
+        """The .values() queryset to paginate and pass to project()"""
+        queryset = queryset.select_related(None).prefetch_related(None)
+        if self.annotations:
+            queryset = queryset.annotate(**self.annotations)
+        return queryset.values(*self._lookups)
+
+    def project(self, rows, context):
+        """List of representations of rows from values() (one query per many=True field)"""
+        rows = list(rows)
+        pks = [row[self.pk_key] for row in rows]
+        for prepare in self._prepares:
+            prepare(pks, context)
+        related = [child._project_grouped(fk, pks, context) for fk, child in self._many]
+        build = self._build
+        steps = self.steps
+        return [build(steps, row, context, related) for row in rows]
+
+    def project_pks(self, queryset, pks, context):
+        """Representations of the given objects of queryset, in the order of pks"""
+        pks = list(pks)
+        rows = {row[self.pk_key]: row for row in self.values(queryset.filter(pk__in=pks))}
+        return self.project([rows[pk] for pk in pks if pk in rows], context)
+
+    def _project_grouped(self, fk, parent_pks, context):
+        """{parent pk: [representations]} of the child rows of a page"""
+        groups = defaultdict(list)
+        if parent_pks:
+            queryset = self.model._default_manager.filter(**{f'{fk}__in': parent_pks})
+            rows = list(self.values(queryset))
+            for row, data in zip(rows, self.project(rows, context)):
+                groups[row[fk]].append(data)
+        return groups
+
+    def _build(self, steps, row, context, related):
+        data = {}
+        for kind, name, key, extra in steps:
+            if kind is VALUE:
+                value = row[key]
+                data[name] = value if extra is None or value is None else extra(value, context)
+            elif kind is NESTED:
+                data[name] = None if row[key] is None else self._build(extra, row, context, related)
+            elif kind is EXPRESSION:
+                data[name] = row[key] if extra is None else extra(row[key])
+            elif kind is MANY:
+                data[name] = related[key].get(row[self.pk_key], [])
+            else:
+                data[name] = extra(row[key], context)
+        return data
+
+
+@functools.lru_cache(maxsize=None)
+def get_projection(serializer_class):
+    """Compiled projection for a ModelSerializer class, or None if it can't be projected"""
+    try:
+        return Projection(serializer_class(), serializer_class.Meta.model)
+    except ProjectionNotSupported as exc:
+        logger.debug('%s is not projectable: %s', serializer_class.__name__, exc)
+        return None
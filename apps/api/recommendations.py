@@ -0,0 +1,196 @@
+"""
+Recipe recommendations: offline item-item collaborative filtering
+
+Favorites and ratings say which recipes the same people like. Two recipes
+are neighbors when mostly the same users interacted with them:
+
+    similarity(a, b) = cosine of the rows a and b of the recipe x user matrix
+
+Building (offline, `python manage.py build_recommendations`):
+1. Load every favorite (weight 1.0) and rating (weight stars / 5) into a
+   sparse recipe x user matrix (SciPy) and L2-normalize the rows.
+2. Multiply chunks of CHUNK_SIZE rows with the whole matrix - a sparse
+   product, so only recipes that share users are ever compared - and keep
+   each recipe's top NEIGHBORS_PER_RECIPE neighbors. Chunks are spread
+   over worker processes (one per core by default).
+3. Replace the RecipeNeighbor table in one transaction.
+
+Serving (recommended_recipes()): one query sums the neighbor scores of
+everything the user favorited, leaves out recipes they already favorited
+or wrote, boosts recipes suiting their dietary preference
+(UserProfile.dietary_preferences, matched against Recipe.dietary_tags) and
+returns the best ones. Users without favorites (or with few results) get
+popular recipes for their diet.
+
+NumPy and SciPy are only needed to build (they're optional dependencies);
+serving is plain SQL.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.db import transaction
+from django.db.models import Case, F, FloatField, Sum, Value, When
+
+from apps.recipes.dietary import BITS, compatible_with
+from apps.recipes.models import Favorite, Rating, Recipe, RecipeNeighbor
+
+try:
+    import numpy
+    from scipy import sparse
+except ImportError:  # pragma: no cover - optional dependency
+    numpy = sparse = None
+
+NEIGHBORS_PER_RECIPE = 30
+CHUNK_SIZE = 2000  # Recipes per sparse product
+MIN_SIMILARITY = 0.01
+FAVORITE_WEIGHT = 1.0
+DIETARY_MATCH_BOOST = 2.0  # Score multiplier for recipes matching the user's diet
+WRITE_BATCH_SIZE = 5000
+MAX_RECOMMENDATIONS = 100
+
+
+def build_available():
+    """Whether NumPy and SciPy are installed"""
+    return numpy is not None and sparse is not None
+
+
+# ========== BUILDING ==========
+
+def interaction_matrix():
+    """
+    (recipe ids, L2-normalized recipe x user CSR matrix)
+
+    A user who both favorited and rated a recipe counts once, with the
+    larger weight.
+    """
+    weights = {}
+    for recipe_id, user_id in Favorite.objects.values_list('recipe_id', 'user_id').iterator():
+        weights[recipe_id, user_id] = FAVORITE_WEIGHT
+    for recipe_id, user_id, stars in Rating.objects.values_list('recipe_id', 'user_id', 'stars').iterator():
+        key = (recipe_id, user_id)
+        weights[key] = max(weights.get(key, 0), stars / 5)
+    if not weights:
+        return numpy.zeros(0, dtype=numpy.int64), sparse.csr_matrix((0, 0), dtype=numpy.float32)
+
+    pairs = numpy.array(list(weights), dtype=numpy.int64)
+    recipe_ids, rows = numpy.unique(pairs[:, 0], return_inverse=True)
+    user_ids, columns = numpy.unique(pairs[:, 1], return_inverse=True)
+    matrix = sparse.csr_matrix(
+        (numpy.fromiter(weights.values(), dtype=numpy.float32, count=len(weights)), (rows, columns)),
+        shape=(len(recipe_ids), len(user_ids)),
+    )
+    norms = numpy.sqrt(matrix.multiply(matrix).sum(axis=1)).A1
+    return recipe_ids, sparse.diags(1 / norms).dot(matrix).tocsr()
+
+
+# Matrix shared with worker processes (set by _init_worker)
+_matrix = None
+_transposed = None
+
+
+def _init_worker(matrix):
+    global _matrix, _transposed
+    _matrix = matrix
+    _transposed = matrix.T.tocsr()
+
+
+def _top_neighbors(bounds):
+    """(rows, neighbor rows, scores) of the top neighbors of rows start..stop"""
+    start, stop = bounds
+    similarities = _matrix[start:stop].dot(_transposed).tocsr()
+    sources, targets, scores = [], [], []
+    for offset in range(stop - start):
+        row = start + offset
+        begin, end = similarities.indptr[offset], similarities.indptr[offset + 1]
+        columns = similarities.indices[begin:end]
+        values = similarities.data[begin:end]
+        keep = (columns != row) & (values >= MIN_SIMILARITY)
+        columns, values = columns[keep], values[keep]
+        if len(values) > NEIGHBORS_PER_RECIPE:
+            best = numpy.argpartition(-values, NEIGHBORS_PER_RECIPE)[:NEIGHBORS_PER_RECIPE]
+            columns, values = columns[best], values[best]
+        sources.append(numpy.full(len(columns), row, dtype=numpy.int64))
+        targets.append(columns.astype(numpy.int64))
+        scores.append(values)
+    if not sources:
+        return numpy.zeros(0, numpy.int64), numpy.zeros(0, numpy.int64), numpy.zeros(0, numpy.float32)
+    return numpy.concatenate(sources), numpy.concatenate(targets), numpy.concatenate(scores)
+
+
+def compute_neighbors(matrix, workers=None):
+    """Top neighbors of every row: (rows, neighbor rows, scores) arrays"""
+    chunks = [(start, min(start + CHUNK_SIZE, matrix.shape[0])) for start in range(0, matrix.shape[0], CHUNK_SIZE)]
+    workers = min(workers or os.cpu_count() or 1, len(chunks))
+    if workers <= 1:
+        _init_worker(matrix)
+        results = [_top_neighbors(chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(matrix,)) as pool:
+            results = list(pool.map(_top_neighbors, chunks))
+    if not results:
+        return numpy.zeros(0, numpy.int64), numpy.zeros(0, numpy.int64), numpy.zeros(0, numpy.float32)
+    return tuple(numpy.concatenate(parts) for parts in zip(*results))
+
+
+def build_neighbors(workers=None):
+    """Recompute the RecipeNeighbor table. Returns (recipes, neighbor rows)"""
+    recipe_ids, matrix = interaction_matrix()
+    rows, neighbor_rows, scores = compute_neighbors(matrix, workers)
+    sources, targets = recipe_ids[rows], recipe_ids[neighbor_rows]
+
+    with transaction.atomic():
+        RecipeNeighbor.objects.all().delete()
+        for start in range(0, len(scores), WRITE_BATCH_SIZE):
+            stop = start + WRITE_BATCH_SIZE
+            RecipeNeighbor.objects.bulk_create([
+                RecipeNeighbor(recipe_id=int(source), neighbor_id=int(target), score=round(float(score), 4))
+                for source, target, score in zip(sources[start:stop], targets[start:stop], scores[start:stop])
+            ])
+    return len(recipe_ids), len(scores)
+
+
+# ========== SERVING ==========
+
+def _dietary_mask(user):
+    """Bit of the user's dietary preference (0 for none)"""
+    profile = getattr(user, 'profile', None)
+    return BITS.get(getattr(profile, 'dietary_preferences', 'none'), 0)
+
+
+def recommended_recipes(user, limit=20):
+    """
+    [(recipe id, score, reason)] for a user, best first
+
+    reason is 'favorites' (neighbors of the user's favorites) or 'popular'
+    (trending recipes for their diet, to fill up the list).
+    """
+    mask = _dietary_mask(user)
+    score = F('score')
+    if mask:
+        score = score * Case(
+            When(compatible_with(mask, 'neighbor__dietary_tags'), then=Value(DIETARY_MATCH_BOOST)),
+            default=Value(1.0),
+            output_field=FloatField(),
+        )
+    liked = Favorite.objects.filter(user=user).values('recipe_id')
+    rows = (
+        RecipeNeighbor.objects
+        .filter(recipe__favorites__user=user, neighbor__is_published=True)
+        .exclude(neighbor_id__in=liked)
+        .exclude(neighbor__author=user)
+        .values('neighbor_id')
+        .annotate(total=Sum(score, output_field=FloatField()))
+        .order_by('-total', 'neighbor_id')[:limit]
+    )
+    results = [(row['neighbor_id'], round(row['total'], 4), 'favorites') for row in rows]
+
+    if len(results) < limit:
+        popular = Recipe.objects.filter(is_published=True).exclude(author=user).exclude(pk__in=liked)
+        if mask:
+            popular = popular.filter(compatible_with(mask))
+        seen = {recipe_id for recipe_id, _, _ in results}
+        for recipe_id in popular.order_by('-trending_score', '-view_count').values_list('pk', flat=True)[:limit]:
+            if recipe_id not in seen and len(results) < limit:
+                results.append((recipe_id, 0.0, 'popular'))
+    return results
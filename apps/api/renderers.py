@@ -0,0 +1,108 @@
+"""
+API Renderers
+
+- FastJSONRenderer: drop-in replacement for DRF's JSONRenderer that encodes
+  with orjson/msgspec when installed (see apps/api/fastjson.py)
+- MessagePackRenderer: compact binary format for mobile sync clients,
+  selected with `Accept: application/msgpack`. List endpoints can also
+  return a columnar "table" shape with `Accept: application/msgpack; shape=table`:
+
+      {"columns": ["id", "title", ...], "rows": [[1, "Pasta", ...], ...]}
+
+  so repeated keys are sent once per page instead of once per recipe.
+  Paginated responses keep count/next/previous and put the table in "results".
+
+MessagePack support needs the optional msgpack package; viewsets use
+renderer_classes_with_msgpack() so it is only offered when installed.
+"""
+
+import functools
+from operator import itemgetter
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.mediatypes import _MediaType
+
+from . import fastjson
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer backed by the fastest available JSON encoder"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if self.ensure_ascii or not self.compact or not self.strict:
+            # Non-default UNICODE_JSON/COMPACT_JSON/STRICT_JSON settings
+            return super().render(data, accepted_media_type, renderer_context)
+
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        return fastjson.dumps(data, indent=indent)
+
+
+# ========== MESSAGEPACK ==========
+
+TABLE_SCHEMA_CACHE_SIZE = 256  # Column sets kept compiled (?fields= lets clients pick many)
+
+
+@functools.lru_cache(maxsize=TABLE_SCHEMA_CACHE_SIZE)
+def _compiled_schema(columns):
+    return columns, itemgetter(*columns)
+
+
+def _table_schema(rows):
+    """
+    (columns, row getter) for a list of serialized objects
+
+    Columns come from the serializer DRF attaches to list data (its fields
+    are already built by then); the getter is compiled once per column set.
+    """
+    serializer = getattr(rows, 'serializer', None)
+    child = getattr(serializer, 'child', None)
+    if child is None:
+        return _compiled_schema(tuple(rows[0]))
+    return _compiled_schema(tuple(name for name, field in child.fields.items() if not field.write_only))
+
+
+def to_table(rows):
+    """Columnar shape for a list of dicts"""
+    if not rows or not isinstance(rows[0], dict):
+        return rows
+    columns, getter = _table_schema(rows)
+    if len(columns) == 1:
+        return {'columns': list(columns), 'rows': [[getter(row)] for row in rows]}
+    return {'columns': list(columns), 'rows': [list(getter(row)) for row in rows]}
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Renders responses as MessagePack (optionally in the table shape)"""
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        shape = _MediaType(accepted_media_type or '').params.get('shape')
+        if shape == 'table':
+            if isinstance(data, list):
+                data = to_table(data)
+            elif isinstance(data, dict) and isinstance(data.get('results'), list):
+                data = {**data, 'results': to_table(data['results'])}
+
+        return msgpack.packb(data, default=fastjson.default, use_bin_type=True)
+
+
+def renderer_classes_with_msgpack():
+    """The default renderers, plus MessagePack when msgpack is installed"""
+    renderers = list(api_settings.DEFAULT_RENDERER_CLASSES)
+    if msgpack is not None:
+        renderers.append(MessagePackRenderer)
+    return renderers
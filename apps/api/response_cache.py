@@ -0,0 +1,132 @@
+"""
+Response cache for anonymous catalog pages
+
+Anonymous visitors asking for the same recipe list/search/category page get
+exactly the same result, so we cache it, keyed by:
+- the view and its normalized query parameters (order and blanks don't matter)
+- the global catalog version
+
+The catalog version is bumped by Recipe/Rating/Favorite/Comment/Category
+signals (see apps/recipes/models.py), which invalidates every cached page at
+once without scanning keys.
+
+Authenticated users always bypass the cache - they can see their own
+unpublished recipes and personalized fields.
+
+Hit rates are tracked under the 'catalog' namespace (see cache.get_stats()).
+"""
+
+import functools
+
+from django.conf import settings
+from django.core.paginator import Page
+from rest_framework.response import Response
+
+from .cache import memoize, bump_namespace
+
+CATALOG_NAMESPACE = 'catalog'
+RESPONSE_CACHE_TIMEOUT = 300  # Seconds a page is fresh
+RESPONSE_CACHE_STALE_TIMEOUT = 60  # Extra seconds a stale page may be served
+
+
+def response_cache_enabled():
+    return getattr(settings, 'RESPONSE_CACHE_ENABLED', True)
+
+
+def bump_catalog_version():
+    """Invalidate every cached catalog page"""
+    bump_namespace(CATALOG_NAMESPACE)
+
+
+def normalize_query(params, ignore=()):
+    """
+    Canonical form of query parameters for cache keys
+
+    ?b=2&a=1 and ?a=1&b=2&c= produce the same key.
+    """
+    normalized = []
+    for name in sorted(params.keys()):
+        if name in ignore:
+            continue
+        values = sorted(value.strip() for value in params.getlist(name) if value.strip())
+        if values:
+            normalized.append((name, tuple(values)))
+    return tuple(normalized)
+
+
+def catalog_memoize(parts, compute):
+    """memoize() in the catalog namespace with the response cache timeouts"""
+    return memoize(
+        CATALOG_NAMESPACE, parts, compute,
+        timeout=RESPONSE_CACHE_TIMEOUT,
+        stale_timeout=RESPONSE_CACHE_STALE_TIMEOUT,
+    )
+
+
+def cache_anonymous_response(view_method):
+    """
+    Decorator for DRF viewset actions that caches response data for anonymous GETs
+
+    The cached value is the response *data* (what the serializer produced),
+    so any renderer can still be negotiated on a hit.
+    """
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        if (
+            request.method != 'GET'
+            or request.user.is_authenticated
+            or not response_cache_enabled()
+        ):
+            return view_method(self, request, *args, **kwargs)
+
+        computed = []
+
+        def compute():
+            response = view_method(self, request, *args, **kwargs)
+            computed.append(response)
+            return (response.status_code, response.data)
+
+        parts = [
+            type(self).__name__, self.action, request.get_host(), request.path,
+            normalize_query(request.query_params),
+        ]
+        status_code, data = catalog_memoize(parts, compute)
+        if computed:
+            response = computed[0]
+            response['X-Cache'] = 'MISS'
+        else:
+            response = Response(data, status=status_code)
+            response['X-Cache'] = 'HIT'
+        return response
+    return wrapper
+
+
+def cached_page(request, parts, paginate, make_paginator):
+    """
+    Cache a paginated page of model instances for anonymous template views
+
+    paginate() must return (paginator, page) - it is only called on a miss.
+    On a hit the page is rebuilt from the cached objects and count, using a
+    fresh paginator from make_paginator(), without touching the database.
+    Returns (paginator, page).
+    """
+    if request.user.is_authenticated or not response_cache_enabled():
+        return paginate()
+
+    computed = []
+
+    def compute():
+        paginator, page = paginate()
+        computed.append((paginator, page))
+        return (list(page.object_list), page.number, paginator.count)
+
+    object_list, number, count = catalog_memoize(
+        [*parts, normalize_query(request.GET)], compute
+    )
+    if computed:
+        return computed[0]
+
+    paginator = make_paginator()
+    # Prime Paginator.count (a cached_property) so it never runs COUNT(*)
+    paginator.__dict__['count'] = count
+    return paginator, Page(object_list, number, paginator)
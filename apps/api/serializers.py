@@ -4,14 +4,115 @@ API Serializers for Recipe Sharing Platform
 Serializers for REST API endpoints
 """
 from rest_framework import serializers
+from django.db import models, transaction
+from django.db.models import Prefetch
 from django.contrib.auth import get_user_model
-from apps.recipes.models import Recipe, Category, Ingredient, RecipeIngredient, Rating, Comment, Favorite, RecipeImage, MealPlan
+from apps.recipes.dietary import tag_names
+from apps.recipes.models import (
+    Recipe, Category, Ingredient, RecipeIngredient, Rating, Comment, Favorite, RecipeImage, MealPlan,
+    MealPlanTemplate, MealPlanTemplateItem,
+)
 from apps.users.models import UserProfile
+from .meal_plan_bulk import MAX_ITEMS, validate_plan_items
 from .models import APIKey
+from .personalization import RecipePersonalization
+from .projections import ProjectedField, related_average, related_count
+from .sparse_fields import FieldPlan, SparseFieldsSerializerMixin
 
 User = get_user_model()
 
 
+def _ids_only(model):
+    """
+    Prefetch queryset that loads just enough to count/list related ids
+    
+    Ordered by id: the default orderings may join other tables.
+    """
+    return model.objects.only('id', 'recipe').order_by('pk')
+
+
+# What each field needs from the queryset when ?fields=/?expand= are used
+# (see apps/api/sparse_fields.py)
+RECIPE_FIELD_PLANS = {
+    'author': FieldPlan(columns=('author',), select_related=('author',), expandable=True),
+    'category': FieldPlan(columns=('category',), select_related=('category',), expandable=True),
+    'recipe_ingredients': FieldPlan(
+        prefetch=('recipe_ingredients__ingredient',), expandable=True, many=True,
+        collapsed_prefetch=(Prefetch('recipe_ingredients', queryset=_ids_only(RecipeIngredient)),),
+    ),
+    'images': FieldPlan(
+        prefetch=('images',), expandable=True, many=True,
+        collapsed_prefetch=(Prefetch('images', queryset=_ids_only(RecipeImage)),),
+    ),
+    'total_time': FieldPlan(columns=('prep_time', 'cook_time')),
+    'rating_count': FieldPlan(prefetch=(Prefetch('ratings', queryset=_ids_only(Rating)),)),
+    'favorite_count': FieldPlan(prefetch=(Prefetch('favorites', queryset=_ids_only(Favorite)),)),
+    'comment_count': FieldPlan(prefetch=(Prefetch('comments', queryset=_ids_only(Comment)),)),
+}
+
+
+def _personalization(context):
+    """Current user's favorites/ratings loader (None for anonymous users)"""
+    request = context.get('request')
+    if request and request.user.is_authenticated:
+        return context.setdefault('personalization', RecipePersonalization(request.user))
+    return None
+
+
+def _rating_summary(rating):
+    """user_rating representation of the current user's Rating"""
+    if rating is None:
+        return None
+    return {
+        'id': rating.id,
+        'stars': rating.stars,
+        'review_text': rating.review_text,
+        'created_at': rating.created_at,
+        'updated_at': rating.updated_at,
+    }
+
+
+def _load_personalization(recipe_ids, context):
+    personalization = _personalization(context)
+    if personalization is not None:
+        personalization.load(recipe_ids)
+
+
+def _project_is_favorited(recipe_id, context):
+    personalization = _personalization(context)
+    return personalization.is_favorited(recipe_id) if personalization is not None else False
+
+
+def _project_user_rating(recipe_id, context):
+    personalization = _personalization(context)
+    return _rating_summary(personalization.rating_for(recipe_id)) if personalization is not None else None
+
+
+def _round_rating(value):
+    # Same rounding as Recipe.average_rating
+    return round(value or 0.0, 2)
+
+
+# How list endpoints compute the non-column fields without the serializer
+# (see apps/api/projections.py)
+RECIPE_PROJECTED_FIELDS = {
+    'total_time': ProjectedField(expression=models.F('prep_time') + models.F('cook_time')),
+    'dietary_tags': ProjectedField(expression=models.F('dietary_tags'), convert=tag_names),
+    'average_rating': ProjectedField(expression=related_average(Rating, 'stars'), convert=_round_rating),
+    'rating_count': ProjectedField(expression=related_count(Rating)),
+    'favorite_count': ProjectedField(expression=related_count(Favorite)),
+    'comment_count': ProjectedField(expression=related_count(Comment)),
+    'is_favorited': ProjectedField(resolve=_project_is_favorited, prepare=_load_personalization),
+    'user_rating': ProjectedField(resolve=_project_user_rating, prepare=_load_personalization),
+}
+
+# Ratings, comments, favorites and meal plans: user + recipe title
+USER_RECIPE_FIELD_PLANS = {
+    'user': FieldPlan(columns=('user',), select_related=('user',), expandable=True),
+    'recipe_title': FieldPlan(columns=('recipe__title',), select_related=('recipe',)),
+}
+
+
 class UserSerializer(serializers.ModelSerializer):
     """Serializer for User model"""
     class Meta:
@@ -49,7 +150,7 @@ class CategorySerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     """Serializer for Ingredient model"""
     class Meta:
         model = Ingredient
@@ -72,11 +173,13 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class RatingSerializer(serializers.ModelSerializer):
+class RatingSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     """Serializer for Rating model"""
     user = UserSerializer(read_only=True)
     recipe_title = serializers.CharField(source='recipe.title', read_only=True)
     
+    field_plans = USER_RECIPE_FIELD_PLANS
+    
     class Meta:
         model = Rating
         fields = ['id', 'recipe', 'recipe_title', 'user', 'stars', 'review_text', 'created_at', 'updated_at']
@@ -89,11 +192,13 @@ class RatingSerializer(serializers.ModelSerializer):
         return value
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     """Serializer for Comment model"""
     user = UserSerializer(read_only=True)
     recipe_title = serializers.CharField(source='recipe.title', read_only=True)
     
+    field_plans = USER_RECIPE_FIELD_PLANS
+    
     class Meta:
         model = Comment
         fields = ['id', 'recipe', 'recipe_title', 'user', 'text', 'created_at', 'updated_at']
@@ -106,11 +211,13 @@ class CommentSerializer(serializers.ModelSerializer):
         return value
 
 
-class FavoriteSerializer(serializers.ModelSerializer):
+class FavoriteSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     """Serializer for Favorite model"""
     user = UserSerializer(read_only=True)
     recipe_title = serializers.CharField(source='recipe.title', read_only=True)
     
+    field_plans = USER_RECIPE_FIELD_PLANS
+    
     class Meta:
         model = Favorite
         fields = ['id', 'recipe', 'recipe_title', 'user', 'created_at']
@@ -126,7 +233,7 @@ class RecipeImageSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at']
 
 
-class MealPlanSerializer(serializers.ModelSerializer):
+class MealPlanSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     """Serializer for MealPlan model"""
     recipe_title = serializers.CharField(source='recipe.title', read_only=True)
     recipe_id = serializers.PrimaryKeyRelatedField(
@@ -137,6 +244,11 @@ class MealPlanSerializer(serializers.ModelSerializer):
     meal_type_display = serializers.CharField(source='get_meal_type_display', read_only=True)
     user = UserSerializer(read_only=True)
     
+    field_plans = {
+        **USER_RECIPE_FIELD_PLANS,
+        'meal_type_display': FieldPlan(columns=('meal_type',)),
+    }
+    
     class Meta:
         model = MealPlan
         fields = [
@@ -160,7 +272,90 @@ class MealPlanSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class MealPlanTemplateItemSerializer(serializers.ModelSerializer):
+    """Serializer for one slot of a meal plan template"""
+    recipe_id = serializers.IntegerField()
+    recipe_title = serializers.CharField(source='recipe.title', read_only=True)
+    
+    class Meta:
+        model = MealPlanTemplateItem
+        fields = ['day', 'meal_type', 'recipe_id', 'recipe_title', 'notes']
+
+
+class MealPlanTemplateSerializer(serializers.ModelSerializer):
+    """
+    Serializer for MealPlanTemplate with its items
+    
+    The items are validated together (one query for all their recipes) and
+    replaced as a whole when they are sent on update.
+    """
+    items = MealPlanTemplateItemSerializer(many=True, required=False)
+    
+    class Meta:
+        model = MealPlanTemplate
+        fields = ['id', 'name', 'description', 'items', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'created_at', 'updated_at']
+    
+    def validate_name(self, value):
+        """Template names are unique per user"""
+        templates = MealPlanTemplate.objects.filter(user=self.context['request'].user, name=value)
+        if self.instance is not None:
+            templates = templates.exclude(pk=self.instance.pk)
+        if templates.exists():
+            raise serializers.ValidationError('You already have a template with this name.')
+        return value
+    
+    def validate_items(self, items):
+        """Check every item's recipe and slot in one pass"""
+        if len(items) > MAX_ITEMS:
+            raise serializers.ValidationError(f'At most {MAX_ITEMS} items per template.')
+        try:
+            return validate_plan_items(self.context['request'].user, items, day_field=True)
+        except serializers.ValidationError as error:
+            raise serializers.ValidationError(error.detail['items'])
+    
+    def _save_items(self, template, items):
+        template.items.all().delete()
+        MealPlanTemplateItem.objects.bulk_create([
+            MealPlanTemplateItem(template=template, **item) for item in items
+        ])
+    
+    @transaction.atomic
+    def create(self, validated_data):
+        items = validated_data.pop('items', [])
+        template = MealPlanTemplate.objects.create(user=self.context['request'].user, **validated_data)
+        self._save_items(template, items)
+        return template
+    
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        items = validated_data.pop('items', None)
+        instance = super().update(instance, validated_data)
+        if items is not None:
+            self._save_items(instance, items)
+            # Drop the prefetched items so the response shows the new ones
+            getattr(instance, '_prefetched_objects_cache', {}).pop('items', None)
+        return instance
+
+
+class RecipePersonalizedListSerializer(serializers.ListSerializer):
+    """
+    List serializer for RecipeSerializer(many=True)
+    
+    Loads the current user's favorites and ratings for every recipe on the
+    page up front, so is_favorited/user_rating don't query once per recipe.
+    """
+    
+    def to_representation(self, data):
+        recipes = list(data.all() if isinstance(data, models.Manager) else data)
+        request = self.context.get('request')
+        personalized = 'is_favorited' in self.child.fields or 'user_rating' in self.child.fields
+        if personalized and request and request.user.is_authenticated:
+            _load_personalization([recipe.pk for recipe in recipes], self.context)
+        return super().to_representation(recipes)
+
+
+class RecipeSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     """Serializer for Recipe model with statistics"""
     author = UserSerializer(read_only=True)
     category = CategorySerializer(read_only=True)
@@ -176,6 +371,8 @@ class RecipeSerializer(serializers.ModelSerializer):
     images = RecipeImageSerializer(many=True, read_only=True)
     images_data = serializers.JSONField(write_only=True, required=False)
     
+    dietary_tags = serializers.SerializerMethodField()
+    
     # Statistics fields
     average_rating = serializers.ReadOnlyField()
     rating_count = serializers.SerializerMethodField()
@@ -188,6 +385,9 @@ class RecipeSerializer(serializers.ModelSerializer):
     is_favorited = serializers.SerializerMethodField()
     user_rating = serializers.SerializerMethodField()
     
+    field_plans = RECIPE_FIELD_PLANS
+    projected_fields = RECIPE_PROJECTED_FIELDS
+    
     class Meta:
         model = Recipe
         fields = [
@@ -207,6 +407,11 @@ class RecipeSerializer(serializers.ModelSerializer):
             'images',
             'images_data',
             'dietary_restrictions',
+            'dietary_tags',
+            'calories',
+            'protein',
+            'carbs',
+            'fat',
             'view_count',
             'average_rating',
             'rating_count',
@@ -220,6 +425,11 @@ class RecipeSerializer(serializers.ModelSerializer):
             'updated_at',
         ]
         read_only_fields = ['id', 'author', 'created_at', 'updated_at']
+        list_serializer_class = RecipePersonalizedListSerializer
+    
+    def get_dietary_tags(self, obj):
+        """Every diet the recipe suits (from its label and ingredients)"""
+        return tag_names(obj.dietary_tags)
     
     def get_rating_count(self, obj):
         """Get total number of ratings"""
@@ -235,28 +445,13 @@ class RecipeSerializer(serializers.ModelSerializer):
     
     def get_is_favorited(self, obj):
         """Check if current user has favorited this recipe"""
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return obj.favorites.filter(user=request.user).exists()
-        return False
+        return _project_is_favorited(obj.pk, self.context)
     
     def get_user_rating(self, obj):
         """Get current user's rating if exists"""
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            try:
-                rating = obj.ratings.get(user=request.user)
-                return {
-                    'id': rating.id,
-                    'stars': rating.stars,
-                    'review_text': rating.review_text,
-                    'created_at': rating.created_at,
-                    'updated_at': rating.updated_at,
-                }
-            except Rating.DoesNotExist:
-                return None
-        return None
+        return _project_user_rating(obj.pk, self.context)
     
+    @transaction.atomic
     def create(self, validated_data):
         """Create recipe and handle ingredients and images"""
         ingredients_data = validated_data.pop('ingredients_data', [])
@@ -265,20 +460,7 @@ class RecipeSerializer(serializers.ModelSerializer):
         
         # Handle ingredients
         if ingredients_data:
-            for ing_data in ingredients_data:
-                if ing_data.get('name') and ing_data.get('quantity'):
-                    # Get or create ingredient
-                    ingredient, _ = Ingredient.objects.get_or_create(
-                        name=ing_data['name'].strip()
-                    )
-                    # Create RecipeIngredient
-                    RecipeIngredient.objects.create(
-                        recipe=recipe,
-                        ingredient=ingredient,
-                        quantity=ing_data.get('quantity', 0),
-                        unit=ing_data.get('unit', ''),
-                        notes=ing_data.get('notes', '')
-                    )
+            recipe.set_ingredients(ingredients_data)
         
         # Handle images
         if images_data:
@@ -294,6 +476,7 @@ class RecipeSerializer(serializers.ModelSerializer):
         
         return recipe
     
+    @transaction.atomic
     def update(self, instance, validated_data):
         """Update recipe and handle ingredients and images"""
         ingredients_data = validated_data.pop('ingredients_data', None)
@@ -304,27 +487,9 @@ class RecipeSerializer(serializers.ModelSerializer):
             setattr(instance, attr, value)
         instance.save()
         
-        # Handle ingredients if provided
+        # Handle ingredients if provided (replacing the existing ones)
         if ingredients_data is not None:
-            # Clear existing ingredients
-            RecipeIngredient.objects.filter(recipe=instance).delete()
-            
-            # Add new ingredients
-            if ingredients_data:
-                for ing_data in ingredients_data:
-                    if ing_data.get('name') and ing_data.get('quantity'):
-                        # Get or create ingredient
-                        ingredient, _ = Ingredient.objects.get_or_create(
-                            name=ing_data['name'].strip()
-                        )
-                        # Create RecipeIngredient
-                        RecipeIngredient.objects.create(
-                            recipe=instance,
-                            ingredient=ingredient,
-                            quantity=ing_data.get('quantity', 0),
-                            unit=ing_data.get('unit', ''),
-                            notes=ing_data.get('notes', '')
-                        )
+            instance.set_ingredients(ingredients_data, replace=True)
         
         # Handle images if provided
         if images_data is not None:
@@ -346,15 +511,19 @@ class RecipeSerializer(serializers.ModelSerializer):
         return instance
 
 
-class RecipeListSerializer(serializers.ModelSerializer):
+class RecipeListSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     """Lightweight serializer for recipe list views"""
     author = UserSerializer(read_only=True)
     category = CategorySerializer(read_only=True)
+    dietary_tags = serializers.SerializerMethodField()
     average_rating = serializers.ReadOnlyField()
     rating_count = serializers.SerializerMethodField()
     favorite_count = serializers.SerializerMethodField()
     comment_count = serializers.SerializerMethodField()
     
+    field_plans = RECIPE_FIELD_PLANS
+    projected_fields = RECIPE_PROJECTED_FIELDS
+    
     class Meta:
         model = Recipe
         fields = [
@@ -367,6 +536,11 @@ class RecipeListSerializer(serializers.ModelSerializer):
             'author',
             'category',
             'dietary_restrictions',
+            'dietary_tags',
+            'calories',
+            'protein',
+            'carbs',
+            'fat',
             'average_rating',
             'rating_count',
             'favorite_count',
@@ -376,6 +550,9 @@ class RecipeListSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'created_at']
     
+    def get_dietary_tags(self, obj):
+        return tag_names(obj.dietary_tags)
+    
     def get_rating_count(self, obj):
         return obj.rating_count
     
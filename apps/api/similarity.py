@@ -0,0 +1,221 @@
+"""
+Similar recipes: MinHash signatures in an LSH index
+
+"More like this" compares a recipe's features - its ingredients, category
+and dietary tag - with every other recipe's. Computing the overlap
+(Jaccard similarity) against the whole catalog is O(N) per request, so we
+index the recipes instead:
+
+1. MinHash: each recipe gets a signature of SIGNATURE_SIZE numbers (the
+   smallest hash of its features under SIGNATURE_SIZE different hash
+   functions). The share of equal numbers in two signatures estimates
+   their Jaccard similarity, without looking at the ingredients again.
+2. LSH banding: the signature is cut into BANDS bands of ROWS_PER_BAND
+   numbers and each band is stored as one hashed key
+   (RecipeSimilarityBand). Recipes sharing at least one band key are
+   candidates: with 16 bands of 4 rows, two recipes with 50% overlap are
+   found about 65% of the time, with 80% overlap over 99% of the time, and
+   unrelated recipes almost never.
+
+A lookup is one indexed query for the candidates (and their signatures),
+then ranking a few dozen signatures in Python - well under a millisecond
+(see scripts/benchmark_similarity.py).
+
+The index is updated after a recipe or its ingredients change (signals in
+apps/recipes/models.py). To index existing recipes:
+
+    python manage.py build_similarity_index
+"""
+
+import functools
+import hashlib
+import random
+from array import array
+from collections import defaultdict
+
+from django.db import connection, transaction
+
+from apps.recipes.models import Recipe, RecipeIngredient, RecipeSignature, RecipeSimilarityBand
+
+SIGNATURE_SIZE = 64
+BANDS = 16
+ROWS_PER_BAND = SIGNATURE_SIZE // BANDS
+MAX_CANDIDATES = 1000  # Signatures ranked per lookup
+INDEX_BATCH_SIZE = 1000
+
+# Hash functions (a * x + b) mod p, the same in every process
+_PRIME = 2 ** 31 - 1
+_random = random.Random(20240601)
+_HASH_FUNCTIONS = [(_random.randrange(1, _PRIME), _random.randrange(0, _PRIME)) for _ in range(SIGNATURE_SIZE)]
+
+
+# ========== SIGNATURES ==========
+
+def recipe_features(ingredient_ids, category_id, dietary_restrictions):
+    """The set of features compared between recipes"""
+    features = {f'ingredient:{ingredient_id}' for ingredient_id in ingredient_ids}
+    if category_id is not None:
+        features.add(f'category:{category_id}')
+    if dietary_restrictions and dietary_restrictions != 'none':
+        features.add(f'dietary:{dietary_restrictions}')
+    return features
+
+
+def _feature_hash(feature):
+    return int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), 'big') % _PRIME
+
+
+def minhash(features):
+    """MinHash signature of a feature set (None for an empty set)"""
+    if not features:
+        return None
+    hashes = [_feature_hash(feature) for feature in features]
+    return array('I', [min((a * x + b) % _PRIME for x in hashes) for a, b in _HASH_FUNCTIONS])
+
+
+def unpack(data):
+    signature = array('I')
+    signature.frombytes(bytes(data))
+    return signature
+
+
+def band_keys(signature):
+    """One signed 64-bit key per band"""
+    keys = []
+    for band in range(BANDS):
+        values = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        digest = hashlib.blake2b(band.to_bytes(2, 'big') + values.tobytes(), digest_size=8).digest()
+        keys.append(int.from_bytes(digest, 'big', signed=True))
+    return keys
+
+
+def estimated_similarity(first, second):
+    """Estimated Jaccard similarity of two signatures (0.0 - 1.0)"""
+    return sum(x == y for x, y in zip(first, second)) / SIGNATURE_SIZE
+
+
+# ========== INDEXING ==========
+
+def _signatures(recipe_ids):
+    """{recipe id: signature or None} for the recipes that exist"""
+    ingredients = defaultdict(list)
+    for recipe_id, ingredient_id in RecipeIngredient.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list('recipe_id', 'ingredient_id'):
+        ingredients[recipe_id].append(ingredient_id)
+    return {
+        recipe_id: minhash(recipe_features(ingredients[recipe_id], category_id, dietary))
+        for recipe_id, category_id, dietary in Recipe.objects.filter(pk__in=recipe_ids).values_list(
+            'pk', 'category_id', 'dietary_restrictions'
+        )
+    }
+
+
+def index_recipes(recipe_ids):
+    """
+    (Re)index recipes whose signature changed
+
+    Returns the number of recipes whose index entries were rewritten.
+    """
+    recipe_ids = list(set(recipe_ids))
+    signatures = _signatures(recipe_ids)
+    stored = {
+        recipe_id: bytes(data)
+        for recipe_id, data in RecipeSignature.objects.filter(pk__in=recipe_ids).values_list('recipe_id', 'signature')
+    }
+    changed = [
+        recipe_id for recipe_id, signature in signatures.items()
+        if (signature.tobytes() if signature is not None else None) != stored.get(recipe_id)
+    ]
+    if not changed:
+        return 0
+
+    with transaction.atomic():
+        RecipeSimilarityBand.objects.filter(recipe_id__in=changed).delete()
+        RecipeSignature.objects.filter(pk__in=changed).delete()
+        indexed = [recipe_id for recipe_id in changed if signatures[recipe_id] is not None]
+        RecipeSignature.objects.bulk_create([
+            RecipeSignature(recipe_id=recipe_id, signature=signatures[recipe_id].tobytes())
+            for recipe_id in indexed
+        ])
+        RecipeSimilarityBand.objects.bulk_create([
+            RecipeSimilarityBand(recipe_id=recipe_id, key=key)
+            for recipe_id in indexed
+            for key in band_keys(signatures[recipe_id])
+        ], batch_size=INDEX_BATCH_SIZE)
+    return len(changed)
+
+
+def index_recipe_on_commit(recipe_id):
+    """
+    index_recipes([recipe_id]) once the current transaction commits
+    
+    A transaction touching many rows of a recipe queues it once: queued
+    ids are kept on the connection until their callback runs. An id whose
+    callback was dropped (rolled back savepoint) is queued again.
+    """
+    pending = connection.__dict__.setdefault('similarity_pending_index', {})
+    callback = pending.get(recipe_id)
+    if callback is not None and any(entry[1] is callback for entry in connection.run_on_commit):
+        return
+    
+    def callback():
+        if pending.get(recipe_id) is callback:
+            del pending[recipe_id]
+        index_recipes([recipe_id])
+    pending[recipe_id] = callback
+    transaction.on_commit(callback)  # Runs at once outside a transaction
+
+
+# ========== LOOKUPS ==========
+
+@functools.lru_cache(maxsize=None)
+def _lookup_sql():
+    """
+    One query returning the recipe's signature and its candidates' signatures
+
+    Written as SQL once (like a compiled projection): building the
+    equivalent ORM query takes longer than running it.
+    """
+    quote = connection.ops.quote_name
+    signatures, bands, recipes = (
+        quote(model._meta.db_table) for model in (RecipeSignature, RecipeSimilarityBand, Recipe)
+    )
+    return (
+        f'SELECT s.{quote("recipe_id")}, s.{quote("signature")} '
+        f'FROM {signatures} s INNER JOIN {recipes} r ON r.{quote("id")} = s.{quote("recipe_id")} '
+        f'WHERE s.{quote("recipe_id")} IN ('
+        f'SELECT other.{quote("recipe_id")} FROM {bands} mine '
+        f'INNER JOIN {bands} other ON other.{quote("key")} = mine.{quote("key")} '
+        f'WHERE mine.{quote("recipe_id")} = %s'
+        f') AND (r.{quote("is_published")} = %s OR s.{quote("recipe_id")} = %s) '
+        f'LIMIT {MAX_CANDIDATES + 1}'
+    )
+
+
+def _candidates(recipe_id):
+    with connection.cursor() as cursor:
+        cursor.execute(_lookup_sql(), [recipe_id, True, recipe_id])
+        return {other_id: unpack(data) for other_id, data in cursor.fetchall()}
+
+
+def similar_recipes(recipe_id, limit=10):
+    """
+    [(recipe id, estimated similarity)] of the most similar published recipes
+
+    A recipe that isn't indexed yet is indexed first.
+    """
+    candidates = _candidates(recipe_id)
+    signature = candidates.pop(recipe_id, None)
+    if signature is None:
+        if index_recipes([recipe_id]):
+            return similar_recipes(recipe_id, limit)  # Wasn't indexed yet
+        # No features to compare, or cut off by MAX_CANDIDATES
+        data = RecipeSignature.objects.filter(pk=recipe_id).values_list('signature', flat=True).first()
+        if data is None:
+            return []
+        signature = unpack(data)
+
+    scored = [(estimated_similarity(signature, other), other_id) for other_id, other in candidates.items()]
+    scored.sort(key=lambda item: (-item[0], item[1]))
+    return [(other_id, score) for score, other_id in scored[:limit]]
@@ -0,0 +1,148 @@
+"""
+Sparse fieldsets (?fields=) and expansion controls (?expand=) for the API
+
+Query parameters (read-only requests):
+- fields: comma-separated fields to return, e.g. ?fields=id,title,image
+- expand: comma-separated relations to return as nested objects, e.g.
+  ?expand=author. When expand is given, relations that are not listed are
+  returned as primary keys instead (author -> author id, images -> [ids]).
+  Expanded relations are always included, even if missing from fields.
+
+Without either parameter the response is exactly the same as before.
+
+The same selection also drives the queryset: serializers describe what each
+field needs (columns, joins, prefetches) in `field_plans`, and
+plan_queryset() only joins/prefetches what will be rendered and defers the
+other columns with .only().
+"""
+
+from typing import NamedTuple, Tuple
+
+from django.db.models import Prefetch
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class FieldPlan(NamedTuple):
+    """What a serializer field needs from the queryset"""
+    columns: Tuple = ()  # Model columns to load (FK names load the id column)
+    select_related: Tuple = ()  # Joins needed when rendered in full
+    prefetch: Tuple = ()  # Prefetches needed when rendered in full
+    expandable: bool = False  # Relation that ?expand= can collapse to ids
+    many: bool = False  # Collapses to a list of ids
+    collapsed_prefetch: Tuple = ()  # Prefetches needed when collapsed
+
+
+def _split(value):
+    return frozenset(part.strip() for part in value.split(',') if part.strip())
+
+
+def parse_sparse_fields(request, serializer_class):
+    """
+    Read ?fields= and ?expand= for a request
+
+    Returns None when neither parameter is given, otherwise
+    (fields or None, expand or None). Unknown names raise a 400 error.
+    """
+    params = request.query_params
+    if request.method not in SAFE_METHODS or ('fields' not in params and 'expand' not in params):
+        return None
+
+    readable = {
+        name for name, field in serializer_class().fields.items() if not field.write_only
+    }
+    plans = getattr(serializer_class, 'field_plans', {})
+    expandable = {name for name, plan in plans.items() if plan.expandable}
+
+    errors = {}
+    fields = _split(params['fields']) if 'fields' in params else None
+    expand = _split(params['expand']) if 'expand' in params else None
+    if fields is not None and fields - readable:
+        errors['fields'] = f"Unknown field(s): {', '.join(sorted(fields - readable))}"
+    if expand is not None and expand - expandable:
+        errors['expand'] = (
+            f"Cannot expand: {', '.join(sorted(expand - expandable))}. "
+            f"Expandable: {', '.join(sorted(expandable)) or 'none'}"
+        )
+    if errors:
+        raise ValidationError(errors)
+    return (fields, expand)
+
+
+class SparseFieldsSerializerMixin:
+    """
+    Serializer mixin that prunes/collapses fields per context['sparse_fields']
+
+    Only the top-level serializer (or the child of a top-level list) is
+    pruned - nested serializers always render in full.
+    """
+    field_plans = {}
+
+    def _is_top_level(self):
+        parent = self.parent
+        return parent is None or (
+            isinstance(parent, serializers.ListSerializer) and parent.parent is None
+        )
+
+    def get_fields(self):
+        fields = super().get_fields()
+        sparse = self.context.get('sparse_fields')
+        if sparse is None or not self._is_top_level():
+            return fields
+
+        requested, expand = sparse
+        for name in list(fields):
+            if fields[name].write_only:
+                continue
+            plan = self.field_plans.get(name)
+            if plan is not None and plan.expandable and expand is not None:
+                if name in expand:
+                    continue  # Expanded relations are always rendered
+                fields[name] = serializers.PrimaryKeyRelatedField(read_only=True, many=plan.many)
+            if requested is not None and name not in requested:
+                del fields[name]
+        return fields
+
+
+def plan_queryset(queryset, serializer_class, fields, expand, required_columns=()):
+    """
+    Restrict a queryset to what the sparse serializer will render
+
+    Replaces the queryset's select_related/prefetch_related and loads only
+    the needed columns (plus required_columns, e.g. ones the view's
+    permission checks read).
+    """
+    serializer = serializer_class(context={'sparse_fields': (fields, expand)})
+    model = queryset.model
+    concrete = {field.name for field in model._meta.concrete_fields}
+    plans = serializer_class.field_plans
+
+    columns = set(required_columns)
+    select_related = set()
+    prefetches = {}
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        plan = plans.get(name)
+        if plan is None:
+            if name in concrete:
+                columns.add(name)
+            continue
+        columns.update(plan.columns)
+        if plan.expandable and expand is not None and name not in expand:
+            lookups = plan.collapsed_prefetch
+        else:
+            select_related.update(plan.select_related)
+            lookups = plan.prefetch
+        for lookup in lookups:
+            key = lookup.prefetch_to if isinstance(lookup, Prefetch) else lookup
+            prefetches.setdefault(key, lookup)
+
+    queryset = queryset.select_related(None).prefetch_related(None)
+    if select_related:
+        queryset = queryset.select_related(*sorted(select_related))
+    if prefetches:
+        queryset = queryset.prefetch_related(*prefetches.values())
+    return queryset.only(*sorted(columns | {model._meta.pk.name}))
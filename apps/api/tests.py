@@ -1,5 +1,1998 @@
-from django.test import TestCase
+"""
+Tests for the REST API
 
-# Create your tests here.
+This test suite verifies:
+1. Permission checks reuse already-fetched objects
+2. Cached token/JWT authentication
+3. The two-tier cache backend and memoization helpers
+4. Shared rate limiting
+5. Anonymous response caching and conditional GETs
+6. Batched personalization fields and sparse fieldsets
+7. Fast JSON and MessagePack renderers/parsers
+8. Compiled list projections match the serializers byte for byte
+9. The recipe change feed for partner sync
+10. The batch endpoint
+11. Bulk fetch of recipes by id
+12. Idempotency keys and single-flight GETs
+13. Author analytics rollups
+14. Time-decayed trending scores
+15. Similar recipes (MinHash/LSH index)
+16. Item-item recommendations
+17. Filtering by dietary tags
+18. Filtering and sorting by nutrition
+19. The meal plan generator
+20. Bulk meal plan operations and templates
+21. Calendar subscription feeds
+22. Favorites paginated in SQL
+"""
 
+import threading
+import time
+import unittest
+from datetime import date, timedelta
 
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.http import HttpResponse
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase
+from apps.recipes.models import Category, Ingredient, MealPlan, Recipe
+from .idempotency import coalesce_get, idempotency_cache_key
+from .recommendations import build_available
+
+User = get_user_model()
+
+
+class APITestBase(APITestCase):
+    """Common fixtures for API tests"""
+    
+    def setUp(self):
+        """Set up test data"""
+        # Rate limiting and throttling keep their counters in the cache
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="apichef",
+            email="apichef@example.com",
+            password="testpass123"
+        )
+        self.other_user = User.objects.create_user(
+            username="othercook",
+            email="othercook@example.com",
+            password="testpass123"
+        )
+        self.category = Category.objects.create(name="Dinner", slug="dinner")
+        self.recipe = Recipe.objects.create(
+            title="Pasta",
+            description="Simple pasta",
+            instructions="Boil water. Cook pasta.",
+            prep_time=5,
+            cook_time=10,
+            author=self.user,
+            category=self.category
+        )
+    
+    def tearDown(self):
+        """Drop analytics buffered by the test (views, ratings, ...)"""
+        from . import analytics
+        analytics._buffer.clear()
+
+
+class ObjectPermissionQueryTest(APITestBase):
+    """Test object permission checks don't refetch the object"""
+    
+    def count_recipe_selects(self, queries):
+        table = Recipe._meta.db_table
+        return sum(
+            1 for q in queries
+            if q['sql'].startswith('SELECT') and f'FROM "{table}"' in q['sql']
+        )
+    
+    def test_update_fetches_recipe_once(self):
+        """Test PATCH loads the recipe a single time"""
+        self.client.force_authenticate(self.user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.patch(
+                f'/api/recipes/{self.recipe.pk}/', {'title': 'Better Pasta'}, format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['title'], 'Better Pasta')
+        self.assertEqual(self.count_recipe_selects(ctx.captured_queries), 1)
+    
+    def test_non_owner_cannot_delete(self):
+        """Test ownership is still enforced"""
+        self.client.force_authenticate(self.other_user)
+        response = self.client.delete(f'/api/recipes/{self.recipe.pk}/')
+        self.assertEqual(response.status_code, 403)
+        self.assertTrue(Recipe.objects.filter(pk=self.recipe.pk).exists())
+
+
+class CachedAuthenticationTest(APITestBase):
+    """Test cached token and JWT user resolution"""
+    
+    def auth_queries(self, queries):
+        """Queries that load from the token or user tables"""
+        tables = ('FROM "authtoken_token"', f'FROM "{User._meta.db_table}"')
+        return [q for q in queries if q['sql'].startswith('SELECT') and any(t in q['sql'] for t in tables)]
+    
+    def get_with_token(self, key):
+        return self.client.get('/api/meal-plans/', HTTP_AUTHORIZATION=f'Token {key}')
+    
+    def test_token_lookup_is_cached(self):
+        """Test repeated token requests skip the token/user query"""
+        from rest_framework.authtoken.models import Token
+        
+        token = Token.objects.create(user=self.user)
+        self.assertEqual(self.get_with_token(token.key).status_code, 200)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.get_with_token(token.key).status_code, 200)
+        self.assertEqual(self.auth_queries(ctx.captured_queries), [])
+    
+    def test_cache_holds_no_credentials(self):
+        """Test only the user's id and flags are cached, and the rest still loads on demand"""
+        from rest_framework.authtoken.models import Token
+        from rest_framework_simplejwt.tokens import AccessToken
+        from .authentication import token_cache_key, user_cache_key
+        
+        token = Token.objects.create(user=self.user)
+        self.get_with_token(token.key)
+        self.client.get('/api/meal-plans/', HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        expected = {'id': self.user.pk, 'is_active': True, 'is_staff': False}
+        self.assertEqual(cache.get(token_cache_key(token.key)), expected)
+        self.assertEqual(cache.get(user_cache_key(self.user.pk)), expected)
+        
+        response = self.client.get('/api/users/me/', HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['username'], 'apichef')
+    
+    def test_deleted_token_is_rejected(self):
+        """Test revoking a token invalidates the cached lookup"""
+        from rest_framework.authtoken.models import Token
+        
+        token = Token.objects.create(user=self.user)
+        self.get_with_token(token.key)
+        token.delete()
+        self.assertIn(self.get_with_token(token.key).status_code, (401, 403))
+    
+    def test_deactivated_user_is_rejected(self):
+        """Test deactivating a user invalidates cached lookups"""
+        from rest_framework.authtoken.models import Token
+        
+        token = Token.objects.create(user=self.user)
+        self.get_with_token(token.key)
+        self.user.is_active = False
+        self.user.save()
+        self.assertIn(self.get_with_token(token.key).status_code, (401, 403))
+    
+    def test_jwt_user_is_cached(self):
+        """Test repeated JWT requests skip the user query"""
+        from rest_framework_simplejwt.tokens import AccessToken
+        
+        header = f'Bearer {AccessToken.for_user(self.user)}'
+        self.client.get('/api/meal-plans/', HTTP_AUTHORIZATION=header)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/meal-plans/', HTTP_AUTHORIZATION=header)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.auth_queries(ctx.captured_queries), [])
+    
+    def test_stateless_jwt_reads(self):
+        """Test stateless mode builds the user from claims"""
+        from rest_framework_simplejwt.tokens import AccessToken
+        
+        header = f'Bearer {AccessToken.for_user(self.user)}'
+        with self.settings(JWT_STATELESS_READS=True):
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get('/api/recipes/', HTTP_AUTHORIZATION=header)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(self.auth_queries(ctx.captured_queries), [])
+
+
+class TwoTierCacheTest(APITestCase):
+    """Test the in-process LRU + shared cache backend"""
+    
+    def setUp(self):
+        """Set up a fresh cache"""
+        cache.clear()
+    
+    def test_local_tier_serves_repeat_reads(self):
+        """Test a value read once is served from the local tier"""
+        from django.core.cache import caches
+        
+        cache.set('two-tier:key', {'a': 1})
+        cache.clear_local()
+        cache.stats.reset()
+        self.assertEqual(cache.get('two-tier:key'), {'a': 1})
+        self.assertEqual(cache.get('two-tier:key'), {'a': 1})
+        self.assertEqual(cache.stats.shared_hits, 1)
+        self.assertEqual(cache.stats.local_hits, 1)
+        # The value really lives in the shared cache
+        self.assertEqual(caches['shared'].get('two-tier:key'), {'a': 1})
+    
+    def test_local_tier_is_bounded(self):
+        """Test the LRU evicts the least recently used entries"""
+        max_entries = cache._local_max_entries
+        for i in range(max_entries + 10):
+            cache.set(f'two-tier:bounded:{i}', i)
+        self.assertEqual(len(cache._local), max_entries)
+    
+    def test_counters_use_shared_tier(self):
+        """Test incr() always reflects the shared value"""
+        from django.core.cache import caches
+        
+        cache.set('two-tier:counter', 1)
+        caches['shared'].incr('two-tier:counter', 5)
+        self.assertEqual(cache.incr('two-tier:counter'), 7)
+        self.assertEqual(cache.get('two-tier:counter'), 7)
+
+
+class MemoizeTest(APITestCase):
+    """Test memoize(): namespaces, single-flight and stale-while-revalidate"""
+    
+    def setUp(self):
+        """Set up a fresh cache"""
+        from . import cache as app_cache
+        
+        cache.clear()
+        app_cache.reset_stats()
+        self.app_cache = app_cache
+        self.calls = 0
+    
+    def compute(self):
+        self.calls += 1
+        return self.calls
+    
+    def test_memoize_and_bump_namespace(self):
+        """Test values are reused until the namespace is bumped"""
+        memoize = self.app_cache.memoize
+        self.assertEqual(memoize('test', ['a'], self.compute), 1)
+        self.assertEqual(memoize('test', ['a'], self.compute), 1)
+        self.app_cache.bump_namespace('test')
+        self.assertEqual(memoize('test', ['a'], self.compute), 2)
+        stats = self.app_cache.get_stats()['test']
+        self.assertEqual((stats['hits'], stats['misses']), (1, 2))
+    
+    def test_single_flight(self):
+        """Test concurrent misses compute the value once"""
+        import threading
+        
+        def slow_compute():
+            time.sleep(0.2)
+            return self.compute()
+        
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(
+                self.app_cache.memoize('test', ['slow'], slow_compute)
+            ))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, [1] * 5)
+    
+    def test_stale_while_revalidate(self):
+        """Test stale values are served while one caller refreshes"""
+        from unittest import mock
+        
+        memoize = self.app_cache.memoize
+        now = time.time()
+        with mock.patch.object(self.app_cache, '_now', return_value=now):
+            memoize('test', ['swr'], self.compute, timeout=10, stale_timeout=60)
+        
+        key = self.app_cache.make_key('test', ['swr'])
+        with mock.patch.object(self.app_cache, '_now', return_value=now + 20):
+            # Someone else is already refreshing -> stale value
+            cache.add(f'{key}:lock', 1)
+            self.assertEqual(memoize('test', ['swr'], self.compute, timeout=10), 1)
+            cache.delete(f'{key}:lock')
+            # Nobody refreshing -> this caller refreshes
+            self.assertEqual(memoize('test', ['swr'], self.compute, timeout=10), 2)
+        self.assertEqual(self.app_cache.get_stats()['test']['stale_hits'], 1)
+    
+    def test_cached_decorator(self):
+        """Test the decorator keys on arguments"""
+        @self.app_cache.cached('test')
+        def double(x):
+            self.calls += 1
+            return x * 2
+        
+        self.assertEqual(double(2), 4)
+        self.assertEqual(double(2), 4)
+        self.assertEqual(double(3), 6)
+        self.assertEqual(self.calls, 2)
+
+
+class RateLimitTest(APITestBase):
+    """Test the shared-cache rate limiter"""
+    
+    def test_rate_limit_enforced(self):
+        """Test requests over the limit get a 429"""
+        with self.settings(RATE_LIMIT_REQUESTS=2):
+            self.assertEqual(self.client.get('/api/').status_code, 200)
+            response = self.client.get('/api/')
+            self.assertEqual(response['X-RateLimit-Remaining'], '0')
+            self.assertEqual(self.client.get('/api/').status_code, 429)
+
+
+class ResponseCacheTest(APITestBase):
+    """Test the anonymous catalog response cache"""
+    
+    def test_anonymous_list_is_cached(self):
+        """Test a repeated anonymous list request is served from cache"""
+        first = self.client.get('/api/recipes/?page=1&search=')
+        self.assertEqual(first['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            second = self.client.get('/api/recipes/?search=&page=1')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(first.data, second.data)
+    
+    def test_catalog_change_invalidates(self):
+        """Test a new rating invalidates cached pages once it commits"""
+        from apps.recipes.models import Rating
+        
+        self.client.get('/api/recipes/search/?search=pasta')
+        with self.captureOnCommitCallbacks(execute=True):
+            Rating.objects.create(recipe=self.recipe, user=self.other_user, stars=4)
+            self.assertEqual(self.client.get('/api/recipes/search/?search=pasta')['X-Cache'], 'HIT')
+        response = self.client.get('/api/recipes/search/?search=pasta')
+        self.assertEqual(response['X-Cache'], 'MISS')
+    
+    def test_view_count_does_not_invalidate(self):
+        """Test view counter updates keep the cache warm"""
+        self.client.get('/api/recipes/')
+        self.recipe.increment_view_count()
+        self.assertEqual(self.client.get('/api/recipes/')['X-Cache'], 'HIT')
+    
+    def test_export_needs_login(self):
+        """Test the full-catalog export stays closed to anonymous users while search is public"""
+        self.assertIn(self.client.get('/api/recipes/export/').status_code, (401, 403))
+        self.assertEqual(self.client.get('/api/recipes/search/?search=pasta').status_code, 200)
+    
+    def test_authenticated_requests_bypass_cache(self):
+        """Test authenticated users never get cached responses"""
+        self.client.force_authenticate(self.user)
+        response = self.client.get('/api/recipes/')
+        self.assertFalse(response.has_header('X-Cache'))
+    
+    def test_recipe_list_page_is_cached(self):
+        """Test the server-rendered list page reuses cached results"""
+        self.client.get('/recipes/?category=dinner')
+        with self.assertNumQueries(0):
+            response = self.client.get('/recipes/?category=dinner')
+        self.assertContains(response, 'Pasta')
+    
+    def test_category_page_is_cached(self):
+        """Test the category page reuses cached results"""
+        self.client.get('/recipes/category/dinner/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/recipes/category/dinner/')
+        self.assertContains(response, 'Pasta')
+        self.assertEqual(self.client.get('/recipes/category/missing/').status_code, 404)
+
+
+class ConditionalGetTest(APITestBase):
+    """Test ETag / Last-Modified handling on recipe and meal plan endpoints"""
+    
+    def detail_url(self):
+        return f'/api/recipes/{self.recipe.pk}/'
+    
+    def test_recipe_detail_not_modified(self):
+        """Test a matching If-None-Match returns 304 without loading the recipe"""
+        first = self.client.get(self.detail_url())
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('public', first['Cache-Control'])
+        self.assertIn('stale-while-revalidate', first['Cache-Control'])
+        
+        with self.assertNumQueries(1):
+            second = self.client.get(self.detail_url(), HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second['ETag'], first['ETag'])
+    
+    def test_if_modified_since(self):
+        """Test If-Modified-Since with the returned Last-Modified returns 304"""
+        first = self.client.get(self.detail_url())
+        second = self.client.get(self.detail_url(), HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(second.status_code, 304)
+    
+    def test_new_rating_changes_detail_etag(self):
+        """Test related changes (ratings) produce a new ETag"""
+        from apps.recipes.models import Rating
+        
+        first = self.client.get(self.detail_url())
+        with self.captureOnCommitCallbacks(execute=True):
+            Rating.objects.create(recipe=self.recipe, user=self.other_user, stars=5)
+        second = self.client.get(self.detail_url(), HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(second['ETag'], first['ETag'])
+    
+    def test_authenticated_detail_is_private_and_counts_views(self):
+        """Test personalized responses are private and 304s still count as views"""
+        self.client.force_authenticate(self.other_user)
+        first = self.client.get(self.detail_url())
+        self.assertIn('private', first['Cache-Control'])
+        second = self.client.get(self.detail_url(), HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 304)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.view_count, 2)
+    
+    def test_missing_recipe_is_404(self):
+        """Test unknown and unpublished recipes still 404"""
+        self.assertEqual(self.client.get('/api/recipes/999999/').status_code, 404)
+        self.assertEqual(self.client.get('/api/recipes/abc/').status_code, 404)
+        self.recipe.is_published = False
+        self.recipe.save()
+        self.assertEqual(self.client.get(self.detail_url()).status_code, 404)
+    
+    def test_list_not_modified_until_catalog_changes(self):
+        """Test list ETags follow the filtered set"""
+        first = self.client.get('/api/recipes/?search=pasta')
+        with self.assertNumQueries(0):
+            second = self.client.get('/api/recipes/?search=pasta', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 304)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            Recipe.objects.create(
+                title="Pasta bake", description="Baked", instructions="Bake.",
+                author=self.user, category=self.category,
+            )
+        third = self.client.get('/api/recipes/?search=pasta', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(third.status_code, 200)
+        self.assertEqual(third.data['count'], 2)
+    
+    def test_meal_plan_exports(self):
+        """Test iCal export and grocery list honor If-None-Match and notice deletions"""
+        from datetime import date
+        from apps.recipes.models import MealPlan
+        
+        self.client.force_authenticate(self.user)
+        meal_plan = MealPlan.objects.create(user=self.user, recipe=self.recipe, date=date(2026, 1, 5))
+        MealPlan.objects.create(user=self.user, recipe=self.recipe, date=date(2026, 1, 6))
+        
+        for url in ['/api/meal-plans/export/ical/', '/api/meal-plans/grocery-list/']:
+            first = self.client.get(url)
+            self.assertEqual(first.status_code, 200)
+            self.assertIn('private', first['Cache-Control'])
+            second = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+            self.assertEqual(second.status_code, 304)
+        
+        first = self.client.get('/api/meal-plans/export/ical/')
+        with self.captureOnCommitCallbacks(execute=True):
+            meal_plan.delete()
+        second = self.client.get(
+            '/api/meal-plans/export/ical/',
+            HTTP_IF_NONE_MATCH=first['ETag'], HTTP_IF_MODIFIED_SINCE=first['Last-Modified'],
+        )
+        self.assertEqual(second.status_code, 200)
+
+
+class PersonalizationQueryTest(APITestBase):
+    """Test is_favorited/user_rating are loaded for a whole page at once"""
+    
+    def add_recipes(self, count):
+        from apps.recipes.models import Ingredient, RecipeIngredient
+        
+        tomato, _ = Ingredient.objects.get_or_create(name="tomato")
+        for i in range(count):
+            recipe = Recipe.objects.create(
+                title=f"Tomato dish {i}", description="Red", instructions="Cook.",
+                author=self.other_user, category=self.category,
+            )
+            RecipeIngredient.objects.create(recipe=recipe, ingredient=tomato, quantity=1)
+    
+    def count_user_queries(self, url):
+        """Number of queries filtering ratings/favorites by the current user (cold cache)"""
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        user_queries = [
+            query for query in queries
+            if '."user_id" = ' in query['sql']
+            and ('recipes_rating' in query['sql'] or 'recipes_favorite' in query['sql'])
+        ]
+        return len(user_queries), response
+    
+    def test_query_count_does_not_grow_with_page_size(self):
+        """Test personalization costs the same queries for 2 or 8 recipes"""
+        self.client.force_authenticate(self.user)
+        url = '/api/recipes/by-ingredients/?ingredients=tomato'
+        self.add_recipes(2)
+        small, _ = self.count_user_queries(url)
+        self.add_recipes(6)
+        large, response = self.count_user_queries(url)
+        self.assertEqual(len(response.data['results']), 8)
+        self.assertEqual(small, large)
+        self.assertLessEqual(large, 2)
+    
+    def test_personalized_values(self):
+        """Test favorites and ratings are reported per recipe"""
+        from apps.recipes.models import Favorite, Rating
+        
+        self.add_recipes(2)
+        favorite, rated = Recipe.objects.filter(title__startswith="Tomato").order_by('pk')
+        Favorite.objects.create(user=self.user, recipe=favorite)
+        Rating.objects.create(user=self.user, recipe=rated, stars=4)
+        
+        self.client.force_authenticate(self.user)
+        response = self.client.get('/api/recipes/by-ingredients/?ingredients=tomato')
+        results = {item['id']: item for item in response.data['results']}
+        self.assertTrue(results[favorite.pk]['is_favorited'])
+        self.assertIsNone(results[favorite.pk]['user_rating'])
+        self.assertFalse(results[rated.pk]['is_favorited'])
+        self.assertEqual(results[rated.pk]['user_rating']['stars'], 4)
+        
+        # The cached favorite set is dropped when favorites change
+        Favorite.objects.filter(user=self.user).delete()
+        response = self.client.get(f'/api/recipes/{favorite.pk}/')
+        self.assertFalse(response.data['is_favorited'])
+
+
+class SparseFieldsTest(APITestBase):
+    """Test ?fields= and ?expand= pruning and query planning"""
+    
+    def setUp(self):
+        super().setUp()
+        from apps.recipes.models import Ingredient, RecipeIngredient, RecipeImage
+        
+        salt = Ingredient.objects.create(name="salt")
+        RecipeIngredient.objects.create(recipe=self.recipe, ingredient=salt, quantity=1, unit="tsp")
+        RecipeImage.objects.create(recipe=self.recipe, image_url="https://example.com/pasta.jpg")
+    
+    def capture(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response, [query['sql'] for query in queries]
+    
+    def test_fields_prunes_list_payload_and_queries(self):
+        """Test only requested fields are returned and fewer queries run"""
+        # Compare with the full serializer (full list pages are otherwise projected)
+        with override_settings(API_PROJECTIONS_ENABLED=False):
+            full, full_queries = self.capture('/api/recipes/')
+        sparse, sparse_queries = self.capture('/api/recipes/?fields=id,title,image')
+        self.assertEqual(set(sparse.data['results'][0]), {'id', 'title', 'image'})
+        self.assertLess(len(sparse.content), len(full.content))
+        self.assertLess(len(sparse_queries), len(full_queries))
+        # Unrequested text columns are deferred
+        self.assertNotIn('"description"', sparse_queries[-1])
+    
+    def test_expand_collapses_other_relations(self):
+        """Test relations not listed in expand are returned as ids"""
+        response, queries = self.capture(f'/api/recipes/{self.recipe.pk}/?expand=author')
+        data = response.data
+        self.assertEqual(data['author']['username'], 'apichef')
+        self.assertEqual(data['category'], self.category.pk)
+        self.assertEqual(len(data['recipe_ingredients']), 1)
+        self.assertIsInstance(data['recipe_ingredients'][0], int)
+        self.assertIsInstance(data['images'][0], int)
+        self.assertFalse(any('recipes_category' in sql for sql in queries))
+        self.assertFalse(any('recipes_ingredient"' in sql for sql in queries))
+    
+    def test_expanded_relations_are_included(self):
+        """Test expand adds nested relations to a sparse field list"""
+        response, _ = self.capture(f'/api/recipes/{self.recipe.pk}/?fields=title&expand=category')
+        self.assertEqual(set(response.data), {'title', 'category'})
+        self.assertEqual(response.data['category']['slug'], 'dinner')
+    
+    def test_unknown_fields_are_rejected(self):
+        """Test misspelled fields and non-expandable relations return 400"""
+        self.assertEqual(self.client.get('/api/recipes/?fields=id,titel').status_code, 400)
+        self.assertEqual(self.client.get('/api/recipes/?expand=title').status_code, 400)
+    
+    def test_default_payload_unchanged(self):
+        """Test responses without the parameters keep every field"""
+        response = self.client.get(f'/api/recipes/{self.recipe.pk}/')
+        self.assertEqual(response.data['author']['username'], 'apichef')
+        self.assertEqual(response.data['recipe_ingredients'][0]['ingredient']['name'], 'salt')
+    
+    def test_other_viewsets(self):
+        """Test ratings accept sparse fieldsets too"""
+        from apps.recipes.models import Rating
+        
+        Rating.objects.create(recipe=self.recipe, user=self.other_user, stars=3)
+        response, queries = self.capture('/api/ratings/?fields=id,stars,recipe_title')
+        self.assertEqual(response.data['results'][0], {'id': response.data['results'][0]['id'], 'stars': 3, 'recipe_title': 'Pasta'})
+        self.assertFalse(any('users_customuser' in sql for sql in queries))
+
+
+class FastJSONTest(APITestBase):
+    """Test the fast JSON renderer/parser match DRF's JSON output"""
+    
+    def sample_payload(self):
+        import datetime
+        import uuid
+        from decimal import Decimal
+        from django.utils.translation import gettext_lazy
+        
+        return {
+            'quantity': Decimal('2.50'),
+            'aware': datetime.datetime(2026, 1, 2, 3, 4, 5, 678000, tzinfo=datetime.timezone.utc),
+            'naive': datetime.datetime(2026, 1, 2, 3, 4, 5),
+            'date': datetime.date(2026, 1, 2),
+            'time': datetime.time(12, 30),
+            'duration': datetime.timedelta(minutes=90),
+            'uuid': uuid.UUID(int=1),
+            'lazy': gettext_lazy('Dinner'),
+            'text': 'Crème brûlée \u2028 line',
+            'nested': [{'stars': 5, 'ratio': 0.5, 'none': None, 'flag': True}],
+            'huge': 2 ** 70,
+        }
+    
+    def test_matches_drf_renderer(self):
+        """Test output decodes to the same data as DRF's JSONRenderer"""
+        import json
+        from rest_framework.renderers import JSONRenderer
+        from apps.api import fastjson
+        from apps.api.renderers import FastJSONRenderer
+        
+        payload = self.sample_payload()
+        expected = JSONRenderer().render(payload)
+        rendered = FastJSONRenderer().render(payload)
+        self.assertEqual(json.loads(rendered), json.loads(expected))
+        self.assertIn(b'\\u2028', rendered)
+        self.assertIn(b'"2026-01-02T03:04:05.678000Z"', rendered)
+        self.assertEqual(fastjson._stdlib_dumps(payload), expected)
+    
+    def test_indent(self):
+        """Test ?indent (Accept parameter) and indent=2 pretty printing"""
+        from apps.api import fastjson
+        from apps.api.renderers import FastJSONRenderer
+        
+        rendered = FastJSONRenderer().render({'a': [1]}, 'application/json; indent=2')
+        self.assertIn(b'\n  "a"', rendered)
+        self.assertEqual(fastjson.loads(fastjson.dumps({'a': 1}, indent=2)), {'a': 1})
+    
+    def test_api_requests_use_fast_parser(self):
+        """Test JSON bodies are parsed and malformed JSON returns 400"""
+        self.client.force_authenticate(self.other_user)
+        response = self.client.post(
+            '/api/ratings/', '{"recipe": %d, "stars": 4}' % self.recipe.pk,
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()['stars'], 4)
+        
+        response = self.client.post('/api/ratings/', '{"stars": ', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('JSON parse error', response.json()['detail'])
+
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+@unittest.skipIf(msgpack is None, "msgpack is not installed")
+class MessagePackTest(APITestBase):
+    """Test MessagePack content negotiation"""
+    
+    def get_msgpack(self, url, accept='application/msgpack'):
+        response = self.client.get(url, HTTP_ACCEPT=accept)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        return msgpack.unpackb(response.content, raw=False)
+    
+    def test_recipe_list_matches_json(self):
+        """Test the MessagePack body decodes to the JSON body"""
+        data = self.get_msgpack('/api/recipes/')
+        self.assertEqual(data, self.client.get('/api/recipes/').json())
+    
+    def test_table_shape(self):
+        """Test list results can be sent as columns + rows"""
+        data = self.get_msgpack('/api/recipes/?fields=id,title', 'application/msgpack; shape=table')
+        self.assertEqual(data['count'], 1)
+        self.assertEqual(data['results'], {'columns': ['id', 'title'], 'rows': [[self.recipe.pk, 'Pasta']]})
+        
+        Ingredient.objects.create(name="basil")
+        ingredients = self.get_msgpack('/api/ingredients/', 'application/msgpack; shape=table')
+        self.assertEqual(ingredients['results']['columns'], ['id', 'name'])
+        
+        # Cycling field selections can't grow the compiled schemas without bound
+        from .renderers import TABLE_SCHEMA_CACHE_SIZE, _compiled_schema
+        for index in range(TABLE_SCHEMA_CACHE_SIZE + 10):
+            _compiled_schema(('id', f'field_{index}'))
+        self.assertLessEqual(_compiled_schema.cache_info().currsize, TABLE_SCHEMA_CACHE_SIZE)
+    
+    def test_msgpack_request_body(self):
+        """Test meal plans can be created from a MessagePack body"""
+        self.client.force_authenticate(self.user)
+        body = msgpack.packb({'recipe': self.recipe.pk, 'recipe_id': self.recipe.pk, 'date': '2026-03-01', 'meal_type': 'lunch'})
+        response = self.client.post('/api/meal-plans/', body, content_type='application/msgpack')
+        self.assertEqual(response.status_code, 201, response.content)
+        response = self.client.post('/api/meal-plans/', b'\xc1', content_type='application/msgpack')
+        self.assertEqual(response.status_code, 400)
+
+
+class ProjectionParityTest(APITestBase):
+    """Test list pages built by projections are identical to serializer output"""
+    
+    def setUp(self):
+        super().setUp()
+        from decimal import Decimal
+        from apps.recipes.models import Comment, Favorite, Rating, RecipeImage, RecipeIngredient
+        
+        self.recipe.image = 'recipes/pasta.jpg'
+        self.recipe.description = 'Line\u2028separator and "quotes"'
+        self.recipe.save()
+        salt = Ingredient.objects.create(name="salt")
+        basil = Ingredient.objects.create(name="basil")
+        RecipeIngredient.objects.create(recipe=self.recipe, ingredient=salt, quantity=Decimal('1.5'), unit="tsp")
+        RecipeIngredient.objects.create(recipe=self.recipe, ingredient=basil, quantity=2, notes="fresh")
+        RecipeImage.objects.create(recipe=self.recipe, image_url="https://example.com/pasta.jpg")
+        for stars, user in [(5, self.user), (4, self.other_user)]:
+            Rating.objects.create(recipe=self.recipe, user=user, stars=stars, review_text="ok")
+        third = User.objects.create_user(username="third", password="testpass123")
+        Rating.objects.create(recipe=self.recipe, user=third, stars=5)
+        Favorite.objects.create(recipe=self.recipe, user=self.user)
+        Comment.objects.create(recipe=self.recipe, user=self.other_user, text="Yum")
+        
+        # No category, no image, no ratings, unpublished (visible to its author)
+        self.plain = Recipe.objects.create(
+            title="Toast", description="", instructions="Toast it.", author=self.other_user,
+            is_published=False, dietary_restrictions='vegan',
+        )
+        RecipeIngredient.objects.create(recipe=self.plain, ingredient=salt, quantity=1)
+    
+    def fetch(self, url, projections):
+        cache.clear()
+        with override_settings(API_PROJECTIONS_ENABLED=projections):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.content
+    
+    def assert_parity(self, url):
+        self.assertEqual(self.fetch(url, True), self.fetch(url, False), url)
+    
+    def test_recipe_list_and_search(self):
+        """Test list, search and by-ingredients responses are byte-identical"""
+        urls = [
+            '/api/recipes/',
+            '/api/recipes/?sort=rating',
+            '/api/recipes/?sort=title&max_total_time=60',
+            '/api/recipes/?dietary=vegan',
+            '/api/recipes/?sort=calories',
+            '/api/recipes/search/?ingredients=salt',
+            '/api/recipes/search/?search=pasta&sort=views',
+            '/api/recipes/by-ingredients/?ingredients=salt,basil',
+        ]
+        for url in urls:
+            self.assert_parity(url)
+        for user in (self.user, self.other_user):
+            self.client.force_authenticate(user)
+            for url in urls:
+                self.assert_parity(url)
+        self.assertEqual(len(self.client.get('/api/recipes/').json()['results']), 2)
+    
+    def test_user_favorites(self):
+        """Test the favorites page is byte-identical"""
+        self.client.force_authenticate(self.user)
+        self.assert_parity('/api/user/favorites/')
+    
+    def test_list_query_count_is_constant(self):
+        """Test a projected page costs the same queries for 2 or 12 recipes"""
+        def count_queries():
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get('/api/recipes/search/?sort=rating')
+            self.assertEqual(response.status_code, 200)
+            return len(queries)
+        
+        small = count_queries()
+        for i in range(10):
+            Recipe.objects.create(title=f"Soup {i}", description="Hot", instructions="Boil.", author=self.user)
+        self.assertEqual(count_queries(), small)
+        self.assertLessEqual(small, 5)
+    
+    def test_unsupported_serializers_use_the_serializer(self):
+        """Test serializers with dotted sources aren't projected"""
+        from .projections import get_projection
+        from .serializers import RatingSerializer, RecipeListSerializer
+        
+        self.assertIsNone(get_projection(RatingSerializer))
+        self.assertIsNotNone(get_projection(RecipeListSerializer))
+        # ?fields= keeps using the sparse serializer
+        response = self.client.get('/api/recipes/?fields=id,title')
+        self.assertEqual(set(response.data['results'][0]), {'id', 'title'})
+
+
+class ChangeFeedTest(APITestBase):
+    """Test the recipe change feed used for incremental partner sync"""
+    
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.other_user)
+        self.cursor = self.client.get('/api/recipes/changes/').data['next_cursor']
+    
+    def get_changes(self, **params):
+        response = self.client.get('/api/recipes/changes/', {'since': self.cursor, **params})
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.data
+    
+    def test_changes_since_cursor(self):
+        """Test updates carry the recipe and deletions are tombstones"""
+        from apps.recipes.models import RecipeIngredient
+        
+        self.assertEqual(self.get_changes()['changes'], [])
+        with self.captureOnCommitCallbacks(execute=True):
+            soup = Recipe.objects.create(title="Soup", description="Hot", instructions="Boil.", author=self.user)
+            salt = Ingredient.objects.create(name="salt")
+            RecipeIngredient.objects.create(recipe=soup, ingredient=salt, quantity=1)
+            self.recipe.title = "Better pasta"
+            self.recipe.save()
+            self.recipe.increment_view_count()  # Not a change for partners
+        
+        data = self.get_changes()
+        self.assertEqual([(c['recipe_id'], c['action']) for c in data['changes']],
+                         [(soup.pk, 'updated'), (self.recipe.pk, 'updated')])
+        self.assertEqual(data['changes'][0]['recipe']['recipe_ingredients'][0]['ingredient']['name'], 'salt')
+        self.assertEqual(data['changes'][1]['recipe']['title'], 'Better pasta')
+        self.assertFalse(data['has_more'])
+        
+        # Resuming from the returned cursor only shows newer changes
+        self.cursor = data['next_cursor']
+        soup_id = soup.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            soup.delete()
+        data = self.get_changes()
+        self.assertEqual(data['changes'][-1], {
+            'cursor': data['next_cursor'], 'recipe_id': soup_id, 'action': 'deleted',
+            'changed_at': data['changes'][-1]['changed_at'], 'recipe': None,
+        })
+    
+    def test_unpublished_recipes_are_tombstones(self):
+        """Test unpublishing is reported without the recipe, drafts not at all"""
+        from apps.recipes.models import RecipeImage, RecipeIngredient
+        with self.captureOnCommitCallbacks(execute=True):
+            draft = Recipe.objects.create(title="Draft", description="", instructions="", author=self.user, is_published=False)
+            # Edits, ingredients, images and deletion of a draft don't reveal its id
+            draft.title = "Draft v2"
+            draft.save()
+            RecipeIngredient.objects.create(recipe=draft, ingredient=Ingredient.objects.create(name="salt"), quantity=1)
+            RecipeImage.objects.create(recipe=draft, image_url="https://example.com/draft.jpg")
+            Recipe.objects.get(pk=draft.pk).delete()
+            self.recipe.is_published = False
+            self.recipe.save()
+        changes = self.get_changes()['changes']
+        self.assertEqual([(c['recipe_id'], c['action'], c['recipe']) for c in changes],
+                         [(self.recipe.pk, 'unpublished', None)])
+    
+    def test_ingredient_list_is_one_change(self):
+        """Test writing a recipe's ingredients logs one change, not one per row"""
+        from apps.recipes.models import RecipeChange
+        self.client.force_authenticate(self.user)
+        ingredients = [{'name': f'Spice {i}', 'quantity': 1, 'unit': 'g'} for i in range(20)]
+        with self.captureOnCommitCallbacks(execute=True), CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/api/recipes/', {
+                'title': 'Curry', 'description': 'Spicy', 'instructions': 'Simmer.',
+                'ingredients_data': ingredients, 'images_data': [],
+            }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(len(response.data['recipe_ingredients']), 20)
+        self.assertLess(len(ctx.captured_queries), 69)
+        curry = response.data['id']
+        self.assertEqual(RecipeChange.objects.filter(recipe_id=curry, action=RecipeChange.UPDATED).count(), 1)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(f'/api/recipes/{curry}/', {'ingredients_data': ingredients[:10]}, format='json')
+        self.assertEqual(len(response.data['recipe_ingredients']), 10)
+        self.assertEqual(RecipeChange.objects.filter(recipe_id=curry, action=RecipeChange.UPDATED).count(), 3)
+    
+    def test_paging_and_validation(self):
+        """Test limit pages through changes and bad cursors are rejected"""
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(3):
+                Recipe.objects.create(title=f"Dish {i}", description="", instructions="", author=self.user)
+        first = self.get_changes(limit=2)
+        self.assertEqual(len(first['changes']), 2)
+        self.assertTrue(first['has_more'])
+        self.cursor = first['next_cursor']
+        second = self.get_changes(limit=2)
+        self.assertEqual([c['recipe']['title'] for c in second['changes']], ['Dish 2'])
+        self.assertFalse(second['has_more'])
+        
+        self.assertEqual(self.client.get('/api/recipes/changes/?since=abc').status_code, 400)
+        self.client.force_authenticate(None)
+        self.assertIn(self.client.get('/api/recipes/changes/?since=0').status_code, (401, 403))
+    
+    def test_changes_are_written_after_commit(self):
+        """Test a change gets its cursor when its transaction commits, and not at all on rollback"""
+        from django.db import transaction
+        with self.captureOnCommitCallbacks(execute=True):
+            soup = Recipe.objects.create(title="Soup", description="", instructions="", author=self.user)
+            # Still in flight: a cursor handed out now must not skip it later
+            data = self.get_changes()
+            self.assertEqual(data['changes'], [])
+            self.assertEqual(data['next_cursor'], self.cursor)
+            try:
+                with transaction.atomic():
+                    Recipe.objects.create(title="Stew", description="", instructions="", author=self.user)
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertEqual([c['recipe_id'] for c in self.get_changes()['changes']], [soup.pk])
+
+
+class BatchTest(APITestBase):
+    """Test /api/batch/ runs sub-requests with shared authentication"""
+    
+    def batch(self, requests, expected_status=200, **extra):
+        response = self.client.post('/api/batch/', {'requests': requests, **extra}, format='json')
+        self.assertEqual(response.status_code, expected_status, response.content)
+        return response
+    
+    def test_recipe_page_in_one_request(self):
+        """Test sub-responses match the individual requests"""
+        from apps.recipes.models import Comment
+        
+        Comment.objects.create(recipe=self.recipe, user=self.other_user, text="Nice")
+        self.client.force_authenticate(self.user)
+        response = self.batch([
+            {'id': 'recipe', 'path': f'/api/recipes/{self.recipe.pk}/'},
+            {'id': 'comments', 'path': f'/api/comments/?recipe={self.recipe.pk}'},
+            {'id': 'me', 'path': '/api/users/me/'},
+            {'id': 'missing', 'path': '/api/nothing-here/'},
+            {'id': 'calendar', 'path': '/api/calendar/nope.ics'},  # A plain view raising Http404
+        ])
+        results = {item['id']: item for item in response.json()['responses']}
+        self.assertEqual(results['recipe']['body']['title'], 'Pasta')
+        self.assertEqual(results['comments']['body'], self.client.get(f'/api/comments/?recipe={self.recipe.pk}').json())
+        self.assertEqual(results['me']['body']['username'], 'apichef')
+        self.assertEqual(results['missing']['status'], 404)
+        self.assertEqual(results['calendar']['status'], 404)
+        self.assertIn('ETag', results['recipe']['headers'])
+        self.assertTrue(all(item['duration_ms'] >= 0 for item in results.values()))
+        self.assertTrue(response['Server-Timing'].startswith('batch;dur='))
+    
+    def test_sub_requests_share_the_batch_user(self):
+        """Test anonymous batches can't reach authenticated endpoints"""
+        response = self.batch([{'path': '/api/users/me/', 'headers': {'Authorization': 'Token nope'}}])
+        self.assertIn(response.json()['responses'][0]['status'], (401, 403))
+    
+    def test_writes_and_atomic_batches(self):
+        """Test failed writes are isolated, and atomic batches roll back entirely"""
+        from apps.recipes.models import Comment
+        
+        self.client.force_authenticate(self.other_user)
+        good = {'method': 'POST', 'path': '/api/comments/', 'body': {'recipe': self.recipe.pk, 'text': 'Great'}}
+        bad = {'method': 'POST', 'path': '/api/comments/', 'body': {'recipe': self.recipe.pk}}
+        statuses = [item['status'] for item in self.batch([good, bad]).json()['responses']]
+        self.assertEqual(statuses, [201, 400])
+        self.assertEqual(Comment.objects.count(), 1)
+        
+        self.batch([good, bad], atomic=True)
+        self.assertEqual(Comment.objects.count(), 1)
+    
+    def test_failed_reads_are_rolled_back(self):
+        """Test a read that fails in the database doesn't break the sub-requests after it"""
+        from unittest import mock
+        from django.db import DatabaseError
+        from apps.api import batch
+        
+        depths = []
+        def fail_in_savepoint(sub_request):
+            depths.append(len(connection.savepoint_ids))
+            if sub_request.path_info == '/api/health/':
+                raise DatabaseError('current transaction is aborted')
+            return call_view(sub_request)
+        call_view = batch._call_view
+        with mock.patch.object(batch, '_call_view', fail_in_savepoint):
+            response = self.batch([{'path': '/api/health/'}, {'path': f'/api/recipes/{self.recipe.pk}/'}])
+        self.assertEqual([item['status'] for item in response.json()['responses']], [500, 200])
+        # The batch's savepoint, then one per sub-request
+        self.assertEqual(depths, [len(connection.savepoint_ids) + 2] * 2)
+    
+    @override_settings(BATCH_MAX_REQUESTS=3)
+    def test_limits(self):
+        """Test batch size, paths and the rate limit are enforced"""
+        item = {'path': '/api/health/'}
+        self.batch([item] * 4, expected_status=400)
+        self.batch([{'path': '/api/batch/'}], expected_status=400)
+        self.batch([{'path': '/admin/'}], expected_status=400)
+        self.batch([item, {'path': '/api/recipes/', 'method': 'TRACE'}], expected_status=400)
+        with override_settings(RATE_LIMIT_REQUESTS=5):
+            cache.clear()
+            self.batch([item] * 3)
+            self.batch([item] * 3, expected_status=429)
+
+
+class BulkFetchTest(APITestBase):
+    """Test /api/recipes/bulk/ returns many recipes in one request"""
+    
+    def setUp(self):
+        super().setUp()
+        self.draft = Recipe.objects.create(
+            title="Draft", description="", instructions="", author=self.other_user, is_published=False
+        )
+        self.soup = Recipe.objects.create(title="Soup", description="", instructions="", author=self.user)
+    
+    def test_order_and_missing_ids(self):
+        """Test results follow the given order and hidden/unknown ids are reported"""
+        url = f'/api/recipes/bulk/?ids={self.soup.pk},999999,{self.recipe.pk},{self.draft.pk},{self.soup.pk}'
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([recipe['title'] for recipe in response.data['results']], ['Soup', 'Pasta'])
+        self.assertEqual(response.data['missing'], [999999, self.draft.pk])
+        self.assertLessEqual(len(queries), 4)
+        
+        # Same shape as the detail endpoint
+        detail = self.client.get(f'/api/recipes/{self.recipe.pk}/').json()
+        self.assertEqual(response.json()['results'][1], detail)
+        
+        # Authors see their own drafts
+        self.client.force_authenticate(self.other_user)
+        response = self.client.post('/api/recipes/bulk/', {'ids': [self.draft.pk]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['title'], 'Draft')
+        self.assertEqual(response.data['missing'], [])
+    
+    def test_sparse_fields_and_validation(self):
+        """Test ?fields= works and bad id lists are rejected"""
+        response = self.client.get(f'/api/recipes/bulk/?ids={self.recipe.pk}&fields=id,title')
+        self.assertEqual(response.data['results'], [{'id': self.recipe.pk, 'title': 'Pasta'}])
+        self.assertEqual(self.client.get('/api/recipes/bulk/?ids=1,abc').status_code, 400)
+        self.assertEqual(self.client.get('/api/recipes/bulk/').status_code, 400)
+        response = self.client.post('/api/recipes/bulk/', {'ids': list(range(1, 502))}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+
+class IdempotencyTest(APITestBase):
+    """Test Idempotency-Key replays writes and identical exports are coalesced"""
+    
+    def test_retry_replays_response(self):
+        """Test a retried favorite toggle is replayed instead of toggling back"""
+        self.client.force_authenticate(self.user)
+        url = '/api/favorites/'
+        first = self.client.post(url, {'recipe': self.recipe.pk}, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+        retry = self.client.post(url, {'recipe': self.recipe.pk}, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(retry.json(), first.json())
+        self.assertTrue(retry.json()['is_favorited'])
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertTrue(self.recipe.favorites.filter(user=self.user).exists())
+        
+        # Same key, different body
+        response = self.client.post(url, {'recipe': 999}, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+        self.assertEqual(response.status_code, 422)
+        # Without a key the toggle works as before
+        self.client.post(url, {'recipe': self.recipe.pk}, format='json')
+        self.assertFalse(self.recipe.favorites.filter(user=self.user).exists())
+    
+    def test_keys_are_scoped_per_user(self):
+        """Test another user's request with the same key runs normally"""
+        data = {'recipe': self.recipe.pk, 'recipe_id': self.recipe.pk, 'date': '2030-01-01', 'meal_type': 'dinner'}
+        for user in (self.user, self.other_user):
+            self.client.force_authenticate(user)
+            response = self.client.post('/api/meal-plans/', data, format='json', HTTP_IDEMPOTENCY_KEY='k')
+            self.assertEqual(response.status_code, 201, response.content)
+            self.assertNotIn('Idempotent-Replayed', response)
+    
+    def test_in_flight_retry_conflicts(self):
+        """Test a retry while the original request is still running gets 409"""
+        self.client.force_authenticate(self.user)
+        key = idempotency_cache_key(['FavoriteViewSet', 'create', self.user.pk, 'busy'])
+        cache.add(f'{key}:lock', 1)
+        response = self.client.post(
+            '/api/favorites/', {'recipe': self.recipe.pk}, format='json', HTTP_IDEMPOTENCY_KEY='busy'
+        )
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(self.recipe.favorites.exists())
+    
+    def test_retry_racing_the_original_is_replayed(self):
+        """Test a retry that takes the lock just after the original finished replays it"""
+        from unittest import mock
+        self.client.force_authenticate(self.user)
+        url = '/api/favorites/'
+        first = self.client.post(url, {'recipe': self.recipe.pk}, format='json', HTTP_IDEMPOTENCY_KEY='race')
+        key = idempotency_cache_key(['FavoriteViewSet', 'create', self.user.pk, 'race'])
+        cache_get, missed = cache.get, []
+        
+        def get(cache_key, *args, **kwargs):
+            # The retry's first look happens before the original stored its response
+            if cache_key == key and not missed:
+                missed.append(cache_key)
+                return None
+            return cache_get(cache_key, *args, **kwargs)
+        with mock.patch.object(cache, 'get', get):
+            retry = self.client.post(url, {'recipe': self.recipe.pk}, format='json', HTTP_IDEMPOTENCY_KEY='race')
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.json(), first.json())
+        self.assertTrue(self.recipe.favorites.filter(user=self.user).exists())
+    
+    def test_concurrent_identical_gets_compute_once(self):
+        """Test N concurrent identical requests run the view once"""
+        calls = []
+        
+        class ExportView:
+            action = 'export'
+            
+            @coalesce_get()
+            def export(self, request):
+                calls.append(1)
+                time.sleep(0.2)
+                return HttpResponse('exported', content_type='text/csv')
+        
+        request = Request(APIRequestFactory().get('/api/recipes/export/?format=csv'))
+        request.user = AnonymousUser()
+        barrier = threading.Barrier(4)
+        responses = []
+        
+        def fetch():
+            barrier.wait(5)
+            responses.append(ExportView().export(request))
+        
+        threads = [threading.Thread(target=fetch) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+        
+        self.assertEqual(len(calls), 1)
+        self.assertEqual([response.content for response in responses], [b'exported'] * 4)
+        self.assertEqual(sum(response.get('X-Single-Flight') == 'shared' for response in responses), 3)
+        self.assertEqual(responses[0]['Content-Type'], 'text/csv')
+
+
+class AuthorAnalyticsTest(APITestBase):
+    """Test activity is rolled up into buckets and reported per author"""
+    
+    def setUp(self):
+        from . import analytics
+        super().setUp()
+        analytics._buffer.clear()  # Activity recorded by other tests
+        self.analytics = analytics
+    
+    def test_activity_is_counted(self):
+        """Test views, favorites, ratings and comments show up in the report"""
+        self.client.force_authenticate(self.other_user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(f'/api/recipes/{self.recipe.pk}/')
+            self.client.post('/api/favorites/', {'recipe': self.recipe.pk}, format='json')
+            self.client.post('/api/ratings/', {'recipe': self.recipe.pk, 'stars': 4}, format='json')
+            self.client.post('/api/comments/', {'recipe': self.recipe.pk, 'text': 'Nice'}, format='json')
+            self.client.post('/api/favorites/', {'recipe': self.recipe.pk}, format='json')  # Unfavorite
+        
+        self.client.force_authenticate(self.user)
+        response = self.client.get('/api/analytics/author/?days=7')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.data['totals'],
+            {'views': 1, 'favorites': 0, 'ratings': 1, 'comments': 1, 'average_rating': 4.0},
+        )
+        self.assertEqual(len(response.data['buckets']), 7)
+        self.assertEqual(response.data['series']['views'], [0] * 6 + [1])
+        top = response.data['top_recipes'][0]
+        self.assertEqual((top['id'], top['title'], top['views']), (self.recipe.pk, 'Pasta', 1))
+        self.assertEqual(top['sparkline'], [0] * 6 + [1])
+        
+        hourly = self.client.get('/api/analytics/author/?granularity=hour&days=1').data
+        self.assertEqual(len(hourly['buckets']), 24)
+        self.assertEqual(hourly['totals']['views'], 1)
+    
+    def test_flush_waits_for_the_transaction(self):
+        """Test a flush due inside a transaction runs after it, so a rollback can't lose the buffer"""
+        from django.db import transaction
+        from unittest import mock
+        from apps.recipes.models import RecipeStatBucket
+        self.analytics.record(self.recipe.pk, views=2)
+        with mock.patch.object(self.analytics, '_flush_interval', return_value=0):
+            try:
+                with transaction.atomic():
+                    self.analytics.record(self.recipe.pk, views=1)
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertFalse(RecipeStatBucket.objects.exists())
+        self.analytics.flush()
+        self.assertEqual(
+            RecipeStatBucket.objects.get(recipe=self.recipe, period=RecipeStatBucket.DAY).views, 3
+        )
+    
+    def test_exit_flush_without_database_is_quiet(self):
+        """Test the flush at exit gives up without an error log when the database is gone"""
+        from django.db import OperationalError
+        from unittest import mock
+        self.analytics.record(self.recipe.pk, views=1)
+        with mock.patch.object(self.analytics, '_write', side_effect=OperationalError('no such table')):
+            with self.assertNoLogs(self.analytics.logger, 'INFO'):
+                self.analytics._flush_at_exit()
+        self.assertEqual(len(self.analytics._buffer), 0)
+    
+    def test_rating_edit_then_delete_balances(self):
+        """Test editing a rating moves rating_total by the change, so deleting it leaves nothing"""
+        from apps.recipes.models import Rating, RecipeStatBucket
+        with self.captureOnCommitCallbacks(execute=True):
+            rating = Rating.objects.create(recipe=self.recipe, user=self.other_user, stars=5)
+        with self.captureOnCommitCallbacks(execute=True):
+            rating = Rating.objects.get(pk=rating.pk)
+            rating.stars = 1
+            rating.save()
+        self.analytics.flush()
+        day = RecipeStatBucket.objects.get(recipe=self.recipe, period=RecipeStatBucket.DAY)
+        self.assertEqual((day.ratings, day.rating_total), (1, 1))
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            rating.delete()
+        self.analytics.flush()
+        day.refresh_from_db()
+        self.assertEqual((day.ratings, day.rating_total), (0, 0))
+    
+    def test_period_over_period(self):
+        """Test totals are compared with the previous period"""
+        from django.utils import timezone
+        from apps.recipes.models import RecipeStatBucket
+        today = self.analytics.bucket_start(timezone.now(), RecipeStatBucket.DAY)
+        for days_ago, views in ((0, 30), (3, 10), (8, 20), (20, 99)):
+            RecipeStatBucket.objects.create(
+                recipe=self.recipe, author=self.user, period=RecipeStatBucket.DAY,
+                bucket_start=today - timezone.timedelta(days=days_ago), views=views,
+            )
+        self.client.force_authenticate(self.user)
+        data = self.client.get('/api/analytics/author/?days=7').data
+        self.assertEqual(data['totals']['views'], 40)
+        self.assertEqual(data['previous_totals']['views'], 20)
+        self.assertEqual(data['change']['views'], 100.0)
+        self.assertIsNone(data['change']['favorites'])
+    
+    def test_queries_do_not_grow_with_recipes(self):
+        """Test the report only reads buckets, in a fixed number of queries"""
+        recipes = [
+            Recipe.objects.create(title=f"Dish {index}", description="", instructions="", author=self.user)
+            for index in range(30)
+        ]
+        for recipe in recipes:
+            self.analytics.record(recipe.pk, views=2, favorites=1)
+        with CaptureQueriesContext(connection) as queries:
+            self.analytics.flush()
+        self.assertLessEqual(len(queries), 2 * len(recipes) + 10)  # One UPDATE per hour/day bucket
+        
+        with self.assertNumQueries(5):
+            report = self.analytics.author_report(self.user.pk, top=5)
+        self.assertEqual(report['totals']['views'], 60)
+        self.assertEqual(len(report['top_recipes']), 5)
+    
+    def test_permissions_and_validation(self):
+        """Test other authors are staff-only and bad parameters are rejected"""
+        self.client.force_authenticate(self.other_user)
+        self.assertEqual(self.client.get('/api/analytics/author/?author=apichef').status_code, 403)
+        self.assertEqual(self.client.get('/api/analytics/author/?granularity=week').status_code, 400)
+        self.assertEqual(self.client.get('/api/analytics/author/?granularity=hour&days=30').status_code, 400)
+        self.client.force_authenticate(None)
+        self.assertIn(self.client.get('/api/analytics/author/').status_code, (401, 403))
+
+
+class TrendingTest(APITestBase):
+    """Test trending scores favor recent activity and stay small"""
+    
+    def setUp(self):
+        from datetime import timedelta
+        from django.db import transaction
+        from django.utils import timezone
+        from . import trending
+        super().setUp()
+        self.trending = trending
+        self.now = timezone.now()
+        self.old = Recipe.objects.create(title="Old favorite", description="", instructions="", author=self.user)
+        self.new = Recipe.objects.create(
+            title="New hit", description="", instructions="", author=self.user, category=self.category
+        )
+        with transaction.atomic():
+            trending.add_activity([
+                (self.old.pk, self.now - timedelta(days=10), {'favorites': 10, 'views': 500}),
+                (self.new.pk, self.now, {'favorites': 2, 'views': 20}),
+            ])
+    
+    def score(self, recipe):
+        return Recipe.objects.get(pk=recipe.pk).trending_score
+    
+    def test_recent_activity_ranks_first(self):
+        """Test sort=trending and /trending/ put recent activity above old totals"""
+        Recipe.objects.filter(pk=self.old.pk).update(view_count=1000)
+        titles = [r['title'] for r in self.client.get('/api/recipes/?sort=trending').data['results']]
+        self.assertEqual(titles[:2], ['New hit', 'Old favorite'])
+        
+        response = self.client.get('/api/recipes/trending/')
+        self.assertEqual([r['title'] for r in response.data], ['New hit', 'Old favorite'])
+        self.assertIn('average_rating', response.data[0])
+        response = self.client.get(f'/api/recipes/trending/?category={self.category.pk}&limit=5')
+        self.assertEqual([r['title'] for r in response.data], ['New hit'])
+        self.assertEqual(self.client.get('/api/recipes/trending/?limit=x').status_code, 400)
+    
+    def test_flushed_activity_adds_to_score(self):
+        """Test the analytics flush updates only the active recipe's score"""
+        from . import analytics
+        analytics._buffer.clear()
+        before, old_score = self.score(self.recipe), self.score(self.old)
+        analytics.record(self.recipe.pk, views=3, favorites=1)
+        analytics.flush()
+        self.assertGreater(self.score(self.recipe), before)
+        self.assertEqual(self.score(self.old), old_score)
+    
+    def test_removals_never_go_below_zero(self):
+        """Test an un-favorite of an old favorite leaves the score at 0, not negative"""
+        from datetime import timedelta
+        from django.db import transaction
+        with transaction.atomic():
+            self.trending.add_activity([(self.recipe.pk, self.now - timedelta(days=14), {'favorites': 1})])
+            self.trending.add_activity([(self.recipe.pk, self.now, {'favorites': -1})])
+        self.assertEqual(self.score(self.recipe), 0)
+    
+    def test_renormalize_only_when_due(self):
+        """Test the landmark moves after enough half-lives and the order is kept"""
+        from datetime import timedelta
+        self.assertIsNone(self.trending.renormalize(now=self.now + timedelta(days=1)))
+        
+        later = self.now + timedelta(hours=48 * 20)
+        new_score = self.score(self.new)
+        self.assertEqual(self.trending.renormalize(now=later), 2)  # Recipes without a score are skipped
+        self.assertAlmostEqual(self.score(self.new), new_score / 2 ** 20)
+        self.assertLess(self.score(self.old), self.score(self.new))
+        
+        # Scores that decayed to almost nothing are reset
+        self.trending.renormalize(force=True, now=later + timedelta(hours=48 * 20))
+        self.assertEqual(self.score(self.old), 0)
+    
+    def test_rebuild_from_buckets(self):
+        """Test --rebuild recomputes scores from the daily analytics buckets"""
+        from io import StringIO
+        from django.core.management import call_command
+        from apps.recipes.models import RecipeStatBucket
+        from .analytics import bucket_start
+        RecipeStatBucket.objects.create(
+            recipe=self.recipe, author=self.user, period=RecipeStatBucket.DAY,
+            bucket_start=bucket_start(self.now, RecipeStatBucket.DAY), views=5, favorites=1,
+        )
+        out = StringIO()
+        call_command('renormalize_trending', '--rebuild', stdout=out)
+        self.assertIn('1 recipes', out.getvalue())
+        self.assertEqual(list(self.trending.trending_recipe_ids()), [self.recipe.pk])
+    
+    def test_updates_are_batched(self):
+        """Test big rebuilds write TRENDING_UPDATE_BATCH recipes per UPDATE"""
+        from unittest import mock
+        from apps.recipes.models import RecipeStatBucket
+        from .analytics import bucket_start
+        day = bucket_start(self.now, RecipeStatBucket.DAY)
+        recipes = Recipe.objects.bulk_create(
+            Recipe(title=f"Dish {index}", description="", instructions="", author=self.user) for index in range(7)
+        )
+        RecipeStatBucket.objects.bulk_create(
+            RecipeStatBucket(recipe=recipe, author=self.user, period=RecipeStatBucket.DAY,
+                             bucket_start=day, views=index + 1)
+            for index, recipe in enumerate(recipes)
+        )
+        with mock.patch.object(self.trending, 'TRENDING_UPDATE_BATCH', 3), \
+                CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.trending.rebuild(now=self.now), 7)
+        updates = [q['sql'] for q in queries if q['sql'].startswith('UPDATE') and 'CASE' in q['sql']]
+        self.assertEqual(len(updates), 3)
+        self.assertAlmostEqual(self.score(recipes[6]), 7 * self.trending.growth(day, self.now))
+
+
+class SimilarRecipesTest(APITestBase):
+    """Test the MinHash/LSH index finds recipes with overlapping ingredients"""
+    
+    def make_recipe(self, title, names, **fields):
+        from apps.recipes.models import RecipeIngredient
+        recipe = Recipe.objects.create(
+            title=title, description="", instructions="", author=self.user, category=self.category, **fields
+        )
+        for name in names:
+            ingredient, _ = Ingredient.objects.get_or_create(name=name)
+            RecipeIngredient.objects.create(recipe=recipe, ingredient=ingredient, quantity=1)
+        return recipe
+    
+    def setUp(self):
+        super().setUp()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.base = self.make_recipe("Tomato pasta", "tomato garlic basil pasta olive salt pepper".split())
+            self.near = self.make_recipe("Tomato spaghetti", "tomato garlic basil pasta olive salt chili".split())
+            self.far = self.make_recipe("Fruit salad", "apple banana grape honey mint".split())
+            self.draft = self.make_recipe(
+                "Secret pasta", "tomato garlic basil pasta olive salt pepper".split(), is_published=False
+            )
+    
+    def test_similar_recipes(self):
+        """Test the most similar published recipe comes first"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/api/recipes/{self.base.pk}/similar/')
+        self.assertEqual(response.status_code, 200)
+        titles = [recipe['title'] for recipe in response.data]
+        self.assertEqual(titles[0], 'Tomato spaghetti')
+        self.assertNotIn('Secret pasta', titles)
+        self.assertNotIn('Fruit salad', titles)
+        self.assertGreater(response.data[0]['similarity'], 0.5)
+        self.assertIn('average_rating', response.data[0])
+        self.assertLessEqual(len(queries), 6)
+        
+        self.assertEqual(self.client.get(f'/api/recipes/{self.draft.pk}/similar/').status_code, 404)
+        self.assertEqual(self.client.get('/api/recipes/abc/similar/').status_code, 404)
+    
+    def test_index_follows_ingredient_changes(self):
+        """Test editing a recipe's ingredients updates its index entry"""
+        from apps.recipes.models import RecipeIngredient
+        with self.captureOnCommitCallbacks(execute=True):
+            RecipeIngredient.objects.filter(recipe=self.near).delete()
+            for name in ('apple', 'banana', 'grape', 'honey'):
+                RecipeIngredient.objects.create(
+                    recipe=self.near, ingredient=Ingredient.objects.get(name=name), quantity=1
+                )
+        titles = [recipe['title'] for recipe in self.client.get(f'/api/recipes/{self.far.pk}/similar/').data]
+        self.assertEqual(titles[0], 'Tomato spaghetti')
+        titles = [recipe['title'] for recipe in self.client.get(f'/api/recipes/{self.base.pk}/similar/').data]
+        self.assertNotIn('Tomato spaghetti', titles)
+    
+    def test_index_runs_once_per_transaction(self):
+        """Test a recipe saved with many ingredients is queued for indexing once"""
+        from unittest import mock
+        from . import similarity
+        with mock.patch.object(similarity, 'index_recipes', wraps=similarity.index_recipes) as index:
+            with self.captureOnCommitCallbacks(execute=True):
+                soup = self.make_recipe("Tomato soup", "tomato garlic basil olive salt pepper".split())
+                self.near.set_ingredients([{'name': 'tomato', 'quantity': 2}], replace=True)
+            self.assertEqual(sorted(call.args[0] for call in index.call_args_list), sorted([[soup.pk], [self.near.pk]]))
+            
+            # Once indexed, later transactions queue the recipe again
+            with self.captureOnCommitCallbacks(execute=True):
+                soup.save()
+            self.assertEqual(index.call_count, 3)
+    
+    def test_signature_estimates_jaccard(self):
+        """Test MinHash estimates the overlap of two feature sets"""
+        from .similarity import estimated_similarity, minhash
+        first = {f'ingredient:{i}' for i in range(0, 300)}
+        second = {f'ingredient:{i}' for i in range(100, 400)}  # Jaccard 0.5
+        self.assertAlmostEqual(estimated_similarity(minhash(first), minhash(second)), 0.5, delta=0.15)
+        self.assertEqual(estimated_similarity(minhash(first), minhash(set(first))), 1.0)
+
+
+@unittest.skipUnless(build_available(), "numpy/scipy are not installed")
+class RecommendationsTest(APITestBase):
+    """Test item-item recommendations built from favorites and ratings"""
+    
+    def setUp(self):
+        super().setUp()
+        from apps.recipes.models import Favorite
+        make = lambda title, **fields: Recipe.objects.create(
+            title=title, description="", instructions="", author=self.other_user, category=self.category, **fields
+        )
+        self.soup = make("Tomato soup")
+        self.salad = make("Caprese salad")
+        self.curry = make("Lentil curry", dietary_restrictions='vegan')
+        self.cake = make("Chocolate cake", trending_score=5.0)
+        fans = [User.objects.create_user(username=f"fan{i}", email=f"fan{i}@example.com", password="testpass123") for i in range(3)]
+        for fan in fans:
+            Favorite.objects.create(user=fan, recipe=self.soup)
+            Favorite.objects.create(user=fan, recipe=self.salad)
+        Favorite.objects.create(user=fans[0], recipe=self.curry)
+        Favorite.objects.create(user=self.user, recipe=self.soup)
+        self.client.force_authenticate(self.user)
+    
+    def test_recommends_neighbors_of_favorites(self):
+        """Test recipes liked by the same people come first, favorites excluded"""
+        from io import StringIO
+        from django.core.management import call_command
+        call_command('build_recommendations', '--workers', '1', stdout=StringIO())
+        response = self.client.get('/api/recipes/recommended/?limit=3')
+        self.assertEqual(response.status_code, 200)
+        titles = [recipe['title'] for recipe in response.data]
+        self.assertEqual(titles[0], 'Caprese salad')
+        self.assertNotIn('Tomato soup', titles)
+        self.assertNotIn('Pasta', titles)  # Their own recipe
+        self.assertEqual(response.data[0]['recommendation']['reason'], 'favorites')
+        self.assertIn('average_rating', response.data[0])
+    
+    def test_dietary_preference_boost(self):
+        """Test recipes matching the user's diet are boosted"""
+        from .recommendations import build_neighbors, recommended_recipes
+        build_neighbors(workers=1)
+        self.user.profile.dietary_preferences = 'vegan'
+        self.user.profile.save()
+        # Curry (0.5) is a weaker neighbor of the soup than the salad (0.87), but vegan
+        ids = [recipe_id for recipe_id, _, reason in recommended_recipes(self.user) if reason == 'favorites']
+        self.assertEqual(ids, [self.curry.pk, self.salad.pk])
+    
+    def test_cold_start_falls_back_to_popular(self):
+        """Test users without favorites get trending recipes"""
+        from .recommendations import build_neighbors
+        build_neighbors(workers=1)
+        self.client.force_authenticate(self.other_user)
+        response = self.client.get('/api/recipes/recommended/')
+        self.assertEqual(response.data[0]['title'], 'Pasta')
+        self.assertEqual(response.data[0]['recommendation'], {'score': 0.0, 'reason': 'popular'})
+        
+        self.client.force_authenticate(None)
+        self.assertIn(self.client.get('/api/recipes/recommended/').status_code, (401, 403))
+
+
+class DietaryFilterTest(APITestBase):
+    """Test ?dietary= filters on the dietary tag bitmask"""
+    
+    def setUp(self):
+        super().setUp()
+        from apps.recipes.models import RecipeIngredient
+        for recipe, names in [(self.recipe, ["Semolina", "Tomato"]), (None, ["Rice", "Tofu"])]:
+            recipe = recipe or Recipe.objects.create(
+                title="Tofu bowl", description="", instructions="", author=self.user, category=self.category
+            )
+            for name in names:
+                RecipeIngredient.objects.create(
+                    recipe=recipe, ingredient=Ingredient.objects.create(name=name), quantity=1
+                )
+    
+    def titles(self, query):
+        response = self.client.get(f'/api/recipes/?{query}')
+        self.assertEqual(response.status_code, 200, response.content)
+        return {recipe['title'] for recipe in response.data['results']}
+    
+    def test_filter_by_several_diets(self):
+        """Test recipes must suit every listed diet"""
+        self.assertEqual(self.titles('dietary=vegan'), {'Pasta', 'Tofu bowl'})
+        self.assertEqual(self.titles('dietary=vegan,gluten-free'), {'Tofu bowl'})
+        self.assertEqual(self.titles('dietary=all'), {'Pasta', 'Tofu bowl'})
+        self.assertEqual(self.client.get('/api/recipes/?dietary=carnivore').status_code, 400)
+        
+        detail = self.client.get(f'/api/recipes/{self.recipe.pk}/').data
+        self.assertEqual(detail['dietary_tags'], ['vegetarian', 'vegan', 'pescatarian'])
+    
+    def test_filter_by_my_preference(self):
+        """Test dietary=mine uses the user's dietary preference"""
+        self.user.profile.dietary_preferences = 'gluten-free'
+        self.user.profile.save()
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.titles('dietary=mine'), {'Tofu bowl'})
+
+
+class NutritionFilterTest(APITestBase):
+    """Test nutrition filters and sorting on the precomputed totals"""
+    
+    def setUp(self):
+        super().setUp()
+        from apps.recipes.models import IngredientNutrition, RecipeIngredient
+        chicken = Ingredient.objects.create(name="Chicken breast")
+        IngredientNutrition.objects.create(ingredient=chicken, calories=165, protein=31, carbs=0, fat=3.6)
+        mystery = Ingredient.objects.create(name="Mystery spice")
+        for title, grams in [("Chicken salad", 150), ("Chicken feast", 600)]:
+            recipe = Recipe.objects.create(
+                title=title, description="", instructions="", author=self.user, category=self.category
+            )
+            RecipeIngredient.objects.create(recipe=recipe, ingredient=chicken, quantity=grams, unit="g")
+        RecipeIngredient.objects.create(recipe=self.recipe, ingredient=mystery, quantity=1, unit="tsp")
+    
+    def titles(self, query):
+        response = self.client.get(f'/api/recipes/?{query}')
+        self.assertEqual(response.status_code, 200, response.content)
+        return [recipe['title'] for recipe in response.data['results']]
+    
+    def test_filters(self):
+        """Test limits use the totals and skip recipes without data"""
+        self.assertEqual(self.titles('max_calories=500'), ['Chicken salad'])
+        self.assertEqual(self.titles('min_protein=100'), ['Chicken feast'])
+        self.assertEqual(self.titles('max_fat=100&max_carbs=0&sort=calories'), ['Chicken salad', 'Chicken feast'])
+        self.assertEqual(self.client.get('/api/recipes/?max_calories=lots').status_code, 400)
+    
+    def test_sort_and_fields(self):
+        """Test sorting by protein (recipes without data last) and the nutrition fields"""
+        self.assertEqual(self.titles('sort=protein'), ['Chicken feast', 'Chicken salad', 'Pasta'])
+        results = self.client.get('/api/recipes/?sort=protein').data['results']
+        self.assertEqual(results[0]['calories'], 990.0)
+        self.assertEqual(results[0]['protein'], 186.0)
+        self.assertIsNone(results[2]['calories'])
+    
+    def test_create_returns_fresh_totals(self):
+        """Test the create/update responses include the totals computed from the new ingredients"""
+        self.client.force_authenticate(self.user)
+        response = self.client.post('/api/recipes/', {
+            'title': "Grilled chicken", 'description': "Simple", 'instructions': "Grill.",
+            'ingredients_data': [{'name': "Chicken breast", 'quantity': 100, 'unit': 'g'}], 'images_data': [],
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual((response.data['calories'], response.data['protein']), (165.0, 31.0))
+        
+        response = self.client.patch(f"/api/recipes/{response.data['id']}/", {
+            'ingredients_data': [{'name': "Chicken breast", 'quantity': 200, 'unit': 'g'}],
+        }, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.data['calories'], 330.0)
+
+
+class MealPlanGeneratorTest(APITestBase):
+    """Test generated meal plans respect the constraints and share ingredients"""
+    
+    def setUp(self):
+        super().setUp()
+        from apps.recipes.models import RecipeIngredient
+        self.recipe.delete()
+        self.recipes = {}
+        # Most popular first; the two least popular share their ingredients
+        for title, score, names, minutes in [
+            ("Feast", 4, ["beef", "wine", "carrot", "celery", "thyme", "stock"], 30),
+            ("Pesto pasta", 3, ["basil", "pine nuts"], 20),
+            ("Pesto gnocchi", 2, ["basil", "pine nuts"], 20),
+            ("Roast", 1, ["potato", "rosemary"], 90),
+        ]:
+            recipe = Recipe.objects.create(
+                title=title, description="", instructions="", author=self.other_user, category=self.category,
+                prep_time=10, cook_time=minutes, trending_score=score,
+            )
+            for name in names:
+                ingredient, _ = Ingredient.objects.get_or_create(name=name)
+                RecipeIngredient.objects.create(recipe=recipe, ingredient=ingredient, quantity=1)
+            self.recipes[title] = recipe
+        self.client.force_authenticate(self.user)
+    
+    def generate(self, **body):
+        body = {'start_date': '2030-01-07', 'days': 2, 'meal_types': ['dinner'], **body}
+        return self.client.post('/api/meal-plans/generate/', body, format='json')
+    
+    def planned(self):
+        return {plan.recipe.title for plan in MealPlan.objects.filter(user=self.user)}
+    
+    def test_prefers_shared_ingredients(self):
+        """Test the plan trades a little popularity for a shorter grocery list"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.generate()
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(self.planned(), {'Pesto pasta', 'Pesto gnocchi'})
+        self.assertEqual(response.data['grocery_items'], 2)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual([plan['date'] for plan in response.data['meal_plans']], ['2030-01-07', '2030-01-08'])
+        inserts = [query for query in queries if query['sql'].startswith('INSERT INTO "recipes_mealplan"')]
+        self.assertEqual(len(inserts), 1)
+    
+    def test_constraints(self):
+        """Test diet and time limits, and no repeats"""
+        response = self.generate(days=3, dietary='vegetarian', max_total_time=60)
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(self.planned(), {'Pesto pasta', 'Pesto gnocchi'})  # Feast has beef, Roast takes 100 min
+        self.assertEqual(response.data['unfilled'], [{'date': date(2030, 1, 9), 'meal_type': 'dinner'}])
+    
+    def test_keeps_existing_plans(self):
+        """Test filled slots are kept (and count towards the grocery list) unless replace is set"""
+        MealPlan.objects.create(
+            user=self.user, recipe=self.recipes['Pesto gnocchi'], date=date(2030, 1, 7), meal_type='dinner'
+        )
+        response = self.generate(dry_run=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([plan['recipe_title'] for plan in response.data['meal_plans']], ['Pesto gnocchi', 'Pesto pasta'])
+        self.assertEqual(MealPlan.objects.count(), 1)
+        
+        self.generate()
+        self.assertEqual(self.planned(), {'Pesto pasta', 'Pesto gnocchi'})
+        
+        # Next week avoids the recipes planned this week
+        self.generate(start_date='2030-01-09')
+        self.assertEqual(MealPlan.objects.filter(date__gte=date(2030, 1, 9)).count(), 2)
+        self.assertEqual(self.planned(), {'Pesto pasta', 'Pesto gnocchi', 'Feast', 'Roast'})
+        
+        response = self.generate(replace=True, max_prep_time=5)
+        self.assertEqual(response.data['created'], 0)  # Nothing is that quick: the range is cleared
+        self.assertEqual(MealPlan.objects.filter(date__lt=date(2030, 1, 9)).count(), 0)
+    
+    def test_invalid_options(self):
+        """Test bad options are rejected"""
+        self.assertEqual(self.generate(days=90).status_code, 400)
+        self.assertEqual(self.generate(meal_types=['brunch']).status_code, 400)
+        self.assertEqual(self.generate(start_date='next monday').status_code, 400)
+        self.client.force_authenticate(None)
+        self.assertIn(self.generate().status_code, (401, 403))
+
+
+class MealPlanBulkTest(APITestBase):
+    """Test bulk create/move/copy of meal plans and templates"""
+    
+    def setUp(self):
+        super().setUp()
+        self.salad = Recipe.objects.create(
+            title="Salad", description="", instructions="", author=self.other_user, category=self.category,
+        )
+        self.client.force_authenticate(self.user)
+    
+    def plans(self):
+        return {
+            (plan.date.isoformat(), plan.meal_type): plan.recipe_id
+            for plan in MealPlan.objects.filter(user=self.user)
+        }
+    
+    def test_bulk_create(self):
+        """Test many plans are validated together and written with one INSERT"""
+        items = [
+            {'date': f'2030-01-0{day}', 'meal_type': meal_type, 'recipe_id': recipe.pk}
+            for day in (7, 8, 9) for meal_type, recipe in (('lunch', self.salad), ('dinner', self.recipe))
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/meal-plans/bulk/', {'items': items}, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.data['created'], 6)
+        self.assertEqual([result['status'] for result in response.data['results']], ['created'] * 6)
+        self.assertEqual(len(response.data['meal_plans']), 6)
+        self.assertEqual(self.plans()['2030-01-08', 'lunch'], self.salad.pk)
+        inserts = [query for query in queries if query['sql'].startswith('INSERT INTO "recipes_mealplan"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertLessEqual(len(queries), 8)
+    
+    def test_bulk_validation(self):
+        """Test every invalid item is reported and nothing is written"""
+        hidden = Recipe.objects.create(
+            title="Draft", description="", instructions="", author=self.other_user, is_published=False,
+        )
+        response = self.client.post('/api/meal-plans/bulk/', {'items': [
+            {'date': '2030-01-07', 'meal_type': 'dinner', 'recipe_id': self.recipe.pk},
+            {'date': 'monday', 'meal_type': 'dinner', 'recipe_id': self.recipe.pk},
+            {'date': '2030-01-08', 'meal_type': 'brunch', 'recipe_id': hidden.pk},
+            {'date': '2030-01-07', 'meal_type': 'dinner', 'recipe_id': self.salad.pk},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        errors = response.data['items']
+        self.assertEqual(set(errors), {'1', '2', '3'})
+        self.assertIn('date', errors['1'])
+        self.assertEqual(set(errors['2']), {'meal_type', 'recipe_id'})
+        self.assertIn('non_field_errors', errors['3'])
+        self.assertEqual(MealPlan.objects.count(), 0)
+        
+        # Unhashable meal types are rejected, not a server error
+        plan = MealPlan.objects.create(user=self.user, recipe=self.recipe, date=date(2030, 1, 7))
+        for meal_type in (['dinner'], {'type': 'dinner'}):
+            response = self.client.post('/api/meal-plans/bulk/', {'items': [
+                {'date': '2030-01-09', 'meal_type': meal_type, 'recipe_id': self.recipe.pk},
+            ]}, format='json')
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('meal_type', response.data['items']['0'])
+            response = self.client.post(
+                '/api/meal-plans/move/', {'moves': [{'id': plan.pk, 'meal_type': meal_type}]}, format='json'
+            )
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('meal_type', response.data['moves']['0'])
+    
+    def test_conflicts(self):
+        """Test taken slots fail, are skipped or are replaced"""
+        existing = MealPlan.objects.create(user=self.user, recipe=self.recipe, date=date(2030, 1, 7), meal_type='dinner')
+        items = [
+            {'date': '2030-01-07', 'meal_type': 'dinner', 'recipe_id': self.salad.pk},
+            {'date': '2030-01-08', 'meal_type': 'dinner', 'recipe_id': self.salad.pk},
+        ]
+        response = self.client.post('/api/meal-plans/bulk/', {'items': items}, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['conflicts'][0]['index'], 0)
+        self.assertEqual(response.data['conflicts'][0]['existing_id'], existing.pk)
+        self.assertEqual(MealPlan.objects.count(), 1)
+        
+        response = self.client.post('/api/meal-plans/bulk/', {'items': items, 'on_conflict': 'skip'}, format='json')
+        self.assertEqual([result['status'] for result in response.data['results']], ['skipped', 'created'])
+        self.assertEqual(self.plans()['2030-01-07', 'dinner'], self.recipe.pk)
+        
+        items[1]['recipe_id'] = self.recipe.pk
+        response = self.client.post('/api/meal-plans/bulk/', {'items': items, 'on_conflict': 'replace'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['status'] for result in response.data['results']], ['replaced', 'replaced'])
+        self.assertEqual(response.data['results'][0]['id'], existing.pk)  # Updated in place
+        self.assertEqual(self.plans(), {
+            ('2030-01-07', 'dinner'): self.salad.pk, ('2030-01-08', 'dinner'): self.recipe.pk,
+        })
+    
+    def test_move(self):
+        """Test plans can swap slots, keep their ids, and conflicts are resolved"""
+        lunch = MealPlan.objects.create(user=self.user, recipe=self.salad, date=date(2030, 1, 7), meal_type='lunch')
+        dinner = MealPlan.objects.create(user=self.user, recipe=self.recipe, date=date(2030, 1, 7), meal_type='dinner')
+        other = MealPlan.objects.create(user=self.user, recipe=self.recipe, date=date(2030, 1, 8), meal_type='dinner')
+        response = self.client.post('/api/meal-plans/move/', {'moves': [
+            {'id': lunch.pk, 'meal_type': 'dinner'},
+            {'id': dinner.pk, 'meal_type': 'lunch'},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.data['moved'], 2)
+        lunch.refresh_from_db()
+        self.assertEqual(lunch.meal_type, 'dinner')
+        self.assertEqual(MealPlan.objects.get(pk=dinner.pk).meal_type, 'lunch')
+        
+        # Moving onto a plan that stays put is a conflict; a skipped move keeps its slot
+        moves = [
+            {'id': lunch.pk, 'date': '2030-01-08'},
+            {'id': dinner.pk, 'meal_type': 'dinner'},
+        ]
+        self.assertEqual(self.client.post('/api/meal-plans/move/', {'moves': moves}, format='json').status_code, 409)
+        response = self.client.post('/api/meal-plans/move/', {'moves': moves, 'on_conflict': 'skip'}, format='json')
+        self.assertEqual([result['status'] for result in response.data['results']], ['skipped', 'skipped'])
+        response = self.client.post('/api/meal-plans/move/', {'moves': moves, 'on_conflict': 'replace'}, format='json')
+        self.assertEqual([result['status'] for result in response.data['results']], ['replaced', 'moved'])
+        self.assertFalse(MealPlan.objects.filter(pk=other.pk).exists())
+        self.assertEqual(self.plans(), {
+            ('2030-01-08', 'dinner'): self.salad.pk, ('2030-01-07', 'dinner'): self.recipe.pk,
+        })
+    
+    def test_copy_week(self):
+        """Test a week of plans is copied to the next week in one request"""
+        for day in range(7):
+            MealPlan.objects.create(user=self.user, recipe=self.recipe, date=date(2030, 1, 7 + day), meal_type='dinner')
+        response = self.client.post('/api/meal-plans/copy/', {
+            'source_start': '2030-01-07', 'target_start': '2030-01-14', 'on_conflict': 'skip',
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.data['created'], 7)
+        self.assertEqual(MealPlan.objects.filter(date__gte=date(2030, 1, 14)).count(), 7)
+    
+    def test_templates(self):
+        """Test saving a range as a template and applying it to another week"""
+        MealPlan.objects.create(user=self.user, recipe=self.recipe, date=date(2030, 1, 7), meal_type='dinner')
+        MealPlan.objects.create(user=self.user, recipe=self.salad, date=date(2030, 1, 9), meal_type='lunch')
+        response = self.client.post('/api/meal-plan-templates/from-range/', {
+            'name': 'Usual week', 'start_date': '2030-01-07',
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(
+            [(item['day'], item['meal_type'], item['recipe_title']) for item in response.data['items']],
+            [(0, 'dinner', 'Pasta'), (2, 'lunch', 'Salad')],
+        )
+        template_id = response.data['id']
+        
+        response = self.client.post(f'/api/meal-plan-templates/{template_id}/apply/', {
+            'start_date': '2030-02-04',
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(self.plans()['2030-02-06', 'lunch'], self.salad.pk)
+        self.assertEqual(
+            self.client.post(f'/api/meal-plan-templates/{template_id}/apply/', {
+                'start_date': '2030-02-04',
+            }, format='json').status_code,
+            409,
+        )
+        
+        # Names are unique per user; items are validated like bulk items
+        response = self.client.post('/api/meal-plan-templates/', {
+            'name': 'Usual week', 'items': [{'day': 40, 'meal_type': 'dinner', 'recipe_id': self.recipe.pk}],
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data), {'name', 'items'})
+        
+        response = self.client.patch(f'/api/meal-plan-templates/{template_id}/', {
+            'items': [{'day': 1, 'meal_type': 'breakfast', 'recipe_id': self.salad.pk}],
+        }, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual([item['day'] for item in response.data['items']], [1])
+        
+        self.client.force_authenticate(self.other_user)
+        self.assertEqual(self.client.get(f'/api/meal-plan-templates/{template_id}/').status_code, 404)
+
+
+class CalendarFeedTest(APITestBase):
+    """Test the token-authenticated, streamed and cacheable calendar feed"""
+    
+    def setUp(self):
+        super().setUp()
+        self.recipe.title = "Pasta, with basil; fresh"
+        self.recipe.description = "Boil water.\nCook the pasta " + "al dente " * 20
+        self.recipe.save()
+        self.plan = MealPlan.objects.create(user=self.user, recipe=self.recipe, date=date.today(), meal_type='dinner')
+        self.client.force_authenticate(self.user)
+    
+    def feed_url(self):
+        response = self.client.post('/api/meal-plans/feed/')
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(response.data['webcal_url'].startswith('webcal://'))
+        return response.data['url']
+    
+    def test_feed_lifecycle(self):
+        """Test creating, rotating and deleting the feed token"""
+        self.assertEqual(self.client.get('/api/meal-plans/feed/').status_code, 404)
+        url = self.feed_url()
+        self.assertEqual(self.client.get('/api/meal-plans/feed/').data['url'], url)
+        
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get(url).status_code, 200)  # The token is enough
+        
+        self.client.force_authenticate(self.user)
+        new_url = self.feed_url()
+        self.assertNotEqual(new_url, url)
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.delete('/api/meal-plans/feed/').status_code, 204)
+        self.assertEqual(self.client.get(new_url).status_code, 404)
+    
+    def test_feed_content(self):
+        """Test the streamed calendar is valid iCalendar with only the feed window"""
+        MealPlan.objects.create(
+            user=self.user, recipe=self.recipe, date=date.today() - timedelta(days=365), meal_type='lunch',
+        )
+        MealPlan.objects.create(user=self.other_user, recipe=self.recipe, date=date.today(), meal_type='lunch')
+        url = self.feed_url()
+        self.client.force_authenticate(None)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        body = b''.join(response.streaming_content).decode()
+        self.assertTrue(body.startswith('BEGIN:VCALENDAR\r\n'))
+        self.assertTrue(body.endswith('END:VCALENDAR\r\n'))
+        self.assertEqual(body.count('BEGIN:VEVENT'), 1)
+        self.assertIn('SUMMARY:Pasta\\, with basil\; fresh - Dinner', body)
+        self.assertIn(f'DTEND;VALUE=DATE:{date.today() + timedelta(days=1):%Y%m%d}', body)
+        self.assertIn('DESCRIPTION:Boil water.\\nCook', body)
+        self.assertTrue(all(len(line.encode()) <= 75 for line in body.split('\r\n')))
+    
+    def test_unchanged_poll_is_one_query(self):
+        """Test polls revalidate with one query and notice additions, deletions and recipe edits"""
+        url = self.feed_url()
+        self.client.force_authenticate(None)
+        first = self.client.get(url)
+        b''.join(first.streaming_content)
+        self.assertIn('private', first['Cache-Control'])
+        
+        def poll():
+            return self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(poll().status_code, 304)
+        self.assertEqual(len(queries), 1)
+        
+        other = MealPlan.objects.create(user=self.user, recipe=self.recipe, date=date.today(), meal_type='lunch')
+        self.assertEqual(poll().status_code, 200)
+        first = self.client.get(url)
+        other.delete()
+        self.assertEqual(poll().status_code, 200)
+        first = self.client.get(url)
+        self.recipe.title = "Renamed"
+        self.recipe.save()
+        self.assertEqual(poll().status_code, 200)
+
+
+class FavoritesPaginationTest(APITestBase):
+    """Test /api/user/favorites/ and the favorites page are paginated in SQL"""
+    
+    def setUp(self):
+        super().setUp()
+        from datetime import datetime, timezone as dt_timezone
+        from apps.recipes.models import Favorite
+        recipes = Recipe.objects.bulk_create([
+            Recipe(
+                title=f"Dish {i}", description="", instructions="", author=self.other_user,
+                is_published=i % 10 != 9,  # 5 of 50 unpublished
+            )
+            for i in range(50)
+        ])
+        favorites = Favorite.objects.bulk_create([Favorite(user=self.user, recipe=recipe) for recipe in recipes])
+        for i, favorite in enumerate(favorites):
+            favorite.created_at = datetime(2026, 1, 1, tzinfo=dt_timezone.utc) + timedelta(minutes=i)
+        Favorite.objects.bulk_update(favorites, ['created_at'])
+        self.newest_first = [recipe.title for recipe in reversed(recipes) if recipe.is_published]
+        self.client.force_authenticate(self.user)
+    
+    def assert_pages_in_sql(self, queries):
+        favorite_queries = [query['sql'] for query in queries if '"recipes_favorite"' in query['sql']]
+        self.assertTrue(favorite_queries)
+        for sql in favorite_queries:
+            if 'COUNT(' not in sql and '"recipes_favorite"."recipe_id" IN' not in sql:
+                self.assertIn('LIMIT', sql)
+    
+    def test_api_pages(self):
+        """Test newest favorites first, unpublished left out, one page loaded"""
+        for projected in (True, False):
+            with self.subTest(projected=projected), override_settings(API_PROJECTIONS_ENABLED=projected):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get('/api/user/favorites/?page=2')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.data['count'], 45)
+                self.assertEqual(
+                    [recipe['title'] for recipe in response.data['results']], self.newest_first[20:40]
+                )
+                self.assert_pages_in_sql(queries)
+    
+    def test_html_pages(self):
+        """Test the favorites page shows 12 recipes per page with working pagination"""
+        self.client.force_login(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/recipes/favorites/?page=2')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['is_paginated'])
+        self.assertEqual(response.context['page_obj'].paginator.count, 45)
+        self.assertEqual([recipe.title for recipe in response.context['recipes']], self.newest_first[12:24])
+        self.assertContains(response, 'Page 2 of 4')
+        self.assert_pages_in_sql(queries)
@@ -0,0 +1,187 @@
+"""
+Trending recipes: time-decayed popularity scores
+
+sort=views orders by the lifetime view_count, so old recipes stay on top
+forever. The trending score counts recent activity more:
+
+    score = sum over events of  weight * 2 ** (-(now - event time) / half-life)
+
+with weights TRENDING_WEIGHTS (a favorite counts as much as 8 views) and a
+half-life of TRENDING_HALF_LIFE_HOURS (default 48): a favorite from two days
+ago is worth half a favorite from today.
+
+Updating the score of every recipe as time passes would rewrite the whole
+table. Instead, scores are stored relative to a fixed landmark time L
+(forward decay):
+
+    stored = sum over events of  weight * 2 ** ((event time - L) / half-life)
+
+Newer events get bigger multipliers, which orders recipes exactly like the
+decayed score (both differ by the same factor 2 ** ((now - L) / half-life)
+for every recipe). So:
+- An event only adds to its own recipe's score (done in batches when the
+  analytics buffer is flushed, see apps/api/analytics.py).
+- Removals (an un-favorite, a deleted rating) subtract with today's
+  multiplier, which can be more than the original event added. Scores are
+  clamped at 0, so such a recipe drops to "no activity" and never below.
+- Recipe.trending_score is indexed and sort=trending is a plain ORDER BY.
+- Multipliers grow over time, so now and then the landmark is moved
+  forward and all scores are divided by the same factor (renormalize(),
+  run by `python manage.py renormalize_trending` from cron). It only
+  rewrites rows once the multipliers have grown TRENDING_RENORMALIZE_AFTER
+  half-lives (about a month with the defaults) and skips recipes without a
+  score.
+
+The top recipes per category are cached for TRENDING_CACHE_TIMEOUT seconds
+(default 60), see trending_recipe_ids().
+"""
+
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, FloatField, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from apps.recipes.models import Recipe, RecipeStatBucket, TrendingLandmark
+
+from .cache import memoize
+
+TRENDING_WEIGHTS = {'views': 1, 'favorites': 8, 'ratings': 4}
+TRENDING_RENORMALIZE_AFTER = 16  # Half-lives between landmark moves (multipliers up to 65536)
+TRENDING_NEGLIGIBLE_SCORE = 1e-6  # Rescaled scores below this become 0
+TRENDING_NAMESPACE = 'trending'
+TRENDING_MAX_LIMIT = 100
+TRENDING_UPDATE_BATCH = 500  # Recipes per UPDATE (about 3 bind parameters each)
+
+
+def _half_life_seconds():
+    return getattr(settings, 'TRENDING_HALF_LIFE_HOURS', 48) * 3600
+
+
+def _cache_timeout():
+    return getattr(settings, 'TRENDING_CACHE_TIMEOUT', 60)
+
+
+def _weights():
+    return getattr(settings, 'TRENDING_WEIGHTS', TRENDING_WEIGHTS)
+
+
+def growth(moment, landmark):
+    """Multiplier of an event at `moment` relative to the landmark"""
+    return 2 ** ((moment - landmark).total_seconds() / _half_life_seconds())
+
+
+def event_weight(amounts):
+    """Weighted sum of activity counts, e.g. {'views': 3, 'favorites': 1}"""
+    weights = _weights()
+    return sum(weights.get(name, 0) * amount for name, amount in amounts.items())
+
+
+# ========== WRITING ==========
+
+def add_activity(activity):
+    """
+    Add activity to the recipes' scores
+
+    activity is an iterable of (recipe_id, moment, amounts). Must run in a
+    transaction: the landmark row stays locked until it ends, so a
+    concurrent renormalize() can't rescale between reading the landmark
+    and adding to the scores.
+    """
+    landmark = TrendingLandmark.current(lock=True).landmark
+    increments = defaultdict(float)
+    for recipe_id, moment, amounts in activity:
+        weight = event_weight(amounts)
+        if weight:
+            increments[recipe_id] += weight * growth(moment, landmark)
+    _apply_increments(increments)
+
+
+def _apply_increments(increments):
+    """
+    Add {recipe_id: increment} to the scores, TRENDING_UPDATE_BATCH recipes
+    per UPDATE
+
+    Each UPDATE has a CASE with one WHEN per recipe: batching keeps it
+    under the database's bind parameter limit (65535 on PostgreSQL, 32766
+    on SQLite by default) and the per-row CASE short.
+    """
+    items = list(increments.items())
+    for start in range(0, len(items), TRENDING_UPDATE_BATCH):
+        batch = items[start:start + TRENDING_UPDATE_BATCH]
+        Recipe.objects.filter(pk__in=[recipe_id for recipe_id, _ in batch]).update(trending_score=Greatest(
+            F('trending_score') + Case(
+                *[When(pk=recipe_id, then=Value(increment)) for recipe_id, increment in batch],
+                output_field=FloatField(),
+            ),
+            Value(0.0),
+        ))
+
+
+def renormalize(force=False, now=None):
+    """
+    Move the landmark to now and rescale the scores, if it's due
+
+    Returns the number of rescaled recipes, or None if nothing had to be
+    done yet (force=True rescales anyway).
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        landmark = TrendingLandmark.current(lock=True)
+        half_lives = (now - landmark.landmark).total_seconds() / _half_life_seconds()
+        if half_lives < TRENDING_RENORMALIZE_AFTER and not force:
+            return None
+        scored = Recipe.objects.exclude(trending_score=0)
+        rescaled = scored.update(trending_score=F('trending_score') / growth(now, landmark.landmark))
+        scored.filter(
+            trending_score__gt=-TRENDING_NEGLIGIBLE_SCORE, trending_score__lt=TRENDING_NEGLIGIBLE_SCORE
+        ).update(trending_score=0)
+        landmark.landmark = now
+        landmark.save(update_fields=['landmark'])
+    return rescaled
+
+
+def rebuild(now=None):
+    """
+    Recompute every score from the daily analytics buckets
+
+    For recipes that existed before the analytics buckets (or after a
+    change of weights or half-life). Returns the number of scored recipes.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        landmark = TrendingLandmark.current(lock=True)
+        landmark.landmark = now
+        landmark.save(update_fields=['landmark'])
+        Recipe.objects.exclude(trending_score=0).update(trending_score=0)
+        counters = tuple(_weights())
+        buckets = RecipeStatBucket.objects.filter(period=RecipeStatBucket.DAY).order_by(
+            'recipe_id'
+        ).values_list('recipe_id', 'bucket_start', *counters)
+        # Buckets come grouped by recipe, so a batch is complete once the
+        # next recipe starts: only TRENDING_UPDATE_BATCH scores are held
+        increments = defaultdict(float)
+        for recipe_id, moment, *amounts in buckets.iterator(chunk_size=2000):
+            if recipe_id not in increments and len(increments) >= TRENDING_UPDATE_BATCH:
+                _apply_increments(increments)
+                increments.clear()
+            increments[recipe_id] += event_weight(dict(zip(counters, amounts))) * growth(moment, now)
+        _apply_increments(increments)
+        return Recipe.objects.exclude(trending_score=0).count()
+
+
+# ========== READING ==========
+
+def trending_recipe_ids(category_id=None, limit=20):
+    """Ids of the top published recipes by trending score (cached briefly)"""
+    def compute():
+        queryset = Recipe.objects.filter(is_published=True, trending_score__gt=0)
+        if category_id is not None:
+            queryset = queryset.filter(category_id=category_id)
+        return list(queryset.order_by('-trending_score', '-created_at').values_list('pk', flat=True)[:limit])
+    return memoize(
+        TRENDING_NAMESPACE, ['top', category_id, limit], compute,
+        timeout=_cache_timeout(), stale_timeout=_cache_timeout(),
+    )
@@ -12,6 +12,7 @@ router.register(r'ratings', views.RatingViewSet, basename='rating')
 router.register(r'comments', views.CommentViewSet, basename='comment')
 router.register(r'favorites', views.FavoriteViewSet, basename='favorite')
 router.register(r'meal-plans', views.MealPlanViewSet, basename='mealplan')
+router.register(r'meal-plan-templates', views.MealPlanTemplateViewSet, basename='mealplantemplate')
 router.register(r'api-keys', views.APIKeyViewSet, basename='apikey')
 
 urlpatterns = [
@@ -19,6 +20,10 @@ urlpatterns = [
     path('', views.api_root, name='api-root'),
     path('health/', views.health_check, name='health-check'),
     path('config/supabase/', views.supabase_config, name='supabase-config'),
+    path('cache/stats/', views.cache_stats, name='cache-stats'),
+    path('batch/', views.batch, name='batch'),
+    path('calendar/<str:token>.ics', views.meal_plan_feed, name='meal-plan-feed'),
+    path('analytics/author/', views.author_analytics, name='author-analytics'),
     
     # User endpoints
     path('users/me/', views.current_user, name='current-user'),
@@ -1,26 +1,69 @@
+from datetime import timedelta
 from rest_framework.decorators import api_view, permission_classes, action
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework import viewsets
 from rest_framework.exceptions import ValidationError, NotFound
 from django.shortcuts import get_object_or_404
-from django.db.models import Q, Avg
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import IntegrityError
+from django.db.models import Q, Avg, F, Count, Max, Prefetch
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.utils import timezone
+from django.http import Http404, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.views.decorators.http import require_safe
 from rest_framework.authtoken.models import Token
-from apps.recipes.models import Recipe, Rating, Comment, Favorite, MealPlan, Ingredient
+from apps.recipes.dietary import compatible_with, diet_mask
+from apps.recipes.models import Recipe, Rating, Comment, Favorite, MealPlan, MealPlanTemplate, MealPlanTemplateItem, Ingredient
 from apps.users.models import UserProfile
-from .models import APIKey
+from .middleware import RateLimitMiddleware
+from .models import APIKey, CalendarFeed
+from . import fastjson
+from .parsers import parser_classes_with_msgpack
+from .renderers import renderer_classes_with_msgpack
+from .mixins import CachedObjectMixin, ProjectionMixin, SparseFieldsMixin
+from .projections import get_projection, projections_enabled
+from .batch import parse_batch, run_batch, server_timing
+from .change_feed import build_deltas, format_cursor, latest_cursor, parse_cursor, parse_limit, read_changes
+from .response_cache import cache_anonymous_response, normalize_query
+from .idempotency import IdempotencyMixin, coalesce_get, idempotent
+from .analytics import author_report, parse_report_params, record as record_activity
+from .trending import TRENDING_MAX_LIMIT, trending_recipe_ids
+from .similarity import similar_recipes
+from .recommendations import MAX_RECOMMENDATIONS, recommended_recipes
+from .meal_planner import generate_meal_plans, parse_generate_params
+from .meal_plan_bulk import (
+    PlanConflict, copy_items, move_plans, parse_bulk_items, parse_conflict_mode, parse_date,
+    parse_days, parse_moves, template_items, write_plans,
+)
+from .conditional import (
+    conditional_get, conditional_list, last_modified_timestamp, make_etag, set_cache_headers,
+    resource_changed_at, recipe_resource, meal_plans_resource,
+)
+from .ical import feed_meal_plans, feed_start, feed_state, render_calendar, stream_calendar
 from .serializers import (
     RecipeSerializer, RecipeListSerializer,
     RatingSerializer, CommentSerializer, FavoriteSerializer,
-    UserProfileSerializer, MealPlanSerializer, IngredientSerializer,
+    UserProfileSerializer, MealPlanSerializer, MealPlanTemplateSerializer, IngredientSerializer,
     APIKeySerializer
 )
 
 User = get_user_model()
 
+BULK_MAX_IDS = 500  # Recipes per /api/recipes/bulk/ request
+
+# Nutrition query parameters -> lookups on the precomputed recipe totals
+NUTRITION_FILTERS = {
+    'max_calories': 'calories__lte',
+    'min_protein': 'protein__gte',
+    'max_carbs': 'carbs__lte',
+    'max_fat': 'fat__lte',
+}
+
 
 @api_view(['GET'])
 @permission_classes([AllowAny])  # Public endpoint
@@ -43,8 +86,11 @@ def api_root(request):
             'comments': request.build_absolute_uri('/api/comments/'),
             'favorites': request.build_absolute_uri('/api/favorites/'),
             'meal-plans': request.build_absolute_uri('/api/meal-plans/'),
+            'meal-plan-templates': request.build_absolute_uri('/api/meal-plan-templates/'),
             'users': request.build_absolute_uri('/api/users/me/'),
             'health': request.build_absolute_uri('/api/health/'),
+            'batch': request.build_absolute_uri('/api/batch/'),
+            'analytics': request.build_absolute_uri('/api/analytics/author/'),
         },
         'authentication': {
             'token': request.build_absolute_uri('/api/auth/token/'),
@@ -91,33 +137,34 @@ def user_favorites(request):
     """
     Get current user's favorite recipes
     
-    Returns a list of recipes that the current user has favorited.
+    Returns the published recipes the current user has favorited, newest
+    favorites first (20 per page).
     Requires authentication.
     """
     from .serializers import RecipeListSerializer
     from rest_framework.pagination import PageNumberPagination
     
-    favorites = Favorite.objects.filter(user=request.user).select_related('recipe', 'recipe__author', 'recipe__category').prefetch_related(
-        'recipe__recipe_ingredients__ingredient',
-        'recipe__ratings',
-        'recipe__comments',
-        'recipe__favorites',
-        'recipe__images'
-    )
-    
-    recipes = [favorite.recipe for favorite in favorites]
+    context = {'request': request}
     
-    # Apply pagination
+    # Paginated in SQL (COUNT + one page of ids) over the (user, -created_at)
+    # index; only the recipes on the page are loaded
+    recipe_ids = Favorite.objects.filter(
+        user=request.user, recipe__is_published=True
+    ).order_by('-created_at').values_list('recipe_id', flat=True)
     paginator = PageNumberPagination()
     paginator.page_size = 20
-    page = paginator.paginate_queryset(recipes, request)
+    page = paginator.paginate_queryset(recipe_ids, request)
     
-    if page is not None:
-        serializer = RecipeListSerializer(page, many=True, context={'request': request})
-        return paginator.get_paginated_response(serializer.data)
+    projection = get_projection(RecipeListSerializer) if projections_enabled() else None
+    if projection is not None:
+        data = projection.project_pks(Recipe.objects.all(), page, context)
+        return paginator.get_paginated_response(data)
     
-    serializer = RecipeListSerializer(recipes, many=True, context={'request': request})
-    return Response(serializer.data)
+    recipes = Recipe.objects.select_related('author', 'category').prefetch_related(
+        'ratings', 'comments', 'favorites'
+    ).in_bulk(page)
+    serializer = RecipeListSerializer([recipes[pk] for pk in page if pk in recipes], many=True, context=context)
+    return paginator.get_paginated_response(serializer.data)
 
 
 @api_view(['POST'])
@@ -263,7 +310,70 @@ def health_check(request):
         }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+@api_view(['POST'])
+@permission_classes([AllowAny])  # Each sub-request checks its own permissions
+def batch(request):
+    """
+    Run several API requests in one round trip (see apps/api/batch.py)
+    
+    Body: {"requests": [{"id", "method", "path", "headers", "body"}, ...], "atomic": false}
+    Returns {"responses": [{"id", "status", "headers", "body", "duration_ms"}, ...], "duration_ms"}
+    """
+    specs = parse_batch(request.data)
+    
+    # The middleware counted the batch as one request; charge for the rest
+    if len(specs) > 1:
+        count, _ = RateLimitMiddleware.count_requests(request, len(specs) - 1)
+        if count > getattr(settings, 'RATE_LIMIT_REQUESTS', 100):
+            return Response({'error': 'Rate limit exceeded'}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+    
+    results, duration_ms = run_batch(request, specs, atomic=bool(request.data.get('atomic')))
+    response = Response({'responses': results, 'duration_ms': duration_ms})
+    response['Server-Timing'] = server_timing(results, duration_ms)
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def author_analytics(request):
+    """
+    Activity trends for the current user's recipes (see apps/api/analytics.py)
+    
+    Query parameters:
+    - days: Length of the period (default 30 days, or 2 for hourly buckets)
+    - granularity: 'day' (default, up to 365 days) or 'hour' (up to 7 days)
+    - top: Number of top recipes with sparklines (default 10, max 50)
+    - sort: Rank top recipes by 'views' (default), 'favorites', 'ratings' or 'comments'
+    - author: Username of another author (staff only)
+    
+    Totals are compared with the previous period of the same length
+    ("change" is in percent, null when the previous period had nothing).
+    """
+    author = request.user
+    username = request.query_params.get('author')
+    if username and username != author.username:
+        if not author.is_staff:
+            return Response({'error': 'Only staff can view other authors.'}, status=status.HTTP_403_FORBIDDEN)
+        author = get_object_or_404(User, username=username)
+    
+    days, granularity, top, sort = parse_report_params(request.query_params)
+    return Response(author_report(author.pk, days=days, granularity=granularity, top=top, sort=sort))
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])  # Staff only
+def cache_stats(request):
+    """
+    Cache statistics for this worker process
+    
+    Returns hit/miss counters and hit rates per cache namespace (e.g. the
+    'catalog' response cache) plus in-process/shared tier counters.
+    """
+    from .cache import get_stats
+    return Response(get_stats())
+
+
+class RecipeViewSet(CachedObjectMixin, ProjectionMixin, SparseFieldsMixin, viewsets.ModelViewSet):
     """
     ViewSet for Recipe CRUD operations
     
@@ -272,14 +382,28 @@ class RecipeViewSet(viewsets.ModelViewSet):
     - create: Create a new recipe (authenticated users only)
     - update: Update a recipe (author or staff only)
     - destroy: Delete a recipe (author or staff only)
+    - bulk: Fetch many recipes by id (?ids=1,2,3)
+    - trending: Top recipes by recent activity (see apps/api/trending.py)
+    - similar: Recipes with similar ingredients (see apps/api/similarity.py)
+    - recommended: Personal recommendations (see apps/api/recommendations.py)
+    - changes: Change feed for incremental partner sync (see apps/api/change_feed.py)
+    
+    Read requests accept ?fields= and ?expand= (see apps/api/sparse_fields.py).
+    List pages are built without the serializer (see apps/api/projections.py).
+    Responses can be MessagePack: Accept: application/msgpack[; shape=table]
     
     Authentication: Session, Token, or JWT
     """
     queryset = Recipe.objects.all().select_related('author', 'category')
     permission_classes = [IsAuthenticated]
+    # JSON, plus MessagePack via Accept: application/msgpack (see apps/api/renderers.py)
+    renderer_classes = renderer_classes_with_msgpack()
+    parser_classes = parser_classes_with_msgpack()
+    # get_object() checks publication and authorship
+    sparse_required_columns = ('author', 'is_published')
     
     def get_serializer_class(self):
-        if self.action == 'list':
+        if self.action in ('list', 'trending', 'similar', 'recommended'):
             return RecipeListSerializer
         return RecipeSerializer
     
@@ -290,10 +414,15 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return context
     
     def get_permissions(self):
-        """Allow public read access, require auth for write operations"""
+        """
+        Allow public read access, require auth for write operations
+        
+        Extra actions use the permission_classes given to @action
+        (e.g. search is public; export, a full-catalog dump, needs a login).
+        """
         if self.action in ['list', 'retrieve']:
             return [AllowAny()]
-        return [IsAuthenticated()]
+        return super().get_permissions()
     
     def get_queryset(self):
         """
@@ -302,27 +431,12 @@ class RecipeViewSet(viewsets.ModelViewSet):
         - Published recipes are visible to everyone
         - Authors can see their own unpublished recipes
         - Supports filtering by category, search, author, ingredients, time, dietary restrictions
-        - Supports sorting by newest, oldest, rating, views, title
+        - Supports filtering by nutrition (max_calories, min_protein, max_carbs, max_fat)
+        - Supports sorting by newest, oldest, rating, views, trending, calories, protein, title
         """
         from django.db.models import F
         
-        # Base queryset
-        if self.request.user.is_authenticated:
-            # Authenticated users can see published recipes + their own unpublished
-            queryset = Recipe.objects.filter(
-                Q(is_published=True) | Q(author=self.request.user)
-            )
-        else:
-            # Anonymous users can only see published recipes
-            queryset = Recipe.objects.filter(is_published=True)
-        
-        queryset = queryset.select_related('author', 'category').prefetch_related(
-            'recipe_ingredients__ingredient',
-            'ratings',
-            'comments',
-            'favorites',
-            'images'
-        )
+        queryset = self.get_visible_queryset()
 
         # Filter by category
         category_id = self.request.query_params.get('category', None)
@@ -363,10 +477,29 @@ class RecipeViewSet(viewsets.ModelViewSet):
         if max_total_time and max_total_time.isdigit():
             queryset = queryset.annotate(total_time_calc=F('prep_time') + F('cook_time')).filter(total_time_calc__lte=int(max_total_time))
 
-        # Filter by dietary restrictions
+        # Filter by diets: recipes suiting every listed diet ("mine" = the
+        # user's dietary preference), one indexed lookup on the tag bitmask
         dietary_filter = self.request.query_params.get('dietary', None)
-        if dietary_filter and dietary_filter != 'all':
-            queryset = queryset.filter(dietary_restrictions=dietary_filter)
+        if dietary_filter:
+            diets = dietary_filter.split(',')
+            if 'mine' in diets:
+                diets.remove('mine')
+                profile = getattr(self.request.user, 'profile', None)
+                diets.append(getattr(profile, 'dietary_preferences', 'none'))
+            try:
+                queryset = queryset.filter(compatible_with(diet_mask(diets)))
+            except ValueError as error:
+                raise ValidationError({'dietary': str(error)})
+
+        # Filter by nutrition (whole-recipe totals precomputed from the
+        # ingredients, see apps/recipes/nutrition.py)
+        for param, lookup in NUTRITION_FILTERS.items():
+            value = self.request.query_params.get(param)
+            if value:
+                try:
+                    queryset = queryset.filter(**{lookup: float(value)})
+                except ValueError:
+                    raise ValidationError({param: 'Must be a number.'})
 
         # Sorting
         sort_by = self.request.query_params.get('sort', '-created_at')
@@ -378,6 +511,12 @@ class RecipeViewSet(viewsets.ModelViewSet):
             queryset = queryset.annotate(avg_rating=Avg('ratings__stars')).order_by('-avg_rating', '-created_at')
         elif sort_by == 'views':
             queryset = queryset.order_by('-view_count', '-created_at')
+        elif sort_by == 'trending':
+            queryset = queryset.order_by('-trending_score', '-created_at')
+        elif sort_by == 'calories':
+            queryset = queryset.order_by(F('calories').asc(nulls_last=True), '-created_at')
+        elif sort_by == 'protein':
+            queryset = queryset.order_by(F('protein').desc(nulls_last=True), '-created_at')
         elif sort_by == 'title':
             queryset = queryset.order_by('title')
         else:
@@ -385,21 +524,89 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
         return queryset
 
+    def get_visible_queryset(self):
+        """Recipes the current user may see (with the usual joins/prefetches)"""
+        if self.request.user.is_authenticated:
+            # Authenticated users can see published recipes + their own unpublished
+            queryset = Recipe.objects.filter(
+                Q(is_published=True) | Q(author=self.request.user)
+            )
+        else:
+            # Anonymous users can only see published recipes
+            queryset = Recipe.objects.filter(is_published=True)
+        
+        return queryset.select_related('author', 'category').prefetch_related(
+            'recipe_ingredients__ingredient',
+            'ratings',
+            'comments',
+            'favorites',
+            'images'
+        )
+
+    @conditional_list
+    @cache_anonymous_response
+    def list(self, request, *args, **kwargs):
+        """List recipes (anonymous responses are cached per query string)"""
+        return super().list(request, *args, **kwargs)
+
     def retrieve(self, request, *args, **kwargs):
-        """Get a single recipe with statistics"""
-        instance = self.get_object()
+        """
+        Get a single recipe with statistics
         
-        # Increment view count
-        if request.user.is_authenticated and request.user != instance.author:
-            instance.increment_view_count()
+        Honors If-None-Match / If-Modified-Since: the validators come from a
+        single small query, so an unchanged recipe is answered with 304 without
+        loading its ingredients, ratings, comments and images.
+        """
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            row = (
+                self.filter_queryset(self.get_queryset())
+                .prefetch_related(None)
+                .order_by()
+                .filter(**{self.lookup_field: kwargs[lookup_url_kwarg]})
+                .values_list('pk', 'updated_at', 'author_id')
+                .first()
+            )
+        except (TypeError, ValueError, DjangoValidationError):
+            row = None  # A malformed pk (e.g. /api/recipes/abc/)
+        if row is None:
+            self.get_object()  # Raises the usual 404
+        recipe_id, updated_at, author_id = row
+        
+        user = request.user
+        count_view = user.is_authenticated and user.pk != author_id
+        stats_changed = resource_changed_at(recipe_resource(recipe_id))
+        
+        def build_response():
+            instance = self.get_object()
+            
+            # Increment view count
+            if count_view:
+                instance.increment_view_count()
+            
+            serializer = self.get_serializer(instance)
+            return Response(serializer.data)
         
-        serializer = self.get_serializer(instance)
-        return Response(serializer.data)
+        response = conditional_get(
+            request,
+            ['recipe', recipe_id, updated_at.isoformat(), stats_changed,
+             user.pk if user.is_authenticated else 'anon',
+             normalize_query(request.query_params)],
+            last_modified_timestamp(updated_at, stats_changed),
+            build_response,
+            public=not user.is_authenticated,
+        )
+        if response.status_code == 304 and count_view:
+            # Still a view - bump the counter without loading the recipe
+            Recipe.objects.filter(pk=recipe_id).update(view_count=F('view_count') + 1)
+            record_activity(recipe_id, views=1)
+        return response
 
     def perform_create(self, serializer):
         """Set author to current user when creating recipe"""
         serializer.save(author=self.request.user)
 
+    @idempotent
     def create(self, request, *args, **kwargs):
         """
         Create a new recipe
@@ -444,6 +651,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
         
         return super().create(request, *args, **kwargs)
 
+    @idempotent
     def update(self, request, *args, **kwargs):
         """
         Update a recipe
@@ -510,6 +718,8 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return Response({'view_count': recipe.view_count})
     
     @action(detail=False, methods=['get'], url_path='search', permission_classes=[AllowAny])
+    @conditional_list
+    @cache_anonymous_response
     def search(self, request):
         """
         Search recipes with filters
@@ -522,21 +732,19 @@ class RecipeViewSet(viewsets.ModelViewSet):
         - max_prep_time: Maximum preparation time in minutes
         - max_cook_time: Maximum cooking time in minutes
         - max_total_time: Maximum total time in minutes
-        - dietary: Dietary restriction filter
-        - sort: Sort order (newest, oldest, rating, views, title)
+        - dietary: Comma-separated diets the recipes must all suit (e.g. vegan,gluten-free; "mine" for your preference)
+        - max_calories, min_protein, max_carbs, max_fat: Nutrition limits (whole recipe)
+        - sort: Sort order (newest, oldest, rating, views, trending, calories, protein, title)
         - page: Page number for pagination
-        """
-        # Use the existing get_queryset logic
-        queryset = self.get_queryset()
         
-        # Apply pagination
-        page = self.paginate_queryset(queryset)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
+        Anonymous responses are cached per query string until the catalog changes,
+        and unchanged results are answered with 304 Not Modified.
+        """
+        # Use the existing get_queryset logic (plus ?fields= planning)
+        queryset = self.filter_queryset(self.get_queryset())
         
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        # Paginate and serialize (compiled projection unless ?fields= is used)
+        return self.list_response(queryset)
     
     @action(detail=False, methods=['get'], url_path='by-ingredients', permission_classes=[AllowAny])
     def by_ingredients(self, request):
@@ -565,20 +773,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
             )
         
         # Base queryset
-        if request.user.is_authenticated:
-            queryset = Recipe.objects.filter(
-                Q(is_published=True) | Q(author=request.user)
-            )
-        else:
-            queryset = Recipe.objects.filter(is_published=True)
-        
-        queryset = queryset.select_related('author', 'category').prefetch_related(
-            'recipe_ingredients__ingredient',
-            'ratings',
-            'comments',
-            'favorites',
-            'images'
-        )
+        queryset = self.get_visible_queryset()
         
         if match_all:
             # Recipe must contain ALL specified ingredients
@@ -589,16 +784,159 @@ class RecipeViewSet(viewsets.ModelViewSet):
             # Recipe must contain ANY of the specified ingredients
             queryset = queryset.filter(ingredients__name__in=ingredients_list).distinct()
         
-        # Apply pagination
-        page = self.paginate_queryset(queryset)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
+        queryset = self.filter_queryset(queryset)
         
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        # Paginate and serialize (compiled projection unless ?fields= is used)
+        return self.list_response(queryset)
+    
+    @action(detail=False, methods=['get', 'post'], url_path='bulk', permission_classes=[AllowAny])
+    def bulk(self, request):
+        """
+        Fetch many recipes by id in one request
+        
+        GET ?ids=1,2,3 or POST {"ids": [1, 2, 3]} for long lists (at most
+        BULK_MAX_IDS). Returns {"results": [...], "missing": [...]}: results
+        in the order the ids were given, and the ids that don't exist or
+        aren't visible to the current user.
+        """
+        if request.method == 'POST':
+            raw_ids = request.data.get('ids') if isinstance(request.data, dict) else None
+        else:
+            raw_ids = request.query_params.get('ids', '').split(',')
+        recipe_ids = self._parse_ids(raw_ids)
+        
+        results = self.serialize_pks(self.get_visible_queryset(), recipe_ids)
+        found = {recipe['id'] for recipe in results}
+        return Response({
+            'results': results,
+            'missing': [recipe_id for recipe_id in recipe_ids if recipe_id not in found],
+        })
+    
+    def _parse_ids(self, raw_ids):
+        """Unique recipe ids in the given order (400 for bad input)"""
+        if not isinstance(raw_ids, list):
+            raise ValidationError({'ids': 'Expected a list of recipe ids.'})
+        try:
+            recipe_ids = [int(value) for value in raw_ids if str(value).strip()]
+        except (TypeError, ValueError):
+            raise ValidationError({'ids': 'Recipe ids must be integers.'})
+        recipe_ids = list(dict.fromkeys(recipe_ids))
+        if not recipe_ids:
+            raise ValidationError({'ids': 'At least one recipe id is required.'})
+        if len(recipe_ids) > BULK_MAX_IDS:
+            raise ValidationError({'ids': f'At most {BULK_MAX_IDS} recipe ids per request.'})
+        return recipe_ids
+    
+    @action(detail=False, methods=['get'], url_path='trending', permission_classes=[AllowAny])
+    def trending(self, request):
+        """
+        Recipes with the most recent activity (see apps/api/trending.py)
+        
+        Query parameters:
+        - category: Only recipes in this category (ID)
+        - limit: Number of recipes (default 20, max 100)
+        
+        The ranking is cached for about a minute per category.
+        """
+        try:
+            category_id = int(request.query_params['category']) if 'category' in request.query_params else None
+            limit = max(1, min(int(request.query_params.get('limit', 20)), TRENDING_MAX_LIMIT))
+        except ValueError:
+            raise ValidationError({'detail': 'category and limit must be numbers.'})
+        
+        recipe_ids = trending_recipe_ids(category_id, limit)
+        return Response(self.serialize_pks(Recipe.objects.filter(is_published=True), recipe_ids))
+    
+    @action(detail=True, methods=['get'], url_path='similar', permission_classes=[AllowAny])
+    def similar(self, request, pk=None):
+        """
+        Recipes similar to this one (shared ingredients, category and dietary tag)
+        
+        Query parameters:
+        - limit: Number of recipes (default 10, max 50)
+        
+        Each recipe has a "similarity" between 0 and 1 (estimated share of
+        common features), most similar first.
+        """
+        try:
+            recipe_id = int(pk)
+        except (TypeError, ValueError):
+            raise NotFound()
+        if not self.get_visible_queryset().filter(pk=recipe_id).exists():
+            raise NotFound()
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 10)), 50))
+        except ValueError:
+            raise ValidationError({'limit': 'Must be a number.'})
+        
+        scores = dict(similar_recipes(recipe_id, limit))
+        results = self.serialize_pks(Recipe.objects.filter(is_published=True), list(scores))
+        for recipe in results:
+            recipe['similarity'] = round(scores[recipe['id']], 2)
+        return Response(results)
     
-    @action(detail=False, methods=['get'], url_path='export', permission_classes=[AllowAny])
+    @action(detail=False, methods=['get'], url_path='recommended', permission_classes=[IsAuthenticated])
+    def recommended(self, request):
+        """
+        Recipes recommended for the current user
+        
+        Based on what people who liked the same recipes also liked, boosted
+        for the user's dietary preference. Each recipe has a
+        "recommendation" with its score and reason ('favorites' or
+        'popular' for users with few favorites).
+        
+        Query parameters:
+        - limit: Number of recipes (default 20, max 100)
+        """
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 20)), MAX_RECOMMENDATIONS))
+        except ValueError:
+            raise ValidationError({'limit': 'Must be a number.'})
+        
+        recommendations = {
+            recipe_id: {'score': score, 'reason': reason}
+            for recipe_id, score, reason in recommended_recipes(request.user, limit)
+        }
+        results = self.serialize_pks(Recipe.objects.filter(is_published=True), list(recommendations))
+        for recipe in results:
+            recipe['recommendation'] = recommendations[recipe['id']]
+        return Response(results)
+    
+    @action(detail=False, methods=['get'], url_path='changes', permission_classes=[IsAuthenticated])
+    def changes(self, request):
+        """
+        Change feed for incremental sync (see apps/api/change_feed.py)
+        
+        Query parameters:
+        - since: Cursor from a previous response (omit to get the current cursor)
+        - limit: Maximum changes to read (default 500, max 1000)
+        """
+        since = request.query_params.get('since')
+        if since is None:
+            return Response({'changes': [], 'next_cursor': format_cursor(latest_cursor()), 'has_more': False})
+        
+        changes, next_cursor, has_more = read_changes(
+            parse_cursor(since), parse_limit(request.query_params.get('limit'))
+        )
+        return Response({
+            'changes': build_deltas(changes, self._render_recipes),
+            'next_cursor': format_cursor(next_cursor),
+            'has_more': has_more,
+        })
+    
+    def _render_recipes(self, queryset, recipe_ids):
+        """Full representations (as in the JSON export) of the given recipes"""
+        context = {'request': self.request}
+        projection = get_projection(RecipeSerializer) if projections_enabled() else None
+        if projection is not None:
+            return projection.project_pks(queryset, recipe_ids, context)
+        queryset = queryset.filter(pk__in=recipe_ids).select_related('author', 'category').prefetch_related(
+            'recipe_ingredients__ingredient', 'images'
+        )
+        return RecipeSerializer(queryset, many=True, context=context).data
+    
+    @action(detail=False, methods=['get'], url_path='export', permission_classes=[IsAuthenticated])
+    @coalesce_get()
     def export(self, request):
         """
         Export recipes in multiple formats for meal planner apps
@@ -749,7 +1087,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return response
         
         else:  # JSON export (default)
-            serializer = self.get_serializer(queryset, many=True)
+            serializer = self.get_serializer(self.filter_queryset(queryset), many=True)
             response = Response(serializer.data)
             response['Content-Disposition'] = 'attachment; filename="recipes.json"'
             response['Content-Type'] = 'application/json'
@@ -884,7 +1222,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
                     'instructions': self._parse_instructions(recipe.instructions),
                 }
             
-            response = HttpResponse(json.dumps(data, indent=2), content_type='application/json')
+            response = HttpResponse(fastjson.dumps(data, indent=2), content_type='application/json')
             response['Content-Disposition'] = f'attachment; filename="{recipe.title.replace(" ", "_")}.json"'
             return response
     
@@ -902,7 +1240,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return [instructions] if instructions else []
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(SparseFieldsMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for Ingredient read operations
     
@@ -913,6 +1251,7 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     """
     queryset = Ingredient.objects.all().order_by('name')
     serializer_class = IngredientSerializer
+    renderer_classes = renderer_classes_with_msgpack()
     permission_classes = [AllowAny]  # Public read access
     
     def get_queryset(self):
@@ -924,7 +1263,7 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
         return queryset
 
 
-class RatingViewSet(viewsets.ModelViewSet):
+class RatingViewSet(IdempotencyMixin, CachedObjectMixin, SparseFieldsMixin, viewsets.ModelViewSet):
     """
     ViewSet for Rating operations
     
@@ -973,7 +1312,7 @@ class RatingViewSet(viewsets.ModelViewSet):
         super().check_permissions(request)
 
 
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(IdempotencyMixin, CachedObjectMixin, SparseFieldsMixin, viewsets.ModelViewSet):
     """
     ViewSet for Comment operations
     
@@ -1022,7 +1361,7 @@ class CommentViewSet(viewsets.ModelViewSet):
         super().check_permissions(request)
 
 
-class FavoriteViewSet(viewsets.ModelViewSet):
+class FavoriteViewSet(SparseFieldsMixin, viewsets.ModelViewSet):
     """
     ViewSet for Favorite operations
     
@@ -1039,6 +1378,7 @@ class FavoriteViewSet(viewsets.ModelViewSet):
         """Get current user's favorites"""
         return Favorite.objects.filter(user=self.request.user).select_related('recipe', 'user')
 
+    @idempotent
     def create(self, request, *args, **kwargs):
         """Toggle favorite - create if not exists, delete if exists"""
         recipe_id = request.data.get('recipe')
@@ -1078,7 +1418,12 @@ class FavoriteViewSet(viewsets.ModelViewSet):
         }, status=status.HTTP_200_OK if created else status.HTTP_200_OK)
 
 
-class MealPlanViewSet(viewsets.ModelViewSet):
+def _meal_plans_version(view, request):
+    """Single-flight key part: when the user's meal plans last changed"""
+    return [resource_changed_at(meal_plans_resource(request.user.pk))]
+
+
+class MealPlanViewSet(IdempotencyMixin, SparseFieldsMixin, viewsets.ModelViewSet):
     """
     ViewSet for MealPlan operations
     
@@ -1089,10 +1434,15 @@ class MealPlanViewSet(viewsets.ModelViewSet):
     - destroy: Remove a meal plan entry
     - grocery-list: Generate grocery list from meal plans
     - export_ical: Export meal plans as an iCal file
+    - feed: Manage the calendar subscription (webcal) feed of your meal plans
+    - generate: Fill a date range with recipes automatically (see apps/api/meal_planner.py)
+    - bulk / move / copy: Create, move or copy many plans at once (see apps/api/meal_plan_bulk.py)
     
     Authentication: Session, Token, or JWT
     """
     serializer_class = MealPlanSerializer
+    renderer_classes = renderer_classes_with_msgpack()
+    parser_classes = parser_classes_with_msgpack()
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
@@ -1130,48 +1480,154 @@ class MealPlanViewSet(viewsets.ModelViewSet):
         """Set user to current user"""
         serializer.save(user=self.request.user)
     
-    @action(detail=False, methods=['get'], url_path='export/ical')
-    def export_ical(self, request):
-        """Export meal plans as iCal format"""
-        from django.http import HttpResponse
-        from datetime import datetime
-        
-        queryset = self.get_queryset()
+    def _conditional_get(self, request, queryset, build_response):
+        """
+        Answer with 304 Not Modified when the user's meal plans are unchanged
         
-        # Generate iCal content
-        ical_content = [
-            'BEGIN:VCALENDAR',
-            'VERSION:2.0',
-            'PRODID:-//Recipe Sharing Platform//Meal Plans//EN',
-            'CALSCALE:GREGORIAN',
-            'METHOD:PUBLISH',
+        Validators: count and newest update of the selected meal plans, the
+        newest update of their recipes, and when any of the user's meal plans
+        last changed (so deletions are noticed too).
+        """
+        totals = queryset.order_by().aggregate(
+            count=Count('pk'),
+            last_updated=Max('updated_at'),
+            recipes_updated=Max('recipe__updated_at'),
+        )
+        changed_at = resource_changed_at(meal_plans_resource(request.user.pk))
+        etag_parts = [
+            'meal_plans', self.action, request.user.pk,
+            sorted(request.query_params.items()),
+            totals['count'], totals['last_updated'], totals['recipes_updated'], changed_at,
         ]
+        last_modified = last_modified_timestamp(
+            totals['last_updated'], totals['recipes_updated'], changed_at,
+        )
+        return conditional_get(request, etag_parts, last_modified, build_response)
+    
+    @action(detail=False, methods=['post'], url_path='generate')
+    @idempotent
+    def generate(self, request):
+        """
+        Generate meal plans for a date range
+        
+        Fills every empty (date, meal type) slot with a recipe that suits
+        the user's diet and time budget, without repeats, preferring popular
+        recipes that share ingredients (a shorter grocery list).
+        
+        Body (all optional):
+        - start_date: First day (YYYY-MM-DD, default today)
+        - days: Number of days (default 7, max 28)
+        - meal_types: List of meal types (default breakfast, lunch, dinner)
+        - dietary: Diets the recipes must suit (default "mine": your preference)
+        - max_prep_time, max_cook_time, max_total_time: Minutes
+        - replace: Replace existing plans in the range (default false: keep them)
+        - dry_run: Return the plan without saving it
+        - seed: Makes the (randomized) search repeatable
+        """
+        options = parse_generate_params(request.data, request.user)
+        try:
+            result = generate_meal_plans(request.user, options)
+        except IntegrityError:
+            return Response(
+                {'detail': 'Your meal plans changed while generating. Please try again.'},
+                status=status.HTTP_409_CONFLICT,
+            )
+        plans = result.pop('plans')
+        result['meal_plans'] = MealPlanSerializer(plans, many=True, context={'request': request}).data
+        return Response(
+            result,
+            status=status.HTTP_200_OK if options['dry_run'] else status.HTTP_201_CREATED,
+        )
+    
+    @action(detail=False, methods=['post'], url_path='bulk')
+    @idempotent
+    def bulk(self, request):
+        """
+        Create many meal plans at once
         
-        for meal_plan in queryset:
-            # Format date for iCal (YYYYMMDD)
-            date_str = meal_plan.date.strftime('%Y%m%d')
-            
-            # Create event
-            ical_content.extend([
-                'BEGIN:VEVENT',
-                f'UID:mealplan-{meal_plan.id}@recipesharing.com',
-                f'DTSTART;VALUE=DATE:{date_str}',
-                f'DTEND;VALUE=DATE:{date_str}',
-                f'SUMMARY:{meal_plan.recipe.title} - {meal_plan.get_meal_type_display()}',
-                f'DESCRIPTION:{meal_plan.recipe.description[:200]}',
-                f'LOCATION:Kitchen',
-                f'STATUS:CONFIRMED',
-                f'SEQUENCE:0',
-                'END:VEVENT',
-            ])
+        Body: {"items": [{"date", "meal_type", "recipe_id", "notes"}, ...],
+        "on_conflict": "error" | "skip" | "replace"}
+        """
+        items = parse_bulk_items(request.data, request.user)
+        on_conflict = parse_conflict_mode(request.data)
+        return _bulk_plan_response(request, lambda: write_plans(request.user, items, on_conflict))
+    
+    @action(detail=False, methods=['post'], url_path='move')
+    @idempotent
+    def move(self, request):
+        """
+        Move meal plans to other dates/meal types (plans may swap slots)
         
-        ical_content.append('END:VCALENDAR')
+        Body: {"moves": [{"id", "date", "meal_type"}, ...], "on_conflict"}
+        """
+        moves = parse_moves(request.data, request.user)
+        on_conflict = parse_conflict_mode(request.data)
+        return _bulk_plan_response(request, lambda: move_plans(request.user, moves, on_conflict))
+    
+    @action(detail=False, methods=['post'], url_path='copy')
+    @idempotent
+    def copy(self, request):
+        """
+        Copy the meal plans of a date range to another start date
+        
+        Body: {"source_start", "days" (default 7), "target_start",
+        "meal_types" (optional), "on_conflict"}
+        """
+        items = copy_items(request.user, request.data)
+        on_conflict = parse_conflict_mode(request.data)
+        return _bulk_plan_response(request, lambda: write_plans(request.user, items, on_conflict))
+    
+    @action(detail=False, methods=['get'], url_path='export/ical')
+    @coalesce_get(extra_parts=_meal_plans_version)
+    def export_ical(self, request):
+        """Export meal plans as iCal format (supports conditional GET)"""
+        queryset = self.get_queryset()
+        return self._conditional_get(request, queryset, lambda: self._ical_response(queryset))
+    
+    def _ical_response(self, queryset):
+        """Build the iCal file for the given meal plans"""
+        from django.http import HttpResponse
         
-        response = HttpResponse('\r\n'.join(ical_content), content_type='text/calendar')
+        response = HttpResponse(render_calendar(queryset), content_type='text/calendar; charset=utf-8')
         response['Content-Disposition'] = 'attachment; filename="meal-plans.ics"'
         return response
     
+    @action(detail=False, methods=['get', 'post', 'delete'], url_path='feed')
+    def feed(self, request):
+        """
+        Calendar subscription feed of your meal plans
+        
+        - GET: The feed's URLs (404 if you have none)
+        - POST: Create the feed, or replace its token (the old URL stops working)
+        - DELETE: Turn the feed off
+        
+        Add webcal_url to a calendar app to see your meal plans there.
+        """
+        feed = CalendarFeed.objects.filter(user=request.user).first()
+        if request.method == 'DELETE':
+            if feed is not None:
+                feed.delete()
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        if request.method == 'POST':
+            if feed is None:
+                feed = CalendarFeed(user=request.user)
+            feed.token = CalendarFeed.generate_token()
+            feed.save()
+        elif feed is None:
+            raise NotFound('You have no calendar feed yet. POST to create one.')
+        
+        url = request.build_absolute_uri(reverse('api:meal-plan-feed', args=[feed.token]))
+        return Response(
+            {
+                'url': url,
+                'webcal_url': 'webcal://' + url.split('://', 1)[1],
+                'created_at': feed.created_at,
+            },
+            status=status.HTTP_201_CREATED if request.method == 'POST' else status.HTTP_200_OK,
+        )
+    
     @action(detail=False, methods=['get'], url_path='grocery-list')
+    @coalesce_get(extra_parts=_meal_plans_version)
     def grocery_list(self, request):
         """
         Generate grocery list from meal plans
@@ -1180,8 +1636,9 @@ class MealPlanViewSet(viewsets.ModelViewSet):
         - start_date: Start date (YYYY-MM-DD)
         - end_date: End date (YYYY-MM-DD)
         - format: Response format (json, text, pdf) - default: json
+        
+        Supports conditional GET (ETag / If-Modified-Since).
         """
-        from .grocery_list import generate_grocery_list
         from datetime import datetime
         
         queryset = self.get_queryset()
@@ -1205,6 +1662,15 @@ class MealPlanViewSet(viewsets.ModelViewSet):
             except ValueError:
                 pass
         
+        return self._conditional_get(
+            request, queryset,
+            lambda: self._grocery_list_response(queryset, start_date_str, end_date_str, format_type),
+        )
+    
+    def _grocery_list_response(self, queryset, start_date_str, end_date_str, format_type):
+        """Build the grocery list response in the requested format"""
+        from .grocery_list import generate_grocery_list
+        
         meal_plans = list(queryset)
         
         if not meal_plans:
@@ -1373,6 +1839,126 @@ class MealPlanViewSet(viewsets.ModelViewSet):
         return response
 
 
+@require_safe
+def meal_plan_feed(request, token):
+    """
+    Calendar subscription feed (webcal) of a user's meal plans
+    
+    GET /api/calendar/<token>.ics
+    
+    The token in the URL is the only credential (see CalendarFeed), so
+    calendar apps can poll without logging in. An unchanged poll is
+    answered with 304 after one query; otherwise the calendar is streamed
+    (see apps/api/ical.py).
+    """
+    state = feed_state(token)
+    if state is None:
+        raise Http404('Unknown calendar feed')
+    changed_at = resource_changed_at(meal_plans_resource(state['user_id']))
+    etag = make_etag([
+        'meal_plan_feed', state['user_id'], feed_start(),
+        state['count'], state['last_updated'], state['recipes_updated'], changed_at,
+    ])
+    last_modified = last_modified_timestamp(state['last_updated'], state['recipes_updated'], changed_at)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = StreamingHttpResponse(
+            stream_calendar(
+                feed_meal_plans(state['user_id']), name=f"Meal plans ({state['user__username']})"
+            ),
+            content_type='text/calendar; charset=utf-8',
+        )
+        response['Content-Disposition'] = 'inline; filename="meal-plans.ics"'
+    return set_cache_headers(response, etag, last_modified)
+
+
+def _bulk_plan_response(request, run):
+    """
+    Response of a bulk meal plan operation (see apps/api/meal_plan_bulk.py)
+    
+    201 when plans were created, 200 otherwise; 409 with the conflicting
+    items when on_conflict is "error" or another request took a slot.
+    """
+    try:
+        result = run()
+    except PlanConflict as conflict:
+        return Response(
+            {'detail': 'Some meal plan slots are already taken.', 'conflicts': conflict.conflicts},
+            status=status.HTTP_409_CONFLICT,
+        )
+    except IntegrityError:
+        return Response(
+            {'detail': 'Your meal plans changed meanwhile. Please try again.'},
+            status=status.HTTP_409_CONFLICT,
+        )
+    plans = result.pop('plans')
+    result['meal_plans'] = MealPlanSerializer(plans, many=True, context={'request': request}).data
+    return Response(
+        result,
+        status=status.HTTP_201_CREATED if result.get('created') else status.HTTP_200_OK,
+    )
+
+
+class MealPlanTemplateViewSet(IdempotencyMixin, viewsets.ModelViewSet):
+    """
+    ViewSet for saved meal plan templates
+    
+    - list/create/retrieve/update/destroy: Manage templates (with their items)
+    - apply: Create meal plans from a template, starting on a date
+    - from-range: Save a date range of your meal plans as a template
+    
+    Authentication: Session, Token, or JWT
+    """
+    serializer_class = MealPlanTemplateSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        """Current user's templates with their items"""
+        return MealPlanTemplate.objects.filter(user=self.request.user).prefetch_related(
+            Prefetch('items', queryset=MealPlanTemplateItem.objects.select_related('recipe'))
+        )
+    
+    @action(detail=True, methods=['post'])
+    @idempotent
+    def apply(self, request, pk=None):
+        """
+        Create meal plans from this template
+        
+        Body: {"start_date" (day 0 of the template), "on_conflict"}
+        """
+        template = self.get_object()
+        start = parse_date(request.data.get('start_date'), 'start_date')
+        on_conflict = parse_conflict_mode(request.data)
+        items = template_items(template, start)
+        return _bulk_plan_response(request, lambda: write_plans(request.user, items, on_conflict))
+    
+    @action(detail=False, methods=['post'], url_path='from-range')
+    @idempotent
+    def from_range(self, request):
+        """
+        Save your meal plans of a date range as a new template
+        
+        Body: {"name", "description", "start_date", "days" (default 7)}
+        """
+        start = parse_date(request.data.get('start_date'), 'start_date')
+        days = parse_days(request.data)
+        plans = MealPlan.objects.filter(
+            user=request.user, date__range=(start, start + timedelta(days=days - 1)),
+        ).order_by('date', 'meal_type')
+        serializer = self.get_serializer(data={
+            'name': request.data.get('name'),
+            'description': request.data.get('description', ''),
+            'items': [
+                {'day': (plan.date - start).days, 'meal_type': plan.meal_type,
+                 'recipe_id': plan.recipe_id, 'notes': plan.notes}
+                for plan in plans
+            ],
+        })
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
 class APIKeyViewSet(viewsets.ModelViewSet):
     """
     ViewSet for managing API keys for meal planner apps
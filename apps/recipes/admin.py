@@ -9,9 +9,13 @@ Enhanced admin interface with:
 """
 
 from django.contrib import admin
+from django.db import transaction
 from django.utils.html import format_html
 from django.db.models import Count, Avg
-from .models import Recipe, Category, Ingredient, RecipeIngredient, Rating, Comment, Favorite, RecipeImage, MealPlan
+from .models import (
+    Recipe, Category, Ingredient, RecipeIngredient, Rating, Comment, Favorite, RecipeImage, MealPlan,
+    RecipeChange, IngredientNutrition, MealPlanTemplate, MealPlanTemplateItem,
+)
 
 
 @admin.register(Category)
@@ -35,11 +39,19 @@ class CategoryAdmin(admin.ModelAdmin):
     recipe_count.admin_order_field = 'recipe_count'
 
 
+class IngredientNutritionInline(admin.StackedInline):
+    """Inline editing for an ingredient's nutrition (per 100 g)"""
+    model = IngredientNutrition
+    can_delete = True
+    fields = ['calories', 'protein', 'carbs', 'fat', 'grams_per_ml', 'grams_per_piece']
+
+
 @admin.register(Ingredient)
 class IngredientAdmin(admin.ModelAdmin):
     """Admin interface for Ingredient model"""
     list_display = ['name', 'recipe_count']
     search_fields = ['name']
+    inlines = [IngredientNutritionInline]
     
     def get_queryset(self, request):
         """Optimize queryset with recipe count"""
@@ -165,13 +177,21 @@ class RecipeAdmin(admin.ModelAdmin):
     
     def publish_recipes(self, request, queryset):
         """Bulk action to publish recipes"""
-        count = queryset.update(is_published=True)
+        # update() sends no signals, so log the partner sync changes here
+        with transaction.atomic():
+            recipe_ids = list(queryset.values_list('pk', flat=True))
+            count = queryset.update(is_published=True)
+            RecipeChange.record(recipe_ids, RecipeChange.UPDATED)
         self.message_user(request, f'{count} recipes published.')
     publish_recipes.short_description = 'Publish selected recipes'
     
     def unpublish_recipes(self, request, queryset):
         """Bulk action to unpublish recipes"""
-        count = queryset.update(is_published=False)
+        with transaction.atomic():
+            # Drafts were never on the change feed: don't reveal them
+            recipe_ids = list(queryset.filter(is_published=True).values_list('pk', flat=True))
+            count = queryset.update(is_published=False)
+            RecipeChange.record(recipe_ids, RecipeChange.UNPUBLISHED)
         self.message_user(request, f'{count} recipes unpublished.')
     unpublish_recipes.short_description = 'Unpublish selected recipes'
 
@@ -306,3 +326,31 @@ class MealPlanAdmin(admin.ModelAdmin):
         """Display meal type"""
         return obj.get_meal_type_display()
     meal_type_display.short_description = 'Meal Type'
+
+
+class MealPlanTemplateItemInline(admin.TabularInline):
+    """Inline editing for a template's recipes"""
+    model = MealPlanTemplateItem
+    extra = 1
+    fields = ['day', 'meal_type', 'recipe', 'notes']
+    autocomplete_fields = ['recipe']
+
+
+@admin.register(MealPlanTemplate)
+class MealPlanTemplateAdmin(admin.ModelAdmin):
+    """Admin interface for MealPlanTemplate model"""
+    list_display = ['name', 'user', 'item_count', 'updated_at']
+    search_fields = ['name', 'user__username']
+    readonly_fields = ['created_at', 'updated_at']
+    autocomplete_fields = ['user']
+    inlines = [MealPlanTemplateItemInline]
+    
+    def get_queryset(self, request):
+        """Optimize queryset with item count"""
+        return super().get_queryset(request).annotate(item_count=Count('items'))
+    
+    def item_count(self, obj):
+        """Display number of recipes in the template"""
+        return obj.item_count
+    item_count.short_description = 'Recipes'
+    item_count.admin_order_field = 'item_count'
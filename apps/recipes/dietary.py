@@ -0,0 +1,295 @@
+"""
+Dietary tags as a bitmask
+
+Recipe.dietary_restrictions holds one label, so a recipe can't be both
+vegan and gluten-free. Recipe.dietary_tags stores every diet the recipe is
+compatible with as one integer, one bit per diet:
+
+    vegetarian = 1, vegan = 2, gluten-free = 4, keto = 8, ...
+    dietary_tags = 1 | 2 | 4 = 7    # Vegetarian, vegan and gluten-free
+
+The tags are worked out from the ingredients:
+
+1. Each Ingredient stores the diets it rules out (Ingredient.
+   dietary_violations), from keyword rules on its name (VIOLATION_RULES):
+   "butter" rules out vegan and paleo, "bacon" rules out vegetarian, vegan,
+   pescatarian, halal and kosher, ... This is computed once, when the
+   ingredient is saved, not on every recipe.
+2. Each Ingredient also stores the diets it is known to suit
+   (Ingredient.dietary_safe): its whole name has to be made of foods listed
+   for that diet in SAFE_FOODS (plus words like "chopped" or "fresh").
+   "Chicken thighs" is known to be gluten-free; "croutons", "malt vinegar"
+   or "vegetable stock" aren't known to be anything.
+3. A recipe is vegetarian, vegan, pescatarian or gluten-free
+   (INFERRED_DIETS) when every one of its ingredients is known to suit that
+   diet - a name the rules don't recognize is never taken as safe. Other
+   diets, and these when an ingredient isn't known, come from the author's
+   label (dietary_restrictions). Keto, paleo, halal and kosher depend on
+   more than ingredient names, so they always do. Either way a diet is
+   dropped if an ingredient rules it out.
+
+Filtering: "compatible with vegan and gluten-free" means "both bits are
+set". A bitwise AND in the WHERE clause can't use an index, but with only
+len(DIETS) bits there are few values that contain a given set of bits, so
+compatible_with() lists them:
+
+    Recipe.objects.filter(compatible_with(diet_mask(['vegan', 'gluten-free'])))
+    # WHERE dietary_tags IN (6, 7, 14, 15, ...)   - uses the index
+
+Tags are refreshed by signals in apps/recipes/models.py when a recipe, its
+ingredients or an ingredient's name change.
+"""
+
+import re
+from collections import defaultdict
+
+from django.db.models import Q
+
+# Bit positions are stored in the database: only ever append to this list
+DIETS = ('vegetarian', 'vegan', 'gluten-free', 'keto', 'paleo', 'pescatarian', 'halal', 'kosher')
+BITS = {diet: 1 << position for position, diet in enumerate(DIETS)}
+ALL_DIETS = (1 << len(DIETS)) - 1
+
+# Diets a recipe has when every ingredient is known to suit them
+INFERRED_DIETS = BITS['vegetarian'] | BITS['vegan'] | BITS['pescatarian'] | BITS['gluten-free']
+
+# A label implies the more permissive diets (a vegan dish suits vegetarians)
+IMPLIED_DIETS = {
+    'vegan': ('vegetarian', 'pescatarian'),
+    'vegetarian': ('pescatarian',),
+}
+
+_MEAT = (
+    'beef', 'steak', 'veal', 'pork', 'bacon', 'ham', 'prosciutto', 'pancetta', 'salami', 'pepperoni',
+    'chorizo', 'sausage', 'lard', 'chicken', 'turkey', 'duck', 'lamb', 'mutton', 'venison', 'gelatin',
+    'gelatine', 'meatball',
+)
+_PORK = ('pork', 'bacon', 'ham', 'prosciutto', 'pancetta', 'salami', 'pepperoni', 'chorizo', 'lard')
+_SHELLFISH = ('shrimp', 'prawn', 'crab', 'lobster', 'clam', 'mussel', 'oyster', 'scallop', 'squid', 'octopus')
+_SEAFOOD = (
+    'fish', 'salmon', 'tuna', 'cod', 'anchovy', 'anchovies', 'sardine', 'trout', 'tilapia', 'halibut', 'mackerel',
+) + _SHELLFISH
+_FISH = _SEAFOOD + ('worcestershire',)  # Made with anchovies
+_DAIRY = (
+    'milk', 'buttermilk', 'butter', 'cheese', 'cream', 'yogurt', 'yoghurt', 'ghee', 'parmesan', 'mozzarella',
+    'cheddar', 'feta', 'ricotta', 'mascarpone', 'whey',
+)
+_GLUTEN = (
+    'flour', 'wheat', 'bread', 'breadcrumb', 'panko', 'pasta', 'spaghetti', 'macaroni', 'noodle',
+    'lasagna', 'couscous', 'barley', 'rye', 'semolina', 'bulgur', 'seitan', 'cracker', 'tortilla',
+    'pita', 'soy sauce', 'beer', 'spelt', 'farro', 'malt', 'crouton', 'ramen', 'udon', 'gnocchi', 'orzo',
+)
+_STARCH = (
+    'flour', 'bread', 'pasta', 'spaghetti', 'noodle', 'rice', 'potato', 'corn', 'cornstarch', 'cornmeal',
+    'oat', 'oatmeal', 'quinoa',
+)
+_SUGAR = ('sugar', 'honey', 'maple syrup', 'molasses', 'agave')
+_LEGUMES = ('bean', 'lentil', 'chickpea', 'peanut', 'soy', 'tofu', 'pea')
+_ALCOHOL = ('wine', 'beer', 'rum', 'vodka', 'whiskey', 'brandy', 'sake', 'mirin', 'liqueur')
+_PLANT_DAIRY = (
+    'coconut milk', 'coconut cream', 'almond milk', 'oat milk', 'soy milk', 'rice milk',
+    'peanut butter', 'almond butter', 'cashew butter', 'cocoa butter', 'cream of tartar',
+    'vegan',
+)
+_GLUTEN_FREE = ('gluten-free', 'gluten free', 'rice flour', 'almond flour', 'coconut flour', 'corn tortilla')
+
+# Foods known to suit a diet (the allow-list behind Ingredient.dietary_safe)
+_PLANTS = (
+    'tomato', 'onion', 'red onion', 'garlic', 'shallot', 'scallion', 'spring onion', 'leek', 'carrot', 'celery',
+    'potato', 'sweet potato', 'bell pepper', 'chili', 'chile', 'jalapeno', 'cucumber', 'zucchini', 'courgette',
+    'eggplant', 'aubergine', 'spinach', 'kale', 'lettuce', 'arugula', 'cabbage', 'broccoli', 'cauliflower',
+    'asparagus', 'mushroom', 'pea', 'bean', 'green bean', 'corn', 'squash', 'pumpkin', 'beet', 'beetroot',
+    'radish', 'turnip', 'parsnip', 'artichoke', 'avocado', 'okra', 'fennel', 'ginger', 'olive', 'chard',
+    'bok choy', 'lentil', 'chickpea', 'tofu', 'apple', 'banana', 'orange', 'lemon', 'lime', 'grapefruit',
+    'grape', 'strawberry', 'raspberry', 'blueberry', 'blackberry', 'cranberry', 'cherry', 'peach', 'pear',
+    'plum', 'apricot', 'mango', 'pineapple', 'melon', 'watermelon', 'kiwi', 'fig', 'pomegranate', 'coconut',
+    'raisin', 'basil', 'parsley', 'cilantro', 'coriander', 'mint', 'dill', 'thyme', 'rosemary', 'oregano',
+    'sage', 'tarragon', 'chive', 'bay leaf', 'cumin', 'turmeric', 'paprika', 'cinnamon', 'nutmeg', 'clove',
+    'cardamom', 'saffron', 'vanilla', 'cayenne', 'pepper', 'peppercorn', 'salt', 'sesame', 'almond', 'walnut',
+    'pecan', 'cashew', 'pistachio', 'hazelnut', 'peanut', 'pine nut', 'chia', 'flaxseed', 'sunflower seed',
+    'pumpkin seed', 'water', 'olive oil', 'vegetable oil', 'canola oil', 'sunflower oil', 'sesame oil',
+    'coconut oil', 'sugar', 'brown sugar', 'maple syrup', 'agave', 'molasses', 'rice', 'quinoa', 'buckwheat',
+    'millet', 'polenta', 'cornmeal', 'cornstarch', 'rice flour', 'almond flour', 'coconut flour',
+    'baking soda', 'baking powder', 'yeast', 'cocoa', 'vinegar', 'balsamic vinegar', 'cider vinegar',
+    'wine vinegar',
+) + _PLANT_DAIRY[:-1]
+_WHEAT = ('flour', 'wheat', 'semolina', 'couscous', 'bulgur', 'oat', 'barley', 'rye', 'spelt', 'farro')
+_DAIRY_EGGS = _DAIRY + ('sour cream', 'cream cheese', 'egg', 'egg yolk', 'egg white', 'honey')
+_MEAT_CUTS = (
+    'beef', 'steak', 'veal', 'pork', 'chicken', 'turkey', 'duck', 'lamb', 'mutton', 'venison', 'breast',
+    'thigh', 'drumstick', 'wing', 'leg', 'loin', 'tenderloin', 'chop', 'rib', 'shoulder',
+)
+# Words that don't change what an ingredient is
+_DESCRIPTORS = (
+    'fresh', 'freshly', 'chopped', 'diced', 'minced', 'sliced', 'grated', 'shredded', 'ground', 'crushed',
+    'dried', 'large', 'medium', 'small', 'whole', 'raw', 'ripe', 'frozen', 'peeled', 'boneless', 'skinless',
+    'extra', 'virgin', 'red', 'green', 'yellow', 'white', 'black', 'unsalted', 'salted', 'plain', 'organic',
+    'baby', 'all', 'purpose', 'and', 'of', 'to', 'taste', 'juice', 'zest', 'leaves', 'sprig', 'finely',
+    'roughly', 'thinly', 'halved', 'cubed', 'melted', 'softened', 'pitted', 'trimmed', 'rinsed', 'drained',
+    'powder', 'flakes', 'seeds', 'fillet', 'filet',
+)
+
+SAFE_FOODS = {
+    'vegan': _PLANTS + _WHEAT,
+    'vegetarian': _PLANTS + _WHEAT + _DAIRY_EGGS,
+    'pescatarian': _PLANTS + _WHEAT + _DAIRY_EGGS + _SEAFOOD,
+    'gluten-free': _PLANTS + _DAIRY_EGGS + _MEAT_CUTS + _SEAFOOD,
+}
+
+# (diets ruled out, name keywords, phrases that don't count)
+VIOLATION_RULES = (
+    (('vegetarian', 'vegan', 'pescatarian'), _MEAT, ('vegan', 'plant-based')),
+    (('halal', 'kosher'), _PORK, ()),
+    (('kosher',), _SHELLFISH, ()),
+    (('vegetarian', 'vegan'), _FISH, ()),
+    (('vegan',), _DAIRY + ('egg', 'honey', 'mayonnaise'), _PLANT_DAIRY + ('eggplant',)),
+    (('paleo',), _DAIRY, _PLANT_DAIRY),
+    (('gluten-free',), _GLUTEN, _GLUTEN_FREE),
+    (('keto',), _STARCH + _SUGAR, ('cauliflower rice', 'sugar-free', 'sugar free')),
+    (('paleo',), _STARCH + _SUGAR[:1] + _LEGUMES, ('cauliflower rice', 'sweet potato', 'sugar-free')),
+    (('halal',), _ALCOHOL, ('wine vinegar',)),
+)
+
+
+def _compile(keywords):
+    # Whole words or their plurals ("eggs", "potatoes" - but not "eggplant")
+    return re.compile(r'\b(?:' + '|'.join(re.escape(keyword) for keyword in keywords) + r')(?:e?s)?\b')
+
+
+_RULES = [
+    (sum(BITS[diet] for diet in diets), _compile(keywords), _compile(exceptions) if exceptions else None)
+    for diets, keywords, exceptions in VIOLATION_RULES
+]
+
+
+def _compile_foods(foods):
+    # Longest first, so "olive oil" is matched before "olive"; "berry" also matches "berries"
+    foods = set(foods) | {food[:-1] + 'ies' for food in foods if food.endswith('y')}
+    return _compile(sorted(foods, key=len, reverse=True))
+
+
+_SAFE_FOODS = [(BITS[diet], _compile_foods(foods + _DESCRIPTORS)) for diet, foods in SAFE_FOODS.items()]
+
+
+def _normalize(name):
+    return ' '.join((name or '').lower().split())
+
+
+def ingredient_violations(name):
+    """
+    Bitmask of the diets an ingredient (by name) rules out
+
+    A rule doesn't apply when the name contains one of its exceptions
+    ("coconut milk" isn't dairy, "rice flour" has no gluten).
+    """
+    name = _normalize(name)
+    violations = 0
+    for bits, keywords, exceptions in _RULES:
+        if keywords.search(name) and not (exceptions and exceptions.search(name)):
+            violations |= bits
+    return violations
+
+
+def ingredient_safe_diets(name):
+    """
+    Bitmask of the INFERRED_DIETS an ingredient (by name) is known to suit
+
+    Every word of the name has to belong to a food listed for the diet in
+    SAFE_FOODS (or be a descriptor like "chopped"), and no rule may rule
+    the diet out. Unknown names suit nothing.
+    """
+    name = _normalize(name)
+    if not name:
+        return 0
+    safe = 0
+    for bits, foods in _SAFE_FOODS:
+        if not re.sub(r'[^a-z]+', '', foods.sub(' ', name)):
+            safe |= bits
+    return safe & ~ingredient_violations(name)
+
+
+def diet_mask(diets):
+    """Bitmask of diet names ('none' and 'all' add nothing). ValueError for unknown names"""
+    mask = 0
+    for diet in diets:
+        diet = diet.strip().lower()
+        if diet in ('', 'none', 'all'):
+            continue
+        if diet not in BITS:
+            raise ValueError(f'Unknown diet {diet!r}. Choose from: {", ".join(DIETS)}')
+        mask |= BITS[diet]
+    return mask
+
+
+def declared_tags(label):
+    """Bitmask for an author's dietary_restrictions label (with implied diets)"""
+    if label not in BITS:
+        return 0
+    return diet_mask((label,) + IMPLIED_DIETS.get(label, ()))
+
+
+def recipe_tags(label, violations, safe=0):
+    """
+    dietary_tags of a recipe from its label, its ingredients' combined
+    violations and the diets every one of its ingredients is known to suit
+    """
+    return (declared_tags(label) | (safe & INFERRED_DIETS)) & ~violations & ALL_DIETS
+
+
+def tag_names(tags):
+    """Diet names in a bitmask, in DIETS order"""
+    return [diet for diet in DIETS if tags & BITS[diet]]
+
+
+def compatible_values(mask):
+    """Every tag value that contains all the bits of mask"""
+    free = ALL_DIETS & ~mask
+    values = []
+    subset = free
+    while True:  # Walk the subsets of the free bits
+        values.append(mask | subset)
+        if not subset:
+            break
+        subset = (subset - 1) & free
+    return sorted(values)
+
+
+def compatible_with(mask, field='dietary_tags'):
+    """Q() for rows whose tags include every diet in mask (index-friendly IN list)"""
+    if not mask:
+        return Q()
+    return Q(**{f'{field}__in': compatible_values(mask)})
+
+
+# ========== RECIPES ==========
+
+def recipe_ingredient_diets(recipe_ids):
+    """
+    {recipe id: (combined violations, diets every ingredient is known to suit)}
+    for recipes that have ingredients
+    """
+    from .models import RecipeIngredient
+    diets = {}
+    for recipe_id, violations, safe in RecipeIngredient.objects.filter(recipe_id__in=recipe_ids).values_list(
+        'recipe_id', 'ingredient__dietary_violations', 'ingredient__dietary_safe'
+    ):
+        previous_violations, previous_safe = diets.get(recipe_id, (0, ALL_DIETS))
+        diets[recipe_id] = (previous_violations | violations, previous_safe & safe)
+    return diets
+
+
+def refresh_recipe_tags(recipe_ids):
+    """Recompute Recipe.dietary_tags. Returns the number of recipes whose tags changed"""
+    from .models import Recipe
+    recipe_ids = list(recipe_ids)
+    diets = recipe_ingredient_diets(recipe_ids)
+    changed = defaultdict(list)  # New tags -> recipe ids
+    for recipe_id, label, tags in Recipe.objects.filter(pk__in=recipe_ids).values_list(
+        'pk', 'dietary_restrictions', 'dietary_tags'
+    ):
+        new_tags = recipe_tags(label, *diets.get(recipe_id, (0, 0)))
+        if new_tags != tags:
+            changed[new_tags].append(recipe_id)
+    for tags, ids in changed.items():
+        Recipe.objects.filter(pk__in=ids).update(dietary_tags=tags)
+    return sum(len(ids) for ids in changed.values())
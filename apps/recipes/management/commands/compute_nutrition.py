@@ -0,0 +1,74 @@
+"""
+Django management command to compute recipe nutrition
+
+Loads ingredient nutrition data (optional) and recomputes the calories and
+macros of every recipe (see apps/recipes/nutrition.py). Changes made later
+are picked up automatically; run this after loading data or to backfill.
+
+The CSV needs a header row with: name, calories, protein, carbs, fat
+(per 100 g) and optionally grams_per_ml and grams_per_piece. Rows are
+matched to existing ingredients by name (case-insensitive).
+
+Usage:
+    python manage.py compute_nutrition
+    python manage.py compute_nutrition --load apps/recipes/fixtures/ingredient_nutrition.csv
+"""
+
+import csv
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.recipes.models import Ingredient, IngredientNutrition, Recipe
+from apps.recipes.nutrition import BATCH_SIZE, NUTRIENTS, parse_nutrition_row, refresh_recipe_nutrition
+
+
+class Command(BaseCommand):
+    help = 'Loads ingredient nutrition data and recomputes recipe nutrition'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--load', metavar='CSV', help='Ingredient nutrition CSV to load first')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Recipes per batch')
+
+    def handle(self, *args, **options):
+        if options['load']:
+            self.load(options['load'])
+
+        started = time.perf_counter()
+        recipe_ids = list(Recipe.objects.order_by('pk').values_list('pk', flat=True))
+        changed = refresh_recipe_nutrition(recipe_ids, batch_size=options['batch_size'])
+        counted = Recipe.objects.filter(calories__isnull=False).count()
+        self.stdout.write(self.style.SUCCESS(
+            f'Updated {changed} of {len(recipe_ids)} recipes in {time.perf_counter() - started:.1f}s '
+            f'({counted} have complete nutrition data)'
+        ))
+
+    def load(self, path):
+        try:
+            with open(path, newline='', encoding='utf-8') as handle:
+                rows = list(csv.DictReader(handle))
+        except OSError as error:
+            raise CommandError(f'Cannot read {path}: {error}')
+
+        ingredients = {}
+        for ingredient in Ingredient.objects.all():
+            ingredients.setdefault(ingredient.name.strip().lower(), []).append(ingredient)
+
+        entries, skipped = [], 0
+        for line, row in enumerate(rows, start=2):
+            try:
+                values = parse_nutrition_row(row)
+            except ValueError as error:
+                raise CommandError(f'{path}, line {line}: {error}')
+            matches = ingredients.get((row.get('name') or '').strip().lower(), [])
+            entries.extend(IngredientNutrition(ingredient=ingredient, **values) for ingredient in matches)
+            skipped += not matches
+
+        # bulk_create sends no signals: recipes are recomputed once afterwards
+        IngredientNutrition.objects.bulk_create(
+            entries,
+            update_conflicts=True,
+            unique_fields=['ingredient'],
+            update_fields=list(NUTRIENTS) + ['grams_per_ml', 'grams_per_piece'],
+        )
+        self.stdout.write(f'Loaded nutrition for {len(entries)} ingredients ({skipped} rows matched no ingredient)')
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-19 07:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_rename_recipes_meal_user_id_7a8b2a_idx_recipes_mea_user_id_1c29da_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipe_id', models.BigIntegerField(help_text='Recipe that changed (kept after the recipe is deleted)')),
+                ('action', models.CharField(choices=[('created', 'Created'), ('updated', 'Updated'), ('unpublished', 'Unpublished'), ('deleted', 'Deleted')], help_text='What happened to the recipe', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Recipe Change',
+                'verbose_name_plural': 'Recipe Changes',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['recipe_id'], name='recipes_rec_recipe__6c002e_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.30 on 2026-10-19 08:11
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0007_recipechange'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeStatBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=4)),
+                ('bucket_start', models.DateTimeField(help_text='Start of the hour/day (UTC)')),
+                ('views', models.IntegerField(default=0)),
+                ('favorites', models.IntegerField(default=0)),
+                ('ratings', models.IntegerField(default=0)),
+                ('rating_total', models.IntegerField(default=0, help_text="Sum of the stars of the bucket's ratings (for averages)")),
+                ('comments', models.IntegerField(default=0)),
+                ('author', models.ForeignKey(help_text='Author of the recipe (denormalized for dashboard queries)', on_delete=django.db.models.deletion.CASCADE, related_name='recipe_stat_buckets', to=settings.AUTH_USER_MODEL)),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stat_buckets', to='recipes.recipe')),
+            ],
+            options={
+                'verbose_name': 'Recipe Stat Bucket',
+                'verbose_name_plural': 'Recipe Stat Buckets',
+                'ordering': ['bucket_start'],
+                'indexes': [models.Index(fields=['author', 'period', 'bucket_start'], name='recipes_rec_author__a5f45a_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='recipestatbucket',
+            constraint=models.UniqueConstraint(fields=('recipe', 'period', 'bucket_start'), name='unique_recipe_stat_bucket'),
+        ),
+    ]
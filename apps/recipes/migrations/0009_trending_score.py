@@ -0,0 +1,36 @@
+# Generated by Django 4.2.30 on 2026-10-19 08:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_recipestatbucket'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingLandmark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('landmark', models.DateTimeField(help_text='Time the stored trending scores are relative to')),
+            ],
+            options={
+                'verbose_name': 'Trending Landmark',
+            },
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='trending_score',
+            field=models.FloatField(default=0, help_text='Time-decayed popularity (see apps/api/trending.py)'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-trending_score'], name='recipes_rec_trendin_93dc77_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['category', '-trending_score'], name='recipes_rec_categor_9694d5_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.30 on 2026-10-19 08:19
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_trending_score'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeSignature',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='signature', serialize=False, to='recipes.recipe')),
+                ('signature', models.BinaryField(help_text='MinHash values (packed 32-bit integers)')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Recipe Signature',
+            },
+        ),
+        migrations.CreateModel(
+            name='RecipeSimilarityBand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.BigIntegerField(help_text='Hash of the band number and its signature values')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similarity_bands', to='recipes.recipe')),
+            ],
+            options={
+                'verbose_name': 'Recipe Similarity Band',
+                'indexes': [models.Index(fields=['key', 'recipe'], name='recipes_rec_key_b100c6_idx')],
+            },
+        ),
+    ]
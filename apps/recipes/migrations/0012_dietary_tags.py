@@ -0,0 +1,51 @@
+# Generated by Django 4.2.30 on 2026-10-19 08:36
+
+from django.db import migrations, models
+
+from apps.recipes.dietary import ingredient_violations, recipe_tags
+
+
+def fill_dietary_tags(apps, schema_editor):
+    """Compute the new bitmasks from ingredient names and the existing dietary_restrictions labels"""
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+
+    ingredients = list(Ingredient.objects.only('id', 'name'))
+    for ingredient in ingredients:
+        ingredient.dietary_violations = ingredient_violations(ingredient.name)
+    Ingredient.objects.bulk_update(ingredients, ['dietary_violations'], batch_size=1000)
+
+    violations = {}
+    for recipe_id, bits in RecipeIngredient.objects.values_list('recipe_id', 'ingredient__dietary_violations').iterator():
+        violations[recipe_id] = violations.get(recipe_id, 0) | bits
+    recipes = list(Recipe.objects.only('id', 'dietary_restrictions'))
+    for recipe in recipes:
+        # Diets inferred from ingredients are filled in by 0015_ingredient_dietary_safe
+        recipe.dietary_tags = recipe_tags(recipe.dietary_restrictions, violations.get(recipe.pk, 0))
+    Recipe.objects.bulk_update(recipes, ['dietary_tags'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_recipeneighbor'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='dietary_violations',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Bitmask of the diets this ingredient rules out (see apps/recipes/dietary.py)'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='dietary_tags',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Bitmask of every diet this recipe suits, from its label and ingredients (see apps/recipes/dietary.py)'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['dietary_tags', '-created_at'], name='recipes_rec_dietary_b5f92e_idx'),
+        ),
+        migrations.RunPython(fill_dietary_tags, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 4.2.30 on 2026-10-19 08:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_dietary_tags'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngredientNutrition',
+            fields=[
+                ('ingredient', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='nutrition', serialize=False, to='recipes.ingredient')),
+                ('calories', models.FloatField(help_text='kcal per 100 g')),
+                ('protein', models.FloatField(help_text='Grams of protein per 100 g')),
+                ('carbs', models.FloatField(help_text='Grams of carbohydrates per 100 g')),
+                ('fat', models.FloatField(help_text='Grams of fat per 100 g')),
+                ('grams_per_ml', models.FloatField(default=1.0, help_text='Density, to convert cups and spoons (water = 1.0, flour = 0.53)')),
+                ('grams_per_piece', models.FloatField(blank=True, help_text='Weight of one piece (e.g. one egg = 50), for quantities without a unit', null=True)),
+            ],
+            options={
+                'verbose_name': 'Ingredient Nutrition',
+                'verbose_name_plural': 'Ingredient Nutrition',
+            },
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='calories',
+            field=models.FloatField(blank=True, editable=False, help_text='Total kcal', null=True),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='carbs',
+            field=models.FloatField(blank=True, editable=False, help_text='Total carbohydrates (g)', null=True),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='fat',
+            field=models.FloatField(blank=True, editable=False, help_text='Total fat (g)', null=True),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='protein',
+            field=models.FloatField(blank=True, editable=False, help_text='Total protein (g)', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['calories'], name='recipes_rec_calorie_c49c82_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-protein'], name='recipes_rec_protein_19e90f_idx'),
+        ),
+    ]
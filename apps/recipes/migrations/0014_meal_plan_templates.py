@@ -0,0 +1,55 @@
+# Generated by Django 4.2.30 on 2026-10-19 08:53
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0013_recipe_nutrition'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MealPlanTemplate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('description', models.TextField(blank=True, max_length=500)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(help_text='User who saved this template', on_delete=django.db.models.deletion.CASCADE, related_name='meal_plan_templates', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Meal Plan Template',
+                'verbose_name_plural': 'Meal Plan Templates',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='MealPlanTemplateItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.PositiveSmallIntegerField(help_text='Day offset from the first day (0 = first day)')),
+                ('meal_type', models.CharField(choices=[('breakfast', 'Breakfast'), ('lunch', 'Lunch'), ('dinner', 'Dinner'), ('snack', 'Snack'), ('dessert', 'Dessert')], default='dinner', max_length=20)),
+                ('notes', models.TextField(blank=True, max_length=500)),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='recipes.recipe')),
+                ('template', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='recipes.mealplantemplate')),
+            ],
+            options={
+                'verbose_name': 'Meal Plan Template Item',
+                'ordering': ['day', 'meal_type'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='mealplantemplateitem',
+            constraint=models.UniqueConstraint(fields=('template', 'day', 'meal_type'), name='unique_meal_plan_template_slot'),
+        ),
+        migrations.AddConstraint(
+            model_name='mealplantemplate',
+            constraint=models.UniqueConstraint(fields=('user', 'name'), name='unique_meal_plan_template_name'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.30 on 2026-10-19 10:12
+
+from django.db import migrations, models
+
+from apps.recipes.dietary import ALL_DIETS, ingredient_safe_diets, recipe_tags
+
+
+def fill_dietary_safe(apps, schema_editor):
+    """Classify the ingredients and recompute recipe tags (unknown ingredients no longer count as safe)"""
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+
+    ingredients = list(Ingredient.objects.only('id', 'name'))
+    for ingredient in ingredients:
+        ingredient.dietary_safe = ingredient_safe_diets(ingredient.name)
+    Ingredient.objects.bulk_update(ingredients, ['dietary_safe'], batch_size=1000)
+
+    diets = {}
+    for recipe_id, violations, safe in RecipeIngredient.objects.values_list(
+        'recipe_id', 'ingredient__dietary_violations', 'ingredient__dietary_safe'
+    ).iterator():
+        previous_violations, previous_safe = diets.get(recipe_id, (0, ALL_DIETS))
+        diets[recipe_id] = (previous_violations | violations, previous_safe & safe)
+    recipes = list(Recipe.objects.only('id', 'dietary_restrictions'))
+    for recipe in recipes:
+        recipe.dietary_tags = recipe_tags(recipe.dietary_restrictions, *diets.get(recipe.pk, (0, 0)))
+    Recipe.objects.bulk_update(recipes, ['dietary_tags'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0014_meal_plan_templates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='dietary_safe',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Bitmask of the diets this ingredient is known to suit (see apps/recipes/dietary.py)'),
+        ),
+        migrations.RunPython(fill_dietary_safe, migrations.RunPython.noop),
+    ]
@@ -9,9 +9,18 @@ Models:
 5. Rating - User ratings for recipes (1-5 stars with review text)
 6. Comment - User comments on recipes
 7. Favorite - User saved/favorited recipes
+8. RecipeImage - Extra images for a recipe
+9. MealPlan - Recipes planned for a date and meal
+10. RecipeChange - Change log of recipes for incremental partner sync
+11. RecipeStatBucket - Hourly/daily view, favorite, rating and comment counters
+12. TrendingLandmark - Reference time of the recipes' trending scores
+13. RecipeSignature / RecipeSimilarityBand - MinHash index for similar recipes
+14. RecipeNeighbor - Precomputed item-item neighbors for recommendations
+15. IngredientNutrition - Calories and macros per 100 g of an ingredient
+16. MealPlanTemplate / MealPlanTemplateItem - Saved plans to apply to any week
 """
 
-from django.db import models
+from django.db import connection, models, transaction
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 
@@ -62,6 +71,16 @@ class Ingredient(models.Model):
         max_length=200,
         help_text="Ingredient name (e.g., Flour, Sugar, Chicken)"
     )
+    dietary_violations = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Bitmask of the diets this ingredient rules out (see apps/recipes/dietary.py)"
+    )
+    dietary_safe = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Bitmask of the diets this ingredient is known to suit (see apps/recipes/dietary.py)"
+    )
     
     class Meta:
         ordering = ['name']
@@ -71,6 +90,29 @@ class Ingredient(models.Model):
     
     def __str__(self):
         return self.name
+    
+    def save(self, *args, **kwargs):
+        from .dietary import ingredient_safe_diets, ingredient_violations
+        self.dietary_violations = ingredient_violations(self.name)
+        self.dietary_safe = ingredient_safe_diets(self.name)
+        super().save(*args, **kwargs)
+    
+    @classmethod
+    def get_or_create_many(cls, names):
+        """{name: Ingredient} for the given names, creating the missing ones (two queries)"""
+        from .dietary import ingredient_safe_diets, ingredient_violations
+        names = set(names)
+        found = {}
+        for ingredient in cls.objects.filter(name__in=names):
+            found.setdefault(ingredient.name, ingredient)
+        # bulk_create skips save(), so fill in what it would compute
+        missing = [
+            cls(name=name, dietary_violations=ingredient_violations(name), dietary_safe=ingredient_safe_diets(name))
+            for name in sorted(names - set(found))
+        ]
+        for ingredient in cls.objects.bulk_create(missing):
+            found[ingredient.name] = ingredient
+        return found
 
 
 class Recipe(models.Model):
@@ -136,6 +178,10 @@ class Recipe(models.Model):
         default=0,
         help_text="Number of times this recipe has been viewed"
     )
+    trending_score = models.FloatField(
+        default=0,
+        help_text="Time-decayed popularity (see apps/api/trending.py)"
+    )
     
     # Dietary Restrictions
     DIETARY_CHOICES = [
@@ -156,6 +202,18 @@ class Recipe(models.Model):
         default='none',
         help_text="Dietary restrictions for this recipe"
     )
+    dietary_tags = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Bitmask of every diet this recipe suits, from its label and ingredients (see apps/recipes/dietary.py)"
+    )
+    
+    # Nutrition for the whole recipe, computed from the ingredients (see
+    # apps/recipes/nutrition.py). NULL when an ingredient can't be counted.
+    calories = models.FloatField(null=True, blank=True, editable=False, help_text="Total kcal")
+    protein = models.FloatField(null=True, blank=True, editable=False, help_text="Total protein (g)")
+    carbs = models.FloatField(null=True, blank=True, editable=False, help_text="Total carbohydrates (g)")
+    fat = models.FloatField(null=True, blank=True, editable=False, help_text="Total fat (g)")
     
     # Metadata
     created_at = models.DateTimeField(auto_now_add=True)
@@ -171,6 +229,11 @@ class Recipe(models.Model):
             models.Index(fields=['-created_at']),
             models.Index(fields=['author', '-created_at']),
             models.Index(fields=['category', '-created_at']),
+            models.Index(fields=['-trending_score']),
+            models.Index(fields=['category', '-trending_score']),
+            models.Index(fields=['dietary_tags', '-created_at']),
+            models.Index(fields=['calories']),
+            models.Index(fields=['-protein']),
         ]
     
     def __str__(self):
@@ -179,6 +242,66 @@ class Recipe(models.Model):
     def get_absolute_url(self):
         return reverse('recipes:detail', kwargs={'pk': self.pk})
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remember whether the stored recipe is published (see recipe_saved)"""
+        instance = super().from_db(db, field_names, values)
+        instance._saved_is_published = instance.__dict__.get('is_published')
+        return instance
+    
+    def save(self, *args, **kwargs):
+        if kwargs.get('update_fields') is None:
+            from .dietary import recipe_ingredient_diets, recipe_tags
+            diets = recipe_ingredient_diets([self.pk]) if self.pk else {}
+            self.dietary_tags = recipe_tags(self.dietary_restrictions, *diets.get(self.pk, (0, 0)))
+        super().save(*args, **kwargs)
+    
+    def set_ingredients(self, ingredients_data, replace=False):
+        """
+        Write the recipe's ingredients from [{"name", "quantity", "unit", "notes"}]
+        (the API serializer and the recipe form)
+        
+        Entries without a name or quantity are skipped, repeated ingredients
+        keep their first entry. replace=True deletes the current ingredients
+        first. The rows go in with one bulk INSERT, which sends no signals -
+        the per-row signals below are for one-off edits (e.g. in the admin) -
+        so what depends on them is updated here once for the recipe: a
+        single RecipeChange if it is published, its dietary tags, nutrition
+        and similar-recipes index entry.
+        """
+        entries = [data for data in ingredients_data if data.get('name') and data.get('quantity')]
+        ingredients = Ingredient.get_or_create_many(data['name'].strip() for data in entries)
+        rows = {}
+        for data in entries:
+            ingredient = ingredients[data['name'].strip()]
+            rows.setdefault(ingredient.pk, RecipeIngredient(
+                recipe=self,
+                ingredient=ingredient,
+                quantity=data.get('quantity', 0),
+                unit=data.get('unit', ''),
+                notes=data.get('notes', ''),
+            ))
+        with transaction.atomic(), bulk_ingredient_write(self.pk):
+            if replace:
+                RecipeIngredient.objects.filter(recipe=self).delete()
+            RecipeIngredient.objects.bulk_create(rows.values())
+            if self.is_published and (rows or replace):
+                RecipeChange.record([self.pk], RecipeChange.UPDATED)
+            
+            from .dietary import refresh_recipe_tags
+            from .nutrition import NUTRIENTS, refresh_recipe_nutrition
+            from apps.api.similarity import index_recipe_on_commit
+            refresh_recipe_tags([self.pk])
+            refresh_recipe_nutrition([self.pk])
+            index_recipe_on_commit(self.pk)
+        self.refresh_from_db(fields=['dietary_tags', *NUTRIENTS])
+    
+    @property
+    def dietary_tag_names(self):
+        """Names of the diets this recipe suits (e.g. ['vegetarian', 'gluten-free'])"""
+        from .dietary import tag_names
+        return tag_names(self.dietary_tags)
+    
     @property
     def total_time(self):
         """Calculate total time (prep + cook)"""
@@ -197,9 +320,11 @@ class Recipe(models.Model):
         return self.ratings.count()
     
     def increment_view_count(self):
-        """Increment view count"""
+        """Increment view count (and the hourly/daily analytics counters)"""
+        from apps.api.analytics import record
         self.view_count += 1
         self.save(update_fields=['view_count'])
+        record(self.pk, views=1)
 
 
 class RecipeIngredient(models.Model):
@@ -284,6 +409,13 @@ class Rating(models.Model):
     
     def __str__(self):
         return f"{self.user.username} - {self.stars} stars for {self.recipe.title}"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remember the stored stars, so an edit can count the change (see recipe_activity)"""
+        instance = super().from_db(db, field_names, values)
+        instance._saved_stars = instance.__dict__.get('stars')
+        return instance
 
 
 class Comment(models.Model):
@@ -470,3 +602,621 @@ class MealPlan(models.Model):
     
     def __str__(self):
         return f"{self.user.username} - {self.get_meal_type_display()} on {self.date}"
+
+
+class RecipeChange(models.Model):
+    """
+    Recipe Change Log
+    
+    One row per change to a recipe (or its ingredients/images), logged by
+    signals with record(). Partners read it through /api/recipes/changes/
+    to sync incrementally instead of exporting the whole catalog. The id is
+    the sync cursor, so ids must become visible in order: see record().
+    
+    recipe_id is a plain column (not a foreign key) so the entry for a
+    deleted recipe survives as a tombstone.
+    """
+    CREATED = 'created'
+    UPDATED = 'updated'
+    UNPUBLISHED = 'unpublished'
+    DELETED = 'deleted'
+    ACTION_CHOICES = [
+        (CREATED, 'Created'),
+        (UPDATED, 'Updated'),
+        (UNPUBLISHED, 'Unpublished'),
+        (DELETED, 'Deleted'),
+    ]
+    
+    recipe_id = models.BigIntegerField(
+        help_text="Recipe that changed (kept after the recipe is deleted)"
+    )
+    action = models.CharField(
+        max_length=20,
+        choices=ACTION_CHOICES,
+        help_text="What happened to the recipe"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['id']
+        verbose_name = "Recipe Change"
+        verbose_name_plural = "Recipe Changes"
+        indexes = [
+            models.Index(fields=['recipe_id']),
+        ]
+    
+    def __str__(self):
+        return f"Recipe {self.recipe_id} {self.action}"
+    
+    @classmethod
+    def record(cls, recipe_ids, action):
+        """
+        Log the same change for one or more recipes once the current
+        transaction commits (nothing if it rolls back)
+        
+        Written inside the caller's transaction, a row would get its id when
+        the transaction writes it but become visible when it commits: a slow
+        transaction could commit an id below a cursor partners already
+        have, and they would never see it. Written after the commit, with
+        other change writers locked out until this small transaction ends,
+        every new id is higher than all the visible ones.
+        """
+        changes = [cls(recipe_id=recipe_id, action=action) for recipe_id in recipe_ids]
+        if changes:
+            transaction.on_commit(lambda: cls._insert(changes))
+    
+    @classmethod
+    def _insert(cls, changes):
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                # Blocks other writers of the table, not readers (SQLite
+                # already allows one writer at a time)
+                with connection.cursor() as cursor:
+                    cursor.execute(f'LOCK TABLE {connection.ops.quote_name(cls._meta.db_table)} IN SHARE ROW EXCLUSIVE MODE')
+            cls.objects.bulk_create(changes)
+
+
+class RecipeStatBucket(models.Model):
+    """
+    Recipe Activity Counters per Hour/Day
+    
+    Pre-aggregated counts for the author analytics dashboard, so trends
+    never need a GROUP BY over the Rating/Favorite/Comment tables. Rows are
+    written in batches by apps/api/analytics.py (never one per event).
+    
+    Counters are net changes within the bucket: an unfavorite or a deleted
+    comment subtracts one. author is copied from the recipe so a whole
+    dashboard is one index range scan.
+    """
+    HOUR = 'hour'
+    DAY = 'day'
+    PERIOD_CHOICES = [
+        (HOUR, 'Hour'),
+        (DAY, 'Day'),
+    ]
+    
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='stat_buckets'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='recipe_stat_buckets',
+        help_text="Author of the recipe (denormalized for dashboard queries)"
+    )
+    period = models.CharField(max_length=4, choices=PERIOD_CHOICES)
+    bucket_start = models.DateTimeField(help_text="Start of the hour/day (UTC)")
+    views = models.IntegerField(default=0)
+    favorites = models.IntegerField(default=0)
+    ratings = models.IntegerField(default=0)
+    rating_total = models.IntegerField(
+        default=0,
+        help_text="Sum of the stars of the bucket's ratings (for averages)"
+    )
+    comments = models.IntegerField(default=0)
+    
+    class Meta:
+        ordering = ['bucket_start']
+        verbose_name = "Recipe Stat Bucket"
+        verbose_name_plural = "Recipe Stat Buckets"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'period', 'bucket_start'], name='unique_recipe_stat_bucket'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['author', 'period', 'bucket_start']),
+        ]
+    
+    def __str__(self):
+        return f"Recipe {self.recipe_id} {self.period} {self.bucket_start:%Y-%m-%d %H:00}"
+
+
+class TrendingLandmark(models.Model):
+    """
+    Trending Score Landmark
+    
+    A single row holding the time that Recipe.trending_score values are
+    relative to. Events after it count more the later they happen, which
+    is the same as older events fading away (see apps/api/trending.py).
+    Moving the landmark forward rescales all scores at once.
+    """
+    landmark = models.DateTimeField(help_text="Time the stored trending scores are relative to")
+    
+    class Meta:
+        verbose_name = "Trending Landmark"
+    
+    def __str__(self):
+        return f"Trending scores relative to {self.landmark:%Y-%m-%d %H:%M}"
+    
+    @classmethod
+    def current(cls, lock=False):
+        """The landmark row (created on first use); lock=True locks it until the transaction ends"""
+        from django.utils import timezone
+        queryset = cls.objects.select_for_update() if lock else cls.objects
+        landmark, _ = queryset.get_or_create(pk=1, defaults={'landmark': timezone.now()})
+        return landmark
+
+
+class RecipeSignature(models.Model):
+    """
+    MinHash Signature of a Recipe
+    
+    A compact fingerprint of the recipe's ingredients, category and dietary
+    tag: the share of equal values in two signatures estimates how much the
+    two recipes overlap (see apps/api/similarity.py).
+    """
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='signature'
+    )
+    signature = models.BinaryField(help_text="MinHash values (packed 32-bit integers)")
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Recipe Signature"
+    
+    def __str__(self):
+        return f"Signature of recipe {self.recipe_id}"
+
+
+class RecipeSimilarityBand(models.Model):
+    """
+    LSH Band of a Recipe Signature
+    
+    Each signature is cut into bands; recipes sharing any band key are
+    candidates for "similar recipes", found with one indexed lookup.
+    """
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similarity_bands'
+    )
+    key = models.BigIntegerField(help_text="Hash of the band number and its signature values")
+    
+    class Meta:
+        verbose_name = "Recipe Similarity Band"
+        indexes = [
+            models.Index(fields=['key', 'recipe']),  # Lookups only read the index
+        ]
+    
+    def __str__(self):
+        return f"Band {self.key} of recipe {self.recipe_id}"
+
+
+class RecipeNeighbor(models.Model):
+    """
+    Precomputed Recipe Neighbor
+    
+    "People who favorited/rated this recipe also liked neighbor": the top
+    neighbors of each recipe by cosine similarity of who interacted with
+    them. Rebuilt offline by `python manage.py build_recommendations`
+    (see apps/api/recommendations.py).
+    """
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='neighbors'
+    )
+    neighbor = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    score = models.FloatField(help_text="Cosine similarity (0 - 1)")
+    
+    class Meta:
+        verbose_name = "Recipe Neighbor"
+        constraints = [
+            models.UniqueConstraint(fields=['recipe', 'neighbor'], name='unique_recipe_neighbor'),
+        ]
+    
+    def __str__(self):
+        return f"{self.recipe_id} -> {self.neighbor_id} ({self.score:.2f})"
+
+
+class IngredientNutrition(models.Model):
+    """
+    Ingredient Nutrition
+    
+    Calories and macros per 100 g of an ingredient, and how to weigh it:
+    grams_per_ml turns cups and spoons into grams, grams_per_piece counts
+    like "2 eggs". Used to compute the recipes' nutrition totals (see
+    apps/recipes/nutrition.py).
+    """
+    ingredient = models.OneToOneField(
+        Ingredient,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='nutrition'
+    )
+    calories = models.FloatField(help_text="kcal per 100 g")
+    protein = models.FloatField(help_text="Grams of protein per 100 g")
+    carbs = models.FloatField(help_text="Grams of carbohydrates per 100 g")
+    fat = models.FloatField(help_text="Grams of fat per 100 g")
+    grams_per_ml = models.FloatField(
+        default=1.0,
+        help_text="Density, to convert cups and spoons (water = 1.0, flour = 0.53)"
+    )
+    grams_per_piece = models.FloatField(
+        null=True,
+        blank=True,
+        help_text="Weight of one piece (e.g. one egg = 50), for quantities without a unit"
+    )
+    
+    class Meta:
+        verbose_name = "Ingredient Nutrition"
+        verbose_name_plural = "Ingredient Nutrition"
+    
+    def __str__(self):
+        return f"{self.ingredient}: {self.calories:g} kcal/100 g"
+
+
+class MealPlanTemplate(models.Model):
+    """
+    Meal Plan Template
+    
+    A saved plan ("my usual week") that can be applied to any date range.
+    Its items are placed by day offset (0 = first day) instead of dates.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='meal_plan_templates',
+        help_text="User who saved this template"
+    )
+    name = models.CharField(max_length=100)
+    description = models.TextField(blank=True, max_length=500)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['name']
+        verbose_name = "Meal Plan Template"
+        verbose_name_plural = "Meal Plan Templates"
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'name'], name='unique_meal_plan_template_name'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.name}"
+
+
+class MealPlanTemplateItem(models.Model):
+    """
+    Meal Plan Template Item
+    
+    A recipe for one (day offset, meal type) slot of a template
+    """
+    template = models.ForeignKey(
+        MealPlanTemplate,
+        on_delete=models.CASCADE,
+        related_name='items'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    day = models.PositiveSmallIntegerField(help_text="Day offset from the first day (0 = first day)")
+    meal_type = models.CharField(max_length=20, choices=MealPlan.MEAL_TYPE_CHOICES, default='dinner')
+    notes = models.TextField(blank=True, max_length=500)
+    
+    class Meta:
+        ordering = ['day', 'meal_type']
+        verbose_name = "Meal Plan Template Item"
+        constraints = [
+            models.UniqueConstraint(fields=['template', 'day', 'meal_type'], name='unique_meal_plan_template_slot'),
+        ]
+    
+    def __str__(self):
+        return f"{self.template.name}: day {self.day} {self.meal_type}"
+
+
+# Signals to invalidate cached catalog pages and HTTP validators
+# (see apps/api/response_cache.py and apps/api/conditional.py)
+from contextlib import contextmanager
+
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+
+
+@contextmanager
+def bulk_ingredient_write(recipe_id):
+    """
+    Marks a recipe whose ingredients Recipe.set_ingredients() is rewriting:
+    per-row ingredient signals skip it (set_ingredients() does their work
+    once). Kept on the connection, so it only applies to this thread.
+    """
+    writing = connection.__dict__.setdefault('recipes_bulk_ingredient_write', set())
+    writing.add(recipe_id)
+    try:
+        yield
+    finally:
+        writing.discard(recipe_id)
+
+
+def in_bulk_ingredient_write(recipe_id):
+    return recipe_id in connection.__dict__.get('recipes_bulk_ingredient_write', ())
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+@receiver(post_save, sender=Rating)
+@receiver(post_delete, sender=Rating)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+def catalog_changed(sender, instance, **kwargs):
+    """
+    Signal receiver - Bumps the catalog version so cached list, search and
+    category pages are recomputed
+    
+    View counter updates are skipped: they happen on every detail view and
+    would make the cache useless. Cached pages show view counts that are at
+    most a few minutes old.
+    
+    The bump waits for the transaction to commit: done earlier, a request in
+    between would cache the old catalog under the new version.
+    """
+    update_fields = kwargs.get('update_fields')
+    if update_fields and set(update_fields) <= {'view_count'}:
+        return
+    
+    from apps.api.conditional import touch_resource
+    from apps.api.response_cache import CATALOG_NAMESPACE, bump_catalog_version
+    
+    def bump():
+        bump_catalog_version()
+        touch_resource(CATALOG_NAMESPACE)
+    transaction.on_commit(bump)
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+@receiver(post_save, sender=RecipeImage)
+@receiver(post_delete, sender=RecipeImage)
+@receiver(post_save, sender=Rating)
+@receiver(post_delete, sender=Rating)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+def recipe_stats_changed(sender, instance, **kwargs):
+    """
+    Signal receiver - Marks a recipe's related data as changed so its detail
+    ETag changes (the recipe's own updated_at doesn't move when it gets a
+    new rating, comment or favorite), once the transaction commits
+    """
+    from apps.api.conditional import touch_resource, recipe_resource
+    resource = recipe_resource(instance.recipe_id)
+    transaction.on_commit(lambda: touch_resource(resource))
+
+
+@receiver(post_save, sender=MealPlan)
+@receiver(post_delete, sender=MealPlan)
+def meal_plans_changed(sender, instance, **kwargs):
+    """
+    Signal receiver - Marks a user's meal plans as changed so iCal exports
+    and grocery lists are not answered with 304 after a deletion (once the
+    transaction commits, so no request sees the new time with the old plans)
+    """
+    from apps.api.conditional import touch_resource, meal_plans_resource
+    resource = meal_plans_resource(instance.user_id)
+    transaction.on_commit(lambda: touch_resource(resource))
+
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+def user_favorites_changed(sender, instance, **kwargs):
+    """
+    Signal receiver - Drops the user's cached favorite set (used for
+    is_favorited in the API, see apps/api/personalization.py)
+    """
+    from apps.api.personalization import invalidate_user_favorites
+    invalidate_user_favorites(instance.user_id)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, created, **kwargs):
+    """
+    Signal receiver - Logs a RecipeChange for partner sync
+    
+    Recipes that stop being published are logged as 'unpublished' so
+    partners drop them. Drafts that were never published are not logged at
+    all - partners must not learn their ids.
+    """
+    update_fields = kwargs.get('update_fields')
+    if update_fields and set(update_fields) <= {'view_count'}:
+        return
+    was_published = getattr(instance, '_saved_is_published', None)
+    instance._saved_is_published = instance.is_published
+    if instance.is_published:
+        action = RecipeChange.CREATED if created else RecipeChange.UPDATED
+    elif created:
+        return
+    elif was_published or (was_published is None and _on_change_feed(instance.pk)):
+        action = RecipeChange.UNPUBLISHED
+    else:
+        return
+    RecipeChange.record([instance.pk], action)
+
+
+def _on_change_feed(recipe_id):
+    """Whether the change feed already mentions a recipe (only published recipes get there)"""
+    return RecipeChange.objects.filter(recipe_id=recipe_id).exists()
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    """Signal receiver - Logs a tombstone RecipeChange for partner sync (not for drafts)"""
+    if instance.is_published or _on_change_feed(instance.pk):
+        RecipeChange.record([instance.pk], RecipeChange.DELETED)
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+@receiver(post_save, sender=RecipeImage)
+@receiver(post_delete, sender=RecipeImage)
+def recipe_parts_changed(sender, instance, **kwargs):
+    """
+    Signal receiver - Logs a RecipeChange when the ingredients or images
+    of a published recipe change
+    """
+    if sender is RecipeIngredient and in_bulk_ingredient_write(instance.recipe_id):
+        return
+    if sender.recipe.is_cached(instance):
+        published = instance.recipe.is_published
+    else:
+        published = Recipe.objects.filter(pk=instance.recipe_id, is_published=True).exists()
+    if published:
+        RecipeChange.record([instance.recipe_id], RecipeChange.UPDATED)
+
+
+@receiver(pre_save, sender=Rating)
+def rating_stars_snapshot(sender, instance, **kwargs):
+    """
+    Signal receiver - Looks up the stored stars of a rating that is saved
+    without them (built by hand or loaded with .only()), for recipe_activity
+    """
+    if instance.pk and getattr(instance, '_saved_stars', None) is None:
+        instance._saved_stars = (
+            Rating.objects.filter(pk=instance.pk).values_list('stars', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=Comment)
+@receiver(post_save, sender=Rating)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=Comment)
+@receiver(post_delete, sender=Rating)
+def recipe_activity(sender, instance, **kwargs):
+    """
+    Signal receiver - Counts new (or removed) favorites, comments and
+    ratings in the author analytics buckets (see apps/api/analytics.py)
+    
+    Editing a comment doesn't change the counters; editing a rating adds
+    the change in stars to rating_total, so a later delete (which
+    subtracts the current stars) leaves the totals balanced.
+    """
+    from apps.api.analytics import record_on_commit
+    
+    created = kwargs.get('created')
+    if created is False:
+        if sender is not Rating:
+            return
+        previous = getattr(instance, '_saved_stars', None)
+        if previous is None:
+            return
+        instance._saved_stars = instance.stars
+        if instance.stars != previous:
+            record_on_commit(instance.recipe_id, rating_total=instance.stars - previous)
+        return
+    sign = 1 if created else -1
+    counter = {Favorite: 'favorites', Comment: 'comments', Rating: 'ratings'}[sender]
+    amounts = {counter: sign}
+    if sender is Rating:
+        amounts['rating_total'] = sign * instance.stars
+        instance._saved_stars = instance.stars
+    
+    record_on_commit(instance.recipe_id, **amounts)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def recipe_features_changed(sender, instance, **kwargs):
+    """
+    Signal receiver - Updates the recipe's entry in the similar-recipes
+    index (see apps/api/similarity.py) after the transaction commits
+    """
+    update_fields = kwargs.get('update_fields')
+    if update_fields and set(update_fields) <= {'view_count'}:
+        return
+    if sender is RecipeIngredient and in_bulk_ingredient_write(instance.recipe_id):
+        return  # Recipe.set_ingredients() queues it once
+    
+    from apps.api.similarity import index_recipe_on_commit
+    index_recipe_on_commit(instance.pk if sender is Recipe else instance.recipe_id)
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def recipe_tags_changed(sender, instance, **kwargs):
+    """
+    Signal receiver - Recomputes the recipe's dietary tags from its
+    ingredients (see apps/recipes/dietary.py) after a one-off edit;
+    Recipe.set_ingredients() does it once for the whole list
+    """
+    if in_bulk_ingredient_write(instance.recipe_id):
+        return
+    from .dietary import refresh_recipe_tags
+    refresh_recipe_tags([instance.recipe_id])
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def recipe_ingredients_changed(sender, instance, **kwargs):
+    """
+    Signal receiver - Recomputes the recipe's nutrition from its
+    ingredients (see apps/recipes/nutrition.py) after a one-off edit;
+    Recipe.set_ingredients() does it once for the whole list
+    """
+    if in_bulk_ingredient_write(instance.recipe_id):
+        return
+    from .nutrition import refresh_recipe_nutrition
+    refresh_recipe_nutrition([instance.recipe_id])
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_saved(sender, instance, created, **kwargs):
+    """
+    Signal receiver - Recomputes the dietary tags of recipes using a renamed
+    ingredient (its dietary violations and known diets may have changed)
+    """
+    if created:
+        return
+    from .dietary import refresh_recipe_tags
+    refresh_recipe_tags(RecipeIngredient.objects.filter(ingredient=instance).values_list('recipe_id', flat=True))
+
+
+@receiver(post_save, sender=IngredientNutrition)
+@receiver(post_delete, sender=IngredientNutrition)
+def ingredient_nutrition_changed(sender, instance, **kwargs):
+    """
+    Signal receiver - Recomputes the nutrition of every recipe using the
+    ingredient
+    """
+    from .nutrition import refresh_ingredient_recipes
+    refresh_ingredient_recipes(instance.ingredient_id)
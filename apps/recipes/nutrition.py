@@ -0,0 +1,188 @@
+"""
+Recipe nutrition: precomputed calories and macros
+
+Filtering by calories can't add up ingredients on every request, so each
+recipe stores its totals (Recipe.calories, protein, carbs and fat, for the
+whole recipe) and the API filters on those indexed columns.
+
+Computing them:
+
+1. IngredientNutrition holds calories and grams of protein, carbs and fat
+   per 100 g of an ingredient, plus what it takes to turn other units into
+   grams: the density (grams per ml, for cups and spoons) and the weight of
+   one piece (for "2 eggs" or "3 cloves").
+2. Every RecipeIngredient quantity is converted to grams (to_grams()).
+3. The totals of a batch of recipes are one matrix product:
+
+       totals (recipes x nutrients) = grams (recipes x ingredients)
+                                      @ per-gram values (ingredients x nutrients)
+
+   computed with NumPy as a scatter-add over the ingredient rows (the grams
+   matrix is mostly zeros, so it's never built). Without NumPy the same sum
+   runs in plain Python.
+
+A recipe gets totals only if every ingredient could be converted: a sum
+missing the butter would let a rich recipe through ?max_calories=. Others
+keep NULL (and are left out by the nutrition filters).
+
+Totals are recomputed when a recipe's ingredients or an ingredient's
+nutrition change (signals in apps/recipes/models.py). To load nutrition
+data and compute everything:
+
+    python manage.py compute_nutrition --load apps/recipes/fixtures/ingredient_nutrition.csv
+"""
+
+import re
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover - optional dependency
+    numpy = None
+
+NUTRIENTS = ('calories', 'protein', 'carbs', 'fat')
+BATCH_SIZE = 1000
+
+GRAMS_PER_UNIT = {
+    'g': 1, 'gram': 1, 'kg': 1000, 'kilogram': 1000, 'mg': 0.001,
+    'oz': 28.35, 'ounce': 28.35, 'lb': 453.6, 'pound': 453.6,
+}
+ML_PER_UNIT = {
+    'ml': 1, 'milliliter': 1, 'millilitre': 1, 'l': 1000, 'liter': 1000, 'litre': 1000,
+    'tsp': 4.93, 'teaspoon': 4.93, 'tbsp': 14.79, 'tablespoon': 14.79,
+    'cup': 236.6, 'fl oz': 29.57, 'pint': 473.2, 'quart': 946.4,
+    'pinch': 0.31, 'dash': 0.62,
+}
+PIECE_UNITS = {'', 'piece', 'whole', 'small', 'medium', 'large', 'clove', 'slice', 'stick', 'sprig', 'leaf'}
+
+
+def normalize_unit(unit):
+    """'Cups' -> 'cup', 'tbsp.' -> 'tbsp', 'leaves' -> 'leaf'"""
+    unit = ' '.join((unit or '').lower().replace('.', ' ').split())
+    if unit in GRAMS_PER_UNIT or unit in ML_PER_UNIT or unit in PIECE_UNITS:
+        return unit
+    for plural, singular in (('ves', 'f'), ('es', ''), ('s', '')):
+        if unit.endswith(plural) and unit[:-len(plural)] + singular in (
+            GRAMS_PER_UNIT.keys() | ML_PER_UNIT.keys() | PIECE_UNITS
+        ):
+            return unit[:-len(plural)] + singular
+    return unit
+
+
+def to_grams(quantity, unit, grams_per_ml=1.0, grams_per_piece=None):
+    """Weight in grams of a quantity, or None if the unit can't be converted"""
+    quantity = float(quantity)
+    unit = normalize_unit(unit)
+    if unit in GRAMS_PER_UNIT:
+        return quantity * GRAMS_PER_UNIT[unit]
+    if unit in ML_PER_UNIT:
+        return quantity * ML_PER_UNIT[unit] * grams_per_ml
+    if unit in PIECE_UNITS and grams_per_piece:
+        return quantity * grams_per_piece
+    return None
+
+
+# ========== COMPUTING ==========
+
+def _ingredient_table(ingredient_ids):
+    """{ingredient id: (per-gram nutrient values, grams per ml, grams per piece)}"""
+    from .models import IngredientNutrition
+    return {
+        ingredient_id: ([value / 100 for value in values], grams_per_ml, grams_per_piece)
+        for ingredient_id, grams_per_ml, grams_per_piece, *values in IngredientNutrition.objects.filter(
+            ingredient_id__in=ingredient_ids
+        ).values_list('ingredient_id', 'grams_per_ml', 'grams_per_piece', *NUTRIENTS)
+    }
+
+
+def compute_nutrition(recipe_ids):
+    """
+    {recipe id: {nutrient: total} or None} for the given recipes
+
+    None when a recipe has no ingredients or one that can't be converted.
+    """
+    from .models import RecipeIngredient
+    recipe_ids = list(recipe_ids)
+    rows = list(RecipeIngredient.objects.filter(recipe_id__in=recipe_ids).values_list(
+        'recipe_id', 'ingredient_id', 'quantity', 'unit'
+    ))
+    table = _ingredient_table({ingredient_id for _, ingredient_id, _, _ in rows})
+
+    incomplete = set()
+    recipe_index, ingredient_index = {}, {}
+    recipes, ingredients, grams = [], [], []
+    for recipe_id, ingredient_id, quantity, unit in rows:
+        if recipe_id in incomplete:
+            continue
+        nutrition = table.get(ingredient_id)
+        weight = to_grams(quantity, unit, *nutrition[1:]) if nutrition is not None else None
+        if weight is None:
+            incomplete.add(recipe_id)
+            continue
+        recipes.append(recipe_index.setdefault(recipe_id, len(recipe_index)))
+        ingredients.append(ingredient_index.setdefault(ingredient_id, len(ingredient_index)))
+        grams.append(weight)
+    per_gram = [table[ingredient_id][0] for ingredient_id in ingredient_index]
+
+    if numpy is not None and grams:
+        totals = numpy.zeros((len(recipe_index), len(NUTRIENTS)))
+        amounts = numpy.asarray(grams)[:, None] * numpy.asarray(per_gram)[ingredients]
+        numpy.add.at(totals, recipes, amounts)
+        totals = totals.tolist()
+    else:
+        totals = [[0.0] * len(NUTRIENTS) for _ in recipe_index]
+        for row, column, weight in zip(recipes, ingredients, grams):
+            for position, value in enumerate(per_gram[column]):
+                totals[row][position] += weight * value
+
+    results = dict.fromkeys(recipe_ids)
+    for recipe_id, row in recipe_index.items():
+        if recipe_id not in incomplete:
+            results[recipe_id] = {name: round(total, 1) for name, total in zip(NUTRIENTS, totals[row])}
+    return results
+
+
+def refresh_recipe_nutrition(recipe_ids, batch_size=BATCH_SIZE):
+    """Recompute and store the totals of recipes. Returns the number of recipes that changed"""
+    from .models import Recipe
+    recipe_ids = list(dict.fromkeys(recipe_ids))
+    changed = 0
+    for start in range(0, len(recipe_ids), batch_size):
+        batch = recipe_ids[start:start + batch_size]
+        totals = compute_nutrition(batch)
+        updates = []
+        for recipe_id, *current in Recipe.objects.filter(pk__in=batch).values_list('pk', *NUTRIENTS):
+            values = totals[recipe_id] or dict.fromkeys(NUTRIENTS)
+            if [values[name] for name in NUTRIENTS] != current:
+                updates.append(Recipe(pk=recipe_id, **values))
+        if updates:
+            Recipe.objects.bulk_update(updates, NUTRIENTS)
+            changed += len(updates)
+    return changed
+
+
+def refresh_ingredient_recipes(ingredient_id):
+    """Recompute the recipes that use an ingredient (its nutrition changed)"""
+    from .models import RecipeIngredient
+    return refresh_recipe_nutrition(
+        RecipeIngredient.objects.filter(ingredient_id=ingredient_id).values_list('recipe_id', flat=True)
+    )
+
+
+# ========== LOADING ==========
+
+_NUMBER = re.compile(r'^-?\d+(\.\d+)?$')
+
+
+def parse_nutrition_row(row):
+    """Field values for IngredientNutrition from a CSV row (ValueError if invalid)"""
+    values = {}
+    for name in NUTRIENTS + ('grams_per_ml', 'grams_per_piece'):
+        raw = (row.get(name) or '').strip()
+        if not raw:
+            if name in NUTRIENTS:
+                raise ValueError(f'{name} is required')
+            continue
+        if not _NUMBER.match(raw) or float(raw) < 0:
+            raise ValueError(f'{name} must be a non-negative number, not {raw!r}')
+        values[name] = float(raw)
+    return values
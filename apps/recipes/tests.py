@@ -6,6 +6,9 @@ This test suite verifies:
 2. All model relationships (ForeignKeys, ManyToMany, OneToOne)
 3. Model methods and properties
 4. Constraints and validations
+5. Dietary tag bitmasks inferred from ingredients
+6. Precomputed recipe nutrition
+7. The recipe detail page stays bounded at 10k ratings
 """
 
 from django.test import TestCase
@@ -91,6 +94,11 @@ class RecipeModelTest(TestCase):
             category=self.category
         )
     
+    def tearDown(self):
+        """Drop the analytics views buffered by the test"""
+        from apps.api import analytics
+        analytics._buffer.clear()
+    
     def test_recipe_creation(self):
         """Test recipe can be created"""
         self.assertEqual(self.recipe.title, "Test Recipe")
@@ -189,6 +197,213 @@ class RecipeIngredientModelTest(TestCase):
         self.assertEqual(str(self.recipe_ingredient), expected)
 
 
+class DietaryTagsTest(TestCase):
+    """Test dietary tags are inferred from ingredients and filter with one indexed lookup"""
+    
+    def setUp(self):
+        """Set up test data"""
+        self.user = User.objects.create_user(
+            username="testchef",
+            email="test@example.com",
+            password="testpass123"
+        )
+        self.salad = self.make_recipe("Salad", ["Tomato", "Olive oil", "Basil"])
+        self.pancakes = self.make_recipe("Pancakes", ["All-purpose flour", "Eggs", "Butter"])
+        self.curry = self.make_recipe("Curry", ["Chicken thighs", "Coconut milk", "Rice"], label='halal')
+    
+    def make_recipe(self, title, names, label='none'):
+        recipe = Recipe.objects.create(
+            title=title, description="", instructions="", author=self.user, dietary_restrictions=label
+        )
+        for name in names:
+            ingredient, _ = Ingredient.objects.get_or_create(name=name)
+            RecipeIngredient.objects.create(recipe=recipe, ingredient=ingredient, quantity=1)
+        return recipe
+    
+    def tags(self, recipe):
+        recipe.refresh_from_db()
+        return recipe.dietary_tag_names
+    
+    def test_ingredient_violations(self):
+        """Test keyword rules, plurals and exceptions"""
+        from .dietary import ingredient_violations, tag_names
+        self.assertEqual(tag_names(ingredient_violations("Butter")), ['vegan', 'paleo'])
+        self.assertEqual(tag_names(ingredient_violations("Eggs")), ['vegan'])
+        self.assertEqual(ingredient_violations("Eggplant"), 0)
+        self.assertEqual(ingredient_violations("Coconut milk"), 0)
+        self.assertNotIn('gluten-free', tag_names(ingredient_violations("Rice flour")))
+        self.assertEqual(Ingredient.objects.get(name="Butter").dietary_violations, ingredient_violations("Butter"))
+    
+    def test_recipe_tags(self):
+        """Test a recipe can suit several diets at once"""
+        self.assertEqual(self.tags(self.salad), ['vegetarian', 'vegan', 'gluten-free', 'pescatarian'])
+        self.assertEqual(self.tags(self.pancakes), ['vegetarian', 'pescatarian'])
+        # The author's label adds diets ingredients can't tell, unless an ingredient rules them out
+        self.assertEqual(self.tags(self.curry), ['gluten-free', 'halal'])
+        self.make_recipe("Bacon curry", ["Bacon", "Rice"], label='halal')
+        self.assertEqual(self.tags(Recipe.objects.get(title="Bacon curry")), [])
+    
+    def test_unknown_ingredients_are_not_safe(self):
+        """Test diets are only inferred when every ingredient is known to suit them"""
+        from .dietary import ingredient_safe_diets, tag_names
+        for name in ("Croutons", "Spelt", "Farro", "Ramen", "Gnocchi", "Malt vinegar"):
+            self.assertNotIn('gluten-free', tag_names(ingredient_safe_diets(name)), name)
+        for name in ("Gelatine", "Worcestershire sauce", "Vegetable stock", "Chicken broth"):
+            self.assertNotIn('vegan', tag_names(ingredient_safe_diets(name)), name)
+        self.assertEqual(tag_names(ingredient_safe_diets("Chicken thighs")), ['gluten-free'])
+        self.assertEqual(len(tag_names(ingredient_safe_diets("Fresh strawberries, halved"))), 4)
+        
+        soup = self.make_recipe("Soup", ["Tomato", "Vegetable stock"])
+        self.assertEqual(self.tags(soup), [])
+        # The author's label still counts when the ingredients can't tell
+        labeled = self.make_recipe("Labeled soup", ["Tomato", "Vegetable stock"], label='vegan')
+        self.assertEqual(self.tags(labeled), ['vegetarian', 'vegan', 'pescatarian'])
+    
+    def test_tags_follow_ingredient_changes(self):
+        """Test tags are recomputed when ingredients change"""
+        RecipeIngredient.objects.create(
+            recipe=self.salad, ingredient=Ingredient.objects.create(name="Feta cheese"), quantity=1
+        )
+        self.assertEqual(self.tags(self.salad), ['vegetarian', 'gluten-free', 'pescatarian'])
+        
+        RecipeIngredient.objects.filter(recipe=self.salad, ingredient__name="Feta cheese").delete()
+        self.assertIn('vegan', self.tags(self.salad))
+        
+        basil = Ingredient.objects.get(name="Basil")
+        basil.name = "Basil and anchovies"
+        basil.save()
+        self.assertEqual(self.tags(self.salad), ['gluten-free', 'pescatarian'])
+    
+    def test_ingredient_list_computes_tags_once(self):
+        """Test replacing a recipe's ingredients recomputes its tags once, not per row"""
+        from unittest import mock
+        from . import dietary
+        names = ["Tomato", "Basil", "Olive oil", "Feta cheese", "Cucumber", "Red onion"]
+        with mock.patch.object(dietary, 'refresh_recipe_tags', wraps=dietary.refresh_recipe_tags) as refresh:
+            self.salad.set_ingredients([{'name': name, 'quantity': 1} for name in names], replace=True)
+        refresh.assert_called_once_with([self.salad.pk])
+        self.assertEqual(self.salad.dietary_tag_names, ['vegetarian', 'gluten-free', 'pescatarian'])
+        self.assertEqual(Ingredient.objects.get(name="Feta cheese").dietary_violations,
+                         dietary.ingredient_violations("Feta cheese"))
+    
+    def test_compatible_with(self):
+        """Test the filter needs every requested diet"""
+        from .dietary import compatible_with, diet_mask
+        def titles(*diets):
+            return set(Recipe.objects.filter(compatible_with(diet_mask(diets))).values_list('title', flat=True))
+        self.assertEqual(titles('vegan', 'gluten-free'), {'Salad'})
+        self.assertEqual(titles('vegetarian'), {'Salad', 'Pancakes'})
+        self.assertEqual(titles('gluten-free'), {'Salad', 'Curry'})
+        self.assertEqual(titles(), {'Salad', 'Pancakes', 'Curry'})
+        with self.assertRaises(ValueError):
+            diet_mask(['carnivore'])
+
+
+class NutritionTest(TestCase):
+    """Test recipe nutrition totals are computed from ingredient nutrition"""
+    
+    def setUp(self):
+        """Set up test data"""
+        from .models import IngredientNutrition
+        self.user = User.objects.create_user(
+            username="testchef",
+            email="test@example.com",
+            password="testpass123"
+        )
+        self.flour = Ingredient.objects.create(name="Flour")
+        self.eggs = Ingredient.objects.create(name="Eggs")
+        self.saffron = Ingredient.objects.create(name="Saffron")
+        IngredientNutrition.objects.create(
+            ingredient=self.flour, calories=364, protein=10, carbs=76, fat=1, grams_per_ml=0.5
+        )
+        IngredientNutrition.objects.create(
+            ingredient=self.eggs, calories=143, protein=12.6, carbs=0.7, fat=9.5, grams_per_piece=50
+        )
+        self.recipe = Recipe.objects.create(title="Pasta dough", description="", instructions="", author=self.user)
+        RecipeIngredient.objects.create(recipe=self.recipe, ingredient=self.flour, quantity=200, unit="g")
+        RecipeIngredient.objects.create(recipe=self.recipe, ingredient=self.eggs, quantity=2, unit="")
+    
+    def test_totals(self):
+        """Test grams and pieces are converted and summed"""
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.calories, 871.0)  # 2 x 364 + 100 g of egg x 1.43
+        self.assertEqual(self.recipe.protein, 32.6)
+        self.assertEqual(self.recipe.fat, 11.5)
+    
+    def test_volume_units(self):
+        """Test cups and spoons use the ingredient's density"""
+        from .nutrition import to_grams
+        self.assertAlmostEqual(to_grams(1, 'Cups', grams_per_ml=0.5), 118.3)
+        self.assertAlmostEqual(to_grams(2, 'tbsp.'), 29.58)
+        self.assertIsNone(to_grams(1, 'handful'))
+        self.assertIsNone(to_grams(1, 'pieces'))  # No piece weight
+    
+    def test_unknown_ingredient_leaves_totals_empty(self):
+        """Test a recipe with an ingredient without data has no totals"""
+        saffron = RecipeIngredient.objects.create(
+            recipe=self.recipe, ingredient=self.saffron, quantity=1, unit="pinch"
+        )
+        self.recipe.refresh_from_db()
+        self.assertIsNone(self.recipe.calories)
+        
+        saffron.delete()
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.calories, 871.0)
+    
+    def test_ingredient_list_computes_nutrition_once(self):
+        """Test replacing a recipe's ingredients computes its nutrition once, not per row"""
+        from unittest import mock
+        from . import nutrition
+        ingredients = [
+            {'name': "Flour", 'quantity': 300, 'unit': "g"},
+            {'name': "Eggs", 'quantity': 3},
+            {'name': "Flour", 'quantity': 1, 'unit': "kg"},  # Repeats keep the first entry
+        ]
+        with mock.patch.object(nutrition, 'compute_nutrition', wraps=nutrition.compute_nutrition) as compute:
+            self.recipe.set_ingredients(ingredients, replace=True)
+        compute.assert_called_once_with([self.recipe.pk])
+        self.assertEqual(self.recipe.calories, 1306.5)  # 3 x 364 + 150 g of egg x 1.43
+    
+    def test_nutrition_changes_update_recipes(self):
+        """Test editing an ingredient's nutrition recomputes its recipes"""
+        nutrition = self.eggs.nutrition
+        nutrition.calories = 150
+        nutrition.save()
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.calories, 878.0)
+    
+    def test_batch_matches_pure_python(self):
+        """Test the NumPy matrix product and the fallback agree"""
+        from unittest import mock
+        from . import nutrition
+        other = Recipe.objects.create(title="Omelette", description="", instructions="", author=self.user)
+        RecipeIngredient.objects.create(recipe=other, ingredient=self.eggs, quantity=3, unit="pieces")
+        ids = [self.recipe.pk, other.pk]
+        with mock.patch.object(nutrition, 'numpy', None):
+            expected = nutrition.compute_nutrition(ids)
+        self.assertEqual(nutrition.compute_nutrition(ids), expected)
+        self.assertEqual(expected[other.pk]['calories'], 214.5)
+    
+    def test_load_command(self):
+        """Test compute_nutrition --load reads a CSV and recomputes recipes"""
+        import os
+        import tempfile
+        from io import StringIO
+        from django.core.management import call_command
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as handle:
+            handle.write("name,calories,protein,carbs,fat,grams_per_ml,grams_per_piece\n")
+            handle.write("saffron,310,11.4,65.4,5.9,,\n")
+            handle.write("eggs,100,10,1,5,,50\n")
+        self.addCleanup(os.unlink, handle.name)
+        RecipeIngredient.objects.create(recipe=self.recipe, ingredient=self.saffron, quantity=1, unit="g")
+        
+        out = StringIO()
+        call_command('compute_nutrition', '--load', handle.name, stdout=out)
+        self.assertIn('Loaded nutrition for 2 ingredients', out.getvalue())
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.calories, 831.1)  # 728 + 100 + 3.1
+
+
 class RatingModelTest(TestCase):
     """Test Rating model and relationships"""
     
@@ -529,3 +744,72 @@ class ModelRelationshipsIntegrationTest(TestCase):
         self.assertEqual(self.recipe.average_rating, 4.5)
         self.assertEqual(self.recipe.comment_count, 1)
         self.assertEqual(self.recipe.favorites.count(), 1)
+
+
+class RecipeDetailViewTest(TestCase):
+    """Test the recipe page costs the same few queries and little memory at 10k ratings"""
+    
+    RATINGS = 10000
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username="author", email="author@example.com", password="pass")
+        cls.recipe = Recipe.objects.create(
+            title="Popular", description="Loved", instructions="Cook", author=cls.author,
+        )
+        users = User.objects.bulk_create([
+            User(username=f"fan{i}", email=f"fan{i}@example.com", password="!") for i in range(cls.RATINGS)
+        ])
+        Rating.objects.bulk_create([
+            Rating(recipe=cls.recipe, user=user, stars=4 if i % 2 else 5) for i, user in enumerate(users)
+        ])
+        Comment.objects.bulk_create([
+            Comment(recipe=cls.recipe, user=user, text=f"Comment {i}") for i, user in enumerate(users[:30])
+        ])
+        Favorite.objects.bulk_create([Favorite(recipe=cls.recipe, user=user) for user in users[:25]])
+        cls.fan = users[0]
+    
+    def get_page(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/recipes/{self.recipe.pk}/')
+        self.assertEqual(response.status_code, 200)
+        return response, queries
+    
+    def tearDown(self):
+        """Drop the analytics views buffered by the test"""
+        from apps.api import analytics
+        analytics._buffer.clear()
+    
+    def test_bounded_queries(self):
+        """Test stats come from aggregates and only the shown items are loaded"""
+        response, queries = self.get_page()
+        self.assertLessEqual(len(queries), 8)
+        self.assertEqual(len(response.context['ratings']), 10)
+        self.assertEqual(len(response.context['comments']), 10)
+        self.assertEqual(response.context['stats'], {
+            'average_rating': 4.5, 'rating_count': self.RATINGS, 'comment_count': 30, 'favorite_count': 25,
+        })
+        self.assertContains(response, f'from {self.RATINGS} ratings')
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.view_count, 1)  # Counted once
+        
+        self.client.force_login(self.fan)
+        response, logged_in_queries = self.get_page()
+        self.assertLessEqual(len(logged_in_queries), len(queries) + 4)  # Session, user, their rating
+        self.assertTrue(response.context['is_favorited'])
+        self.assertEqual(response.context['user_rating'].user, self.fan)
+        self.assertFalse(response.context['can_edit'])
+    
+    def test_bounded_memory(self):
+        """Test rendering the page doesn't load the 10k ratings"""
+        import tracemalloc
+        self.get_page()  # Warm up templates and caches
+        tracemalloc.start()
+        try:
+            self.get_page()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertLess(peak, 2 * 1024 * 1024)
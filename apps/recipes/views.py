@@ -8,12 +8,26 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.core.paginator import Paginator
-from django.db.models import Q
+from django.db.models import Exists, OuterRef, Prefetch, Q
 from django.views.generic import ListView, DetailView
-from django.http import JsonResponse
+from django.http import JsonResponse, Http404
 from django.views.decorators.http import require_POST
 from .models import Recipe, Category, Ingredient, RecipeIngredient, Rating, Comment, Favorite
 from .forms import RecipeForm, RecipeIngredientForm, RatingForm, CommentForm
+from apps.api.projections import related_average, related_count
+from apps.api.response_cache import cached_page, catalog_memoize
+
+DETAIL_RECENT_ITEMS = 10  # Comments and ratings shown on a recipe page
+
+
+def _recent(model):
+    """The DETAIL_RECENT_ITEMS newest comments/ratings of a recipe, with their users"""
+    return model.objects.select_related('user').order_by('-created_at', '-pk')[:DETAIL_RECENT_ITEMS]
+
+
+def get_categories():
+    """All categories (cached until the catalog changes)"""
+    return catalog_memoize(['categories'], lambda: list(Category.objects.all()))
 
 
 class RecipeListView(ListView):
@@ -42,64 +56,102 @@ class RecipeListView(ListView):
         
         return queryset
     
+    def paginate_queryset(self, queryset, page_size):
+        """Paginate, serving anonymous visitors from the catalog page cache"""
+        def paginate():
+            paginator, page, _, _ = super(RecipeListView, self).paginate_queryset(queryset, page_size)
+            return paginator, page
+        
+        def make_paginator():
+            return self.get_paginator(
+                queryset, page_size,
+                orphans=self.get_paginate_orphans(),
+                allow_empty_first_page=self.get_allow_empty(),
+            )
+        
+        paginator, page = cached_page(self.request, ['recipe_list'], paginate, make_paginator)
+        return (paginator, page, page.object_list, page.has_other_pages())
+    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['categories'] = Category.objects.all()
+        context['categories'] = get_categories()
         context['selected_category'] = self.request.GET.get('category')
         context['search_query'] = self.request.GET.get('search', '')
         return context
 
 
 class RecipeDetailView(DetailView):
-    """View a single recipe"""
+    """
+    View a single recipe
+    
+    The page is built from one fetch of the recipe (get_object() runs once
+    per request, and so does the view count):
+    - rating average and rating/comment/favorite counts are subquery
+      aggregates in the recipe's own query - no rating rows are loaded
+    - only the DETAIL_RECENT_ITEMS newest comments and ratings are
+      prefetched (sliced Prefetch querysets), with their users
+    - whether the user favorited the recipe is an EXISTS annotation, and
+      their own rating one small prefetch
+    
+    A popular recipe with thousands of ratings costs the same few queries
+    and little memory.
+    """
     model = Recipe
     template_name = 'recipes/detail.html'
     context_object_name = 'recipe'
     
     def get_queryset(self):
-        return Recipe.objects.select_related('author', 'category').prefetch_related(
+        queryset = Recipe.objects.select_related('author', 'category').annotate(
+            stats_average_rating=related_average(Rating, 'stars'),
+            stats_rating_count=related_count(Rating),
+            stats_comment_count=related_count(Comment),
+            stats_favorite_count=related_count(Favorite),
+        ).prefetch_related(
             'recipe_ingredients__ingredient',
-            'ratings__user',
-            'comments__user',
-            'favorites__user'
+            Prefetch('comments', queryset=_recent(Comment), to_attr='recent_comments'),
+            Prefetch('ratings', queryset=_recent(Rating), to_attr='recent_ratings'),
         )
+        user = self.request.user
+        if user.is_authenticated:
+            queryset = queryset.annotate(
+                user_favorited=Exists(Favorite.objects.filter(recipe=OuterRef('pk'), user=user)),
+            ).prefetch_related(
+                Prefetch('ratings', queryset=Rating.objects.filter(user=user), to_attr='user_ratings'),
+            )
+        return queryset
     
     def get_object(self, queryset=None):
-        """Get recipe and increment view count"""
-        recipe = super().get_object(queryset)
-        # Increment view count (only for published recipes)
-        if recipe.is_published:
-            recipe.increment_view_count()
-        return recipe
+        """Get recipe (once per request) and increment view count"""
+        if not hasattr(self, '_recipe'):
+            self._recipe = super().get_object(queryset)
+            # Increment view count (only for published recipes)
+            if self._recipe.is_published:
+                self._recipe.increment_view_count()
+        return self._recipe
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        recipe = self.get_object()
+        recipe = self.object
+        user = self.request.user
         
         # Check if user can edit/delete
-        context['can_edit'] = (
-            self.request.user.is_authenticated and
-            (recipe.author == self.request.user or self.request.user.is_staff)
-        )
+        context['can_edit'] = user.is_authenticated and (recipe.author_id == user.pk or user.is_staff)
         
-        # Check if user has favorited this recipe
-        context['is_favorited'] = False
-        if self.request.user.is_authenticated:
-            context['is_favorited'] = recipe.favorites.filter(user=self.request.user).exists()
+        # The user's favorite and rating, if any
+        context['is_favorited'] = getattr(recipe, 'user_favorited', False)
+        context['user_rating'] = next(iter(getattr(recipe, 'user_ratings', [])), None)
         
-        # Check if user has rated this recipe
-        context['user_rating'] = None
-        if self.request.user.is_authenticated:
-            try:
-                context['user_rating'] = recipe.ratings.get(user=self.request.user)
-            except:
-                pass
-        
-        # Get recent comments
-        context['comments'] = recipe.comments.select_related('user').all()[:10]
+        # Newest comments and ratings
+        context['comments'] = recipe.recent_comments
+        context['ratings'] = recipe.recent_ratings
         
-        # Get ratings summary
-        context['ratings'] = recipe.ratings.select_related('user').all()[:10]
+        # Ratings summary
+        context['stats'] = {
+            'average_rating': round(recipe.stats_average_rating, 2),
+            'rating_count': recipe.stats_rating_count,
+            'comment_count': recipe.stats_comment_count,
+            'favorite_count': recipe.stats_favorite_count,
+        }
         
         return context
 
@@ -119,21 +171,7 @@ def recipe_create_view(request):
             ingredients_json = request.POST.get('ingredients_data', '[]')
             import json
             try:
-                ingredients_list = json.loads(ingredients_json)
-                for ing_data in ingredients_list:
-                    if ing_data.get('name') and ing_data.get('quantity'):
-                        # Get or create ingredient
-                        ingredient, _ = Ingredient.objects.get_or_create(
-                            name=ing_data['name'].strip()
-                        )
-                        # Create RecipeIngredient
-                        RecipeIngredient.objects.create(
-                            recipe=recipe,
-                            ingredient=ingredient,
-                            quantity=ing_data.get('quantity', 0),
-                            unit=ing_data.get('unit', ''),
-                            notes=ing_data.get('notes', '')
-                        )
+                recipe.set_ingredients(json.loads(ingredients_json))
             except (json.JSONDecodeError, ValueError):
                 pass  # Skip invalid ingredient data
             
@@ -168,27 +206,13 @@ def recipe_edit_view(request, pk):
             recipe = form.save()
             
             # Handle ingredients - clear existing and add new ones
-            RecipeIngredient.objects.filter(recipe=recipe).delete()
             ingredients_json = request.POST.get('ingredients_data', '[]')
             import json
             try:
                 ingredients_list = json.loads(ingredients_json)
-                for ing_data in ingredients_list:
-                    if ing_data.get('name') and ing_data.get('quantity'):
-                        # Get or create ingredient
-                        ingredient, _ = Ingredient.objects.get_or_create(
-                            name=ing_data['name'].strip()
-                        )
-                        # Create RecipeIngredient
-                        RecipeIngredient.objects.create(
-                            recipe=recipe,
-                            ingredient=ingredient,
-                            quantity=ing_data.get('quantity', 0),
-                            unit=ing_data.get('unit', ''),
-                            notes=ing_data.get('notes', '')
-                        )
             except (json.JSONDecodeError, ValueError):
-                pass  # Skip invalid ingredient data
+                ingredients_list = []  # Skip invalid ingredient data
+            recipe.set_ingredients(ingredients_list, replace=True)
             
             messages.success(request, f'Recipe "{recipe.title}" updated successfully!')
             return redirect('recipes:detail', pk=recipe.pk)
@@ -231,20 +255,32 @@ def recipe_delete_view(request, pk):
 
 def category_detail_view(request, slug):
     """View all recipes in a category"""
-    category = get_object_or_404(Category, slug=slug)
+    if request.user.is_authenticated:
+        category = get_object_or_404(Category, slug=slug)
+    else:
+        category = catalog_memoize(
+            ['category', slug], lambda: Category.objects.filter(slug=slug).first()
+        )
+        if category is None:
+            raise Http404("No Category matches the given query.")
+    
     recipes = Recipe.objects.filter(
         category=category,
         is_published=True
     ).select_related('author').order_by('-created_at')
     
-    paginator = Paginator(recipes, 12)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    def paginate():
+        paginator = Paginator(recipes, 12)
+        return paginator, paginator.get_page(request.GET.get('page'))
+    
+    _, page_obj = cached_page(
+        request, ['category_detail', slug], paginate, lambda: Paginator(recipes, 12)
+    )
     
     return render(request, 'recipes/category.html', {
         'category': category,
         'recipes': page_obj,
-        'categories': Category.objects.all()
+        'categories': get_categories()
     })
 
 
@@ -374,19 +410,26 @@ def toggle_favorite_view(request, pk):
 
 @login_required
 def favorite_recipes_view(request):
-    """View user's favorite recipes"""
+    """
+    View user's favorite recipes (newest favorites first)
+    
+    Paginated in the database: a COUNT and one page of favorites (with
+    their recipes) over the (user, -created_at) index, however many
+    favorites the user has.
+    """
     favorites = Favorite.objects.filter(
-        user=request.user
+        user=request.user, recipe__is_published=True
     ).select_related('recipe', 'recipe__author', 'recipe__category').order_by('-created_at')
     
-    recipes = [fav.recipe for fav in favorites if fav.recipe.is_published]
-    
-    paginator = Paginator(recipes, 12)
+    paginator = Paginator(favorites, 12)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
+    page_obj.object_list = [favorite.recipe for favorite in page_obj.object_list]
     
     return render(request, 'recipes/list.html', {
         'recipes': page_obj,
+        'page_obj': page_obj,
+        'is_paginated': page_obj.has_other_pages(),
         'title': 'My Favorite Recipes',
-        'categories': Category.objects.all()
+        'categories': get_categories()
     })
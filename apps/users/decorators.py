@@ -8,6 +8,7 @@ from functools import wraps
 from django.shortcuts import redirect
 from django.contrib import messages
 from django.core.exceptions import PermissionDenied
+from .roles import has_any_role
 
 
 def role_required(*roles):
@@ -32,12 +33,9 @@ def role_required(*roles):
                 messages.error(request, 'You must be logged in to access this page.')
                 return redirect('users:login')
             
-            # Check if user has any of the required roles
-            user_roles = request.user.groups.values_list('name', flat=True)
-            has_role = any(role in user_roles for role in roles)
-            
-            # Superusers bypass role checks
-            if not has_role and not request.user.is_superuser:
+            # Superusers bypass role checks (no role lookup needed)
+            # Roles are resolved once per request and cached between requests
+            if not request.user.is_superuser and not has_any_role(request.user, roles):
                 messages.error(request, 'You do not have permission to access this page.')
                 raise PermissionDenied("Insufficient role permissions")
             
@@ -75,12 +73,9 @@ def owner_or_role_required(*roles):
             username = kwargs.get('username')
             is_owner = username and request.user.username == username
             
-            # Check roles
-            user_roles = list(request.user.groups.values_list('name', flat=True))
-            has_role = any(role in user_roles for role in roles)
-            
-            # Superusers bypass checks
-            if not is_owner and not has_role and not request.user.is_superuser:
+            # Owners and superusers bypass checks, so roles are only
+            # looked up when actually needed (and cached when they are)
+            if not is_owner and not request.user.is_superuser and not has_any_role(request.user, roles):
                 messages.error(request, 'You do not have permission to access this page.')
                 raise PermissionDenied("Insufficient permissions")
             
@@ -189,3 +189,43 @@ def save_user_profile(sender, instance, **kwargs):
     """
     if hasattr(instance, 'profile'):
         instance.profile.save()
+
+
+# Signals to keep the cached role sets (see roles.py) in sync with groups
+from django.contrib.auth.models import Group
+from django.db.models.signals import m2m_changed, post_delete
+from .roles import invalidate_user_roles, invalidate_all_roles
+
+
+@receiver(m2m_changed, sender=CustomUser.groups.through)
+def user_groups_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Signal receiver - Drops cached roles when group membership changes
+    
+    Fires for both user.groups.add(...) and group.user_set.add(...).
+    """
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    
+    if not reverse:
+        # user.groups changed - only this user is affected
+        invalidate_user_roles(instance.pk)
+    elif pk_set:
+        # group.user_set changed - pk_set holds the affected user ids
+        invalidate_user_roles(*pk_set)
+    else:
+        # group.user_set.clear() doesn't tell us who was removed
+        invalidate_all_roles()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    """
+    Signal receiver - Drops every cached role set when a group is
+    renamed or deleted (role names are what we cache)
+    """
+    if kwargs.get('created'):
+        # A brand new group has no members yet
+        return
+    invalidate_all_roles()
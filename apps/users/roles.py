@@ -0,0 +1,80 @@
+"""
+Role (Group) lookups for role-based access control
+
+Resolving a user's roles means a query against the groups table. The RBAC
+decorators need that answer on every decorated request, so this module
+resolves it at most once per request and keeps it in the cache between
+requests.
+
+How the caching works:
+- The role set is memoized on the user object (like Django's own _perm_cache),
+  so repeated checks during one request are free
+- Between requests it lives in the cache under a versioned key
+- Group membership changes delete the user's entry; renaming or deleting a
+  Group bumps a global version so every cached entry is ignored at once
+"""
+
+import time
+
+from django.core.cache import cache
+
+ROLE_CACHE_TIMEOUT = 60 * 60  # 1 hour
+ROLE_VERSION_KEY = 'user_roles:version'
+
+
+def _get_version():
+    """Current global role version (bumped when groups themselves change)"""
+    version = cache.get(ROLE_VERSION_KEY)
+    if version is None:
+        # Seed from the clock so an evicted version never reuses old keys
+        cache.add(ROLE_VERSION_KEY, int(time.time()), None)
+        version = cache.get(ROLE_VERSION_KEY)
+    return version
+
+
+def _roles_key(user_id, version):
+    return f'user_roles:{version}:{user_id}'
+
+
+def get_user_roles(user):
+    """
+    Return the set of role (group) names for a user
+
+    Anonymous users have no roles. The result is memoized on the user object
+    so it is resolved at most once per request.
+    """
+    if not user.is_authenticated:
+        return frozenset()
+
+    roles = getattr(user, '_role_cache', None)
+    if roles is not None:
+        return roles
+
+    key = _roles_key(user.pk, _get_version())
+    roles = cache.get(key)
+    if roles is None:
+        roles = frozenset(user.groups.values_list('name', flat=True))
+        cache.set(key, roles, ROLE_CACHE_TIMEOUT)
+
+    user._role_cache = roles
+    return roles
+
+
+def has_any_role(user, roles):
+    """Check if the user has at least one of the given roles"""
+    return not get_user_roles(user).isdisjoint(roles)
+
+
+def invalidate_user_roles(*user_ids):
+    """Forget cached roles for specific users (membership changed)"""
+    version = _get_version()
+    cache.delete_many([_roles_key(user_id, version) for user_id in user_ids])
+
+
+def invalidate_all_roles():
+    """Forget cached roles for every user (a group was renamed or deleted)"""
+    try:
+        cache.incr(ROLE_VERSION_KEY)
+    except ValueError:
+        # Version key was evicted - start over from a fresh version
+        cache.set(ROLE_VERSION_KEY, int(time.time()), None)
@@ -194,3 +194,90 @@ class UserRecipeRelationshipTest(TestCase):
         
         # User can access favorites via related_name
         self.assertIn(favorite, self.user.favorite_recipes.all())
+
+
+class RoleCacheTest(TestCase):
+    """Test cached role lookups used by the RBAC decorators"""
+    
+    def setUp(self):
+        """Set up test data"""
+        from django.contrib.auth.models import Group
+        from django.core.cache import cache
+        
+        cache.clear()
+        self.moderators = Group.objects.create(name="moderator")
+        self.user = User.objects.create_user(
+            username="moduser",
+            email="mod@example.com",
+            password="testpass123"
+        )
+        self.user.groups.add(self.moderators)
+    
+    def fresh_user(self):
+        """Load the user again, like a new request would"""
+        return User.objects.get(pk=self.user.pk)
+    
+    def test_roles_resolved_once_per_request(self):
+        """Test roles are memoized on the user object"""
+        from .roles import get_user_roles
+        
+        user = self.fresh_user()
+        self.assertEqual(get_user_roles(user), {"moderator"})
+        with self.assertNumQueries(0):
+            get_user_roles(user)
+    
+    def test_roles_cached_between_requests(self):
+        """Test a new request reuses the cached role set"""
+        from .roles import get_user_roles
+        
+        get_user_roles(self.fresh_user())
+        user = self.fresh_user()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_user_roles(user), {"moderator"})
+    
+    def test_membership_change_invalidates(self):
+        """Test adding/removing groups is visible on the next request"""
+        from django.contrib.auth.models import Group
+        from .roles import get_user_roles
+        
+        get_user_roles(self.fresh_user())
+        admins = Group.objects.create(name="admin")
+        admins.user_set.add(self.user)
+        self.assertEqual(get_user_roles(self.fresh_user()), {"moderator", "admin"})
+        
+        self.user.groups.remove(self.moderators)
+        self.assertEqual(get_user_roles(self.fresh_user()), {"admin"})
+    
+    def test_group_rename_invalidates(self):
+        """Test renaming a group invalidates every cached role set"""
+        from .roles import get_user_roles
+        
+        get_user_roles(self.fresh_user())
+        self.moderators.name = "editor"
+        self.moderators.save()
+        self.assertEqual(get_user_roles(self.fresh_user()), {"editor"})
+    
+    def test_role_required_decorator(self):
+        """Test role_required allows members and rejects others"""
+        from django.core.exceptions import PermissionDenied
+        from django.http import HttpResponse
+        from django.test import RequestFactory
+        from .decorators import role_required
+        
+        view = role_required("moderator")(lambda request: HttpResponse("ok"))
+        request = RequestFactory().get("/")
+        request.user = self.fresh_user()
+        self.assertEqual(view(request).status_code, 200)
+        
+        other = User.objects.create_user(
+            username="plainuser",
+            email="plain@example.com",
+            password="testpass123"
+        )
+        from django.contrib.messages.storage.cookie import CookieStorage
+        
+        request = RequestFactory().get("/")
+        request.user = other
+        request._messages = CookieStorage(request)
+        with self.assertRaises(PermissionDenied):
+            view(request)
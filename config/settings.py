@@ -175,6 +175,55 @@ else:
         }
 
 
+# Cache Configuration
+# 'default' is a two-tier cache: a small in-process LRU in front of the
+# 'shared' cache that every worker process sees (rate limits, cached API
+# data, etc.). See apps/api/cache_backends.py and apps/api/cache.py.
+#
+# CACHE_URL selects the shared backend:
+# - redis://host:6379/0          -> Redis (production)
+# - memcached://host:11211       -> Memcached
+# - empty (default)              -> File-based cache in CACHE_DIR (local development)
+CACHE_URL = config('CACHE_URL', default='')
+
+if CACHE_URL.startswith(('redis://', 'rediss://')):
+    SHARED_CACHE = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': CACHE_URL,
+    }
+elif CACHE_URL.startswith('memcached://'):
+    SHARED_CACHE = {
+        'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+        'LOCATION': CACHE_URL[len('memcached://'):],
+    }
+else:
+    # Holds idempotency records, rate-limit counters, locks and cached pages
+    # side by side: Django's default MAX_ENTRIES (300) would keep culling
+    # random files, and a culled idempotency record lets a retried POST run
+    # twice. Still local development only - use Redis or Memcached in
+    # production.
+    SHARED_CACHE = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': config('CACHE_DIR', default=str(BASE_DIR / '.django_cache')),
+        'OPTIONS': {
+            'MAX_ENTRIES': config('CACHE_MAX_ENTRIES', default=20000, cast=int),
+        },
+    }
+SHARED_CACHE['TIMEOUT'] = 3600  # Default expiry for keys set without a timeout
+
+CACHES = {
+    'default': {
+        'BACKEND': 'apps.api.cache_backends.TwoTierCache',
+        'OPTIONS': {
+            'SHARED_ALIAS': 'shared',
+            'LOCAL_MAX_ENTRIES': config('CACHE_LOCAL_MAX_ENTRIES', default=1000, cast=int),
+            'LOCAL_TIMEOUT': config('CACHE_LOCAL_TIMEOUT', default=5, cast=int),  # Seconds
+        },
+    },
+    'shared': SHARED_CACHE,
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -258,10 +307,20 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',  # For web frontend
-        'rest_framework.authentication.TokenAuthentication',  # For API token auth
-        'rest_framework_simplejwt.authentication.JWTAuthentication',  # For JWT auth
+        'apps.api.authentication.CachedTokenAuthentication',  # For API token auth (cached lookups)
+        'apps.api.authentication.CachedJWTAuthentication',  # For JWT auth (cached lookups)
         'apps.api.authentication.APIKeyAuthentication',  # API Key authentication for meal planner apps
     ],
+    # JSON via orjson/msgspec when installed (see apps/api/fastjson.py)
+    'DEFAULT_RENDERER_CLASSES': [
+        'apps.api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'apps.api.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
     # API Documentation (OpenAPI/Swagger)
@@ -296,6 +355,33 @@ SIMPLE_JWT = {
     'TOKEN_TYPE_CLAIM': 'token_type',
 }
 
+# Cached API authentication (see apps/api/authentication.py)
+AUTH_CACHE_TIMEOUT = config('AUTH_CACHE_TIMEOUT', default=300, cast=int)  # Seconds a resolved user stays cached
+# Build the user from JWT claims (no database/cache lookup) on read-only requests
+JWT_STATELESS_READS = config('JWT_STATELESS_READS', default=False, cast=bool)
+
+# HTTP caching of public API responses (see apps/api/conditional.py)
+HTTP_CACHE_MAX_AGE = config('HTTP_CACHE_MAX_AGE', default=60, cast=int)
+HTTP_CACHE_STALE_WHILE_REVALIDATE = config('HTTP_CACHE_STALE_WHILE_REVALIDATE', default=300, cast=int)
+
+# Safe retries (see apps/api/idempotency.py)
+IDEMPOTENCY_KEY_TTL = config('IDEMPOTENCY_KEY_TTL', default=86400, cast=int)  # Seconds a keyed response is replayed
+SINGLE_FLIGHT_RESULT_TIMEOUT = config('SINGLE_FLIGHT_RESULT_TIMEOUT', default=5, cast=int)  # Seconds a coalesced GET is shared
+
+# Author analytics counters (see apps/api/analytics.py)
+ANALYTICS_FLUSH_INTERVAL = config('ANALYTICS_FLUSH_INTERVAL', default=10, cast=int)  # Seconds activity is buffered before writing
+ANALYTICS_HOURLY_RETENTION_DAYS = config('ANALYTICS_HOURLY_RETENTION_DAYS', default=30, cast=int)
+
+# Trending recipes (see apps/api/trending.py)
+TRENDING_HALF_LIFE_HOURS = config('TRENDING_HALF_LIFE_HOURS', default=48, cast=int)  # Activity counts half after this long
+TRENDING_CACHE_TIMEOUT = config('TRENDING_CACHE_TIMEOUT', default=60, cast=int)  # Seconds the top lists are cached
+
+# Meal plan generator (see apps/api/meal_planner.py)
+MEAL_PLANNER_TIME_BUDGET_MS = config('MEAL_PLANNER_TIME_BUDGET_MS', default=30, cast=int)  # Local search time per request
+
+# Calendar subscription feeds (see apps/api/ical.py)
+MEAL_PLAN_FEED_PAST_DAYS = config('MEAL_PLAN_FEED_PAST_DAYS', default=90, cast=int)  # Past meal plans shown in feeds
+
 # API Documentation Settings (drf-spectacular)
 SPECTACULAR_SETTINGS = {
     'TITLE': 'Recipe Sharing Platform API',
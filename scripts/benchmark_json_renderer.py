@@ -0,0 +1,65 @@
+"""
+Benchmark: API JSON rendering and parsing
+
+Serializes a 500-recipe list with the full RecipeSerializer once, then
+times DRF's JSONRenderer/JSONParser against FastJSONRenderer/FastJSONParser
+(and the pure-Python fallback) on that payload.
+
+Usage:
+    python scripts/benchmark_json_renderer.py [--recipes 500] [--repeat 20]
+"""
+
+import argparse
+import io
+
+from benchmark_utils import benchmark_environment, create_sample_catalog, print_header, timed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--recipes', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    with benchmark_environment():
+        from rest_framework.parsers import JSONParser
+        from rest_framework.renderers import JSONRenderer
+        from apps.api import fastjson
+        from apps.api.parsers import FastJSONParser
+        from apps.api.renderers import FastJSONRenderer
+        from apps.api.serializers import RecipeSerializer
+        from apps.recipes.models import Recipe
+
+        create_sample_catalog(args.recipes)
+        recipes = Recipe.objects.select_related('author', 'category').prefetch_related(
+            'recipe_ingredients__ingredient', 'ratings', 'comments', 'favorites', 'images'
+        )
+        data = RecipeSerializer(recipes, many=True).data
+        body = JSONRenderer().render(data)
+
+        print_header(
+            f'JSON rendering: {args.recipes} recipes, {len(body) / 1024:.0f} KB '
+            f'(fast backend: {fastjson.BACKEND})'
+        )
+
+        def render_with(renderer):
+            return lambda: [renderer.render(data) for _ in range(args.repeat)]
+
+        def parse_with(json_parser):
+            return lambda: [json_parser.parse(io.BytesIO(body)) for _ in range(args.repeat)]
+
+        rows = [
+            ('render  DRF JSONRenderer', render_with(JSONRenderer())),
+            ('render  FastJSONRenderer', render_with(FastJSONRenderer())),
+            ('render  pure-Python fallback',
+             lambda: [fastjson._stdlib_dumps(data) for _ in range(args.repeat)]),
+            ('parse   DRF JSONParser', parse_with(JSONParser())),
+            ('parse   FastJSONParser', parse_with(FastJSONParser())),
+        ]
+        for label, func in rows:
+            seconds = timed(func, repeat=3) / args.repeat
+            print(f'{label:<32}{seconds * 1000:8.2f} ms/payload')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark: generating a week of meal plans from a large catalog
+
+Creates a catalog, then times generate_meal_plans() for a week of
+breakfast, lunch and dinner (with and without constraints). Reports the
+time before the local search starts (queries + greedy), the total with
+the search's time budget, and the grocery list size before/after the
+search.
+
+Usage:
+    python scripts/benchmark_meal_planner.py [--recipes 50000] [--runs 20]
+"""
+
+import argparse
+import random
+import statistics
+import time
+from datetime import date
+
+from benchmark_utils import benchmark_environment, create_sample_catalog, print_header
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--recipes', type=int, default=50000)
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    with benchmark_environment():
+        from django.contrib.auth import get_user_model
+        from apps.recipes.dietary import refresh_recipe_tags
+        from apps.recipes.models import Recipe
+        from apps.api import meal_planner
+        from apps.api.meal_planner import generate_meal_plans, parse_generate_params
+
+        print_header(f'Meal plan generator: {args.recipes} recipes, {args.runs} runs')
+        started = time.perf_counter()
+        recipe_ids = create_sample_catalog(args.recipes)
+        rng = random.Random(7)
+        scores = {recipe_id: rng.random() * 100 for recipe_id in recipe_ids}
+        Recipe.objects.bulk_update(
+            [Recipe(pk=recipe_id, trending_score=score) for recipe_id, score in scores.items()],
+            ['trending_score'], batch_size=2000,
+        )
+        for start in range(0, len(recipe_ids), 5000):  # bulk_create skipped Recipe.save()
+            refresh_recipe_tags(recipe_ids[start:start + 5000])
+        print(f'{"create catalog":<34}{time.perf_counter() - started:>10.1f} s')
+        user = get_user_model().objects.create(username='planner', email='planner@example.com')
+
+        scenarios = {
+            'week, 3 meals': {},
+            'week, 3 meals, vegetarian, 45 min': {'dietary': 'vegetarian', 'max_total_time': 45},
+        }
+        for name, body in scenarios.items():
+            options = parse_generate_params(
+                {'start_date': date(2030, 1, 7).isoformat(), 'dry_run': True, **body}, user
+            )
+            for budget in (0, meal_planner._time_budget()):
+                times, items, unfilled = [], [], []
+                original = meal_planner._time_budget
+                meal_planner._time_budget = lambda: budget
+                try:
+                    for run in range(args.runs):
+                        options['seed'] = run
+                        connection.queries_log.clear()
+                        with CaptureQueriesContext(connection) as queries:
+                            started = time.perf_counter()
+                            result = generate_meal_plans(user, options)
+                            times.append((time.perf_counter() - started) * 1000)
+                        items.append(result['grocery_items'])
+                        unfilled.append(len(result['unfilled']))
+                finally:
+                    meal_planner._time_budget = original
+                label = f'{name} ({"greedy" if not budget else f"+{budget * 1000:.0f} ms search"})'
+                print(
+                    f'{label:<52}{statistics.median(times):>8.1f} ms  '
+                    f'{statistics.mean(items):>5.1f} grocery items  {statistics.mean(unfilled):.0f} unfilled  '
+                    f'({len(queries)} queries)'
+                )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Benchmark: MessagePack vs JSON wire formats
+
+Renders a page of recipes (the list serializer, as a sync client would
+fetch it) as JSON, MessagePack and MessagePack in the table shape, and
+reports body size (raw and gzipped) plus encode and decode time.
+
+Usage:
+    python scripts/benchmark_msgpack.py [--recipes 1000] [--repeat 20]
+"""
+
+import argparse
+import gzip
+
+from benchmark_utils import benchmark_environment, create_sample_catalog, print_header, timed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--recipes', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    with benchmark_environment():
+        import msgpack
+        from rest_framework.renderers import JSONRenderer
+        from apps.api import fastjson
+        from apps.api.renderers import FastJSONRenderer, MessagePackRenderer
+        from apps.api.serializers import RecipeListSerializer
+        from apps.recipes.models import Recipe
+
+        create_sample_catalog(args.recipes)
+        recipes = Recipe.objects.select_related('author', 'category').prefetch_related(
+            'ratings', 'comments', 'favorites'
+        )
+        data = {
+            'count': args.recipes, 'next': None, 'previous': None,
+            'results': RecipeListSerializer(recipes, many=True).data,
+        }
+
+        formats = [
+            ('JSON (DRF)', JSONRenderer(), None, fastjson.loads),
+            ('JSON (fast)', FastJSONRenderer(), None, fastjson.loads),
+            ('MessagePack', MessagePackRenderer(), 'application/msgpack',
+             lambda body: msgpack.unpackb(body, raw=False)),
+            ('MessagePack table', MessagePackRenderer(), 'application/msgpack; shape=table',
+             lambda body: msgpack.unpackb(body, raw=False)),
+        ]
+
+        print_header(f'Wire formats: {args.recipes} recipes (list serializer)')
+        print(f'{"format":<20}{"bytes":>10}{"gzip":>10}{"encode ms":>12}{"decode ms":>12}')
+        for label, renderer, media_type, decode in formats:
+            body = renderer.render(data, media_type)
+            encode = timed(lambda: [renderer.render(data, media_type) for _ in range(args.repeat)], repeat=3)
+            decoded = timed(lambda: [decode(body) for _ in range(args.repeat)], repeat=3)
+            print(
+                f'{label:<20}{len(body):>10}{len(gzip.compress(body)):>10}'
+                f'{encode * 1000 / args.repeat:>12.2f}{decoded * 1000 / args.repeat:>12.2f}'
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark: compiled list projections vs DRF serializers
+
+Builds a 100-recipe page (list and full recipe serializers) both ways:
+- serializer: prefetched queryset + RecipeListSerializer/RecipeSerializer
+- projection: one .values() query + the compiled projection
+and reports time and query count, for the whole page and (list
+serializer) with the page's objects/rows already loaded.
+
+Usage:
+    python scripts/benchmark_projection.py [--recipes 1000] [--page-size 100]
+"""
+
+import argparse
+
+from benchmark_utils import benchmark_environment, create_sample_catalog, print_header, timed
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+def count_queries(func):
+    with CaptureQueriesContext(connection) as queries:
+        func()
+    return len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--recipes', type=int, default=1000)
+    parser.add_argument('--page-size', type=int, default=100)
+    args = parser.parse_args()
+
+    with benchmark_environment():
+        from rest_framework.test import APIRequestFactory
+        from rest_framework.request import Request
+        from apps.api.projections import get_projection
+        from apps.api.serializers import RecipeListSerializer, RecipeSerializer
+        from apps.recipes.models import Recipe
+
+        create_sample_catalog(args.recipes)
+        context = {'request': Request(APIRequestFactory().get('/api/recipes/'))}
+        base = Recipe.objects.filter(is_published=True).order_by('-created_at')
+        prefetched = base.select_related('author', 'category').prefetch_related(
+            'recipe_ingredients__ingredient', 'ratings', 'comments', 'favorites', 'images'
+        )
+
+        print_header(f'List projections: {args.page_size}-recipe page of {args.recipes}')
+        print(f'{"serializer":<22}{"serializer ms":>15}{"projection ms":>15}{"speedup":>9}{"queries":>14}')
+        for serializer_class in (RecipeListSerializer, RecipeSerializer):
+            projection = get_projection(serializer_class)
+
+            def serialize():
+                page = list(prefetched[:args.page_size])
+                return serializer_class(page, many=True, context=context).data
+
+            def project():
+                rows = list(projection.values(base)[:args.page_size])
+                return projection.project(rows, context)
+
+            assert serialize() == project()
+            slow, fast = timed(serialize), timed(project)
+            queries = f'{count_queries(serialize)} -> {count_queries(project)}'
+            print(
+                f'{serializer_class.__name__ + " page":<22}{slow * 1000:>15.1f}{fast * 1000:>15.1f}'
+                f'{slow / fast:>8.1f}x{queries:>14}'
+            )
+
+            # Page already loaded (the serializer still queries the average rating)
+            if serializer_class is not RecipeListSerializer:
+                continue
+            objects = list(prefetched[:args.page_size])
+            rows = list(projection.values(base)[:args.page_size])
+            slow = timed(lambda: serializer_class(objects, many=True, context=context).data)
+            fast = timed(lambda: projection.project(rows, context))
+            print(f'{"  (page loaded)":<22}{slow * 1000:>15.1f}{fast * 1000:>15.1f}{slow / fast:>8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
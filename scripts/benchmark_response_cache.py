@@ -0,0 +1,87 @@
+"""
+Benchmark: anonymous catalog response cache
+
+Replays a realistic anonymous workload against /api/recipes/ and
+/api/recipes/search/ - a Zipf-like mix of popular and rare query strings
+with an occasional catalog write (new rating) that invalidates the cache -
+and reports requests/sec with the response cache off and on.
+
+Usage:
+    python scripts/benchmark_response_cache.py [--recipes 2000] [--requests 2000] [--write-every 100]
+"""
+
+import argparse
+import random
+import time
+
+from benchmark_utils import benchmark_environment, create_sample_catalog, print_header
+
+from django.test import Client, override_settings
+
+
+def build_workload(n_requests, seed=7):
+    """Query strings with a long-tail popularity distribution"""
+    rng = random.Random(seed)
+    searches = ['', 'chicken', 'tasty', 'recipe 1', 'recipe 2', 'dish', 'step', 'soup']
+    sorts = ['newest', 'rating', 'views', 'title']
+    urls = []
+    for _ in range(n_requests):
+        # Most traffic goes to the first few pages of the default listing
+        page = min(int(rng.paretovariate(1.5)), 20)
+        if rng.random() < 0.7:
+            urls.append(f'/api/recipes/?page={page}')
+        else:
+            params = f'search={rng.choice(searches)}&sort={rng.choice(sorts)}'
+            urls.append(f'/api/recipes/search/?{params}')
+    return urls
+
+
+def run(urls, write_every, recipe_ids, users):
+    """Replay the workload; returns requests/sec"""
+    from apps.recipes.models import Rating
+
+    client = Client()
+    rng = random.Random(11)
+    started = time.perf_counter()
+    for i, url in enumerate(urls, 1):
+        response = client.get(url)
+        assert response.status_code in (200, 404), (url, response.status_code)
+        if write_every and i % write_every == 0:
+            Rating.objects.update_or_create(
+                recipe_id=rng.choice(recipe_ids), user=rng.choice(users),
+                defaults={'stars': rng.randint(1, 5)},
+            )
+    return len(urls) / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--recipes', type=int, default=2000)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--write-every', type=int, default=100,
+                        help='Create/update a rating every N requests (0 = read only)')
+    args = parser.parse_args()
+
+    with benchmark_environment():
+        from django.contrib.auth import get_user_model
+        from apps.api.cache import get_stats, reset_stats
+
+        recipe_ids = create_sample_catalog(args.recipes)
+        users = list(get_user_model().objects.all()[:20])
+        urls = build_workload(args.requests)
+
+        print_header(f'Response cache benchmark: {args.recipes} recipes, {args.requests} requests')
+
+        with override_settings(RESPONSE_CACHE_ENABLED=False):
+            uncached = run(urls, args.write_every, recipe_ids, users)
+        print(f'Cache off: {uncached:8.1f} req/s')
+
+        reset_stats()
+        cached = run(urls, args.write_every, recipe_ids, users)
+        stats = get_stats().get('catalog', {})
+        print(f'Cache on:  {cached:8.1f} req/s  (hit rate {stats.get("hit_rate", 0):.1%})')
+        print(f'Speedup:   {cached / uncached:8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+Benchmark: similar recipes via the MinHash/LSH index vs a full scan
+
+Builds a catalog where recipes are variations of a few thousand "base
+dishes" (so there are real near-duplicates), indexes it, then compares
+per-lookup time of similar_recipes() with computing the exact Jaccard
+similarity against every recipe, and reports recall of the index's top 10.
+
+Usage:
+    python scripts/benchmark_similarity.py [--recipes 100000] [--lookups 200]
+"""
+
+import argparse
+import random
+import time
+
+from benchmark_utils import benchmark_environment, print_header
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+def create_catalog(n_recipes, rng, n_ingredients=2000, n_dishes=5000):
+    """Recipes with 6-12 ingredients, each a variation of a base dish. Returns {recipe id: features}"""
+    from django.contrib.auth import get_user_model
+    from apps.recipes.models import Category, Ingredient, Recipe, RecipeIngredient
+    from apps.api.similarity import recipe_features
+
+    author = get_user_model().objects.create(username='bench', email='bench@example.com')
+    categories = Category.objects.bulk_create([
+        Category(name=name.title(), slug=name) for name in ['breakfast', 'lunch', 'dinner', 'dessert', 'snack']
+    ])
+    ingredient_ids = [
+        ingredient.pk for ingredient in
+        Ingredient.objects.bulk_create([Ingredient(name=f'ingredient {i}') for i in range(n_ingredients)])
+    ]
+    dishes = [
+        (rng.sample(ingredient_ids, rng.randint(6, 12)), rng.choice(categories))
+        for _ in range(n_dishes)
+    ]
+
+    plans = []
+    for i in range(n_recipes):
+        ingredients, category = rng.choice(dishes)
+        ingredients = list(ingredients)
+        for _ in range(rng.randint(0, 3)):  # Swap a few ingredients
+            ingredients[rng.randrange(len(ingredients))] = rng.choice(ingredient_ids)
+        plans.append((set(ingredients), category))
+
+    recipes = Recipe.objects.bulk_create([
+        Recipe(title=f'Recipe {i}', description='', instructions='', author=author, category=category)
+        for i, (_, category) in enumerate(plans)
+    ], batch_size=2000)
+    RecipeIngredient.objects.bulk_create([
+        RecipeIngredient(recipe=recipe, ingredient_id=ingredient_id, quantity=1)
+        for recipe, (ingredients, _) in zip(recipes, plans)
+        for ingredient_id in ingredients
+    ], batch_size=5000)
+    return {
+        recipe.pk: recipe_features(ingredients, category.pk, 'none')
+        for recipe, (ingredients, category) in zip(recipes, plans)
+    }
+
+
+def exact_top(recipe_id, features, limit):
+    """Top recipes by exact Jaccard similarity, scanning the whole catalog"""
+    mine = features[recipe_id]
+    scored = []
+    for other_id, theirs in features.items():
+        if other_id != recipe_id:
+            scored.append((len(mine & theirs) / len(mine | theirs), other_id))
+    scored.sort(key=lambda item: (-item[0], item[1]))
+    return scored[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--recipes', type=int, default=100000)
+    parser.add_argument('--lookups', type=int, default=200)
+    args = parser.parse_args()
+    rng = random.Random(42)
+
+    with benchmark_environment():
+        from apps.api.similarity import INDEX_BATCH_SIZE, index_recipes, similar_recipes
+
+        print_header(f'Similar recipes: {args.recipes} recipes, {args.lookups} lookups')
+        started = time.perf_counter()
+        features = create_catalog(args.recipes, rng)
+        print(f'{"create catalog":<28}{time.perf_counter() - started:>10.1f} s')
+
+        recipe_ids = sorted(features)
+        started = time.perf_counter()
+        for start in range(0, len(recipe_ids), INDEX_BATCH_SIZE):
+            index_recipes(recipe_ids[start:start + INDEX_BATCH_SIZE])
+        print(f'{"build index":<28}{time.perf_counter() - started:>10.1f} s')
+
+        sample = rng.sample(recipe_ids, args.lookups)
+        connection.queries_log.clear()
+        with CaptureQueriesContext(connection) as queries:
+            similar_recipes(sample[0])
+        started = time.perf_counter()
+        found = {recipe_id: similar_recipes(recipe_id) for recipe_id in sample}
+        index_ms = (time.perf_counter() - started) * 1000 / len(sample)
+        print(f'{"index lookup":<28}{index_ms:>10.2f} ms  ({len(queries)} queries)')
+
+        scan_sample = sample[:20]
+        started = time.perf_counter()
+        exact = {recipe_id: exact_top(recipe_id, features, 10) for recipe_id in scan_sample}
+        scan_ms = (time.perf_counter() - started) * 1000 / len(scan_sample)
+        print(f'{"full scan (in memory)":<28}{scan_ms:>10.2f} ms  ({scan_ms / index_ms:.0f}x slower)')
+
+        # Recall: exact neighbours with Jaccard >= 0.5 that the index returned
+        relevant = hits = 0
+        for recipe_id in scan_sample:
+            returned = {other_id for other_id, _ in found[recipe_id]}
+            for score, other_id in exact[recipe_id]:
+                if score >= 0.5:
+                    relevant += 1
+                    hits += other_id in returned
+        if relevant:
+            print(f'{"recall (Jaccard >= 0.5)":<28}{hits * 100 / relevant:>10.1f} %')
+
+
+if __name__ == '__main__':
+    main()
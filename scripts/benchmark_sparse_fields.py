@@ -0,0 +1,63 @@
+"""
+Benchmark: sparse fieldsets (?fields= / ?expand=)
+
+Compares payload size, query count and time of typical mobile/partner
+requests against the full recipe payloads.
+
+Usage:
+    python scripts/benchmark_sparse_fields.py [--recipes 500]
+"""
+
+import argparse
+
+from benchmark_utils import benchmark_environment, create_sample_catalog, print_header, timed
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+
+
+def measure(client, url):
+    """(bytes, queries, best seconds) for an uncached GET"""
+    def fetch():
+        cache.clear()
+        response = client.get(url)
+        assert response.status_code == 200, (url, response.status_code)
+        return response
+
+    with CaptureQueriesContext(connection) as queries:
+        response = fetch()
+    return len(response.content), len(queries), timed(fetch)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--recipes', type=int, default=500)
+    args = parser.parse_args()
+
+    with benchmark_environment(), override_settings(DEBUG=True):
+        recipe_ids = create_sample_catalog(args.recipes)
+        client = Client()
+        detail = f'/api/recipes/{recipe_ids[0]}/'
+        cases = [
+            ('list page', '/api/recipes/', '/api/recipes/?fields=id,title,image'),
+            ('detail', detail, f'{detail}?fields=id,title,image,total_time'),
+            ('detail, author only', detail, f'{detail}?fields=id,title&expand=author'),
+        ]
+
+        print_header(f'Sparse fieldsets: {args.recipes} recipes')
+        print(f'{"request":<22}{"bytes":>18}{"queries":>14}{"ms":>18}')
+        for label, full_url, sparse_url in cases:
+            full = measure(client, full_url)
+            sparse = measure(client, sparse_url)
+            print(
+                f'{label:<22}'
+                f'{full[0]:>8} -> {sparse[0]:<7}'
+                f'{full[1]:>5} -> {sparse[1]:<5}'
+                f'{full[2] * 1000:>7.1f} -> {sparse[2] * 1000:<7.1f}'
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""
+Shared helpers for the benchmark scripts
+
+Benchmarks run against a throwaway test database (never your real data):
+    with benchmark_environment():
+        create_sample_catalog(500)
+        ...
+"""
+
+import os
+import sys
+import time
+import random
+from contextlib import contextmanager
+from decimal import Decimal
+
+import django
+
+# Setup Django
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment, override_settings
+
+
+@contextmanager
+def benchmark_environment():
+    """Create a test database and relax request limits for the duration"""
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    rest_framework = dict(settings.REST_FRAMEWORK, DEFAULT_THROTTLE_CLASSES=[])
+    try:
+        with override_settings(
+            REST_FRAMEWORK=rest_framework,
+            RATE_LIMIT_REQUESTS=10 ** 9,
+            SECURE_SSL_REDIRECT=False,
+            ALLOWED_HOSTS=['*'],
+        ):
+            cache.clear()
+            yield
+    finally:
+        cache.clear()
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def create_sample_catalog(n_recipes, n_users=50, ingredients_per_recipe=8, seed=42):
+    """
+    Bulk-create a realistic catalog: users, categories, ingredients, recipes,
+    recipe ingredients, ratings and favorites. Returns the list of recipe ids.
+    """
+    from django.contrib.auth import get_user_model
+    from apps.recipes.models import Category, Ingredient, Recipe, RecipeIngredient, Rating, Favorite
+
+    User = get_user_model()
+    rng = random.Random(seed)
+
+    users = User.objects.bulk_create([
+        User(username=f'bench{i}', email=f'bench{i}@example.com') for i in range(n_users)
+    ])
+    categories = Category.objects.bulk_create([
+        Category(name=name.title(), slug=name)
+        for name in ['breakfast', 'lunch', 'dinner', 'dessert', 'snack']
+    ])
+    ingredients = Ingredient.objects.bulk_create([
+        Ingredient(name=f'ingredient {i}') for i in range(max(200, ingredients_per_recipe * 4))
+    ])
+    diets = [choice for choice, _ in Recipe.DIETARY_CHOICES]
+
+    recipes = Recipe.objects.bulk_create([
+        Recipe(
+            title=f'Benchmark recipe {i}',
+            description='A tasty dish. ' * rng.randint(3, 15),
+            instructions='Step. ' * rng.randint(20, 80),
+            prep_time=rng.randint(0, 60),
+            cook_time=rng.randint(0, 120),
+            author=rng.choice(users),
+            category=rng.choice(categories),
+            dietary_restrictions=rng.choice(diets),
+            view_count=rng.randint(0, 5000),
+        )
+        for i in range(n_recipes)
+    ], batch_size=500)
+
+    RecipeIngredient.objects.bulk_create([
+        RecipeIngredient(
+            recipe=recipe,
+            ingredient=ingredient,
+            quantity=Decimal(rng.randint(1, 800)) / 4,
+            unit=rng.choice(['g', 'cup', 'tbsp', 'tsp', 'piece', '']),
+        )
+        for recipe in recipes
+        for ingredient in rng.sample(ingredients, ingredients_per_recipe)
+    ], batch_size=1000)
+
+    Rating.objects.bulk_create([
+        Rating(recipe=recipe, user=user, stars=rng.randint(1, 5))
+        for recipe in recipes
+        for user in rng.sample(users, rng.randint(0, 5))
+    ], batch_size=1000)
+    Favorite.objects.bulk_create([
+        Favorite(recipe=recipe, user=user)
+        for recipe in recipes
+        for user in rng.sample(users, rng.randint(0, 3))
+    ], batch_size=1000)
+
+    return [recipe.pk for recipe in recipes]
+
+
+def timed(func, repeat=5):
+    """Best wall time (seconds) of `repeat` calls to func()"""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def print_header(title):
+    print('=' * 70)
+    print(title)
+    print('=' * 70)